@@ -325,6 +325,14 @@ BSYNCR_SERVER_PORT = os.environ.get('BSYNCR_SERVER_PORT', '80')
 # LBNL's BETTER tool host location
 BETTER_HOST = os.environ.get('BETTER_HOST', 'https://better.lbl.gov')
 
+# Maximum number of requests an analysis makes to BETTER at the same time (e.g., creating buildings)
+BETTER_MAX_CONCURRENT_REQUESTS = int(os.environ.get('BETTER_MAX_CONCURRENT_REQUESTS', 8))
+
+# Seconds between the checks of the status of BETTER analyses, and seconds before they time out.
+# The worker is not blocked in between the checks.
+BETTER_POLLING_INTERVAL = int(os.environ.get('BETTER_POLLING_INTERVAL', 10))
+BETTER_POLLING_TIMEOUT = int(os.environ.get('BETTER_POLLING_TIMEOUT', 3600))
+
 # Audit Template Production Host
 AUDIT_TEMPLATE_HOST = os.environ.get('AUDIT_TEMPLATE_HOST', 'https://buildingenergyscore.energy.gov')
 
@@ -340,6 +348,25 @@ GOOGLE_RECAPTCHA_SECRET_KEY = os.environ.get('GOOGLE_RECAPTCHA_SECRET_KEY')
 # GREEN_ASSESSMENT_DEFAULT_VALIDITY_DURATION=5 * 365
 GREEN_ASSESSMENT_DEFAULT_VALIDITY_DURATION = None
 
+# Number of rows of an import file saved in bulk by each raw save task
+SAVE_RAW_DATA_BATCH_SIZE = int(os.environ.get('SAVE_RAW_DATA_BATCH_SIZE', 1000))
+# Send the raw save tasks of CSV files the position of their rows in the file instead of
+# the rows themselves, so the file does not go through the broker
+SAVE_RAW_DATA_ROW_RANGES = os.environ.get('SAVE_RAW_DATA_ROW_RANGES', 'true').lower() == 'true'
+
+# Number of states checked by each data quality task. The rules are evaluated with set based
+# queries, so the chunks can be large
+DATA_QUALITY_BATCH_SIZE = int(os.environ.get('DATA_QUALITY_BATCH_SIZE', 10000))
+
+# Number of analysis property views processed by each task of analyses run in parallel
+ANALYSIS_RUN_BATCH_SIZE = int(os.environ.get('ANALYSIS_RUN_BATCH_SIZE', 500))
+
+# Aggregate the monthly and yearly meter readings in the database instead of in Python
+METER_READINGS_SQL_AGGREGATION = os.environ.get('METER_READINGS_SQL_AGGREGATION', 'true').lower() == 'true'
+
+# Read the monthly meter readings from the continuous aggregates (TimescaleDB 2.9), when they exist
+METER_READINGS_CONTINUOUS_AGGREGATES = os.environ.get('METER_READINGS_CONTINUOUS_AGGREGATES', 'true').lower() == 'true'
+
 # Config to include v2 APIs
 INCLUDE_SEED_V2_APIS = os.environ.get('INCLUDE_SEED_V2_APIS', 'true').lower() == 'true'
 
@@ -54,6 +54,10 @@ NOSE_ARGS = [
 
 REQUIRE_UNIQUE_EMAIL = False
 
+# the meter reading aggregates are refreshed once the imports are committed, which does not
+# happen within the transactions of the tests
+METER_READINGS_CONTINUOUS_AGGREGATES = False
+
 INTERNAL_IPS = ('127.0.0.1',)
 
 COMPRESS_ENABLED = False
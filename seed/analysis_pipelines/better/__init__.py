@@ -3,5 +3,6 @@ from seed.analysis_pipelines.better.pipeline import (  # noqa: F401
     _finish_analysis,
     _finish_preparation,
     _prepare_all_properties,
-    _start_analysis
+    _start_analysis,
+    _wait_for_better_analyses
 )
@@ -1,10 +1,11 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import NamedTemporaryFile, TemporaryDirectory
 
-import polling
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 from seed.analysis_pipelines.pipeline import AnalysisPipelineException
 
@@ -16,8 +17,40 @@ class BETTERClient:
     HOST = settings.BETTER_HOST
     API_URL = f'{HOST}/api/v1'
 
-    def __init__(self, token):
+    def __init__(self, token, host=None, max_concurrent_requests=None):
+        """
+        :param token: str, BETTER API token
+        :param host: str, optional, defaults to settings.BETTER_HOST
+        :param max_concurrent_requests: int, optional, maximum number of requests made at
+            the same time by the batch methods (e.g., create_buildings), defaults to
+            settings.BETTER_MAX_CONCURRENT_REQUESTS
+        """
         self._token = f'Token {token}'
+        if host is not None:
+            self.HOST = host
+            self.API_URL = f'{host}/api/v1'
+
+        if max_concurrent_requests is None:
+            max_concurrent_requests = settings.BETTER_MAX_CONCURRENT_REQUESTS
+        self._max_concurrent_requests = max_concurrent_requests
+
+        # keep the connections to BETTER alive between requests, with a connection
+        # for each of the concurrent requests
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrent_requests)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def map_concurrently(self, func, items):
+        """Call func on each item, making up to max_concurrent_requests calls at the same time.
+        func should only make requests to BETTER (i.e., no database queries).
+
+        :param func: callable, called with one item
+        :param items: Iterable
+        :return: list, return values of func in the order of the items
+        """
+        with ThreadPoolExecutor(max_workers=self._max_concurrent_requests) as executor:
+            return list(executor.map(func, items))
 
     def token_is_valid(self):
         """Returns true if token is valid
@@ -31,7 +64,7 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("GET", url, headers=headers)
+            response = self._session.request("GET", url, headers=headers)
             return response.status_code == 200
         except Exception:
             return False
@@ -48,7 +81,7 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("GET", url, headers=headers)
+            response = self._session.request("GET", url, headers=headers)
             if response.status_code != 200:
                 return None, [f'Expected 200 response from BETTER but got {response.status_code}: {response.content}']
         except Exception as e:
@@ -73,7 +106,7 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("POST", url, headers=headers, data=data)
+            response = self._session.request("POST", url, headers=headers, data=data)
             if response.status_code == 201:
                 data = response.json()
                 portfolio_id = data['id']
@@ -101,7 +134,7 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("POST", url, headers=headers, data=data)
+            response = self._session.request("POST", url, headers=headers, data=data)
             if response.status_code == 201:
                 data = response.json()
                 logger.info(f'CREATED Analysis: {data}')
@@ -127,7 +160,7 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("GET", url, headers=headers)
+            response = self._session.request("GET", url, headers=headers)
             if response.status_code != 200:
                 return None, [f'Expected 200 response from BETTER but got {response.status_code}: {response.content}']
         except Exception as e:
@@ -135,8 +168,9 @@ class BETTERClient:
 
         return response.json(), []
 
-    def run_portfolio_analysis(self, better_portfolio_id, better_analysis_id):
-        """Start portfolio analysis and wait for it to finish.
+    def generate_portfolio_analysis(self, better_portfolio_id, better_analysis_id):
+        """Start generating the portfolio analysis. Use get_portfolio_analysis_status
+        to find out when it's done.
 
         :param better_portfolio_id: int
         :param better_analysis_id: int, ID of analysis created for the portfolio
@@ -149,47 +183,34 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("GET", url, headers=headers)
+            response = self._session.request("GET", url, headers=headers)
             if response.status_code != 200:
                 return [f'Expected 200 response from BETTER but got {response.status_code}: {response.content}']
         except Exception as e:
             return [f'Unexpected error generating BETTER portfolio analysis: {e}']
 
-        # Gotta make sure the analysis is done
-        def is_ready(res):
-            """
-            :param res: response tuple from get_portfolio_analysis
-            :return: bool
-            """
-            response, errors = res[0], res[1]
-            if errors:
-                raise Exception('; '.join(errors))
-
-            if response['generation_result'] == 'COMPLETE':
-                return True
-            elif response['generation_result'] == 'FAILED':
-                raise Exception(f'BETTER failed to generate the portfolio analysis: {response}')
-            else:
-                return False
+        return []
 
-        POLLING_TIMEOUT_SECS = 300
-        try:
-            polling.poll(
-                lambda: self.get_portfolio_analysis(better_portfolio_id, better_analysis_id),
-                check_success=is_ready,
-                timeout=POLLING_TIMEOUT_SECS,
-                step=10,  # wait 10 seconds between polls
-            )
-        except polling.TimeoutException as te:
-            return [f'BETTER analysis timed out after {POLLING_TIMEOUT_SECS} seconds: {te}']
-        except Exception as e:
-            return [
+    def get_portfolio_analysis_status(self, better_portfolio_id, better_analysis_id):
+        """Check if the portfolio analysis is done generating
+
+        :param better_portfolio_id: int
+        :param better_analysis_id: int, ID of analysis created for the portfolio
+        :return: tuple(bool, list[str]), True if the analysis is complete, followed by
+            list of error messages (e.g., the analysis failed)
+        """
+        response, errors = self.get_portfolio_analysis(better_portfolio_id, better_analysis_id)
+        if errors:
+            return False, [
                 f'Unexpected error checking status of BETTER portfolio analysis:'
                 f' better_portfolio_id: "{better_portfolio_id}"; better_analysis_id: "{better_analysis_id}"'
-                f': {e}'
+                f': {"; ".join(errors)}'
             ]
 
-        return []
+        if response['generation_result'] == 'FAILED':
+            return False, [f'BETTER failed to generate the portfolio analysis: {response}']
+
+        return response['generation_result'] == 'COMPLETE', []
 
     def get_portfolio_analysis_standalone_html(self, better_analysis_id):
         """Get portfolio analysis HTML results.
@@ -206,7 +227,7 @@ class BETTERClient:
         params = {'unit': 'IP'}
 
         try:
-            response = requests.request("GET", url, headers=headers, params=params)
+            response = self._session.request("GET", url, headers=headers, params=params)
             if response.status_code != 200:
                 return None, [f'Expected 200 response from BETTER but got {response.status_code}: {response.content}']
 
@@ -243,7 +264,7 @@ class BETTERClient:
             'Content-Type': 'buildingsync/xml',
         }
         try:
-            response = requests.request("POST", url, headers=headers, data=bsync_content)
+            response = self._session.request("POST", url, headers=headers, data=bsync_content)
             if response.status_code == 201:
                 data = response.json()
                 building_id = data['id']
@@ -254,6 +275,20 @@ class BETTERClient:
 
         return building_id, []
 
+    def create_buildings(self, bsync_xmls, better_portfolio_id=None):
+        """Creates BETTER buildings from bsync_xmls, making the requests concurrently
+
+        :param bsync_xmls: list[str], paths to BSync xml files of the properties
+        :param better_portfolio_id: int | str, optional, if provided it will add the
+            buildings to the portfolio
+        :returns: list[tuple(int, list[str])], BETTER Building ID followed by list of
+            errors, for each of the bsync_xmls
+        """
+        return self.map_concurrently(
+            lambda bsync_xml: self.create_building(bsync_xml, better_portfolio_id),
+            bsync_xmls
+        )
+
     def _create_building_analysis(self, building_id, config):
         """Makes request to better analysis endpoint using the provided configuration
 
@@ -271,7 +306,7 @@ class BETTERClient:
         }
 
         try:
-            response = requests.request("POST", url, headers=headers, data=json.dumps(config))
+            response = self._session.request("POST", url, headers=headers, data=json.dumps(config))
         except ConnectionError:
             message = 'BETTER service could not create analytics for this building'
             raise AnalysisPipelineException(message)
@@ -292,7 +327,7 @@ class BETTERClient:
         params = {'unit': 'IP'}
 
         try:
-            response = requests.request("GET", url, headers=headers, params=params)
+            response = self._session.request("GET", url, headers=headers, params=params)
             standalone_html = response.text.encode('utf8').decode()
 
         except ConnectionError:
@@ -320,7 +355,7 @@ class BETTERClient:
             'Authorization': self._token,
         }
         try:
-            response = requests.request("GET", url, headers=headers)
+            response = self._session.request("GET", url, headers=headers)
             if response.status_code != 200:
                 return None, [f'BETTER analysis could not be fetched: {response.text}']
             response_json = response.json()
@@ -330,24 +365,33 @@ class BETTERClient:
 
         return response_json, []
 
-    def create_and_run_building_analysis(self, building_id, config):
-        """Runs the better analysis by making a request to a better server with the
-        provided configuration. Returns the analysis id for standalone html
+    def create_building_analysis(self, building_id, config):
+        """Starts the better analysis by making a request to a better server with the
+        provided configuration. Use get_building_analysis_status to find out when it's done.
 
         :param building_id: BETTER building id analysis configuration
         :param config: dict
-        :returns: better_analysis_pk
+        :returns: list[str], list of error messages
         """
         try:
             response = self._create_building_analysis(building_id, config)
         except Exception as e:
-            return None, [f'Failed to create analysis for building: {e}']
+            return [f'Failed to create analysis for building: {e}']
 
         if response.status_code != 201:
-            return None, ['BETTER analysis could not be completed and got the following response: {message}'.format(
+            return ['BETTER analysis could not be completed and got the following response: {message}'.format(
                 message=response.text)]
 
-        # Gotta make sure the analysis is done
+        return []
+
+    def get_building_analysis_status(self, building_id):
+        """Check if the latest analysis of the building is done. Returns the analysis id
+        for standalone html once it is.
+
+        :param building_id: BETTER building id
+        :returns: tuple(int | None, list[str]), better_analysis_pk, None if the analysis
+            isn't complete yet, followed by list of error messages
+        """
         url = f"{self.API_URL}/buildings/{building_id}/analytics/"
 
         headers = {
@@ -355,14 +399,17 @@ class BETTERClient:
             'Authorization': self._token,
         }
         try:
-            response = polling.poll(
-                lambda: requests.request("GET", url, headers=headers),
-                check_success=lambda response: response.json()[0]['generation_result'] == 'COMPLETE',
-                timeout=60,
-                step=1)
-        except TimeoutError:
-            return None, ['BETTER analysis timed out']
-
-        data = response.json()
+            response = self._session.request("GET", url, headers=headers)
+            if response.status_code != 200:
+                return None, [f'Expected 200 response from BETTER but got {response.status_code}: {response.content}']
+            data = response.json()
+        except Exception as e:
+            return None, [f'Unexpected error checking status of BETTER building analysis: {e}']
+
+        if data and data[0]['generation_result'] == 'FAILED':
+            return None, [f'BETTER failed to generate the building analysis: {data[0]}']
+        if not data or data[0]['generation_result'] != 'COMPLETE':
+            return None, []
+
         better_analysis_id = data[0]['id']
         return better_analysis_id, []
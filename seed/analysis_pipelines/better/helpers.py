@@ -87,16 +87,14 @@ def _check_errors(errors, what_failed_desc, context, analysis_property_view_id=N
         raise StopAnalysisTaskChain(what_failed_desc)
 
 
-def _run_better_portfolio_analysis(better_portfolio_id, better_building_analyses, analysis_config, context):
-    """Create and run an analysis for a BETTER portfolio. Updates all BuildingAnalysis
-    objects in better_building_analyses to store their individual building analysis IDs.
+def _start_better_portfolio_analysis(better_portfolio_id, analysis_config, context):
+    """Create and start generating an analysis for a BETTER portfolio. Use
+    BETTERClient.get_portfolio_analysis_status to find out when it's done.
 
     :param better_portfolio_id: int
-    :param better_building_analyses: list[BuildingAnalysis]
     :param analysis_config: dict, config for the analysis API
-    :param analysis: Analysis
-    :param progress_data: ProgressData
-    :returns: int, better_analysis_id, ID of the analysis which was created and run
+    :param context: BETTERPipelineContext
+    :returns: int, better_analysis_id, ID of the analysis which was created
     """
     better_analysis_id, errors = context.client.create_portfolio_analysis(
         better_portfolio_id,
@@ -109,7 +107,7 @@ def _run_better_portfolio_analysis(better_portfolio_id, better_building_analyses
         fail_on_error=True
     )
 
-    errors = context.client.run_portfolio_analysis(
+    errors = context.client.generate_portfolio_analysis(
         better_portfolio_id,
         better_analysis_id
     )
@@ -121,6 +119,18 @@ def _run_better_portfolio_analysis(better_portfolio_id, better_building_analyses
             fail_on_error=True,
         )
 
+    return better_analysis_id
+
+
+def _set_better_portfolio_building_analysis_ids(better_portfolio_id, better_analysis_id, better_building_analyses, context):
+    """Updates all BuildingAnalysis objects in better_building_analyses to store their
+    individual building analysis IDs. The portfolio analysis should be completed before calling.
+
+    :param better_portfolio_id: int
+    :param better_analysis_id: int, ID of the portfolio analysis
+    :param better_building_analyses: list[BuildingAnalysis]
+    :param context: BETTERPipelineContext
+    """
     # find and store all individual building analysis IDs for the portfolio
     # so we can fetch and save those individual analysis results later
     better_portfolio_analysis, errors = context.client.get_portfolio_analysis(better_portfolio_id, better_analysis_id)
@@ -140,8 +150,6 @@ def _run_better_portfolio_analysis(better_portfolio_id, better_building_analyses
         )
         building_analysis.better_analysis_id = api_building_analysis['id']
 
-    return better_analysis_id
-
 
 def _store_better_portfolio_analysis_results(better_analysis_id, better_building_analyses, context):
     """Stores results for portfolio analysis. Analysis should be completed before calling.
@@ -178,37 +186,84 @@ def _store_better_portfolio_analysis_results(better_analysis_id, better_building
             analysis_output_file.analysis_property_views.set([b.analysis_property_view_id for b in better_building_analyses])
 
 
-def _run_better_building_analyses(better_building_analyses, analysis_config, context):
-    """Runs building analysis for each building. Updates the BuildingAnalysis objects
-    in better_building_analyses with the IDs of BETTER analyses created.
+def _start_better_building_analyses(better_building_analyses, analysis_config, context):
+    """Starts a building analysis for each building, making the requests concurrently.
+    Use _check_better_building_analyses to find out when they're done.
 
     :param better_building_analyses: list[BuildingAnalysis]
     :param analysis_config: dict, dictionary of required BETTER API body
-    :param analysis: Analysis
-    :param progress_data: ProgressData
+    :param context: BETTERPipelineContext
+    :returns: list[BuildingAnalysis], the buildings whose analysis was started
     """
-    for building_analysis in better_building_analyses:
-        better_building_id = building_analysis.better_building_id
-        analysis_property_view_id = building_analysis.analysis_property_view_id
-
-        better_analysis_id, errors = context.client.create_and_run_building_analysis(
-            better_building_id,
+    errors_by_building = context.client.map_concurrently(
+        lambda building_analysis: context.client.create_building_analysis(
+            building_analysis.better_building_id,
             analysis_config
-        )
+        ),
+        better_building_analyses
+    )
+
+    started_building_analyses = []
+    for building_analysis, errors in zip(better_building_analyses, errors_by_building):
         if errors:
             _check_errors(
                 errors,
                 'Failed to run BETTER building analysis',
                 context,
-                analysis_property_view_id=analysis_property_view_id,
+                analysis_property_view_id=building_analysis.analysis_property_view_id,
                 fail_on_error=False,
             )
             # continue to next building
             continue
 
+        started_building_analyses.append(building_analysis)
+
+    return started_building_analyses
+
+
+def _check_better_building_analyses(better_building_analyses, context, timed_out=False):
+    """Checks the status of the building analyses which aren't complete yet, making the
+    requests concurrently. Updates the BuildingAnalysis objects in better_building_analyses
+    with the IDs of the BETTER analyses which are complete.
+
+    :param better_building_analyses: list[BuildingAnalysis]
+    :param context: BETTERPipelineContext
+    :param timed_out: bool, optional, if True the analyses which aren't complete are failed
+    :returns: list[BuildingAnalysis], the buildings whose analysis is complete or
+        still running (i.e., without the failed ones)
+    """
+    pending_building_analyses = [
+        building_analysis for building_analysis in better_building_analyses
+        if building_analysis.better_analysis_id is None
+    ]
+    statuses = context.client.map_concurrently(
+        lambda building_analysis: context.client.get_building_analysis_status(building_analysis.better_building_id),
+        pending_building_analyses
+    )
+
+    failed_building_ids = set()
+    for building_analysis, (better_analysis_id, errors) in zip(pending_building_analyses, statuses):
+        if not errors and better_analysis_id is None and timed_out:
+            errors = ['BETTER analysis timed out']
+        if errors:
+            _check_errors(
+                errors,
+                'Failed to run BETTER building analysis',
+                context,
+                analysis_property_view_id=building_analysis.analysis_property_view_id,
+                fail_on_error=False,
+            )
+            failed_building_ids.add(building_analysis.better_building_id)
+            continue
+
         # save the analysis ID so we can fetch and store the analysis results later
         building_analysis.better_analysis_id = better_analysis_id
 
+    return [
+        building_analysis for building_analysis in better_building_analyses
+        if building_analysis.better_building_id not in failed_building_ids
+    ]
+
 
 def _store_better_building_analysis_results(better_building_analyses, context):
     """Stores results for building analysis. Analysis should be completed before calling.
@@ -221,15 +276,26 @@ def _store_better_building_analysis_results(better_building_analyses, context):
     :param analysis: Analysis
     :param progress_data: ProgressData
     """
-    for building_analysis in better_building_analyses:
-        better_building_id = building_analysis.better_building_id
-        better_analysis_id = building_analysis.better_analysis_id
+    def _get_results(building_analysis):
+        # only make requests here, the results are stored in the database afterwards
+        results_dir, errors = context.client.get_building_analysis_standalone_html(building_analysis.better_analysis_id)
+        if errors:
+            return results_dir, errors, None, []
+
+        results_dict, results_errors = context.client.get_building_analysis(
+            building_analysis.better_building_id,
+            building_analysis.better_analysis_id
+        )
+        return results_dir, errors, results_dict, results_errors
+
+    results = context.client.map_concurrently(_get_results, better_building_analyses)
+
+    for building_analysis, (results_dir, errors, results_dict, results_errors) in zip(better_building_analyses, results):
         analysis_property_view_id = building_analysis.analysis_property_view_id
 
         #
         # Store the standalone HTML
         #
-        results_dir, errors = context.client.get_building_analysis_standalone_html(better_analysis_id)
         if errors:
             _check_errors(
                 errors,
@@ -262,10 +328,9 @@ def _store_better_building_analysis_results(better_building_analyses, context):
         #
         # Store the JSON results into the AnalysisPropertyView
         #
-        results_dict, errors = context.client.get_building_analysis(better_building_id, better_analysis_id)
-        if errors:
+        if results_errors:
             _check_errors(
-                errors,
+                results_errors,
                 'Failed to get BETTER building analysis results',
                 context,
                 analysis_property_view_id=analysis_property_view_id,
@@ -280,16 +345,18 @@ def _store_better_building_analysis_results(better_building_analyses, context):
 
 
 def _create_better_buildings(better_portfolio_id, context):
-    """Create a BETTER building
+    """Create a BETTER building for each input file of the analysis, making the requests concurrently
 
     :param analysis: Analysis
     :param better_portfolio_id: int | None
     :return: list[BuildingAnalysis]
     """
+    input_file_paths = [input_file.file.path for input_file in context.analysis.input_files.all()]
+    created_buildings = context.client.create_buildings(input_file_paths, better_portfolio_id)
+
     better_building_analyses = []
-    for input_file in context.analysis.input_files.all():
-        analysis_property_view_id = _parse_analysis_property_view_id(input_file.file.path)
-        better_building_id, errors = context.client.create_building(input_file.file.path, better_portfolio_id)
+    for input_file_path, (better_building_id, errors) in zip(input_file_paths, created_buildings):
+        analysis_property_view_id = _parse_analysis_property_view_id(input_file_path)
         if errors:
             _check_errors(
                 errors,
@@ -8,6 +8,7 @@ import copy
 import logging
 
 from celery import chain, shared_task
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.db.models import Count
 
@@ -18,11 +19,14 @@ from seed.analysis_pipelines.better.buildingsync import (
 from seed.analysis_pipelines.better.client import BETTERClient
 from seed.analysis_pipelines.better.helpers import (
     BETTERPipelineContext,
+    BuildingAnalysis,
     ExtraDataColumnPath,
+    _check_better_building_analyses,
     _check_errors,
     _create_better_buildings,
-    _run_better_building_analyses,
-    _run_better_portfolio_analysis,
+    _set_better_portfolio_building_analysis_ids,
+    _start_better_building_analyses,
+    _start_better_portfolio_analysis,
     _store_better_building_analysis_results,
     _store_better_portfolio_analysis_results
 )
@@ -131,11 +135,8 @@ class BETTERPipeline(AnalysisPipeline):
         progress_data.total = 3
         progress_data.save()
 
-        chain(
-            _start_analysis.si(self._analysis_id),
-            _process_results.si(self._analysis_id),
-            _finish_analysis.si(self._analysis_id),
-        ).apply_async()
+        # _wait_for_better_analyses continues the analysis once BETTER is done
+        _start_analysis.si(self._analysis_id).apply_async()
 
 
 def get_meter_readings(property_id, preprocess_meters):
@@ -294,24 +295,78 @@ def _start_analysis(self, analysis_id):
 
     better_building_analyses = _create_better_buildings(better_portfolio_id, context)
 
+    better_analysis_id = None
     if better_portfolio_id is not None:
-        better_analysis_id = _run_better_portfolio_analysis(
+        better_analysis_id = _start_better_portfolio_analysis(
             better_portfolio_id,
+            analysis.configuration,
+            context,
+        )
+    else:
+        better_building_analyses = _start_better_building_analyses(
             better_building_analyses,
             analysis.configuration,
             context,
         )
 
-        _store_better_portfolio_analysis_results(
+    _wait_for_better_analyses.apply_async(
+        args=(analysis_id, better_portfolio_id, better_analysis_id, [vars(b) for b in better_building_analyses], 0),
+        countdown=settings.BETTER_POLLING_INTERVAL,
+    )
+
+
+@shared_task(bind=True)
+@analysis_pipeline_task(Analysis.RUNNING)
+def _wait_for_better_analyses(self, analysis_id, better_portfolio_id, better_analysis_id, building_analyses, polls):
+    """Check if the BETTER analyses started by _start_analysis are done. If they aren't, the
+    task enqueues itself again to check later, instead of sleeping in the worker. Once
+    they are done, it stores their results and continues the analysis.
+
+    :param analysis_id: int
+    :param better_portfolio_id: int | None, BETTER portfolio of a portfolio analysis
+    :param better_analysis_id: int | None, ID of the BETTER portfolio analysis
+    :param building_analyses: list[dict], BuildingAnalysis attributes
+    :param polls: int, number of times the analyses were checked before
+    """
+    pipeline = BETTERPipeline(analysis_id)
+    analysis = Analysis.objects.get(id=analysis_id)
+    client = BETTERClient(analysis.organization.better_analysis_api_key)
+    context = BETTERPipelineContext(analysis, pipeline.get_progress_data(analysis), client)
+    better_building_analyses = [BuildingAnalysis(**building_analysis) for building_analysis in building_analyses]
+    timed_out = (polls + 1) * settings.BETTER_POLLING_INTERVAL >= settings.BETTER_POLLING_TIMEOUT
+
+    if better_portfolio_id is not None:
+        is_complete, errors = client.get_portfolio_analysis_status(better_portfolio_id, better_analysis_id)
+        if not errors and not is_complete and timed_out:
+            errors = [f'BETTER analysis timed out after {settings.BETTER_POLLING_TIMEOUT} seconds']
+        _check_errors(
+            errors,
+            'Failed to generate BETTER portfolio analysis',
+            context,
+            fail_on_error=True,
+        )
+    else:
+        better_building_analyses = _check_better_building_analyses(better_building_analyses, context, timed_out)
+        is_complete = all(b.better_analysis_id is not None for b in better_building_analyses)
+
+    if not is_complete:
+        _wait_for_better_analyses.apply_async(
+            args=(analysis_id, better_portfolio_id, better_analysis_id, [vars(b) for b in better_building_analyses], polls + 1),
+            countdown=settings.BETTER_POLLING_INTERVAL,
+        )
+        return
+
+    if better_portfolio_id is not None:
+        _set_better_portfolio_building_analysis_ids(
+            better_portfolio_id,
             better_analysis_id,
             better_building_analyses,
             context,
         )
 
-    else:
-        _run_better_building_analyses(
+        _store_better_portfolio_analysis_results(
+            better_analysis_id,
             better_building_analyses,
-            analysis.configuration,
             context,
         )
 
@@ -320,6 +375,11 @@ def _start_analysis(self, analysis_id):
         context,
     )
 
+    chain(
+        _process_results.si(analysis_id),
+        _finish_analysis.si(analysis_id),
+    ).apply_async()
+
 
 @shared_task(bind=True)
 @analysis_pipeline_task(Analysis.RUNNING)
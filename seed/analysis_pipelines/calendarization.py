@@ -0,0 +1,153 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+
+Calendarization of meter readings with NumPy.
+
+The readings are handled as arrays of start times, end times and values instead of a
+datetime and relativedelta per month (or day) of each reading. Times are datetime64[s]
+in the wall clock time of the readings, i.e., the time zone is dropped and the months
+and days are those of the readings' own time zone.
+"""
+import datetime
+
+import numpy as np
+
+SECONDS_IN_A_DAY = 86400
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+ONE_SECOND = datetime.timedelta(seconds=1)
+
+
+def _wall_clock_seconds(value):
+    # seconds since the epoch of the time without its time zone, like the naive datetimes of the readings
+    # (converting the integers is much faster than letting NumPy convert the datetimes)
+    return (value.replace(tzinfo=None) - EPOCH) // ONE_SECOND
+
+
+def to_arrays(meter_readings):
+    """Convert the readings to arrays
+
+    :param meter_readings: Iterable[SimpleMeterReading | MeterReading]
+    :return: tuple of np.ndarray, (start times, end times) as datetime64[s] and the
+        readings as float64
+    """
+    meter_readings = list(meter_readings)
+    count = len(meter_readings)
+    start_times = np.fromiter(
+        (_wall_clock_seconds(reading.start_time) for reading in meter_readings), dtype=np.int64, count=count
+    ).astype('datetime64[s]')
+    end_times = np.fromiter(
+        (_wall_clock_seconds(reading.end_time) for reading in meter_readings), dtype=np.int64, count=count
+    ).astype('datetime64[s]')
+    readings = np.fromiter((reading.reading for reading in meter_readings), dtype=np.float64, count=count)
+    return start_times, end_times, readings
+
+
+def to_datetimes(times):
+    """Convert datetime64 values to a list of naive datetime.datetime
+
+    :param times: np.ndarray of datetime64
+    :return: List[datetime.datetime]
+    """
+    return times.astype('datetime64[s]').astype(datetime.datetime).tolist()
+
+
+def split_by_month(start_times, end_times, readings):
+    """Split the readings at the start of each calendar month. The value of each
+    reading is distributed to its months in proportion to the time the reading
+    covers in the month. Months that a reading only touches with its end time (e.g.,
+    a reading ending on February 1 at midnight) are not included.
+
+    :param start_times: np.ndarray of datetime64[s]
+    :param end_times: np.ndarray of datetime64[s]
+    :param readings: np.ndarray of float64
+    :return: tuple of np.ndarray, one element per month of each reading, ordered by
+        reading then month:
+        - index of the reading
+        - month, as datetime64[M]
+        - start of the reading in the month, as datetime64[s]
+        - end of the reading in the month, as datetime64[s]
+        - value of the reading in the month
+    """
+    first_months = start_times.astype('datetime64[M]')
+    month_counts = (end_times.astype('datetime64[M]') - first_months).astype(np.int64) + 1
+
+    reading_indexes = np.repeat(np.arange(len(readings)), month_counts)
+    # position of each month within its reading, 0 for the month of the start time
+    offsets = np.arange(len(reading_indexes)) - np.repeat(np.cumsum(month_counts) - month_counts, month_counts)
+    months = first_months[reading_indexes] + offsets
+
+    split_start_times = np.maximum(months.astype('datetime64[s]'), start_times[reading_indexes])
+    split_end_times = np.minimum((months + 1).astype('datetime64[s]'), end_times[reading_indexes])
+    overlap_seconds = (split_end_times - split_start_times).astype(np.float64)
+
+    # a reading ending at the start of a month doesn't cover any of that month
+    covered = overlap_seconds > 0
+    reading_indexes = reading_indexes[covered]
+    overlap_seconds = overlap_seconds[covered]
+    reading_seconds = (end_times - start_times).astype(np.float64)[reading_indexes]
+
+    return (
+        reading_indexes,
+        months[covered],
+        split_start_times[covered],
+        split_end_times[covered],
+        overlap_seconds / reading_seconds * readings[reading_indexes],
+    )
+
+
+def monthly_totals(start_times, end_times, readings):
+    """Total the readings by calendar month
+
+    :param start_times: np.ndarray of datetime64[s]
+    :param end_times: np.ndarray of datetime64[s]
+    :param readings: np.ndarray of float64
+    :return: tuple of np.ndarray, sorted by month:
+        - months, as datetime64[M]
+        - total of the readings in each month
+        - seconds of the month covered by the readings (counted once per reading,
+          so overlapping readings can cover more than the month)
+    """
+    _, months, split_start_times, split_end_times, split_readings = split_by_month(start_times, end_times, readings)
+    unique_months, month_indexes = np.unique(months, return_inverse=True)
+    # bincount adds the values in order, like summing the readings one at a time
+    totals = np.bincount(month_indexes, weights=split_readings, minlength=len(unique_months))
+    seconds = np.bincount(
+        month_indexes,
+        weights=(split_end_times - split_start_times).astype(np.float64),
+        minlength=len(unique_months)
+    )
+    return unique_months, totals, seconds
+
+
+def seconds_in_months(months):
+    """
+    :param months: np.ndarray of datetime64[M]
+    :return: np.ndarray of float64, number of seconds in each month
+    """
+    return ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.float64) * SECONDS_IN_A_DAY
+
+
+def count_days(start_times, end_times):
+    """Count the calendar days touched by the readings. A reading touches every
+    day from the day of its start time to the day of its end time, inclusive.
+
+    :param start_times: np.ndarray of datetime64[s]
+    :param end_times: np.ndarray of datetime64[s]
+    :return: int, number of distinct days
+    """
+    if len(start_times) == 0:
+        return 0
+
+    order = np.argsort(start_times, kind='stable')
+    first_days = start_times[order].astype('datetime64[D]').astype(np.int64)
+    last_days = end_times[order].astype('datetime64[D]').astype(np.int64)
+
+    # the days of each reading not already touched by the readings starting before it
+    previous_last_days = np.concatenate(([first_days[0] - 1], np.maximum.accumulate(last_days)[:-1]))
+    new_days = last_days - np.maximum(first_days - 1, previous_last_days)
+    return int(np.clip(new_days, 0, None).sum())
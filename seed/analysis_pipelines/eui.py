@@ -9,23 +9,25 @@ import logging
 
 from celery import chain, shared_task
 
+from seed.analysis_pipelines import calendarization
 from seed.analysis_pipelines.pipeline import (
     AnalysisPipeline,
     AnalysisPipelineException,
     analysis_pipeline_task,
+    get_meter_readings_from_input_file,
+    save_meter_readings_input_file,
     task_create_analysis_property_views
 )
-from seed.analysis_pipelines.utils import (
-    SimpleMeterReading,
-    get_days_in_reading
-)
+from seed.analysis_pipelines.utils import get_latest_meter_readings
+from seed.data_importer.hashing import hash_states
 from seed.models import (
     Analysis,
     AnalysisMessage,
     AnalysisPropertyView,
     Column,
     Meter,
-    MeterReading,
+    PromotedExtraDataValue,
+    PropertyState,
     PropertyView
 )
 
@@ -56,7 +58,13 @@ def _get_valid_meters(property_view_ids):
     invalid_area = []
     invalid_meter = []
     meter_readings_by_property_view = {}
-    property_views = PropertyView.objects.filter(id__in=property_view_ids)
+    property_views = PropertyView.objects.filter(id__in=property_view_ids).select_related('state')
+    # get the readings of all the properties with a query per batch of properties
+    meter_readings_by_property = get_latest_meter_readings(
+        [property_view.property_id for property_view in property_views],
+        VALID_METERS,
+        TIME_PERIOD
+    )
     for property_view in property_views:
 
         # ensure we have Gross Floor Area on this property view's state
@@ -64,28 +72,12 @@ def _get_valid_meters(property_view_ids):
             invalid_area.append(property_view.id)
             continue
 
-        # get the most recent electric meter reading's end_time
-        try:
-            end_time = MeterReading.objects.filter(
-                meter__property=property_view.property,
-                meter__type__in=VALID_METERS
-            ).order_by('end_time').last().end_time
-        except Exception:
+        # skip the properties without electric meter readings
+        if property_view.property_id not in meter_readings_by_property:
             invalid_meter.append(property_view.id)
             continue
 
-        # get all readings that started AND ended between end_time and a year prior
-        property_meter_readings = [
-            SimpleMeterReading(reading.start_time, reading.end_time, reading.reading)
-            for reading in MeterReading.objects.filter(
-                meter__property=property_view.property,
-                meter__type__in=VALID_METERS,
-                end_time__lte=end_time,
-                start_time__gte=end_time - TIME_PERIOD
-            ).order_by('start_time')
-        ]
-
-        meter_readings_by_property_view[property_view.id] = property_meter_readings
+        meter_readings_by_property_view[property_view.id] = meter_readings_by_property[property_view.property_id]
 
     errors_by_property_view_id = {}
     for pid in invalid_area:
@@ -113,14 +105,10 @@ def _calculate_eui(meter_readings, gross_floor_area):
             'coverage': float # percent of TIME_PERIOD covered by the readings
         }
     """
-    total_reading = 0
-    days_affected_by_readings = set()
-    for meter_reading in meter_readings:
-        total_reading += meter_reading.reading
-        for day in get_days_in_reading(meter_reading):
-            days_affected_by_readings.add(day)
-
-    total_seconds_covered = len(days_affected_by_readings) * datetime.timedelta(days=1).total_seconds()
+    start_times, end_times, readings = calendarization.to_arrays(meter_readings)
+    total_reading = float(readings.sum())
+
+    total_seconds_covered = calendarization.count_days(start_times, end_times) * datetime.timedelta(days=1).total_seconds()
     fraction_of_time_covered = total_seconds_covered / TIME_PERIOD.total_seconds()
     return {
         'eui': round(total_reading / gross_floor_area, 2),
@@ -163,10 +151,13 @@ class EUIPipeline(AnalysisPipeline):
         progress_data.total = 3
         progress_data.save()
 
+        # the readings can be too large to pass between the tasks
+        meter_readings_row_ranges = save_meter_readings_input_file(self._analysis_id, meter_readings_by_property_view)
+
         chain(
             task_create_analysis_property_views.si(self._analysis_id, property_view_ids),
-            _finish_preparation.s(meter_readings_by_property_view, errors_by_property_view_id, self._analysis_id),
-            _run_analysis.s(self._analysis_id)
+            _finish_preparation.s(errors_by_property_view_id, self._analysis_id),
+            _run_analysis.s(meter_readings_row_ranges, self._analysis_id)
         ).apply_async()
 
     def _start_analysis(self):
@@ -175,7 +166,7 @@ class EUIPipeline(AnalysisPipeline):
 
 @shared_task(bind=True)
 @analysis_pipeline_task(Analysis.CREATING)
-def _finish_preparation(self, analysis_view_ids_by_property_view_id, meter_readings_by_property_view, errors_by_property_view_id, analysis_id):
+def _finish_preparation(self, analysis_view_ids_by_property_view_id, errors_by_property_view_id, analysis_id):
     pipeline = EUIPipeline(analysis_id)
     pipeline.set_analysis_status_to_ready('Ready to run EUI analysis')
 
@@ -192,21 +183,14 @@ def _finish_preparation(self, analysis_view_ids_by_property_view_id, meter_readi
                 debug_message=''
             )
 
-    # replace property_view id with analysis_property_view id in meter lookup
-    meter_readings_by_analysis_property_view = {}
-    for property_view in meter_readings_by_property_view:
-        analysis_view_id = analysis_view_ids_by_property_view_id[property_view]
-        meter_readings_by_analysis_property_view[analysis_view_id] = meter_readings_by_property_view[property_view]
-
-    return meter_readings_by_analysis_property_view
+    return analysis_view_ids_by_property_view_id
 
 
 @shared_task(bind=True)
 @analysis_pipeline_task(Analysis.READY)
-def _run_analysis(self, meter_readings_by_analysis_property_view, analysis_id):
+def _run_analysis(self, analysis_view_ids_by_property_view_id, meter_readings_row_ranges, analysis_id):
     pipeline = EUIPipeline(analysis_id)
     progress_data = pipeline.set_analysis_status_to_running()
-    progress_data.step('Calculating EUI')
     analysis = Analysis.objects.get(id=analysis_id)
 
     # make sure we have the extra data columns we need, don't set the
@@ -235,10 +219,35 @@ def _run_analysis(self, meter_readings_by_analysis_property_view, analysis_id):
         column.column_description = 'EUI Coverage (% of the year)'
         column.save()
 
-    # fix the meter readings dict b/c celery messes with it when serializing
+    # the property_view ids are strings if celery serialized the dict
+    analysis_view_ids_by_property_view_id = {
+        int(property_view_id): analysis_view_id
+        for property_view_id, analysis_view_id in analysis_view_ids_by_property_view_id.items()
+    }
+    # each chunk only reads the meter readings of its property views in the input file
+    analysis_views_and_row_ranges = [
+        [analysis_view_ids_by_property_view_id[property_view_id], property_view_id, offset, length]
+        for property_view_id, offset, length in meter_readings_row_ranges
+    ]
+    pipeline.run_in_chunks(_run_analysis_chunk, analysis_views_and_row_ranges, progress_data=progress_data)
+
+
+@shared_task(bind=True)
+@analysis_pipeline_task(Analysis.RUNNING)
+def _run_analysis_chunk(self, analysis_views_and_row_ranges, analysis_id):
+    pipeline = EUIPipeline(analysis_id)
+
+    # replace property_view id with analysis_property_view id in meter lookup
+    analysis_view_ids_by_property_view_id = {
+        property_view_id: analysis_view_id
+        for analysis_view_id, property_view_id, _, _ in analysis_views_and_row_ranges
+    }
     meter_readings_by_analysis_property_view = {
-        int(key): [SimpleMeterReading(*serialized_reading) for serialized_reading in serialized_readings]
-        for key, serialized_readings in meter_readings_by_analysis_property_view.items()
+        analysis_view_ids_by_property_view_id[property_view_id]: meter_readings
+        for property_view_id, meter_readings in get_meter_readings_from_input_file(
+            analysis_id,
+            [row_range for _, *row_range in analysis_views_and_row_ranges]
+        ).items()
     }
     analysis_property_view_ids = list(meter_readings_by_analysis_property_view.keys())
 
@@ -249,7 +258,8 @@ def _run_analysis(self, meter_readings_by_analysis_property_view, analysis_id):
     )
     property_views_by_apv_id = AnalysisPropertyView.get_property_views(analysis_property_views)
 
-    # create and save EUIs for each property view
+    # calculate EUIs for each property view, and save them all at once
+    states = []
     for analysis_property_view in analysis_property_views:
         area = analysis_property_view.property_state.gross_floor_area.magnitude
         meter_readings = meter_readings_by_analysis_property_view[analysis_property_view.id]
@@ -261,12 +271,19 @@ def _run_analysis(self, meter_readings_by_analysis_property_view, analysis_id):
             'Total Annual Meter Reading (kBtu)': eui['reading'],
             'Gross Floor Area (sqft)': area
         }
-        analysis_property_view.save()
 
         property_view = property_views_by_apv_id[analysis_property_view.id]
         property_view.state.extra_data.update({'analysis_eui': eui['eui']})
         property_view.state.extra_data.update({'analysis_eui_coverage': eui['coverage']})
-        property_view.state.save()
-
-    # all done!
-    pipeline.set_analysis_status_to_completed()
+        states.append(property_view.state)
+
+    AnalysisPropertyView.objects.bulk_update(analysis_property_views, ['parsed_results'])
+    # bulk_update skips PropertyState.save, so the hashes and promoted values of the states are updated here
+    for state, hash_object in zip(states, hash_states(states)):
+        state.hash_object = hash_object
+    PropertyState.objects.bulk_update(states, ['extra_data', 'hash_object'])
+    PromotedExtraDataValue.refresh_for_states(states)
+
+    progress_data = pipeline.get_progress_data()
+    if progress_data is not None:
+        progress_data.step('Calculating EUI')
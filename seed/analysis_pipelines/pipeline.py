@@ -3,15 +3,28 @@ import functools
 import inspect
 import json
 import logging
+from io import StringIO
 
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile
 from django.db import transaction
 from django.db.utils import OperationalError
 from django.utils import timezone as tz
 
+from seed.analysis_pipelines.utils import (
+    read_meter_readings_csv,
+    write_meter_readings_csv
+)
 from seed.decorators import get_prog_key
+from seed.lib.mcm.utils import batch
 from seed.lib.progress_data.progress_data import ProgressData
-from seed.models import Analysis, AnalysisMessage, AnalysisPropertyView
+from seed.models import (
+    Analysis,
+    AnalysisInputFile,
+    AnalysisMessage,
+    AnalysisPropertyView
+)
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +56,42 @@ def task_create_analysis_property_views(analysis_id, property_view_ids, progress
     return analysis_view_ids_by_property_view_id
 
 
+def save_meter_readings_input_file(analysis_id, meter_readings_by_property_view):
+    """Save the meter readings of the property views as an input file of the analysis,
+    instead of passing them between the tasks of the analysis as arguments.
+
+    :param analysis_id: int
+    :param meter_readings_by_property_view: dict[int: List[SimpleMeterReading]]
+    :returns: list[[int, int, int]], the property view id, offset and length of the readings
+        of each property view in the file, to get the readings of some property views only
+    """
+    meter_readings_csv = StringIO()
+    row_ranges = write_meter_readings_csv(meter_readings_csv, meter_readings_by_property_view)
+
+    analysis_input_file = AnalysisInputFile(
+        content_type=AnalysisInputFile.METER_READINGS,
+        analysis_id=analysis_id
+    )
+    analysis_input_file.file.save('meter_readings.csv', ContentFile(meter_readings_csv.getvalue()))
+    return row_ranges
+
+
+def get_meter_readings_from_input_file(analysis_id, row_ranges=None):
+    """Get the meter readings saved by save_meter_readings_input_file
+
+    :param analysis_id: int
+    :param row_ranges: list[[int, int, int]], optional, only get the readings of these
+        property views, from the ranges returned by save_meter_readings_input_file
+    :returns: dict[int: List[SimpleMeterReading]], readings by property view id
+    """
+    analysis_input_file = AnalysisInputFile.objects.filter(
+        analysis_id=analysis_id,
+        content_type=AnalysisInputFile.METER_READINGS
+    ).latest('id')
+    with analysis_input_file.file.open('rb') as meter_readings_csv:
+        return read_meter_readings_csv(meter_readings_csv, row_ranges)
+
+
 def analysis_pipeline_task(expected_status):
     """Decorator factory for analysis pipeline celery tasks. In other words, this
     function _returns_ a decorator for wrapping tasks used in analysis pipelines.
@@ -236,6 +285,18 @@ def analysis_pipeline_task(expected_status):
     return decorator_analysis_pipeline_task
 
 
+@shared_task(bind=True)
+@analysis_pipeline_task(Analysis.RUNNING)
+def task_finish_analysis_chunks(self, analysis_id):
+    """A celery task which completes the analysis once all the chunks run by
+    AnalysisPipeline.run_in_chunks are done.
+
+    :param analysis_id: int
+    """
+    analysis = Analysis.objects.get(id=analysis_id)
+    AnalysisPipeline.factory(analysis).set_analysis_status_to_completed()
+
+
 class AnalysisPipelineException(Exception):
     """An analysis pipeline specific exception"""
 
@@ -474,6 +535,38 @@ class AnalysisPipeline(abc.ABC):
                     f'Its status should be "{statuses[Analysis.RUNNING]}" but it is "{statuses[locked_analysis.status]}"'
                 )
 
+    def run_in_chunks(self, chunk_task, items, *args, progress_data=None):
+        """Runs the analysis in parallel: splits the items (e.g., analysis property view ids)
+        into chunks of settings.ANALYSIS_RUN_BATCH_SIZE, runs chunk_task on each chunk as a
+        celery group, then sets the analysis status to COMPLETED once all the chunks are done.
+
+        chunk_task must be a pipeline task expecting the RUNNING status, whose arguments are
+        the chunk, *args, then analysis_id. It should step the progress data once per chunk
+        and save its results in bulk.
+
+        This should only be called in the context of a pipeline task, after
+        set_analysis_status_to_running.
+
+        :param chunk_task: celery task
+        :param items: list, JSON serializable items to split into chunks
+        :param args: additional arguments passed to chunk_task
+        :param progress_data: ProgressData, optional, its total is set to the number of chunks
+        :returns: None
+        """
+        chunks = list(batch(items, settings.ANALYSIS_RUN_BATCH_SIZE))
+        if progress_data is not None:
+            progress_data.total = len(chunks)
+            progress_data.save()
+
+        if not chunks:
+            self.set_analysis_status_to_completed()
+            return
+
+        chord(
+            [chunk_task.si(chunk, *args, self._analysis_id) for chunk in chunks],
+            interval=15
+        )(task_finish_analysis_chunks.si(self._analysis_id))
+
     def _get_progress_data_key_prefix(self, analysis):
         statuses = dict(Analysis.STATUS_TYPES)
         return f'analysis-{statuses[analysis.status]}'
@@ -9,7 +9,8 @@ from seed.analysis_pipelines.better import (  # noqa: F811, F401
     _finish_analysis,
     _finish_preparation,
     _prepare_all_properties,
-    _start_analysis
+    _start_analysis,
+    _wait_for_better_analyses
 )
 from seed.analysis_pipelines.bsyncr import (  # noqa: F401, F811
     _finish_analysis,
@@ -20,9 +21,11 @@ from seed.analysis_pipelines.bsyncr import (  # noqa: F401, F811
 )
 from seed.analysis_pipelines.co2 import (  # noqa: F811, F401
     _finish_preparation,
-    _run_analysis
+    _run_analysis,
+    _run_analysis_chunk
 )
 from seed.analysis_pipelines.eui import (  # noqa: F811, F401
     _finish_preparation,
-    _run_analysis
+    _run_analysis,
+    _run_analysis_chunk
 )
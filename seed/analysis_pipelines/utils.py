@@ -1,9 +1,14 @@
+import csv
 import datetime
-from calendar import monthrange
 from collections import defaultdict, namedtuple
+from itertools import groupby
 from statistics import mean, pstdev
 
+import numpy as np
 from dateutil import relativedelta
+from django.db import connection
+
+from seed.analysis_pipelines import calendarization
 
 
 def get_json_path(json_path, data):
@@ -29,6 +34,120 @@ def get_json_path(json_path, data):
 # simplified representation of a reading
 SimpleMeterReading = namedtuple('SimpleMeterReading', ['start_time', 'end_time', 'reading'])
 
+# number of properties whose meter readings are fetched by a single query
+METER_READINGS_BATCH_SIZE = 1000
+
+# For each property, the readings of the meters of the given types which started
+# AND ended within the time period before the most recent end time of these readings
+LATEST_METER_READINGS_SQL = """
+WITH latest AS (
+    SELECT m.property_id, MAX(r.end_time) AS end_time
+    FROM seed_meterreading r
+    JOIN seed_meter m ON m.id = r.meter_id
+    WHERE m.property_id IN %(property_ids)s AND m.type IN %(meter_types)s
+    GROUP BY m.property_id
+)
+SELECT latest.property_id, readings.start_time, readings.end_time, readings.reading
+FROM latest
+LEFT JOIN LATERAL (
+    SELECT r.start_time, r.end_time, r.reading
+    FROM seed_meterreading r
+    JOIN seed_meter m ON m.id = r.meter_id
+    WHERE m.property_id = latest.property_id
+        AND m.type IN %(meter_types)s
+        AND r.end_time <= latest.end_time
+        AND r.start_time >= latest.end_time - %(time_period)s
+) readings ON true
+ORDER BY latest.property_id, readings.start_time
+"""
+
+
+def get_latest_meter_readings(property_ids, meter_types, time_period, batch_size=METER_READINGS_BATCH_SIZE):
+    """Get the readings of each property which started and ended within time_period
+    of the end time of its most recent reading, using one query per batch of properties.
+
+    :param property_ids: Iterable[int]
+    :param meter_types: List[int], types of the meters to include (e.g., Meter.ELECTRICITY_GRID)
+    :param time_period: datetime.timedelta
+    :param batch_size: int, number of properties per query
+    :return: dict[int: List[SimpleMeterReading]], readings sorted by start_time for each
+        property id. Properties without any reading of these meters are not included.
+    """
+    property_ids = sorted(set(property_ids))
+    readings_by_property_id = {}
+    with connection.cursor() as cursor:
+        for i in range(0, len(property_ids), batch_size):
+            cursor.execute(LATEST_METER_READINGS_SQL, {
+                'property_ids': tuple(property_ids[i:i + batch_size]),
+                'meter_types': tuple(meter_types),
+                'time_period': time_period,
+            })
+            for property_id, rows in groupby(cursor.fetchall(), key=lambda row: row[0]):
+                # the latest reading can be longer than the time period, leaving the property without readings
+                readings_by_property_id[property_id] = [
+                    SimpleMeterReading(start_time, end_time, reading)
+                    for _, start_time, end_time, reading in rows
+                    if start_time is not None
+                ]
+
+    return readings_by_property_id
+
+
+METER_READINGS_CSV_HEADER = ['id', 'start_time', 'end_time', 'reading']
+
+
+def write_meter_readings_csv(file, meter_readings_by_id):
+    """Write the meter readings to a CSV file, to pass them between tasks. The rows are
+    sorted by id, so the rows of each id can be read without parsing the whole file.
+
+    :param file: file-like object opened in text mode
+    :param meter_readings_by_id: dict[int: List[SimpleMeterReading | MeterReading]]
+    :return: list[[int, int, int]], the id, offset and length of the rows of each id
+    """
+    row_ranges = []
+    writer = csv.writer(file)
+    writer.writerow(METER_READINGS_CSV_HEADER)
+    for id_ in sorted(meter_readings_by_id):
+        # the rows are ASCII, so the offsets in characters are the offsets in bytes
+        offset = file.tell()
+        for meter_reading in meter_readings_by_id[id_]:
+            writer.writerow([
+                id_,
+                meter_reading.start_time.isoformat(),
+                meter_reading.end_time.isoformat(),
+                '' if meter_reading.reading is None else repr(meter_reading.reading),
+            ])
+        row_ranges.append([id_, offset, file.tell() - offset])
+
+    return row_ranges
+
+
+def read_meter_readings_csv(file, row_ranges=None):
+    """Read the meter readings written by write_meter_readings_csv
+
+    :param file: file-like object opened in binary mode
+    :param row_ranges: list[[int, int, int]], optional, only read the rows at these ranges,
+        as returned by write_meter_readings_csv
+    :return: dict[int: List[SimpleMeterReading]]
+    """
+    if row_ranges is None:
+        rows = file.read().decode().splitlines()[1:]
+    else:
+        rows = []
+        for _, offset, length in row_ranges:
+            file.seek(offset)
+            rows.extend(file.read(length).decode().splitlines())
+
+    meter_readings_by_id = defaultdict(list)
+    for id_, start_time, end_time, reading in csv.reader(rows):
+        meter_readings_by_id[int(id_)].append(SimpleMeterReading(
+            datetime.datetime.fromisoformat(start_time),
+            datetime.datetime.fromisoformat(end_time),
+            None if reading == '' else float(reading),
+        ))
+
+    return dict(meter_readings_by_id)
+
 
 def _split_reading(meter_reading, snap_intervals=True):
     """Splits the meter reading into multiple readings. Readings are split at the
@@ -69,71 +188,21 @@ def _split_reading(meter_reading, snap_intervals=True):
     :param snap_intervals: bool
     :return: List[SimpleMeterReading], in sorted order by start_date
     """
-    reading_unaware_start_time = datetime.datetime(
-        meter_reading.start_time.year,
-        meter_reading.start_time.month,
-        meter_reading.start_time.day,
-        meter_reading.start_time.hour,
-        meter_reading.start_time.minute,
-        meter_reading.start_time.second,
-    )
-    reading_unaware_end_time = datetime.datetime(
-        meter_reading.end_time.year,
-        meter_reading.end_time.month,
-        meter_reading.end_time.day,
-        meter_reading.end_time.hour,
-        meter_reading.end_time.minute,
-        meter_reading.end_time.second,
+    _, months, split_start_times, split_end_times, split_readings = calendarization.split_by_month(
+        *calendarization.to_arrays([meter_reading])
     )
-
-    reading_first_month = datetime.datetime(meter_reading.start_time.year, meter_reading.start_time.month, 1)
-    reading_last_month = datetime.datetime(meter_reading.end_time.year, meter_reading.end_time.month, 1)
-    last_month_affected = reading_last_month + relativedelta.relativedelta(months=1)
-
-    # collect all consecutive months this reading "touches"
-    current_month = reading_first_month
-    months_affected = []
-    while current_month < last_month_affected:
-        next_month = current_month + relativedelta.relativedelta(months=1)
-        months_affected.append((current_month, next_month))
-        current_month = next_month
-
-    # For each month this reading affects create a new "reading" for that month
-    split_readings = []
-    meter_reading_delta = reading_unaware_end_time - reading_unaware_start_time
-    for idx, (month_start, month_end) in enumerate(months_affected):
-        # estimate the reading value for this month by calculating
-        # the fraction of the original reading this month covers and multiplying
-        # the "total" (ie original) reading by that fraction
-        overlap_start = max(month_start, reading_unaware_start_time)
-        overlap_end = min(month_end, reading_unaware_end_time)
-        # overlap_delta is essentially the union of time covered by this month and
-        # the time covered by the original reading
-        overlap_delta = overlap_end - overlap_start
-
-        if overlap_delta.total_seconds() == 0:
-            # there can be no overlap if we are given a reading which ends
-            # on the first of a month and we're creating a reading for that month
-            # it ends on.
-            assert idx == len(months_affected) - 1, 'This should not occur, our assumptions were invalid. Please revisit this.'
-            continue
-
-        fraction_of_reading_time = overlap_delta.total_seconds() / meter_reading_delta.total_seconds()
-        month_reading = fraction_of_reading_time * meter_reading.reading
-
-        # determine the start/end time we should report for this reading
-        reported_start_time, reported_end_time = month_start, month_end
-        if not snap_intervals:
-            if idx == 0:
-                # this is the first month included, use the original start time
-                reported_start_time = reading_unaware_start_time
-            if idx == len(months_affected) - 1:
-                # this is the last month included, use the original end time
-                reported_end_time = reading_unaware_end_time
-
-        split_readings.append(SimpleMeterReading(reported_start_time, reported_end_time, month_reading))
-
-    return split_readings
+    if snap_intervals:
+        split_start_times = months
+        split_end_times = months + 1
+
+    return [
+        SimpleMeterReading(start_time, end_time, reading)
+        for start_time, end_time, reading in zip(
+            calendarization.to_datetimes(split_start_times),
+            calendarization.to_datetimes(split_end_times),
+            split_readings.tolist()
+        )
+    ]
 
 
 def calendarize_meter_readings(meter_readings):
@@ -145,27 +214,19 @@ def calendarize_meter_readings(meter_readings):
     :param: meter_readings, Iterable[SimpleMeterReading | MeterReading]
     :return: List[SimpleMeterReading]
     """
-    all_meter_readings = sorted(meter_readings, key=lambda reading: reading.start_time)
-    aggregated_readings_by_start_time = defaultdict(lambda: 0)
-    for meter_reading in all_meter_readings:
-        sr = _split_reading(meter_reading)
-        for monthly_reading in sr:
-            aggregated_readings_by_start_time[monthly_reading.start_time] += monthly_reading.reading
-
-    aggregated_readings_list = []
-    for start_time, reading in aggregated_readings_by_start_time.items():
-        aggregated_readings_list.append(
-            SimpleMeterReading(
-                start_time,
-                start_time + relativedelta.relativedelta(months=1),
-                reading
-            )
+    start_times, end_times, readings = calendarization.to_arrays(meter_readings)
+    # sort by start time so that the readings are summed in the same order as before
+    order = np.argsort(start_times, kind='stable')
+    months, totals, _ = calendarization.monthly_totals(start_times[order], end_times[order], readings[order])
+
+    return [
+        SimpleMeterReading(start_time, end_time, reading)
+        for start_time, end_time, reading in zip(
+            calendarization.to_datetimes(months),
+            calendarization.to_datetimes(months + 1),
+            totals.tolist()
         )
-
-    return aggregated_readings_list
-
-
-SECONDS_IN_A_DAY = 86400
+    ]
 
 
 def calendarize_and_extrapolate_meter_readings(meter_readings, coverage_threshold=0.0):
@@ -184,49 +245,28 @@ def calendarize_and_extrapolate_meter_readings(meter_readings, coverage_threshol
         by the readings to be included.
     :return: List[SimpleMeterReading]
     """
-    split_meter_readings = []
-    for meter_reading in meter_readings:
-        # set snap_intervals to False so we can preserve the number of seconds
-        # in each split up reading
-        for split_reading in _split_reading(meter_reading, snap_intervals=False):
-            split_meter_readings.append(split_reading)
-
-    totals_by_month = defaultdict(lambda: {'total_usage': 0, 'total_seconds': 0})
-    for meter_reading in split_meter_readings:
-        start = meter_reading.start_time
-        month_start = datetime.datetime(start.year, start.month, 1)
-        totals_by_month[month_start]['total_usage'] += meter_reading.reading
-        totals_by_month[month_start]['total_seconds'] += (
-            meter_reading.end_time - meter_reading.start_time
-        ).total_seconds()
-
-    # calculate estimated total usage for each month
-    estimated_monthly_readings = []
-    for month_start, totals in totals_by_month.items():
-        (_, days_in_month) = monthrange(month_start.year, month_start.month)
-        seconds_in_month = days_in_month * SECONDS_IN_A_DAY
-
-        # WARNING: this bit assumes we have non-overlapping readings! Otherwise
-        # the fraction of month cannot be determined by "total seconds" of readings
-        # in the month!
-        fraction_of_month_covered = totals['total_seconds'] / seconds_in_month
-        if fraction_of_month_covered < coverage_threshold:
-            # we don't have enough data, skip this month
-            continue
-
-        average_usage_per_second = totals['total_usage'] / totals['total_seconds']
-
-        estimated_monthly_reading = average_usage_per_second * seconds_in_month
-        estimated_monthly_readings.append(
-            SimpleMeterReading(
-                month_start,
-                month_start + relativedelta.relativedelta(months=1),
-                estimated_monthly_reading
-            )
+    months, total_usages, total_seconds = calendarization.monthly_totals(*calendarization.to_arrays(meter_readings))
+    seconds_in_month = calendarization.seconds_in_months(months)
+
+    # WARNING: this bit assumes we have non-overlapping readings! Otherwise
+    # the fraction of month cannot be determined by "total seconds" of readings
+    # in the month!
+    fraction_of_month_covered = total_seconds / seconds_in_month
+    # skip the months without enough data
+    covered = fraction_of_month_covered >= coverage_threshold
+    months = months[covered]
+
+    average_usage_per_second = total_usages[covered] / total_seconds[covered]
+    estimated_monthly_readings = average_usage_per_second * seconds_in_month[covered]
+
+    return [
+        SimpleMeterReading(start_time, end_time, reading)
+        for start_time, end_time, reading in zip(
+            calendarization.to_datetimes(months),
+            calendarization.to_datetimes(months + 1),
+            estimated_monthly_readings.tolist()
         )
-
-    estimated_monthly_readings.sort(key=lambda reading: reading.start_time)
-    return estimated_monthly_readings
+    ]
 
 
 def reject_outliers(meter_readings, reject=1):
@@ -291,29 +331,3 @@ def interpolate_monthly_readings(meter_readings):
         current_time += relativedelta.relativedelta(months=1)
 
     return interpolated_readings
-
-
-def get_days_in_reading(meter_reading):
-    """Returns a list of datetime.datetime days that the reading covers/touches
-
-    :param meter_reading: List[SimpleMeterReading | MeterReading]
-    :return: List[datetime.datetime], days (at midnight, timezone unaware)
-    """
-    start = datetime.datetime(
-        meter_reading.start_time.year,
-        meter_reading.start_time.month,
-        meter_reading.start_time.day,
-    )
-    end = datetime.datetime(
-        meter_reading.end_time.year,
-        meter_reading.end_time.month,
-        meter_reading.end_time.day,
-    )
-
-    all_days = []
-    current_day = start
-    while current_day <= end:
-        all_days.append(current_day)
-        current_day += relativedelta.relativedelta(days=1)
-
-    return all_days
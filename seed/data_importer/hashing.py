@@ -0,0 +1,105 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+
+Hashing of PropertyState and TaxLotState data, stored in hash_object to quickly
+find states with the same data (e.g., duplicate rows in an import file).
+
+The serialization and the MD5 digest are kept byte for byte identical to the
+original implementation so that the hashes stored in the database remain valid.
+"""
+import hashlib
+from datetime import datetime
+from functools import lru_cache
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.utils import timezone as tz
+from django.utils.timezone import make_naive
+from unidecode import unidecode
+
+from seed.models import Column
+
+# Value hashed for fields which do not exist on the object, so we can distinguish
+# between this and None.
+MISSING_FIELD_VALUE = 'FOO'
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=None)
+def hash_fields():
+    """Names of the database fields which are hashed. The fields only depend on the
+    models, so they are computed once per process.
+
+    :return: tuple of str
+    """
+    return tuple(Column.retrieve_db_field_name_for_hash_comparison())
+
+
+def _ascii(value):
+    # unidecode is only needed for non-ASCII strings
+    return value if value.isascii() else unidecode(value)
+
+
+def _field_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        # if this is a datetime, then make sure to save the string as a naive datetime.
+        # Somehow, somewhere the data are being saved in mapping with a timezone,
+        # then in matching they are removed (but the time is updated correctly)
+        return str(make_naive(value).astimezone(tz.utc).isoformat())
+    if isinstance(value, GEOSGeometry):
+        return GEOSGeometry(value, srid=4326).wkt
+    return str(value)
+
+
+def _extra_data_parts(parts, extra_data):
+    for key, value in sorted(extra_data.items(), key=lambda x_y: x_y[0]):
+        if isinstance(value, dict):
+            _extra_data_parts(parts, value)
+        else:
+            parts.append(_ascii(str(key)))
+            parts.append(_ascii(value) if isinstance(value, str) else str(value))
+
+
+def serialize_state(obj, include_extra_data=True):
+    """Serialize the hashed data of a state into bytes
+
+    :param obj: PropertyState or TaxLotState
+    :param include_extra_data: bool, include the extra_data in the serialization
+    :return: bytes
+    """
+    parts = []
+    for field in hash_fields():
+        parts.append(field)
+        value = getattr(obj, field, _MISSING)
+        parts.append(MISSING_FIELD_VALUE if value is _MISSING else _field_value(value))
+
+    if include_extra_data and obj.extra_data:
+        _extra_data_parts(parts, obj.extra_data)
+
+    return ''.join(parts).encode('utf-8')
+
+
+def hash_state(obj, include_extra_data=True):
+    """Hash the data of a PropertyState or TaxLotState
+
+    :param obj: PropertyState or TaxLotState
+    :param include_extra_data: bool, include the extra_data in the hash
+    :return: str, hexadecimal digest
+    """
+    return hashlib.md5(serialize_state(obj, include_extra_data)).hexdigest()
+
+
+def hash_states(objs, include_extra_data=True):
+    """Hash the data of a batch of PropertyStates or TaxLotStates
+
+    :param objs: iterable of PropertyState or TaxLotState
+    :param include_extra_data: bool, include the extra_data in the hashes
+    :return: list of str, hexadecimal digests in the order of the objects
+    """
+    md5 = hashlib.md5
+    return [md5(serialize_state(obj, include_extra_data)).hexdigest() for obj in objs]
@@ -21,26 +21,20 @@ from seed.lib.merging import merging
 from seed.lib.progress_data.progress_data import ProgressData
 from seed.models import (
     DATA_STATE_DELETE,
-    DATA_STATE_MAPPING,
     DATA_STATE_MATCHING,
-    DATA_STATE_UNKNOWN,
     MERGE_STATE_MERGED,
     MERGE_STATE_NEW,
-    MERGE_STATE_UNKNOWN,
     Column,
-    PropertyAuditLog,
     PropertyState,
     PropertyView,
-    TaxLotAuditLog,
     TaxLotState,
     TaxLotView
 )
-from seed.models.auditlog import AUDIT_IMPORT
 from seed.utils.match import (
+    MatchingIndex,
     empty_criteria_filter,
     match_merge_link,
     matching_criteria_column_names,
-    matching_filter_criteria,
     update_sub_progress_total
 )
 from seed.utils.merge import merge_states_with_views
@@ -273,26 +267,17 @@ def inclusive_match_and_merge(unmatched_state_ids, org, StateClass, sub_progress
 
     sub_progress_data = update_sub_progress_total(100, sub_progress_key)
 
-    # IDs of -States with all matching criteria equal to None are intially promoted
-    # as they're not eligible for matching.
-    promoted_ids = list(
-        StateClass.objects.filter(
-            pk__in=unmatched_state_ids,
-            **empty_criteria_filter(StateClass, column_names)
-        ).values_list('id', flat=True)
+    # Group IDs by -States that match each other in a single pass over the -States
+    index = MatchingIndex.from_queryset(
+        StateClass.objects.filter(pk__in=unmatched_state_ids),
+        column_names,
     )
 
-    # Update the list of IDs whose states haven't been checked for matches.
-    unmatched_state_ids = list(
-        set(unmatched_state_ids) - set(promoted_ids)
-    )
+    # IDs of -States with all matching criteria equal to None are intially promoted
+    # as they're not eligible for matching.
+    promoted_ids = list(index.empty_items)
 
-    # Group IDs by -States that match each other
-    matched_id_groups = StateClass.objects.\
-        filter(id__in=unmatched_state_ids).\
-        values(*column_names).\
-        annotate(matched_ids=ArrayAgg('id')).\
-        values_list('matched_ids', flat=True)
+    matched_id_groups = list(index.groups())
 
     # Collapse groups of matches found in the previous step into 1 -State per group
     merges_within_file = 0
@@ -303,14 +288,11 @@ def inclusive_match_and_merge(unmatched_state_ids, org, StateClass, sub_progress
             # If there's only 1, no merging is needed, so just promote the ID.
             promoted_ids += ids
         else:
-            states = [s for s in StateClass.objects.filter(pk__in=ids).order_by('-id')]
-            merge_state = states.pop()
+            # Merge the whole group at once, from the oldest to the newest -State
+            states = list(StateClass.objects.filter(pk__in=ids).select_related('import_file').order_by('id'))
+            merges_within_file += len(states) - 1
 
-            merges_within_file += len(states)
-
-            while len(states) > 0:
-                newer_state = states.pop()
-                merge_state = save_state_match(merge_state, newer_state, priorities)
+            merge_state = merging.merge_states_bulk(states, priorities[StateClass.__name__])
 
             promoted_ids.append(merge_state.id)
         if batch_size > 0 and idx % batch_size == 0:
@@ -388,35 +370,49 @@ def states_to_views(unmatched_state_ids, org, cycle, StateClass, sub_progress_ke
         pk__in=Subquery(handled_states.values('id'))
     )
 
+    # Index the -States that are attached to -Views in the Cycle by their matching
+    # criteria once, instead of querying for the matches of each remaining -State.
+    existing_index = MatchingIndex.from_queryset(
+        existing_states,
+        column_names,
+        item_fields=['updated', 'id'],
+    )
+
     # For the remaining -States, search for a match within the -States that are attached to -Views.
     # If one match is found, pass that along.
     # If multiple matches are found, merge them together, pass along the resulting record.
     # Otherwise, add current -State to be promoted as is.
     merged_between_existing_count = 0
-    merge_state_pairs = []
+    merge_state_id_pairs = []
+    promote_state_ids = list(promote_states.values_list('id', flat=True))
+    unmatched_states = list(unmatched_states)
     batch_size = math.ceil(len(unmatched_states) / 100)
     for idx, state in enumerate(unmatched_states):
-        matching_criteria = matching_filter_criteria(state, column_names)
-        existing_state_matches = StateClass.objects.filter(
-            pk__in=Subquery(existing_cycle_views.values('state_id')),
-            **matching_criteria
-        )
-        count = existing_state_matches.count()
+        key = existing_index.state_key(state)
+        existing_state_ids = [state_id for _updated, state_id in sorted(existing_index.get(key))]
+        count = len(existing_state_ids)
 
         if count > 1:
             merged_between_existing_count += count
-            existing_state_ids = list(existing_state_matches.order_by('updated').values_list('id', flat=True))
             # The following merge action ignores merge protection and prioritizes -States by most recent AuditLog
             merged_state = merge_states_with_views(existing_state_ids, org.id, 'System Match', StateClass)
-            merge_state_pairs.append((merged_state, state))
+            # the merged -State is now the only one attached to a -View for these matching criteria
+            existing_index.replace(key, [(merged_state.updated, merged_state.id)])
+            merge_state_id_pairs.append((merged_state.id, state))
         elif count == 1:
-            merge_state_pairs.append((existing_state_matches.first(), state))
+            merge_state_id_pairs.append((existing_state_ids[0], state))
         else:
-            promote_states = promote_states | StateClass.objects.filter(pk=state.id)
+            promote_state_ids.append(state.id)
 
         if batch_size > 0 and idx % batch_size == 0:
             sub_progress_data.step('Matching Data (3/6): Merging Unmatched States')
 
+    existing_states_by_id = StateClass.objects.in_bulk([state_id for state_id, _state in merge_state_id_pairs])
+    merge_state_pairs = [
+        (existing_states_by_id[state_id], state) for state_id, state in merge_state_id_pairs
+    ]
+    promote_states = StateClass.objects.filter(pk__in=promote_state_ids).order_by('id')
+
     sub_progress_data = update_sub_progress_total(100, sub_progress_key, finish=True)
 
     # Process -States into -Views either directly (promoted_ids) or post-merge (merge_state_pairs).
@@ -511,57 +507,4 @@ def save_state_match(state1, state2, priorities):
     all of the priorites for the columns, not just the priorities for the selected taxlotstate.
     :return: state1, after merge
     """
-    merged_state = type(state1).objects.create(organization=state1.organization)
-
-    merged_state = merging.merge_state(
-        merged_state, state1, state2, priorities[merged_state.__class__.__name__]
-    )
-
-    AuditLogClass = PropertyAuditLog if isinstance(merged_state, PropertyState) else TaxLotAuditLog
-
-    assert AuditLogClass.objects.filter(state=state1).count() >= 1
-    assert AuditLogClass.objects.filter(state=state2).count() >= 1
-
-    # NJACHECK - is this logic correct?
-    state_1_audit_log = AuditLogClass.objects.filter(state=state1).first()
-    state_2_audit_log = AuditLogClass.objects.filter(state=state2).first()
-
-    AuditLogClass.objects.create(organization=state1.organization,
-                                 parent1=state_1_audit_log,
-                                 parent2=state_2_audit_log,
-                                 parent_state1=state1,
-                                 parent_state2=state2,
-                                 state=merged_state,
-                                 name='System Match',
-                                 description='Automatic Merge',
-                                 import_filename=None,
-                                 record_type=AUDIT_IMPORT)
-
-    # If the two states being merged were just imported from the same import file, carry the import_file_id into the new
-    # state. Also merge the lot_number fields so that pairing can work correctly on the resulting merged record
-    # Possible conditions:
-    # state1.data_state = 2, state1.merge_state = 0 and state2.data_state = 2, state2.merge_state = 0
-    # state1.data_state = 0, state1.merge_state = 2 and state2.data_state = 2, state2.merge_state = 0
-    if state1.import_file_id == state2.import_file_id:
-        if ((
-            state1.data_state == DATA_STATE_MAPPING and state1.merge_state == MERGE_STATE_UNKNOWN and
-            state2.data_state == DATA_STATE_MAPPING and state2.merge_state == MERGE_STATE_UNKNOWN) or
-            (
-                state1.data_state == DATA_STATE_UNKNOWN and state1.merge_state == MERGE_STATE_MERGED and
-                state2.data_state == DATA_STATE_MAPPING and state2.merge_state == MERGE_STATE_UNKNOWN)):
-            merged_state.import_file_id = state1.import_file_id
-
-            if isinstance(merged_state, PropertyState):
-                joined_lots = set()
-                if state1.lot_number:
-                    joined_lots = joined_lots.union(state1.lot_number.split(';'))
-                if state2.lot_number:
-                    joined_lots = joined_lots.union(state2.lot_number.split(';'))
-                if joined_lots:
-                    merged_state.lot_number = ';'.join(joined_lots)
-
-    # Set the merged_state to merged
-    merged_state.merge_state = MERGE_STATE_MERGED
-    merged_state.save()
-
-    return merged_state
+    return merging.merge_states_bulk([state1, state2], priorities[state1.__class__.__name__])
@@ -6,6 +6,7 @@
 """
 import csv
 import hashlib
+import io
 import json
 import logging
 import math
@@ -622,6 +623,14 @@ class ImportFile(NotDeletableModel, TimeStampedModel):
         self._local_file.seek(0)
         return self._local_file
 
+    def open_text_file(self):
+        """Open the file in text mode like local_file, without first copying it into a
+        temporary file. Used by the tasks which only read a part of the file.
+
+        :return: file object, to be closed by the caller
+        """
+        return io.TextIOWrapper(self.file.storage.open(self.file.name, 'rb'), newline=None)
+
     @property
     def data_rows(self):
         """Iterable of rows, made of iterable of column values of the raw data"""
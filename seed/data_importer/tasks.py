@@ -9,10 +9,10 @@ from __future__ import absolute_import
 
 import collections
 import copy
-import hashlib
 import json
 import os
 import tempfile
+import time
 import traceback
 import zipfile
 from bisect import bisect_left
@@ -25,20 +25,22 @@ from math import ceil
 from _csv import Error
 from celery import chain as celery_chain
 from celery import chord, group, shared_task
+from celery.result import GroupResult
+from celery.utils import uuid
 from celery.utils.log import get_task_logger
 from dateutil import parser
-from django.contrib.gis.geos import GEOSGeometry
+from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import DataError, IntegrityError, connection, transaction
 from django.db.utils import ProgrammingError
 from django.utils import timezone as tz
-from django.utils.timezone import make_naive
 from past.builtins import basestring
 from unidecode import unidecode
 
 from seed.building_sync import validation_client
 from seed.building_sync.building_sync import BuildingSync
 from seed.data_importer.equivalence_partitioner import EquivalencePartitioner
+from seed.data_importer.hashing import hash_state, hash_states
 from seed.data_importer.match import (
     match_and_link_incoming_properties_and_taxlots
 )
@@ -72,6 +74,7 @@ from seed.models import (
     ColumnMapping,
     DataLogger,
     Meter,
+    PromotedExtraDataValue,
     PropertyAuditLog,
     PropertyState,
     PropertyView,
@@ -83,9 +86,11 @@ from seed.models import (
 )
 from seed.models.auditlog import AUDIT_IMPORT
 from seed.models.data_quality import DataQualityCheck, Rule
+from seed.utils.address import normalize_address_str
 from seed.utils.buildings import get_source_type
 from seed.utils.geocode import MapQuestAPIKeyError, geocode_buildings
 from seed.utils.match import update_sub_progress_total
+from seed.utils.meter_aggregates import readings_time_range, refresh_aggregates
 from seed.utils.ubid import decode_unique_ids
 
 # from seed.utils.cprofile import cprofile
@@ -96,7 +101,7 @@ STR_TO_CLASS = {'TaxLotState': TaxLotState, 'PropertyState': PropertyState}
 
 
 @shared_task(ignore_result=True)
-def check_data_chunk(model, ids, dq_id):
+def check_data_chunk(model, ids, dq_id, chunk=0):
     if model == 'PropertyState':
         qs = PropertyState.objects.filter(id__in=ids)
     elif model == 'TaxLotState':
@@ -106,8 +111,8 @@ def check_data_chunk(model, ids, dq_id):
     organization = qs.first().organization
     super_organization = organization.get_parent()
     d = DataQualityCheck.retrieve(super_organization.id)
-    d.check_data(model, qs.iterator())
-    d.save_to_cache(dq_id, organization.id)
+    d.check_data_in_bulk(model, qs)
+    d.save_to_cache(dq_id, organization.id, chunk)
 
 
 @shared_task(ignore_result=True)
@@ -155,6 +160,7 @@ def do_checks(org_id, propertystate_ids, taxlotstate_ids, import_file_id=None):
     tasks = _data_quality_check_create_tasks(
         org_id, propertystate_ids, taxlotstate_ids, dq_id
     )
+    DataQualityCheck.set_cache_chunks(dq_id, org_id, len(tasks))
     progress_data.total = len(tasks)
     progress_data.save()
     if tasks:
@@ -319,6 +325,8 @@ def map_row_chunk(ids, file_pk, source_type, prog_key, **kwargs):
                 delimited_fields['jurisdiction_tax_lot_id']['from_field']] = (
                 'PropertyState', 'lot_number', 'Lot Number', False)
     # *** END BREAK OUT ***
+    start = time.perf_counter()
+    mapped_count = 0
     try:
         with transaction.atomic():
             # yes, there are three cascading for loops here. sorry :(
@@ -344,10 +352,9 @@ def map_row_chunk(ids, file_pk, source_type, prog_key, **kwargs):
                 data = PropertyState.objects.filter(id__in=ids).only('extra_data',
                                                                      'bounding_box').iterator()
 
-                # Since we are importing CSV, then each extra_data field will have the same fields.
-                # So save the map_model_obj outside of for loop to pass into the `save_column_names`
-                # methods
-                map_model_obj = None
+                # Map all the rows of the chunk in memory, then save them in bulk
+                map_model_objs = []
+                original_rows = []
 
                 # Loop over all the rows
                 for original_row in data:
@@ -385,90 +392,84 @@ def map_row_chunk(ids, file_pk, source_type, prog_key, **kwargs):
                         map_model_obj.bounding_box = original_row.bounding_box
                         map_model_obj.import_file = import_file
                         map_model_obj.source_type = save_type
-                        map_model_obj.organization = import_file.import_record.super_organization
+                        map_model_obj.organization = org
                         if hasattr(map_model_obj, 'data_state'):
                             map_model_obj.data_state = DATA_STATE_MAPPING
                         if hasattr(map_model_obj, 'clean'):
                             map_model_obj.clean()
 
-                        # There is a potential thread safe issue here:
-                        # This method is called in parallel on production systems, so we need to
-                        # make sure that the object hasn't already been created. For example, in
-                        # the test data the tax lot id is the same for many rows. Make sure
-                        # to only create/save the object if it hasn't been created before.
-                        if hash_state_object(map_model_obj, include_extra_data=False) == \
-                            hash_state_object(
-                                STR_TO_CLASS[table](organization=map_model_obj.organization),
-                                include_extra_data=False):
-                            # Skip this object as it has no data...
-                            _log.warning(
-                                "Skipping property or taxlot during mapping because it is identical to another row")
-                            continue
-
-                        # If a footprint was provided but footprint was not populated/valid,
-                        # create a new extra_data column to store the raw, invalid data.
-                        # Also create a new rule for this new column
-                        if footprint_details.get('obj_field'):
-                            if getattr(map_model_obj, footprint_details['obj_field']) is None:
-                                _store_raw_footprint_and_create_rule(footprint_details, table, org, import_file,
-                                                                     original_row, map_model_obj)
-
-                        # There was an error with a field being too long [> 255 chars].
-                        map_model_obj.save()
-
-                        # if importing BuildingSync create a BuildingFile for the property
-                        if source_type == BUILDINGSYNC_RAW:
-                            raw_ps_id = original_row.id
-                            xml_filename = import_file.raw_property_state_to_filename.get(str(raw_ps_id))
-                            if xml_filename is None:
-                                raise Exception('Expected ImportFile to have the raw PropertyStates id in its raw_property_state_to_filename dict')
-
-                            from_zipfile = import_file.uploaded_filename.endswith('.zip')
-                            # if user uploaded a zipfile, find the xml file related to this property and use it
-                            # else, the user uploaded a sole xml file and we can just use that one.
-                            if from_zipfile:
-                                with zipfile.ZipFile(import_file.file, 'r', zipfile.ZIP_STORED) as openzip:
-                                    new_file = SimpleUploadedFile(
-                                        name=xml_filename,
-                                        content=openzip.read(xml_filename),
-                                        content_type='application/xml')
-                            else:
-                                xml_filename = import_file.uploaded_filename
-                                if xml_filename == '':
-                                    raise Exception('Expected ImportFiles uploaded_filename to be non-empty')
-                                new_file = SimpleUploadedFile(
-                                    name=xml_filename,
-                                    content=import_file.file.read(),
-                                    content_type='application/xml'
-                                )
-
-                            building_file = BuildingFile.objects.create(
-                                file=new_file,
-                                filename=xml_filename,
-                                file_type=BuildingFile.BUILDINGSYNC,
-                            )
-
-                            # link the property state to the building file
-                            building_file.property_state = map_model_obj
-                            building_file.save()
-
-                        # Create an audit log record for the new map_model_obj that was created.
-
-                        AuditLogClass = PropertyAuditLog if isinstance(
-                            map_model_obj, PropertyState) else TaxLotAuditLog
-                        AuditLogClass.objects.create(
-                            organization=org,
-                            state=map_model_obj,
-                            name='Import Creation',
-                            description='Creation from Import file.',
-                            import_filename=import_file,
-                            record_type=AUDIT_IMPORT
-                        )
+                        map_model_objs.append(map_model_obj)
+                        original_rows.append(original_row)
+
+                if not map_model_objs:
+                    continue
+
+                # There is a potential thread safe issue here:
+                # This method is called in parallel on production systems, so we need to
+                # make sure that the object hasn't already been created. For example, in
+                # the test data the tax lot id is the same for many rows. Make sure
+                # to only create/save the object if it hasn't been created before.
+                StateClass = STR_TO_CLASS[table]
+                empty_state_hash = hash_state_object(StateClass(organization=org), include_extra_data=False)
+                new_states = []
+                new_state_rows = []
+                for map_model_obj, original_row, state_hash in zip(
+                    map_model_objs, original_rows, hash_states(map_model_objs, include_extra_data=False)
+                ):
+                    if state_hash == empty_state_hash:
+                        # Skip this object as it has no data...
+                        _log.warning(
+                            "Skipping property or taxlot during mapping because it is identical to another row")
+                        continue
+
+                    # If a footprint was provided but footprint was not populated/valid,
+                    # create a new extra_data column to store the raw, invalid data.
+                    # Also create a new rule for this new column
+                    if footprint_details.get('obj_field'):
+                        if getattr(map_model_obj, footprint_details['obj_field']) is None:
+                            _store_raw_footprint_and_create_rule(footprint_details, table, org, import_file,
+                                                                 original_row, map_model_obj)
+
+                    new_states.append(map_model_obj)
+                    new_state_rows.append(original_row)
+
+                # bulk_create does not call save(), so set the fields computed on save
+                for state in new_states:
+                    if state.address_line_1 is not None:
+                        state.normalized_address = normalize_address_str(state.address_line_1)
+                    else:
+                        state.normalized_address = None
+                for state, hash_object in zip(new_states, hash_states(new_states)):
+                    state.hash_object = hash_object
+
+                # There was an error with a field being too long [> 255 chars].
+                StateClass.objects.bulk_create(new_states)
+                # nor does it send post_save
+                PromotedExtraDataValue.refresh_for_states(new_states)
+                mapped_count += len(new_states)
+
+                # if importing BuildingSync create a BuildingFile for the property
+                if source_type == BUILDINGSYNC_RAW:
+                    for map_model_obj, original_row in zip(new_states, new_state_rows):
+                        _create_building_file(import_file, original_row, map_model_obj)
+
+                # Create an audit log record for the new map_model_obj that were created.
+                AuditLogClass = PropertyAuditLog if StateClass == PropertyState else TaxLotAuditLog
+                AuditLogClass.objects.bulk_create([
+                    AuditLogClass(
+                        organization=org,
+                        state=map_model_obj,
+                        name='Import Creation',
+                        description='Creation from Import file.',
+                        import_filename=import_file,
+                        record_type=AUDIT_IMPORT
+                    )
+                    for map_model_obj in new_states
+                ])
 
                 # Make sure that we've saved all of the extra_data column names from the first item
                 # in list
-                if map_model_obj:
-                    Column.save_column_names(map_model_obj)
+                Column.save_column_names(map_model_objs[-1])
     except IntegrityError as e:
         progress_data.finish_with_error('Could not map_row_chunk with error', str(e))
         raise IntegrityError("Could not map_row_chunk with error: %s" % str(e))
@@ -481,11 +482,50 @@ def map_row_chunk(ids, file_pk, source_type, prog_key, **kwargs):
         progress_data.finish_with_error('Invalid type found while mapping data', str(e))
         raise DataError("Invalid type found while mapping data: %s" % str(e))
 
-    progress_data.step()
+    elapsed = time.perf_counter() - start
+    rows_per_second = mapped_count / elapsed if elapsed > 0 else 0
+    progress_data.step(f'Mapped {mapped_count:,} rows ({rows_per_second:,.0f} rows/s)')
 
     return True
 
 
+def _create_building_file(import_file, original_row, map_model_obj):
+    """Create the BuildingFile of a PropertyState mapped from a BuildingSync file"""
+    raw_ps_id = original_row.id
+    xml_filename = import_file.raw_property_state_to_filename.get(str(raw_ps_id))
+    if xml_filename is None:
+        raise Exception('Expected ImportFile to have the raw PropertyStates id in its raw_property_state_to_filename dict')
+
+    from_zipfile = import_file.uploaded_filename.endswith('.zip')
+    # if user uploaded a zipfile, find the xml file related to this property and use it
+    # else, the user uploaded a sole xml file and we can just use that one.
+    if from_zipfile:
+        with zipfile.ZipFile(import_file.file, 'r', zipfile.ZIP_STORED) as openzip:
+            new_file = SimpleUploadedFile(
+                name=xml_filename,
+                content=openzip.read(xml_filename),
+                content_type='application/xml')
+    else:
+        xml_filename = import_file.uploaded_filename
+        if xml_filename == '':
+            raise Exception('Expected ImportFiles uploaded_filename to be non-empty')
+        new_file = SimpleUploadedFile(
+            name=xml_filename,
+            content=import_file.file.read(),
+            content_type='application/xml'
+        )
+
+    building_file = BuildingFile.objects.create(
+        file=new_file,
+        filename=xml_filename,
+        file_type=BuildingFile.BUILDINGSYNC,
+    )
+
+    # link the property state to the building file
+    building_file.property_state = map_model_obj
+    building_file.save()
+
+
 def _store_raw_footprint_and_create_rule(footprint_details, table, org, import_file, original_row, map_model_obj):
     column_name = footprint_details['raw_field'] + ' (Invalid Footprint)'
 
@@ -582,14 +622,14 @@ def _data_quality_check_create_tasks(org_id, property_state_ids, taxlot_state_id
 
     tasks = []
     if property_state_ids:
-        id_chunks = [[obj for obj in chunk] for chunk in batch(property_state_ids, 100)]
+        id_chunks = [[obj for obj in chunk] for chunk in batch(property_state_ids, settings.DATA_QUALITY_BATCH_SIZE)]
         for ids in id_chunks:
-            tasks.append(check_data_chunk.s("PropertyState", ids, dq_id))
+            tasks.append(check_data_chunk.s("PropertyState", ids, dq_id, len(tasks)))
 
     if taxlot_state_ids:
-        id_chunks_tl = [[obj for obj in chunk] for chunk in batch(taxlot_state_ids, 100)]
+        id_chunks_tl = [[obj for obj in chunk] for chunk in batch(taxlot_state_ids, settings.DATA_QUALITY_BATCH_SIZE)]
         for ids in id_chunks_tl:
-            tasks.append(check_data_chunk.s("TaxLotState", ids, dq_id))
+            tasks.append(check_data_chunk.s("TaxLotState", ids, dq_id, len(tasks)))
 
     return tasks
 
@@ -668,49 +708,59 @@ def _save_raw_data_chunk(chunk, file_pk, progress_key):
     :return: Bool, Always true
     """
     import_file = ImportFile.objects.get(pk=file_pk)
+    organization = import_file.import_record.super_organization
 
     # Save our "column headers" and sample rows for F/E.
     source_type = get_source_type(import_file)
 
-    # BuildingSync only: track property state ID to its source filename
-    raw_property_state_to_filename = {}
+    raw_properties = []
+    source_filenames = []
+    for c in chunk:
+        raw_property = PropertyState(organization=organization)
+        raw_property.import_file = import_file
+
+        # sanitize c and remove any diacritics
+        new_chunk = {}
+        source_filename = None
+        for k, v in c.items():
+            # remove extra spaces surrounding keys.
+            key = k.strip()
+
+            if key == "bounding_box":  # capture bounding_box GIS field on raw record
+                raw_property.bounding_box = v
+            elif key == "_source_filename":  # grab source filename (for BSync)
+                source_filename = v
+            elif isinstance(v, basestring):
+                new_chunk[key] = unidecode(v)
+            elif isinstance(v, (datetime, date)):
+                raise TypeError(
+                    "Datetime class not supported in Extra Data. Needs to be a string.")
+            else:
+                new_chunk[key] = v
+        raw_property.extra_data = new_chunk
+        raw_property.source_type = source_type
+        raw_property.data_state = DATA_STATE_IMPORT
+        raw_properties.append(raw_property)
+        source_filenames.append(source_filename)
+
+    # bulk_create does not call PropertyState.save, which hashes the state. Raw states
+    # never have an address_line_1 to normalize.
+    for raw_property, hash_object in zip(raw_properties, hash_states(raw_properties)):
+        raw_property.hash_object = hash_object
+
     try:
         with transaction.atomic():
-            for c in chunk:
-                raw_property = PropertyState(
-                    organization=import_file.import_record.super_organization)
-                raw_property.import_file = import_file
-
-                # sanitize c and remove any diacritics
-                new_chunk = {}
-                for k, v in c.items():
-                    # remove extra spaces surrounding keys.
-                    key = k.strip()
-
-                    source_filename = None
-                    if key == "bounding_box":  # capture bounding_box GIS field on raw record
-                        raw_property.bounding_box = v
-                    elif key == "_source_filename":  # grab source filename (for BSync)
-                        source_filename = v
-                    elif isinstance(v, basestring):
-                        new_chunk[key] = unidecode(v)
-                    elif isinstance(v, (datetime, date)):
-                        raise TypeError(
-                            "Datetime class not supported in Extra Data. Needs to be a string.")
-                    else:
-                        new_chunk[key] = v
-                raw_property.extra_data = new_chunk
-                raw_property.source_type = source_type
-                raw_property.data_state = DATA_STATE_IMPORT
-                raw_property.organization = import_file.import_record.super_organization
-                raw_property.save()
-
-                if source_filename is not None:
-                    raw_property_state_to_filename[str(raw_property.id)] = source_filename
-
+            PropertyState.objects.bulk_create(raw_properties)
     except IntegrityError as e:
         raise IntegrityError("Could not save_raw_data_chunk with error: %s" % (e))
 
+    # BuildingSync only: track property state ID to its source filename
+    raw_property_state_to_filename = {
+        str(raw_property.id): source_filename
+        for raw_property, source_filename in zip(raw_properties, source_filenames)
+        if source_filename is not None
+    }
+
     # Indicate progress
     progress_data = ProgressData.from_key(progress_key)
     progress_data.step()
@@ -719,17 +769,38 @@ def _save_raw_data_chunk(chunk, file_pk, progress_key):
 
 
 @shared_task(ignore_result=True)
-def finish_raw_save(results, file_pk, progress_key):
+def _save_raw_data_row_range(file_pk, offset, num_rows, progress_key):
+    """
+    Read a range of rows of a CSV import file and save them to the database
+
+    :param file_pk: ImportFile Primary Key
+    :param offset: int, position of the first row in the file, from CSVParser.row_offsets
+    :param num_rows: int, number of rows to save
+    :param progress_key: string, Progress Key to append progress
+    :return: dict, same as _save_raw_data_chunk
+    """
+    import_file = ImportFile.objects.get(pk=file_pk)
+    with import_file.open_text_file() as f:
+        parser = reader.CSVParser(f)
+        chunk = list(parser.rows_at(offset, num_rows))
+
+    return _save_raw_data_chunk(chunk, file_pk, progress_key)
+
+
+@shared_task(ignore_result=True)
+def finish_raw_save(results, file_pk, progress_key, readings_range=None):
     """
     Finish importing the raw file.
 
     If the file is a PM Meter Usage or GreenButton import, remove the cycle association.
     If the file is of one of those types and a summary is provided, add import results
-    to this summary and save it to the ProgressData.
+    to this summary and save it to the ProgressData. The meter reading aggregates are
+    refreshed once for all the imported readings.
 
     :param results: List of results from the parent task
     :param file_pk: ID of the file that was being imported
     :param progress_key: string, Progress Key to append progress
+    :param readings_range: tuple, earliest and latest start times of the imported meter readings
     :param summary: Summary to be saved on ProgressData as a message
     :return: results: results from the other tasks before the chord ran
     """
@@ -760,6 +831,9 @@ def finish_raw_save(results, file_pk, progress_key):
 
     import_file.save()
 
+    if readings_range is not None:
+        refresh_aggregates(*readings_range)
+
     return finished_progress_data
 
 
@@ -829,7 +903,7 @@ def _save_greenbutton_data_create_tasks(file_pk, progress_key):
     for batch_readings in batch(readings, chunk_size):
         tasks.append(_save_greenbutton_data_task.s(batch_readings, meter_id, meter_usage_point_id, progress_data.key))
 
-    return chord(tasks, interval=15)(finish_raw_save.s(file_pk, progress_data.key))
+    return chord(tasks, interval=15)(finish_raw_save.s(file_pk, progress_data.key, readings_time_range(readings)))
 
 
 @shared_task
@@ -1116,7 +1190,10 @@ def _save_pm_meter_usage_data_create_tasks(file_pk, progress_key):
     for meter_readings in meters_and_readings:
         tasks.append(_save_pm_meter_usage_data_task.s(meter_readings, file_pk, progress_data.key))
 
-    return chord(tasks, interval=15)(finish_raw_save.s(file_pk, progress_data.key))
+    readings_range = readings_time_range(
+        reading for meter_readings in meters_and_readings for reading in meter_readings['readings']
+    )
+    return chord(tasks, interval=15)(finish_raw_save.s(file_pk, progress_data.key, readings_range))
 
 
 def _append_meter_import_results_to_summary(import_results, incoming_summary):
@@ -1237,21 +1314,63 @@ def _save_raw_data_create_tasks(file_pk, progress_key):
     import_file.num_rows = 0
     import_file.num_columns = parser.num_columns()
 
-    chunks = []
-    for batch_chunk in batch(parser.data, 100):
-        import_file.num_rows += len(batch_chunk)
-        chunks.append(batch_chunk)
+    batch_size = settings.SAVE_RAW_DATA_BATCH_SIZE
+    if settings.SAVE_RAW_DATA_ROW_RANGES and isinstance(getattr(parser, 'reader', None), reader.CSVParser):
+        # only the positions of the chunks go through the broker, each task reads its rows
+        # from the file
+        offsets, import_file.num_rows = parser.reader.row_offsets(batch_size)
+        import_file.save()
+
+        progress_data.total = len(offsets)
+        progress_data.save()
+
+        tasks = [_save_raw_data_row_range.s(file_pk, offset, batch_size, progress_data.key) for offset in offsets]
+        return chord(tasks, interval=15)(finish_raw_save.s(file_pk, progress_data.key))
+
+    # Send each chunk to the workers as soon as it is read, so that only one chunk of the
+    # file is held in memory. The results are needed by finish_raw_save.
+    results = []
+    for chunk in batch(parser.data, batch_size):
+        import_file.num_rows += len(chunk)
+        results.append(
+            _save_raw_data_chunk.apply_async((chunk, file_pk, progress_data.key), ignore_result=False)
+        )
     import_file.save()
 
-    progress_data.total = len(chunks)
+    progress_data.total = len(results)
     progress_data.save()
 
-    # Add in the save raw data chunks to the background tasks
-    tasks = []
-    for chunk in chunks:
-        tasks.append(_save_raw_data_chunk.s(chunk, file_pk, progress_data.key))
+    group_result = GroupResult(uuid(), results)
+    if group_result.ready():
+        # e.g., the chunks were saved eagerly
+        return finish_raw_save(group_result.get(disable_sync_subtasks=False), file_pk, progress_data.key)
 
-    return chord(tasks, interval=15)(finish_raw_save.s(file_pk, progress_data.key))
+    group_result.save()
+    return _finish_raw_save_when_ready.delay(group_result.id, file_pk, progress_data.key)
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=None)
+def _finish_raw_save_when_ready(self, group_id, file_pk, progress_key):
+    """
+    Wait for the chunks sent by _save_raw_data_create_tasks to be saved, then finish
+    the raw save.
+
+    :param group_id: string, ID of the saved GroupResult of the chunk tasks
+    :param file_pk: int, ID of the file to import
+    :param progress_key: string, Progress Key to append progress
+    """
+    group_result = GroupResult.restore(group_id)
+    if group_result is None:
+        return ProgressData.from_key(progress_key).finish_with_error('Results of the raw data save have expired')
+
+    if not group_result.ready():
+        raise self.retry(countdown=15)
+
+    # raises the exception of a chunk which failed, the same as the chord did
+    results = group_result.get(disable_sync_subtasks=False)
+    group_result.forget()
+    group_result.delete()
+    return finish_raw_save(results, file_pk, progress_key)
 
 
 def save_raw_data(file_pk):
@@ -1540,44 +1659,8 @@ def finish_matching(result, import_file_id, progress_key):
 
 
 def hash_state_object(obj, include_extra_data=True):
-    def add_dictionary_repr_to_hash(hash_obj, dict_obj):
-        assert isinstance(dict_obj, dict)
-
-        for (key, value) in sorted(dict_obj.items(), key=lambda x_y: x_y[0]):
-            if isinstance(value, dict):
-                add_dictionary_repr_to_hash(hash_obj, value)
-            else:
-                hash_obj.update(str(unidecode(key)).encode('utf-8'))
-                if isinstance(value, basestring):
-                    hash_obj.update(unidecode(value).encode('utf-8'))
-                else:
-                    hash_obj.update(str(value).encode('utf-8'))
-        return hash_obj
-
-    def _get_field_from_obj(field_obj, field):
-        if not hasattr(field_obj, field):
-            return 'FOO'  # Return a random value so we can distinguish between this and None.
-        else:
-            return getattr(field_obj, field)
-
-    m = hashlib.md5()
-    for f in Column.retrieve_db_field_name_for_hash_comparison():
-        obj_val = _get_field_from_obj(obj, f)
-        m.update(f.encode('utf-8'))
-        if isinstance(obj_val, datetime):
-            # if this is a datetime, then make sure to save the string as a naive datetime.
-            # Somehow, somewhere the data are being saved in mapping with a timezone,
-            # then in matching they are removed (but the time is updated correctly)
-            m.update(str(make_naive(obj_val).astimezone(tz.utc).isoformat()).encode('utf-8'))
-        elif isinstance(obj_val, GEOSGeometry):
-            m.update(GEOSGeometry(obj_val, srid=4326).wkt.encode('utf-8'))
-        else:
-            m.update(str(obj_val).encode('utf-8'))
-
-    if include_extra_data:
-        add_dictionary_repr_to_hash(m, obj.extra_data)
-
-    return m.hexdigest()
+    """Hash the data of a PropertyState or TaxLotState, see seed.data_importer.hashing"""
+    return hash_state(obj, include_extra_data)
 
 
 @shared_task
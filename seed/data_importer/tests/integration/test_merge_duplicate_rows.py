@@ -15,6 +15,7 @@ from django.utils import timezone as tz
 from quantityfield.units import ureg
 
 from seed.data_importer import match, tasks
+from seed.data_importer.hashing import hash_states
 from seed.data_importer.tests.util import (
     FAKE_EXTRA_DATA,
     FAKE_MAPPINGS,
@@ -84,6 +85,23 @@ class TestCaseMultipleDuplicateMatching(DataMappingBaseTestCase):
         hash_res = tasks.hash_state_object(ps6)
         self.assertEqual(len(hash_res), 32)
 
+    def test_hash_states(self):
+        states = [
+            PropertyState(address_line_1='123 fake st', extra_data={"a": "100", "b": {"c": 1}}),
+            PropertyState(address_line_1='123 fake st', extra_data={"a": "Café"}),
+            PropertyState(address_line_1='123 fake st', extra_data={"a": "Cafe"}),
+            TaxLotState(jurisdiction_tax_lot_id='1234'),
+        ]
+        # the digests of the implementation of hash_state_object before the hashing module
+        expected = [
+            '548008d2b20e15ecc412330959434cd6',
+            '79c74df63077d372bd083b841e9c18cb',
+            '79c74df63077d372bd083b841e9c18cb',
+            '1e216c38ecdbc2f71a719a63d2700afd',
+        ]
+        self.assertEqual(hash_states(states), expected)
+        self.assertEqual(list(map(tasks.hash_state_object, states)), expected)
+
     def test_hash_various_states(self):
         """The hashing should not affect the data_state, source, type and various other states"""
         ps1 = PropertyState.objects.create(
@@ -9,12 +9,20 @@ import os.path as osp
 import pathlib
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from quantityfield.units import ureg
 
 from seed.data_importer import tasks
 from seed.data_importer.tests.util import FAKE_MAPPINGS
 from seed.lib.mcm import mapper
-from seed.models import ASSESSED_RAW, DATA_STATE_IMPORT, Column
+from seed.lib.progress_data.progress_data import ProgressData
+from seed.models import (
+    ASSESSED_RAW,
+    DATA_STATE_IMPORT,
+    Column,
+    PropertyAuditLog,
+    PropertyState
+)
 from seed.models.column_mappings import get_column_mapping
 from seed.test_helpers.fake import (
     FakePropertyFactory,
@@ -85,10 +93,58 @@ class TestMapping(DataMappingBaseTestCase):
         self.assertEqual(state.extra_data['year_built'], props.first().year_built)
         self.assertEqual(state.extra_data['random_extra'], props.first().extra_data['random_extra'])
 
+        # mapped states are created in bulk, with the hash computed on save and an audit log
+        self.assertEqual(len(props.first().hash_object), 32)
+        self.assertTrue(
+            PropertyAuditLog.objects.filter(state=props.first(), name='Import Creation').exists()
+        )
+
         # from seed.utils.generic import pp
         # for p in props:
         #     pp(p)
 
+    def test_save_raw_data_chunk_in_bulk(self):
+        progress_data = ProgressData(func_name='save_raw_data', unique_id=self.import_file.pk)
+        progress_data.total = 1
+        progress_data.save()
+
+        chunk = [
+            {' Address ': f'{i} Main St', 'Café': 'Crème', 'Floor Area': i, '_source_filename': f'file_{i}.xml'}
+            for i in range(250)
+        ]
+        filenames = tasks._save_raw_data_chunk(chunk, self.import_file.pk, progress_data.key)
+
+        states = PropertyState.objects.filter(import_file=self.import_file).order_by('id')
+        self.assertEqual(states.count(), 250)
+        self.assertEqual(filenames, {str(state.id): f'file_{i}.xml' for i, state in enumerate(states)})
+        for state in states[:5]:
+            self.assertEqual(state.data_state, DATA_STATE_IMPORT)
+            self.assertEqual(state.organization, self.org)
+            self.assertEqual(state.extra_data['Café'], 'Creme')
+            self.assertNotIn('_source_filename', state.extra_data)
+            self.assertEqual(state.hash_object, tasks.hash_state_object(state))
+
+    @override_settings(SAVE_RAW_DATA_BATCH_SIZE=2, SAVE_RAW_DATA_ROW_RANGES=True)
+    def test_save_raw_data_csv_row_ranges(self):
+        # rows can span several lines, and blank lines are skipped
+        rows = ['Address Line 1,Notes'] + [f'{i} Main St,"Line 1\nLine 2 of row {i}"' for i in range(5)]
+        rows.insert(3, '')
+        self.import_file.file = SimpleUploadedFile(
+            name='row-ranges.csv',
+            content='\r\n'.join(rows).encode('utf-8')
+        )
+        self.import_file.save()
+
+        tasks.save_raw_data(self.import_file.pk)
+
+        self.import_file.refresh_from_db()
+        self.assertEqual(self.import_file.num_rows, 5)
+        states = PropertyState.objects.filter(import_file=self.import_file).order_by('id')
+        self.assertEqual(
+            [state.extra_data for state in states],
+            [{'Address Line 1': f'{i} Main St', 'Notes': f'Line 1\nLine 2 of row {i}'} for i in range(5)]
+        )
+
     def test_remapping_with_and_without_unit_aware_columns_doesnt_lose_data(self):
         """
         During import, when the initial -State objects are created from the extra_data values,
@@ -20,6 +20,7 @@ from seed.data_importer.tasks import (
     map_data,
     save_raw_data
 )
+from seed.lib.merging.merging import merge_states_bulk
 from seed.lib.progress_data.progress_data import ProgressData
 from seed.lib.xml_mapping.mapper import default_buildingsync_profile_mappings
 from seed.models import (
@@ -1027,6 +1028,36 @@ class TestMatchingHelperMethods(DataMappingBaseTestCase):
         self.assertEqual(pal.parent_state2, ps_2)
         self.assertEqual(pal.description, 'Automatic Merge')
 
+    def test_merge_states_bulk(self):
+        ps_1 = self.property_state_factory.get_property_state(
+            property_name='first', city='First City', extra_data={'extra_1': 'a'})
+        ps_2 = self.property_state_factory.get_property_state(
+            property_name='second', city=None, extra_data={'extra_2': 'b'})
+        ps_3 = self.property_state_factory.get_property_state(
+            property_name='third', city='Third City', extra_data={'extra_1': 'c'})
+        state_count = PropertyState.objects.count()
+
+        priorities = Column.retrieve_priorities(self.org.pk)['PropertyState']
+        priorities['city'] = 'Favor Existing'
+        merged_state = merge_states_bulk([ps_1, ps_2, ps_3], priorities)
+
+        # a single state is created, without intermediate states
+        self.assertEqual(PropertyState.objects.count(), state_count + 1)
+        self.assertEqual(merged_state.merge_state, MERGE_STATE_MERGED)
+        self.assertEqual(merged_state.property_name, 'third')
+        self.assertEqual(merged_state.city, 'First City')
+        self.assertEqual(merged_state.extra_data, {'extra_1': 'c', 'extra_2': 'b'})
+
+        # a single audit log references all the parents
+        pal = PropertyAuditLog.objects.get(organization=self.org, state=merged_state)
+        self.assertEqual(pal.name, 'System Match')
+        self.assertEqual(pal.parent_state1, ps_1)
+        self.assertEqual(pal.parent_state2, ps_3)
+        self.assertCountEqual(pal.parent_states.all(), [ps_1, ps_2, ps_3])
+
+        history, _ = merged_state.history()
+        self.assertEqual([record['state_id'] for record in history], [ps_3.id, ps_2.id, ps_1.id])
+
     def test_filter_duplicate_states(self):
         for i in range(10):
             self.property_state_factory.get_property_state(
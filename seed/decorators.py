@@ -12,6 +12,7 @@ from django.http import (
     HttpResponseBadRequest,
     HttpResponseForbidden
 )
+from django.http.response import HttpResponseBase
 
 from seed.lib.superperms.orgs.models import OrganizationUser
 from seed.serializers.pint import PintJSONEncoder
@@ -153,8 +154,8 @@ def ajax_request_class(func):
             if response.get('status') == 'error' or response.get('success') is False:
                 status_code = 400
 
-        # convert the response into an HttpResponse if it is not already.
-        if not isinstance(response, HttpResponse):
+        # convert the response into an HttpResponse if it is not already (streaming responses are passed through).
+        if not isinstance(response, HttpResponseBase):
             data = FORMAT_TYPES[format_type](response)
             response = HttpResponse(data, content_type=format_type,
                                     status=status_code)
@@ -10,14 +10,21 @@ out of CSV files. Fuzzy matches, application to data models happens
 elsewhere.
 
 """
+import codecs
 import json
 import mmap
 import operator
 import re
+import zipfile
 from builtins import str
 from csv import DictReader, Sniffer
+from csv import reader as csv_reader
+from datetime import date, datetime, time, timedelta
+from itertools import islice
 
 import xmltodict
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
 from past.builtins import basestring
 from unidecode import unidecode
 from xlrd import XLRDError, empty_cell, open_workbook, xldate
@@ -38,6 +45,12 @@ from seed.data_importer.utils import kbtu_thermal_conversion_factors
 ROW_DELIMITER = "|#*#|"
 SEED_GENERATED_HEADER_PREFIX = "SEED Generated Header"
 
+# number of characters read at a time when streaming the features of a GeoJSON file
+JSON_READ_SIZE = 64 * 1024
+
+# day zero of the Excel 1900 date system, used to format times and durations like xlrd
+EXCEL_EPOCH = datetime(1899, 12, 31)
+
 
 def clean_fieldnames(fieldnames):
     """
@@ -251,24 +264,120 @@ class GreenButtonParser(object):
         return None, 1
 
 
+class _JSONStream(object):
+    """Incremental decoder of the values of a JSON file, which only keeps the value
+    being decoded in memory"""
+
+    def __init__(self, json_file, read_size=JSON_READ_SIZE):
+        self.json_file = json_file
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def _read(self):
+        # drop what was consumed, and read at least as much as is buffered so that large
+        # values are decoded in a linear number of reads
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        data = self.json_file.read(max(self.read_size, len(self.buffer)))
+        if isinstance(data, bytes):
+            data = self.utf8_decoder.decode(data, final=not data)
+        if not data:
+            self.eof = True
+        self.buffer += data
+
+    def peek(self):
+        """returns the next character which is not whitespace, without consuming it"""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in ' \t\n\r':
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                raise ValueError('Unexpected end of JSON file')
+            self._read()
+
+    def consume(self, character):
+        if self.peek() != character:
+            raise ValueError(f'Expecting "{character}" at position {self.position} of the JSON file')
+        self.position += 1
+
+    def decode(self):
+        """returns the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # the value continues past the end of the buffer
+                self._read()
+                continue
+            if end == len(self.buffer) and not self.eof:
+                # a number may continue in the next read
+                self._read()
+                continue
+            self.position = end
+            return value
+
+
 class GeoJSONParser(object):
+    """GeoJSON FeatureCollection parser. The features are read from the file one at a
+    time, so the whole file is never loaded in memory."""
+
     def __init__(self, json_file):
-        raw_data = json.load(json_file)
-        features = raw_data.get("features")
-        raw_column_names = features[0].get("properties").keys()
+        self.json_file = json_file
+        first_features = list(islice(self._features(), 5))
+        raw_column_names = first_features[0].get("properties").keys()
 
         self.headers = [self._display_name(col) for col in raw_column_names]
         self.column_translations = {col: self._display_name(col) for col in raw_column_names}
-        self.first_five_rows = [self._capture_row(feature) for feature in features[:5]]
+        self.first_five_rows = [self._capture_row(feature) for feature in first_features]
 
-        self.data = []
-        for feature in features:
+    @property
+    def data(self):
+        """generator yielding a dict per feature, reading the file from the beginning"""
+        for feature in self._features():
             properties = feature.get('properties')
 
             entry = {self.column_translations.get(k, k): v for k, v in properties.items()}
             entry["bounding_box"] = self._get_bounding_box(feature)
 
-            self.data.append(entry)
+            yield entry
+
+    def _features(self):
+        """generator yielding the items of the "features" array of the FeatureCollection"""
+        self.json_file.seek(0)
+        stream = _JSONStream(self.json_file)
+        stream.consume('{')
+        if stream.peek() == '}':
+            return
+
+        while True:
+            key = stream.decode()
+            stream.consume(':')
+            if key == 'features':
+                stream.consume('[')
+                if stream.peek() == ']':
+                    stream.consume(']')
+                else:
+                    while True:
+                        yield stream.decode()
+                        if stream.peek() != ',':
+                            break
+                        stream.consume(',')
+                    stream.consume(']')
+            else:
+                stream.decode()
+
+            if stream.peek() != ',':
+                break
+            stream.consume(',')
+        stream.consume('}')
 
     def _display_name(self, col):
         # Returns string with capitalized words and underscores removed
@@ -289,7 +398,7 @@ class GeoJSONParser(object):
 
 
 class ExcelParser(object):
-    """MS Excel (.xls, .xlsx) file parser for MCMParser
+    """MS Excel (.xls) file parser for MCMParser
 
     usage:
             f = open('data.xls', 'rb')
@@ -418,6 +527,177 @@ class ExcelParser(object):
         return self.cache_headers
 
 
+def _is_binary(f):
+    return 'b' in getattr(f, 'mode', 'b')
+
+
+def is_xlsx_file(f):
+    """returns True if the file is a zip archive, i.e., an Office Open XML workbook"""
+    if not _is_binary(f):
+        return zipfile.is_zipfile(f.name)
+
+    result = zipfile.is_zipfile(f)
+    f.seek(0)
+    return result
+
+
+class XLSXParser(object):
+    """MS Excel (.xlsx) file parser for MCMParser
+
+    The rows are streamed from the sheet (openpyxl read-only mode), so the sheet is never
+    loaded in memory. The values are formatted the same way as ExcelParser.
+
+    usage:
+            f = open('data.xlsx', 'rb')
+            reader = MCMParser(f)
+            rows = reader.next()
+            for row in rows:
+                # something with the row dict
+            ...
+            reader.seek_to_beginning()
+            # rows.next() will return the first row
+    """
+
+    def __init__(self, excel_file, sheet_name=None, *args, **kwargs):
+        self.excel_file = excel_file
+        self.sheet_name = sheet_name
+        self._binary_file = None
+        self._workbook = None
+        self._open()
+        try:
+            self.header_row, header = self._get_header_row()
+        except Exception:
+            self.close()
+            raise
+        # the keys of the rows are not stripped, the same as ExcelParser
+        self.raw_headers = [self.get_value(value) for value in header]
+        self.cache_headers = [value.strip() for value in self.raw_headers]
+        self.excelreader = self.XLSXDictReader()
+
+    def _open(self):
+        """opens the workbook and its sheet"""
+        # the workbook is a zip archive, which has to be read in binary mode. A file opened
+        # in text mode is opened again in binary mode until the parser is closed, so that
+        # the archive is read from the file as the rows are streamed
+        if _is_binary(self.excel_file):
+            self._binary_file = self.excel_file
+        else:
+            self._binary_file = open(self.excel_file.name, 'rb')
+        try:
+            self.sheet = self._get_sheet(self._binary_file, self.sheet_name)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """closes the workbook, and the file if the parser opened it. This is done once all
+        the rows are read, the rows can be read again after seek_to_beginning"""
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+        if self._binary_file is not None and self._binary_file is not self.excel_file:
+            self._binary_file.close()
+        self._binary_file = None
+
+    def _get_sheet(self, f, sheet_name=None):
+        """returns a read-only openpyxl worksheet
+
+        :param f: an open file of type ``file``, in binary mode
+        :param sheet_name: name of the sheet, defaults to the first sheet
+        :returns: openpyxl ReadOnlyWorksheet
+        """
+        self._workbook = load_workbook(f, read_only=True, data_only=True)
+        if sheet_name is None:
+            sheet = self._workbook.worksheets[0]
+        elif sheet_name in self._workbook.sheetnames:
+            sheet = self._workbook[sheet_name]
+        else:
+            raise SheetDoesNotExist(f"No sheet named <{sheet_name!r}>")
+
+        if not sheet.max_row or not sheet.max_column:
+            # some writers do not store the dimensions of the sheet
+            sheet.reset_dimensions()
+            sheet.calculate_dimension(force=True)
+        return sheet
+
+    def _rows(self):
+        """generator yielding the values of each row, padded to the number of columns"""
+        return self.sheet.iter_rows(max_col=self.sheet.max_column, values_only=True)
+
+    def _get_header_row(self):
+        """returns the best guess for the header row: the first row without empty cells
+
+        :returns: tuple, (index of header row, values of header row)
+        """
+        first_row = ()
+        for index, row in enumerate(self._rows()):
+            if index == 0:
+                first_row = row
+            if all(value is not None for value in row):
+                return index, row
+        # default to first row
+        return 0, first_row
+
+    def get_value(self, value):
+        """Handle different value types for XLSX, formatting them the same way as
+        ExcelParser.get_value
+
+        :param value: value of an openpyxl cell
+        :returns: value with dates parsed properly
+        """
+        if value is None:
+            return ''
+
+        if isinstance(value, bool):
+            return int(value)
+
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+
+        if isinstance(value, date):
+            return datetime.combine(value, time()).strftime("%Y-%m-%d %H:%M:%S")
+
+        if isinstance(value, time):
+            return datetime.combine(EXCEL_EPOCH, value).strftime("%Y-%m-%d %H:%M:%S")
+
+        if isinstance(value, timedelta):
+            return (EXCEL_EPOCH + value).strftime("%Y-%m-%d %H:%M:%S")
+
+        if isinstance(value, float) and value % 1 == 0:  # integers
+            return int(value)
+
+        if isinstance(value, basestring):
+            return unidecode(value)
+
+        return value
+
+    def XLSXDictReader(self):
+        """generator yielding a dict per row after the header row, which closes the
+        parser once all the rows are read"""
+        for row in islice(self._rows(), self.header_row + 1, None):
+            yield dict(zip(self.raw_headers, (self.get_value(value) for value in row)))
+        self.close()
+
+    def seek_to_beginning(self):
+        """seeks to the beginning of the file
+
+        The rows are read again from the beginning of the sheet by a new XLSXDictReader
+        """
+        self.excel_file.seek(0)
+        if self._workbook is None:
+            self._open()
+        self.excelreader = self.XLSXDictReader()
+
+    def num_columns(self):
+        """gets the number of columns for the file"""
+        return len(self.cache_headers)
+
+    @property
+    def headers(self):
+        """return ordered list of clean headers"""
+        return self.cache_headers
+
+
 class CSVParser(object):
     """CSV (.csv) file parser for MCMParser
 
@@ -447,6 +727,7 @@ class CSVParser(object):
             DictReader(self.csvfile, dialect=dialect).fieldnames
         )
         self.has_generated_headers = generated_headers
+        self.dialect = dialect
         self.csvfile.seek(0)  # not positive this is required, but adding it just in case
         self.csvreader = DictReader(self.csvfile, dialect=dialect, fieldnames=fieldnames)
 
@@ -457,6 +738,44 @@ class CSVParser(object):
         # skip header row
         self.csvfile.__next__()
 
+    def row_offsets(self, step):
+        """Index the positions of the rows in the file, to read them later with rows_at
+
+        :param step: int, index every ``step``-th row, starting with the first row after the header
+        :returns: tuple, (list of positions of the indexed rows, number of rows)
+        """
+        self.csvfile.seek(0)
+        # the position in the file is only available when reading it line by line. Rows can
+        # span several lines, so it is read before each row.
+        rows = csv_reader(iter(self.csvfile.readline, ''), dialect=self.dialect)
+        next(rows, None)
+
+        offsets = []
+        num_rows = 0
+        while True:
+            position = self.csvfile.tell() if num_rows % step == 0 else None
+            row = next(rows, None)
+            if row is None:
+                break
+            if row == []:
+                # blank lines are skipped by DictReader
+                continue
+            if position is not None:
+                offsets.append(position)
+            num_rows += 1
+
+        self.seek_to_beginning()
+        return offsets, num_rows
+
+    def rows_at(self, position, num_rows):
+        """returns a generator yielding up to ``num_rows`` rows as dicts, starting at a position
+        returned by row_offsets"""
+        self.csvfile.seek(position)
+        return islice(
+            DictReader(self.csvfile, dialect=self.dialect, fieldnames=self.csvreader.fieldnames),
+            num_rows
+        )
+
     def num_columns(self):
         """gets the number of columns for the file"""
         return len(self.csvreader.fieldnames)
@@ -469,7 +788,7 @@ class CSVParser(object):
 
 class MCMParser(object):
     """
-    This Parser is a wrapper around CSVReader and ExcelParser which matches
+    This Parser is a wrapper around CSVParser, ExcelParser and XLSXParser which matches
     columnar data against a set of known ontologies and separates data
     according to those distinctions.
 
@@ -504,6 +823,12 @@ class MCMParser(object):
 
     def _get_reader(self, import_file, sheet_name=None):
         """returns a CSV or XLS/XLSX reader or raises an exception"""
+        if is_xlsx_file(import_file):
+            try:
+                return XLSXParser(import_file, sheet_name)
+            except (InvalidFileException, KeyError, zipfile.BadZipFile):
+                raise Exception('Cannot parse file')
+
         try:
             return ExcelParser(import_file, sheet_name)
         except XLRDError as e:
@@ -523,7 +848,7 @@ class MCMParser(object):
         """calls the reader's seek_to_beginning"""
         if isinstance(self.reader, CSVParser):
             self.data = self.reader.csvreader
-        elif isinstance(self.reader, ExcelParser):
+        elif isinstance(self.reader, (ExcelParser, XLSXParser)):
             self.data = self.reader.excelreader
         else:
             raise Exception('Uknown type of parser in MCMParser')
@@ -0,0 +1,77 @@
+# !/usr/bin/env python
+# encoding: utf-8
+
+import builtins
+import os
+from unittest import mock
+
+from django.test import TestCase
+
+from seed.lib.mcm.reader import MCMParser, SheetDoesNotExist, XLSXParser
+
+builtin_open = builtins.open
+
+
+class XLSXParserTest(TestCase):
+    def setUp(self):
+        self.file_path = os.path.dirname(os.path.abspath(__file__)) + "/test_data/test_espm.xlsx"
+        # files are opened in text mode by ImportFile.local_file
+        self.file = open(self.file_path, "r", encoding="utf-8")
+        self.parser = MCMParser(self.file)
+
+    def tearDown(self) -> None:
+        self.file.close()
+
+    def test_it_streams_the_sheet(self):
+        self.assertIsInstance(self.parser.reader, XLSXParser)
+        self.assertTrue(self.parser.reader._workbook.read_only)
+
+    def test_it_has_a_data_property(self):
+        data = list(self.parser.data)
+
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]['Property Id'], 5487)
+        self.assertEqual(data[0]['Property Name'], 'Two Franklin Square')
+        # dates are formatted the same way as the xls parser
+        self.assertEqual(data[0]['Year Ending'], '2010-12-31 00:00:00')
+
+    def test_it_has_a_headers_property(self):
+        self.assertEqual(
+            self.parser.headers[:5],
+            ['Property Id', 'Property Name', 'Parent Property Id', 'Parent Property Name', 'Year Ending']
+        )
+
+    def test_it_has_a_num_columns_property(self):
+        self.assertEqual(self.parser.num_columns(), 250)
+
+    def test_it_can_be_read_again_from_the_beginning(self):
+        first_five_rows = self.parser.first_five_rows
+
+        self.assertEqual(len(first_five_rows), 3)
+        self.assertEqual(len(list(self.parser.data)), 3)
+
+    def test_it_raises_when_the_sheet_does_not_exist(self):
+        with open(self.file_path, "rb") as f:
+            with self.assertRaises(SheetDoesNotExist):
+                MCMParser(f, sheet_name='Meter Entries')
+
+    def test_it_closes_the_files_it_opens(self):
+        opened = []
+
+        def tracked_open(*args, **kwargs):
+            opened.append(builtin_open(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch('builtins.open', tracked_open):
+            parser = MCMParser(self.file)
+            # the sheet is streamed from the file, which is open until all the rows are read
+            sheet_file = opened[-1]
+            self.assertFalse(sheet_file.closed)
+            self.assertEqual(len(list(parser.data)), 3)
+            self.assertTrue(sheet_file.closed)
+
+            # the file is opened again to read the rows again
+            parser.seek_to_beginning()
+            self.assertIsNot(opened[-1], sheet_file)
+            self.assertEqual(len(list(parser.data)), 3)
+        self.assertTrue(all(f.closed for f in opened))
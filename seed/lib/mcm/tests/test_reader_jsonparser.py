@@ -49,7 +49,7 @@ class JSONParserTest(TestCase):
             }
         ]
 
-        self.assertEqual(self.parser.data, expectation)
+        self.assertEqual(list(self.parser.data), expectation)
 
     def test_it_has_a_headers_property(self):
         expectation = [
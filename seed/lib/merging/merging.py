@@ -7,7 +7,18 @@
 import logging
 from collections import defaultdict
 
-from seed.models import Column, PropertyState, TaxLotState
+from seed.models import (
+    AUDIT_IMPORT,
+    DATA_STATE_MAPPING,
+    DATA_STATE_UNKNOWN,
+    MERGE_STATE_MERGED,
+    MERGE_STATE_UNKNOWN,
+    Column,
+    PropertyAuditLog,
+    PropertyState,
+    TaxLotAuditLog,
+    TaxLotState
+)
 
 _log = logging.getLogger(__name__)
 
@@ -84,50 +95,94 @@ def get_state_attrs(state_list):
         return get_taxlotstate_attrs(state_list)
 
 
-def _merge_geocoding_results(merged_state, state1, state2, priorities, can_attrs, ignore_merge_protection=False):
+GEOCODING_COLUMNS = [
+    'geocoding_confidence',
+    'longitude',
+    'latitude',
+    'long_lat',  # note this col shouldn't have priority set
+]
+
+
+def _present_columns(state):
+    """Return the columns mapped by the import file of the state, or None if unknown"""
+    if state.import_file is not None and state.import_file.cached_mapped_columns is not None:
+        # null has to be defined, not sure why, probably the eval?
+        null = None  # noqa F841
+        return [column["to_field"] for column in eval(state.import_file.cached_mapped_columns)]
+    return None
+
+
+def _merge_value(value1, value2, priority, recognize_empty, present_in_new, ignore_merge_protection=False):
     """
-    Geocoding results need to be handled separately since they should generally
-    "stick together". In one sense, all 4 result columns should be treated as
-    one column. Specifically, the complete geocoding results of either the new
-    state or the existing state is used - not a combination of the geocoding
-    results from each.
+    Choose the merged value of a field from the values of the left (existing) and
+    right (new) parents.
 
-    Note, to avoid unnecessary complications, it's intended for these fields to
-    be left out of the logic involving recognize_empty.
+    :param priority: str, 'Favor New' or 'Favor Existing'
+    :param recognize_empty: bool, empty values overwrite set values
+    :param present_in_new: bool, the field was mapped by the import file of the new parent
+    :return: merged value
     """
-    geocoding_attr_cols = [
-        'geocoding_confidence',
-        'longitude',
-        'latitude',
-        'long_lat',  # note this col shouldn't have priority set
-    ]
+    attr_values = []
+    for value in [value1, value2]:
+        if value is None and recognize_empty:
+            if present_in_new:
+                attr_values.append(value)
+        elif value is not None or recognize_empty:
+            attr_values.append(value)
 
-    existing_results_empty = True
-    new_results_empty = True
-    geocoding_favor_new = True
+    # Two, differing values are set.
+    if len(attr_values) > 1:
+        # If we have more than one value for this field, choose based on the column priority
+        if ignore_merge_protection or priority == 'Favor New':
+            return value2
+        else:  # favor the existing field
+            return value1
 
-    for geocoding_col in geocoding_attr_cols:
-        existing_results_empty = existing_results_empty and can_attrs[geocoding_col][state1] is None
-        new_results_empty = new_results_empty and can_attrs[geocoding_col][state2] is None
+    # No values are set
+    elif len(attr_values) < 1:
+        return None
 
-        geocoding_favor_new = geocoding_favor_new and priorities.get(geocoding_col, 'Favor New') == 'Favor New'
+    # There is only one value set.
+    return attr_values.pop()
 
-        # Since these are handled here, remove them from canonical attributes
-        del can_attrs[geocoding_col]
+
+def _geocoding_state(state1, state2, geocoding_favor_new, ignore_merge_protection=False):
+    """Return the parent whose geocoding results are kept by the merge"""
+    existing_results_empty = all(getattr(state1, col, None) is None for col in GEOCODING_COLUMNS)
+    new_results_empty = all(getattr(state2, col, None) is None for col in GEOCODING_COLUMNS)
 
     # Multiple elif's here is necessary since empty checks should be first, followed by merge protection settings
     if new_results_empty:
-        geo_state = state1
+        return state1
     elif existing_results_empty:
-        geo_state = state2
+        return state2
     elif ignore_merge_protection:
-        geo_state = state2
+        return state2
     elif geocoding_favor_new:
-        geo_state = state2
+        return state2
     else:   # favor existing
-        geo_state = state1
+        return state1
+
+
+def _merge_geocoding_results(merged_state, state1, state2, priorities, can_attrs, ignore_merge_protection=False):
+    """
+    Geocoding results need to be handled separately since they should generally
+    "stick together". In one sense, all 4 result columns should be treated as
+    one column. Specifically, the complete geocoding results of either the new
+    state or the existing state is used - not a combination of the geocoding
+    results from each.
+
+    Note, to avoid unnecessary complications, it's intended for these fields to
+    be left out of the logic involving recognize_empty.
+    """
+    geocoding_favor_new = all(priorities.get(col, 'Favor New') == 'Favor New' for col in GEOCODING_COLUMNS)
+
+    # Since these are handled here, remove them from canonical attributes
+    for geocoding_col in GEOCODING_COLUMNS:
+        del can_attrs[geocoding_col]
 
-    for geo_attr in geocoding_attr_cols:
+    geo_state = _geocoding_state(state1, state2, geocoding_favor_new, ignore_merge_protection)
+    for geo_attr in GEOCODING_COLUMNS:
         setattr(merged_state, geo_attr, getattr(geo_state, geo_attr, None))
 
 
@@ -184,38 +239,16 @@ def merge_state(merged_state, state1, state2, priorities, ignore_merge_protectio
     ).values_list('column_name', flat=True)
 
     default = state2
-    state2_present_columns = None
-    if state2.import_file is not None and state2.import_file.cached_mapped_columns is not None:
-        # null has to be defined, not sure why, probably the eval?
-        null = None  # noqa F841
-        state2_present_columns = [column["to_field"] for column in eval(state2.import_file.cached_mapped_columns)]
+    state2_present_columns = _present_columns(state2)
     for attr in can_attrs:
-        recognize_empty = attr in recognize_empty_columns
-        attr_values = []
-        for value in list(can_attrs[attr].values()):
-            if value is None and recognize_empty:
-                if state2_present_columns is None or attr in state2_present_columns:
-                    attr_values.append(value)
-            elif value is not None or recognize_empty:
-                attr_values.append(value)
-
-        attr_value = None
-        # Two, differing values are set.
-        if len(attr_values) > 1:
-            # If we have more than one value for this field, choose based on the column priority
-            col_prior = priorities.get(attr, 'Favor New')
-            if ignore_merge_protection or col_prior == 'Favor New':
-                attr_value = can_attrs[attr][state2]
-            else:  # favor the existing field
-                attr_value = can_attrs[attr][state1]
-
-        # No values are set
-        elif len(attr_values) < 1:
-            attr_value = None
-
-        # There is only one value set.
-        else:
-            attr_value = attr_values.pop()
+        attr_value = _merge_value(
+            can_attrs[attr][state1],
+            can_attrs[attr][state2],
+            priorities.get(attr, 'Favor New'),
+            attr in recognize_empty_columns,
+            state2_present_columns is None or attr in state2_present_columns,
+            ignore_merge_protection
+        )
 
         if callable(attr):
             # This callable will be responsible for setting the attribute value, not just returning it.
@@ -243,3 +276,141 @@ def merge_state(merged_state, state1, state2, priorities, ignore_merge_protectio
         PropertyState.merge_relationships(merged_state, state1, state2)
 
     return merged_state
+
+
+def _carry_import_file(merged_state, states):
+    """
+    If the states were all just imported from the same import file, carry the
+    import_file_id into the merged state. Also merge the lot_number fields so that
+    pairing can work correctly on the resulting merged record.
+    """
+    if len({state.import_file_id for state in states}) != 1:
+        return
+
+    base_state = states[0]
+    if (base_state.data_state, base_state.merge_state) not in [
+        (DATA_STATE_MAPPING, MERGE_STATE_UNKNOWN),
+        (DATA_STATE_UNKNOWN, MERGE_STATE_MERGED),
+    ]:
+        return
+    if any((state.data_state, state.merge_state) != (DATA_STATE_MAPPING, MERGE_STATE_UNKNOWN) for state in states[1:]):
+        return
+
+    merged_state.import_file_id = base_state.import_file_id
+    if isinstance(merged_state, PropertyState):
+        joined_lots = set()
+        for state in states:
+            if state.lot_number:
+                joined_lots = joined_lots.union(state.lot_number.split(';'))
+        if joined_lots:
+            merged_state.lot_number = ';'.join(joined_lots)
+
+
+def merge_states_bulk(states, priorities, log_name='System Match', ignore_merge_protection=False, data_state=None):
+    """
+    Merge any number of states into a single new state in one pass. The result is
+    the same as merging the states pairwise in order with merge_state, but only the
+    final merged state and its audit log are saved.
+
+    :param states: list of at least two PropertyState/TaxLotState, ordered from least to most priority
+    :param priorities: dict, column names with favor new or existing
+    :param log_name: str, name of the audit log of the merge
+    :param data_state: int, optional, data state of the merged state
+    :return: the merged PropertyState/TaxLotState, saved
+    """
+    StateClass = type(states[0])
+    AuditLogClass = PropertyAuditLog if StateClass == PropertyState else TaxLotAuditLog
+    org_id = states[0].organization_id
+    merged_state = StateClass(organization_id=org_id)
+
+    # Geocoding results are kept together from a single parent
+    geocoding_favor_new = all(priorities.get(col, 'Favor New') == 'Favor New' for col in GEOCODING_COLUMNS)
+    geo_state = states[0]
+    for state in states[1:]:
+        geo_state = _geocoding_state(geo_state, state, geocoding_favor_new, ignore_merge_protection)
+    for geo_attr in GEOCODING_COLUMNS:
+        setattr(merged_state, geo_attr, getattr(geo_state, geo_attr, None))
+
+    recognize_empty_columns = set()
+    recognize_empty_ed_columns = set()
+    for column_name, is_extra_data in Column.objects.filter(
+        organization_id=org_id,
+        table_name=StateClass.__name__,
+        recognize_empty=True,
+    ).values_list('column_name', 'is_extra_data'):
+        if is_extra_data:
+            recognize_empty_ed_columns.add(column_name)
+        else:
+            recognize_empty_columns.add(column_name)
+
+    present_columns = {}
+    for state in states:
+        if state.import_file_id not in present_columns:
+            columns = _present_columns(state)
+            present_columns[state.import_file_id] = set(columns) if columns is not None else None
+    states_present_columns = [present_columns[state.import_file_id] for state in states]
+
+    for _, attr in get_state_to_state_tuple(StateClass.__name__):
+        if attr in GEOCODING_COLUMNS:
+            continue
+        if attr == 'import_file':
+            attr = 'import_file_id'
+
+        attr_value = getattr(states[0], attr)
+        for state, state_present_columns in zip(states[1:], states_present_columns[1:]):
+            attr_value = _merge_value(
+                attr_value,
+                getattr(state, attr),
+                priorities.get(attr, 'Favor New'),
+                attr in recognize_empty_columns,
+                state_present_columns is None or attr in state_present_columns,
+                ignore_merge_protection
+            )
+        setattr(merged_state, attr, attr_value)
+
+    extra_data = states[0].extra_data
+    for state, state_present_columns in zip(states[1:], states_present_columns[1:]):
+        extra_data = _merge_extra_data(
+            extra_data,
+            state.extra_data,
+            priorities['extra_data'],
+            recognize_empty_ed_columns,
+            ignore_merge_protection,
+            state_present_columns
+        )
+    merged_state.extra_data = extra_data
+
+    _carry_import_file(merged_state, states)
+    merged_state.merge_state = MERGE_STATE_MERGED
+    if data_state is not None:
+        merged_state.data_state = data_state
+    merged_state.save()
+
+    # merge measures, scenarios, simulations. Only the relationships of the state
+    # with the most priority are kept.
+    if isinstance(merged_state, PropertyState):
+        PropertyState.merge_relationships(merged_state, states[-2], states[-1])
+
+    # A single audit log references all the parents. parent1 and parent2 are the
+    # parents with the least and most priority.
+    parent_log_ids = {}
+    for state_id, log_id in AuditLogClass.objects.filter(
+        state__in=states
+    ).order_by('id').values_list('state_id', 'id'):
+        parent_log_ids.setdefault(state_id, log_id)
+
+    audit_log = AuditLogClass.objects.create(
+        organization_id=org_id,
+        parent1_id=parent_log_ids.get(states[0].id),
+        parent2_id=parent_log_ids.get(states[-1].id),
+        parent_state1=states[0],
+        parent_state2=states[-1],
+        state=merged_state,
+        name=log_name,
+        description='Automatic Merge',
+        import_filename=None,
+        record_type=AUDIT_IMPORT
+    )
+    audit_log.parent_states.add(*states)
+
+    return merged_state
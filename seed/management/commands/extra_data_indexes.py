@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seed.models import Column, ExtraDataUsage
+from seed.utils.extra_data_indexes import (
+    STATE_CLASSES,
+    ExtraDataIndexException,
+    create_expression_index,
+    create_gin_index,
+    create_suggested_indexes,
+    drop_index,
+    drop_unused_indexes,
+    expression_index_name,
+    list_indexes,
+    suggested_columns
+)
+
+
+class Command(BaseCommand):
+    help = ('Lists, creates and drops the expression and GIN indexes on the extra data of the '
+            'property and tax lot states of an organization. Without --column_id, "create" '
+            'indexes the extra data columns the organization filters and sorts on the most.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action',
+                            choices=['list', 'usage', 'create', 'gin', 'drop'],
+                            help='list: existing indexes, usage: filter and sort counts with the suggested '
+                                 'columns, create: expression indexes, gin: GIN index, drop: indexes')
+
+        parser.add_argument('--org_id',
+                            type=int,
+                            help='Organization of the indexes',
+                            dest='org_id')
+
+        parser.add_argument('--column_id',
+                            type=int,
+                            help='Extra data column to index (create)',
+                            dest='column_id')
+
+        parser.add_argument('--min_uses',
+                            default=10,
+                            type=int,
+                            help='Minimum number of filters and sorts for a column to be indexed (create)',
+                            dest='min_uses')
+
+        parser.add_argument('--limit',
+                            type=int,
+                            help='Maximum number of indexes to create (create)',
+                            dest='limit')
+
+        parser.add_argument('--table_name',
+                            default='PropertyState',
+                            choices=list(STATE_CLASSES.keys()),
+                            help='State table of the GIN index (gin)',
+                            dest='table_name')
+
+        parser.add_argument('--name',
+                            help='Name of the index to drop, by default the indexes of columns which are '
+                                 'no longer indexable are dropped (drop)',
+                            dest='name')
+
+    def handle(self, *args, **options):
+        action = options['action']
+        org_id = options['org_id']
+        if org_id is None and action not in ['list', 'drop']:
+            raise CommandError(f'--org_id is required to {action} indexes')
+
+        try:
+            getattr(self, f'_{action}')(org_id, options)
+        except ExtraDataIndexException as e:
+            raise CommandError(str(e))
+
+    def _list(self, org_id, options):
+        for index in list_indexes(org_id):
+            self.stdout.write(f"{index['name']}: {index['definition']}")
+
+    def _usage(self, org_id, options):
+        ExtraDataUsage.flush(org_id)
+        usages = ExtraDataUsage.objects.filter(column__organization_id=org_id).select_related('column') \
+            .order_by('-filter_count', '-sort_count')
+        for usage in usages:
+            self.stdout.write(
+                f'{usage.column.table_name}.{usage.column.column_name} ({usage.column_id}): '
+                f'{usage.filter_count} filters, {usage.sort_count} sorts, last used {usage.last_used}'
+            )
+        suggested = suggested_columns(org_id, options['min_uses'])
+        self.stdout.write(f'Suggested columns: {", ".join(c.column_name for c in suggested) or "none"}')
+
+    def _create(self, org_id, options):
+        if options['column_id'] is not None:
+            try:
+                column = Column.objects.get(id=options['column_id'], organization_id=org_id)
+            except Column.DoesNotExist:
+                raise CommandError(f"Column {options['column_id']} does not exist in organization {org_id}")
+            created, errors = [create_expression_index(column)], []
+        else:
+            created, errors = create_suggested_indexes(org_id, options['min_uses'], options['limit'])
+
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        for error in errors:
+            self.stderr.write(error)
+
+    def _gin(self, org_id, options):
+        self.stdout.write(f"Created {create_gin_index(org_id, options['table_name'])}")
+
+    def _drop(self, org_id, options):
+        if options['name']:
+            drop_index(options['name'])
+            self.stdout.write(f"Dropped {options['name']}")
+        elif options['column_id'] is not None:
+            column = Column.objects.filter(id=options['column_id']).first()
+            if column is None:
+                raise CommandError(f"Column {options['column_id']} does not exist")
+            drop_index(expression_index_name(column))
+            self.stdout.write(f'Dropped {expression_index_name(column)}')
+        elif org_id is not None:
+            for name in drop_unused_indexes(org_id):
+                self.stdout.write(f'Dropped {name}')
+        else:
+            raise CommandError('One of --name, --column_id or --org_id is required to drop indexes')
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from seed.utils.meter_aggregates import aggregate_exists, refresh_aggregates
+
+
+class Command(BaseCommand):
+    help = ('Refreshes the continuous aggregates of the meter readings, e.g., after it is created '
+            'or after readings are changed outside of the meter imports.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start',
+                            help='Earliest start time of the readings to refresh (ISO 8601), defaults to the first reading',
+                            dest='start')
+
+        parser.add_argument('--end',
+                            help='Latest start time of the readings to refresh (ISO 8601), defaults to the last reading',
+                            dest='end')
+
+    def handle(self, *args, **options):
+        if not aggregate_exists():
+            raise CommandError('The meter reading aggregates do not exist, they require TimescaleDB 2.9')
+
+        start, end = [
+            self._parse(options[name]) if options[name] else None
+            for name in ['start', 'end']
+        ]
+        refresh_aggregates(start, end)
+        self.stdout.write('Refreshed the meter reading aggregates')
+
+    def _parse(self, value):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f'Invalid date time "{value}"')
+        return parsed
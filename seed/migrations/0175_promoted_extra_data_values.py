@@ -0,0 +1,51 @@
+# Generated by Django 3.2.14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0174_fix_ghg_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='column',
+            name='is_promoted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PromotedExtraDataValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value_number', models.FloatField(blank=True, null=True)),
+                ('value_datetime', models.DateTimeField(blank=True, null=True)),
+                ('value_boolean', models.BooleanField(blank=True, null=True)),
+                ('column', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promoted_values', to='seed.column')),
+                ('property_state', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promoted_values', to='seed.propertystate')),
+                ('taxlot_state', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promoted_values', to='seed.taxlotstate')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='promotedextradatavalue',
+            index=models.Index(fields=['column', 'value_number'], name='seed_promoted_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotedextradatavalue',
+            index=models.Index(fields=['column', 'value_datetime'], name='seed_promoted_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotedextradatavalue',
+            index=models.Index(fields=['column', 'value_boolean'], name='seed_promoted_boolean_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='promotedextradatavalue',
+            constraint=models.UniqueConstraint(fields=('column', 'property_state'), name='unique_promoted_property_state'),
+        ),
+        migrations.AddConstraint(
+            model_name='promotedextradatavalue',
+            constraint=models.UniqueConstraint(fields=('column', 'taxlot_state'), name='unique_promoted_taxlot_state'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0175_promoted_extra_data_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtraDataUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_count', models.IntegerField(default=0)),
+                ('sort_count', models.IntegerField(default=0)),
+                ('last_used', models.DateTimeField(blank=True, null=True)),
+                ('column', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='seed.column')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0176_extra_data_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyauditlog',
+            name='parent_states',
+            field=models.ManyToManyField(blank=True, related_name='propertyauditlog_parent_states', to='seed.PropertyState'),
+        ),
+        migrations.AddField(
+            model_name='taxlotauditlog',
+            name='parent_states',
+            field=models.ManyToManyField(blank=True, related_name='taxlotauditlog_parent_states', to='seed.TaxLotState'),
+        ),
+    ]
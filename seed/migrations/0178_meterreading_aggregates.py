@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import migrations
+
+# the days and months are the local days and months of the time zone of SEED
+CREATE_DAILY_AGGREGATE_SQL = """
+CREATE MATERIALIZED VIEW seed_meterreading_daily
+WITH (timescaledb.continuous) AS
+SELECT meter_id,
+    time_bucket(INTERVAL '1 day', start_time, %(time_zone)s) AS day,
+    SUM(reading) AS reading,
+    COUNT(*) AS readings,
+    MAX(end_time) AS end_time
+FROM seed_meterreading
+WHERE end_time > start_time AND reading IS NOT NULL
+GROUP BY meter_id, day
+WITH NO DATA
+"""
+
+CREATE_MONTHLY_AGGREGATE_SQL = """
+CREATE MATERIALIZED VIEW seed_meterreading_monthly
+WITH (timescaledb.continuous) AS
+SELECT meter_id,
+    time_bucket(INTERVAL '1 month', day, %(time_zone)s) AS month,
+    SUM(reading) AS reading,
+    SUM(readings) AS readings,
+    MAX(end_time) AS end_time
+FROM seed_meterreading_daily
+GROUP BY meter_id, month
+WITH NO DATA
+"""
+
+
+def _timescaledb_version(cursor):
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'timescaledb'")
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return tuple(int(part) for part in row[0].split('-')[0].split('.'))
+
+
+def create_aggregates(apps, schema_editor):
+    # continuous aggregates on continuous aggregates require TimescaleDB 2.9
+    with schema_editor.connection.cursor() as cursor:
+        version = _timescaledb_version(cursor)
+        if version is None or version < (2, 9):
+            return
+        cursor.execute(CREATE_DAILY_AGGREGATE_SQL, {'time_zone': settings.TIME_ZONE})
+        cursor.execute(CREATE_MONTHLY_AGGREGATE_SQL, {'time_zone': settings.TIME_ZONE})
+        # materialize the existing readings, the imports only refresh the range of their readings
+        for name in ['seed_meterreading_daily', 'seed_meterreading_monthly']:
+            cursor.execute('CALL refresh_continuous_aggregate(%s::regclass, NULL, NULL)', [name])
+
+
+def drop_aggregates(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP MATERIALIZED VIEW IF EXISTS seed_meterreading_monthly')
+        cursor.execute('DROP MATERIALIZED VIEW IF EXISTS seed_meterreading_daily')
+
+
+class Migration(migrations.Migration):
+    # continuous aggregates cannot be created within a transaction
+    atomic = False
+
+    dependencies = [
+        ('seed', '0177_auditlog_parent_states'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_aggregates, drop_aggregates),
+    ]
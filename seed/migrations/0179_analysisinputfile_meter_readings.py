@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0178_meterreading_aggregates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisinputfile',
+            name='content_type',
+            field=models.IntegerField(choices=[(1, 'BuildingSync'), (2, 'Meter Readings')]),
+        ),
+    ]
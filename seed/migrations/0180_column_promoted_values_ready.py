@@ -0,0 +1,25 @@
+# Generated by Django 3.2.14
+
+from django.db import migrations, models
+
+
+def set_promoted_values_ready(apps, schema_editor):
+    # the values of the columns promoted so far were filled by the task which promoted them
+    Column = apps.get_model('seed', 'Column')
+    Column.objects.filter(is_promoted=True).update(promoted_values_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0179_analysisinputfile_meter_readings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='column',
+            name='promoted_values_ready',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(set_promoted_values_ready, migrations.RunPython.noop),
+    ]
@@ -17,6 +17,8 @@ from .tax_lot_properties import *  # noqa
 from .properties import *  # noqa
 from .tax_lots import *  # noqa
 from .columns import *  # noqa
+from .promoted_columns import *  # noqa
+from .extra_data_usage import *  # noqa
 from .column_mappings import *  # noqa
 from .column_mapping_profiles import *  # noqa
 from .column_list_profiles import *  # noqa
@@ -30,9 +30,11 @@ class AnalysisInputFile(models.Model):
     CSV containing data collected from each property.
     """
     BUILDINGSYNC = 1
+    METER_READINGS = 2
 
     CONTENT_TYPES = (
         (BUILDINGSYNC, 'BuildingSync'),
+        (METER_READINGS, 'Meter Readings'),
     )
 
     file = models.FileField(upload_to=analysis_input_path, max_length=500)
@@ -26,6 +26,7 @@ from seed.models import (
     PropertyState,
     Scenario
 )
+from seed.utils.meter_aggregates import readings_time_range, refresh_aggregates
 
 _log = logging.getLogger(__name__)
 
@@ -220,6 +221,7 @@ class BuildingFile(models.Model):
         }
         # add in scenarios
         linked_meters = []
+        saved_readings = []
         for s in data.get('scenarios', []):
             # If the scenario does not have a name then log a warning and continue
             if not s.get('name'):
@@ -343,6 +345,11 @@ class BuildingFile(models.Model):
                     for mr in valid_readings
                 }
                 MeterReading.objects.bulk_create(valid_reading_models)
+                saved_readings.extend(valid_reading_models)
+
+        readings_range = readings_time_range(saved_readings)
+        if readings_range is not None:
+            refresh_aggregates(*readings_range)
 
         # merge or create the property state's view
         if property_view:
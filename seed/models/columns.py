@@ -9,19 +9,27 @@ import copy
 import csv
 import logging
 import os.path
+import threading
 from collections import OrderedDict
 from typing import Literal, Optional
+from uuid import uuid4
 
 from django.apps import apps
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError, models, transaction
 from django.db.models import Q
-from django.db.models.signals import pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save
+)
 from django.utils.translation import gettext_lazy as _
 
 from seed.lib.superperms.orgs.models import Organization as SuperOrganization
 from seed.models.column_mappings import ColumnMapping
 from seed.models.models import Unit
+from seed.utils.cache import get_cache_raw, set_cache_raw
 
 INVENTORY_DISPLAY = {
     'PropertyState': 'Property',
@@ -31,6 +39,78 @@ INVENTORY_DISPLAY = {
 }
 _log = logging.getLogger(__name__)
 
+# Seconds that the results of Column.retrieve_all are kept in the shared cache
+COLUMN_CACHE_TIMEOUT = 86400
+
+
+class ColumnCache:
+    """Thread safe, least recently used cache of the results of Column.retrieve_all
+    in the memory of the process, keyed by the shared cache key of the results"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._columns: OrderedDict[str, list[dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[list[dict]]:
+        with self._lock:
+            columns = self._columns.get(key)
+            if columns is not None:
+                self._columns.move_to_end(key)
+            return columns
+
+    def set(self, key: str, columns: list[dict]) -> None:
+        with self._lock:
+            self._columns[key] = columns
+            self._columns.move_to_end(key)
+            while len(self._columns) > self.maxsize:
+                self._columns.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._columns.clear()
+
+
+def _column_cache_version_key(org_id):
+    return f'column_cache_version__{org_id}'
+
+
+def column_cache_version(org_id):
+    """Return the version of the columns of an organization, which changes every time
+    a column, column mapping or derived column of the organization changes
+
+    :param org_id: int, organization id
+    :return: str
+    """
+    key = _column_cache_version_key(org_id)
+    version = get_cache_raw(key)
+    if version is None:
+        version = uuid4().hex
+        set_cache_raw(key, version, None)
+    return version
+
+
+def invalidate_column_cache(org_id):
+    """Change the version of the columns of an organization so that Column.retrieve_all
+    does not return the cached columns. Call this after changing columns without saving
+    or deleting the models (e.g., QuerySet.update).
+
+    The version is changed right away for the current transaction, and once more when the
+    transaction is committed, since other processes could have cached the columns as they
+    were before the commit in the meantime.
+
+    :param org_id: int, organization id
+    :return: None
+    """
+    if org_id is None:
+        return
+
+    def _change_version():
+        set_cache_raw(_column_cache_version_key(org_id), uuid4().hex, None)
+
+    _change_version()
+    transaction.on_commit(_change_version)
+
 
 class Column(models.Model):
     """The name of a column for a given organization."""
@@ -644,6 +724,12 @@ class Column(models.Model):
             'data_type': 'string',
         }
     ]
+
+    # maximum number of results of retrieve_all kept in the memory of the process
+    COLUMN_CACHE_SIZE = 32
+
+    _cache = ColumnCache(COLUMN_CACHE_SIZE)
+
     organization = models.ForeignKey(SuperOrganization, on_delete=models.CASCADE, blank=True, null=True)
     column_name = models.CharField(max_length=512, db_index=True)
     # name of the table which the column name applies, if the column name
@@ -679,6 +765,13 @@ class Column(models.Model):
     comstock_mapping = models.CharField(max_length=64, null=True, blank=True, default=None)
     derived_column = models.OneToOneField('DerivedColumn', on_delete=models.CASCADE, null=True, blank=True)
 
+    # Promoted extra_data columns keep a typed and indexed copy of their values in
+    # PromotedExtraDataValue which is used when filtering and sorting the inventory
+    is_promoted = models.BooleanField(default=False)
+    # The promoted values are filled by a task once the column is promoted or its data type
+    # changes, so filters and sorts cast extra_data until the task is done
+    promoted_values_ready = models.BooleanField(default=False)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['organization', 'comstock_mapping'], name='unique_comstock_mapping'),
@@ -688,6 +781,15 @@ class Column(models.Model):
         return '{} - {}:{}'.format(self.pk, self.table_name, self.column_name)
 
     def clean(self):
+        if self.is_promoted:
+            from seed.models.promoted_columns import PromotedExtraDataValue
+
+            if not self.is_extra_data:
+                raise ValidationError({'is_promoted': _('Only extra data columns can be promoted.')})
+            if PromotedExtraDataValue.value_field(self.data_type) is None:
+                raise ValidationError({'is_promoted': _(
+                    'Columns with data type \'%s\' cannot be promoted.') % self.data_type})
+
         if self.derived_column:
             return
         # Don't allow Columns that are not extra_data and not a field in the database
@@ -1334,7 +1436,7 @@ class Column(models.Model):
                 continue
 
             # Eventually move this over to Column serializer directly
-            new_c = ColumnSerializer(c).data
+            new_c = dict(ColumnSerializer(c).data)
 
             if inventory_type:
                 related = not (inventory_type.lower() in new_c['table_name'].lower())
@@ -1386,25 +1488,49 @@ class Column(models.Model):
         database assigned to the organization. It will then go through and cleanup the names to ensure that
         there are no duplicates. The name column is used for uniquely labeling the columns for UI Grid purposes.
 
+        The columns are cached in the memory of the process and in the shared cache until a column,
+        column mapping or derived column of the organization changes (see column_cache_version).
+
         :param org_id: Organization ID
         :param inventory_type: Inventory Type (property|taxlot) from the requester. This sets the related columns if requested.
         :param only_used: View only the used columns that exist in the Column's table
         :param include_related: Include related columns (e.g., if inventory type is Property, include Taxlot columns)
         """
+        org_id = getattr(org_id, 'pk', org_id)
+        key = f'column_cache__{org_id}__{column_cache_version(org_id)}__{inventory_type}__{only_used}__{include_related}'
+
+        columns = Column._cache.get(key)
+        if columns is None:
+            columns = get_cache_raw(key)
+            if columns is None:
+                columns = Column._retrieve_all(org_id, inventory_type, only_used, include_related)
+                set_cache_raw(key, columns, COLUMN_CACHE_TIMEOUT)
+            Column._cache.set(key, columns)
+
+        # the callers can change the columns they get without changing the cached columns
+        return [dict(column) for column in columns]
+
+    @staticmethod
+    def _retrieve_all(org_id, inventory_type, only_used, include_related):
         from seed.serializers.columns import ColumnSerializer
 
         # Grab all the columns out of the database for the organization that are assigned to a
         # table_name. Order extra_data last so that extra data duplicate-checking will happen after
         # processing standard columns
         columns_db = Column.objects.filter(organization_id=org_id).exclude(table_name='').exclude(
-            table_name=None).order_by('is_extra_data', 'column_name')
+            table_name=None).select_related('unit').order_by('is_extra_data', 'column_name')
+        if only_used:
+            used_column_ids = set(
+                ColumnMapping.column_mapped.through.objects.filter(column__organization_id=org_id)
+                .values_list('column_id', flat=True)
+            )
         columns = []
         for c in columns_db:
             if c.column_name in Column.EXCLUDED_COLUMN_RETURN_FIELDS:
                 continue
 
             # Eventually move this over to Column serializer directly
-            new_c = ColumnSerializer(c).data
+            new_c = dict(ColumnSerializer(c).data)
 
             new_c['sharedFieldType'] = new_c['shared_field_type']
             del new_c['shared_field_type']
@@ -1437,7 +1563,7 @@ class Column(models.Model):
             include_column = True
             if only_used:
                 # only add the column if it is in a ColumnMapping object
-                include_column = include_column and ColumnMapping.objects.filter(column_mapped=c).exists()
+                include_column = include_column and c.id in used_column_ids
             if not include_related:
                 # only add the column if it is not a related column
                 is_not_related = not new_c['related']
@@ -1541,3 +1667,33 @@ def validate_model(sender, **kwargs):
 
 
 pre_save.connect(validate_model, sender=Column)
+
+
+def invalidate_column_cache_of_column(sender, instance, **kwargs):
+    invalidate_column_cache(instance.organization_id)
+
+
+def invalidate_column_cache_of_column_mapping(sender, instance, **kwargs):
+    invalidate_column_cache(instance.super_organization_id)
+
+
+def invalidate_column_cache_of_mapped_columns(sender, instance, action, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if not isinstance(instance, ColumnMapping):
+        invalidate_column_cache(instance.organization_id)
+    elif instance.super_organization_id is not None or not pk_set:
+        invalidate_column_cache(instance.super_organization_id)
+    else:
+        # the mapping is not assigned to an organization, use the ones of the columns
+        org_ids = Column.objects.filter(pk__in=pk_set).values_list('organization_id', flat=True).distinct()
+        for org_id in org_ids:
+            invalidate_column_cache(org_id)
+
+
+post_save.connect(invalidate_column_cache_of_column, sender=Column)
+post_delete.connect(invalidate_column_cache_of_column, sender=Column)
+post_save.connect(invalidate_column_cache_of_column_mapping, sender=ColumnMapping)
+post_delete.connect(invalidate_column_cache_of_column_mapping, sender=ColumnMapping)
+m2m_changed.connect(invalidate_column_cache_of_mapped_columns, sender=ColumnMapping.column_mapped.through)
+m2m_changed.connect(invalidate_column_cache_of_mapped_columns, sender=ColumnMapping.column_raw.through)
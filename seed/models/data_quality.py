@@ -4,19 +4,23 @@
 :copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
 :author
 """
+import heapq
 import json
 import logging
 import re
 from builtins import str
+from collections import defaultdict
 from datetime import date, datetime
 from random import randint
 
 import pytz
 from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
 from django.db import IntegrityError, models
+from django.db.models import Q
 from django.utils.timezone import get_current_timezone, make_aware, make_naive
 from past.builtins import basestring
-from pint.errors import DimensionalityError
+from pint.errors import DimensionalityError, UndefinedUnitError
 from quantityfield.units import ureg
 
 from seed.lib.superperms.orgs.models import Organization
@@ -29,7 +33,12 @@ from seed.models import (
     obj_to_dict
 )
 from seed.serializers.pint import pretty_units
-from seed.utils.cache import get_cache_raw, set_cache_raw
+from seed.utils.cache import (
+    delete_cache_many,
+    get_cache_many,
+    get_cache_raw,
+    set_cache_raw
+)
 from seed.utils.time import convert_datestr
 
 _log = logging.getLogger(__name__)
@@ -81,6 +90,28 @@ def format_pint_violation(rule, source_value):
     return formatted_value, formatted_min, formatted_max
 
 
+def _view_labels(record_type):
+    """
+    :param record_type: one of PropertyState | TaxLotState
+    :return: tuple, (view class, labels through class of the view, name of the view field of the labels)
+    """
+    if record_type == 'PropertyState':
+        return PropertyView, apps.get_model('seed', 'PropertyView_labels'), 'propertyview'
+    return TaxLotView, apps.get_model('seed', 'TaxLotView_labels'), 'taxlotview'
+
+
+def _results_with_severity(results, severity):
+    """
+    :param results: iterable of the cached results of the data quality checks
+    :param severity: str, severity of the results to keep
+    :return: iterator of the results which have at least one check with the severity
+    """
+    for result in results:
+        checks = [check for check in result['data_quality_results'] if check['severity'] == severity]
+        if checks:
+            yield dict(result, data_quality_results=checks)
+
+
 class Rule(models.Model):
     """
     Rules for DataQualityCheck
@@ -491,6 +522,93 @@ class Rule(models.Model):
         else:
             return value
 
+    def sql_predicate(self, state_class):
+        """
+        Compile the rule into a predicate selecting the states which may not pass the rule,
+        or, for a range rule with a valid severity, the states which are in range. Only the
+        rules on database fields are compiled. The values of the states are typed, so the
+        predicates select the same states as checking each one in Python.
+
+        :param state_class: PropertyState or TaxLotState
+        :return: Q, or None if the rule can only be checked in Python
+        """
+        if self.for_derived_column:
+            return None
+        try:
+            field = state_class._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.is_relation:
+            return None
+
+        is_null = Q(**{f'{self.field}__isnull': True})
+        if isinstance(field, (models.CharField, models.TextField)):
+            is_null |= Q(**{self.field: ''})
+
+        if self.condition in [Rule.RULE_REQUIRED, Rule.RULE_NOT_NULL]:
+            return is_null
+        elif self.condition in [Rule.RULE_INCLUDE, Rule.RULE_EXCLUDE]:
+            # the text is matched in Python
+            return ~is_null
+        elif self.condition == Rule.RULE_RANGE:
+            return self._range_predicate(field)
+        # the other conditions are never violated
+        return Q(pk__in=[])
+
+    def _range_predicate(self, field):
+        try:
+            rule_min, rule_max = self._typed_bound(field, self.min), self._typed_bound(field, self.max)
+        except (ValueError, DimensionalityError, UndefinedUnitError):
+            # the errors are reported by checking the states in Python
+            return None
+
+        if self.severity == Rule.SEVERITY_VALID:
+            predicate = Q(**{f'{self.field}__isnull': False})
+            if rule_min is not None:
+                predicate &= Q(**{f'{self.field}__gte': rule_min})
+            if rule_max is not None:
+                predicate &= Q(**{f'{self.field}__lte': rule_max})
+            return predicate
+
+        predicate = Q(pk__in=[])
+        if rule_min is not None:
+            predicate |= Q(**{f'{self.field}__lt': rule_min})
+        if rule_max is not None:
+            predicate |= Q(**{f'{self.field}__gt': rule_max})
+        return predicate
+
+    def _typed_bound(self, field, bound):
+        """
+        Convert a minimum or maximum into the type of the database field, the same way as
+        minimum_valid and maximum_valid convert them for the values of the field.
+
+        :param field: model field of the states
+        :param bound: float, min or max of the rule
+        :return: typed bound or None
+        """
+        if bound is None:
+            return None
+
+        if hasattr(field, 'base_units'):
+            # QuantityField, stored in its base units. Without units in the rule, only the
+            # magnitude is compared
+            if self.units == '':
+                return ureg.Quantity(bound, field.base_units)
+            rule_units = ureg(self.units)
+            if rule_units.dimensionality != ureg(field.base_units).dimensionality:
+                raise DimensionalityError(rule_units, field.base_units)
+            return (bound * rule_units).to(field.base_units)
+        elif isinstance(field, models.DateTimeField):
+            # values are compared in the current time zone
+            return make_aware(datetime.strptime(str(int(bound)), '%Y%m%d'), get_current_timezone())
+        elif isinstance(field, models.DateField):
+            return datetime.strptime(str(int(bound)), '%Y%m%d').date()
+        elif isinstance(field, models.IntegerField):
+            return int(bound)
+        elif isinstance(field, (models.FloatField, models.DecimalField)):
+            return bound
+        raise ValueError(f'{self.field} is not a number or a date')
+
     def format_strings(self, value):
         f_min = self.min
         f_max = self.max
@@ -542,6 +660,9 @@ class DataQualityCheck(models.Model):
         'TaxLotState': ['address_line_1', 'custom_id_1', 'jurisdiction_tax_lot_id'],
     }
 
+    # results are kept in the cache for 24 hours
+    CACHE_TIMEOUT = 86400
+
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
     name = models.CharField(max_length=255, default='Default Data Quality Check')
 
@@ -598,15 +719,39 @@ class DataQualityCheck(models.Model):
         to be stored for the data quality checks, the identifier, is the random number (or specified
         value that is used to identifier both the progress and the data storage
 
+        Each chunk of the checks stores its results under its own key (see save_to_cache) so that
+        chunks running in parallel never overwrite each other. The cache_key stores the number of
+        chunks, and the results of a previous run with the same identifier are removed.
+
         :param identifier: Identifier for cache, if None, then creates a random one
         :return: list, [cache_key and the identifier]
         """
         if identifier is None:
             identifier = randint(100, 100000)
         cache_key = DataQualityCheck.cache_key(identifier, organization_id)
-        set_cache_raw(cache_key, [])
+        previous = get_cache_raw(cache_key)
+        if isinstance(previous, dict):
+            delete_cache_many([
+                DataQualityCheck.chunk_cache_key(cache_key, chunk) for chunk in range(previous['chunks'])
+            ])
+        set_cache_raw(cache_key, {'chunks': 0}, DataQualityCheck.CACHE_TIMEOUT)
         return cache_key, identifier
 
+    @staticmethod
+    def set_cache_chunks(identifier, organization_id, chunks):
+        """
+        Store the number of chunks whose results make up the results of the data quality checks.
+
+        :param identifier: Identifier for cache
+        :param chunks: int, number of chunks
+        :return: None
+        """
+        set_cache_raw(
+            DataQualityCheck.cache_key(identifier, organization_id),
+            {'chunks': chunks},
+            DataQualityCheck.CACHE_TIMEOUT
+        )
+
     @staticmethod
     def cache_key(identifier, organization_id):
         """
@@ -617,15 +762,224 @@ class DataQualityCheck(models.Model):
         """
         return f"data_quality_results__{organization_id}__{identifier}"
 
+    @staticmethod
+    def chunk_cache_key(cache_key, chunk):
+        """
+        Return the location of the results of a chunk of the data quality checks.
+
+        :param cache_key: str, location of the data_quality results
+        :param chunk: int, index of the chunk
+        :return: str
+        """
+        return f"{cache_key}__{chunk}"
+
+    @staticmethod
+    def retrieve_results(identifier, organization_id, severity=None):
+        """
+        Retrieve the results of the data quality checks from the cache. The results of
+        the chunks are each sorted by id and are merged lazily.
+
+        :param identifier: Identifier for cache
+        :param severity: str, if present, only return the results with this severity
+        :return: iterator of dicts sorted by id, or None if there are no results
+        """
+        cache_key = DataQualityCheck.cache_key(identifier, organization_id)
+        stored = get_cache_raw(cache_key)
+        if stored is None:
+            return None
+
+        if isinstance(stored, list):
+            # results stored before the results were saved by chunk
+            chunk_results = [stored]
+        else:
+            chunk_results = get_cache_many([
+                DataQualityCheck.chunk_cache_key(cache_key, chunk) for chunk in range(stored['chunks'])
+            ]).values()
+
+        results = heapq.merge(*chunk_results, key=lambda k: k['id'])
+        if severity is not None:
+            results = _results_with_severity(results, severity)
+        return results
+
     def check_data(self, record_type, rows):
         """
         Send in data as a queryset from the Property/Taxlot ids.
 
+        The views of the rows and their labels are found once for all the rows, and the status
+        labels are added and removed in bulk after all the rows are checked.
+
         :param record_type: one of PropertyState | TaxLotState
         :param rows: rows of data to be checked for data quality
         :return: None
         """
 
+        derived_columns_by_name = self._load_columns(record_type)
+
+        # grab all the rules once, save query time
+        rules = list(
+            self.rules.filter(enabled=True, table_name=record_type).select_related('status_label')
+            .order_by('field', 'severity')
+        )
+
+        rows = list(rows)
+        view_labels = self._prefetch_view_labels(record_type, [row.id for row in rows])
+
+        # view ids to label, and view ids whose label is left as is, by status label id
+        labeled = defaultdict(set)
+        unchanged = defaultdict(set)
+
+        # Get the list of the field names that will show in every result
+        fields = self.get_fieldnames(record_type)
+        for row in rows:
+            self._initialize_result(row, fields)
+
+            # Run the checks
+            view_id, _ = view_labels.get(row.id, (None, None))
+            self._check(rules, row, derived_columns_by_name, view_id, labeled, unchanged)
+
+        self._prune_results()
+        self._apply_status_labels(record_type, rules, view_labels, labeled, unchanged)
+
+    def check_data_in_bulk(self, record_type, states):
+        """
+        Check all the states of a queryset with a few set based queries instead of checking
+        each row in Python. The rules on database fields (not null, required, range, include
+        and exclude) are compiled into SQL predicates, and only the states which do not pass
+        them are checked in Python to build the results. The rules which cannot be compiled
+        (e.g., extra data and derived columns) are checked in Python for every state. The
+        status labels are added and removed in bulk.
+
+        The results are the same as check_data.
+
+        :param record_type: one of PropertyState | TaxLotState
+        :param states: queryset of PropertyState or TaxLotState to check
+        :return: None
+        """
+        derived_columns_by_name = self._load_columns(record_type)
+        rules = list(
+            self.rules.filter(enabled=True, table_name=record_type).select_related('status_label')
+            .order_by('field', 'severity')
+        )
+
+        # ids of the states to check in Python for each compiled rule, and ids of the states
+        # labeled by each compiled range rule with a valid severity
+        flagged = {}
+        valid = {}
+        python_rules = []
+        for rule in rules:
+            predicate = None
+            if (rule.table_name, rule.field) in self.column_lookup:
+                predicate = rule.sql_predicate(states.model)
+
+            if predicate is None:
+                python_rules.append(rule)
+            elif rule.condition == Rule.RULE_RANGE and rule.severity == Rule.SEVERITY_VALID:
+                valid[rule.id] = set(states.filter(predicate).values_list('id', flat=True))
+            elif rule.condition in [Rule.RULE_INCLUDE, Rule.RULE_EXCLUDE]:
+                # regular expressions are evaluated in Python over the values of the column
+                flagged[rule.id] = {
+                    state_id for state_id, value in states.filter(predicate).values_list('id', rule.field)
+                    if not rule.valid_text(value)
+                }
+            else:
+                flagged[rule.id] = set(states.filter(predicate).values_list('id', flat=True))
+
+        rows = states
+        if not python_rules:
+            rows = states.filter(id__in=set().union(*flagged.values()))
+
+        view_labels = self._prefetch_view_labels(record_type, states)
+
+        # view ids to label, and view ids whose label is left as is, by status label id
+        labeled = defaultdict(set)
+        unchanged = defaultdict(set)
+        fields = self.get_fieldnames(record_type)
+        for row in rows.order_by('id').iterator():
+            self._initialize_result(row, fields)
+            row_rules = [
+                rule for rule in rules
+                if rule.id not in valid and (rule.id not in flagged or row.id in flagged[rule.id])
+            ]
+            view_id, _ = view_labels.get(row.id, (None, None))
+            self._check(row_rules, row, derived_columns_by_name, view_id, labeled, unchanged)
+
+        for rule in rules:
+            if rule.id in valid and rule.status_label_id is not None:
+                labeled[rule.status_label_id].update(
+                    view_labels[state_id][0] for state_id in valid[rule.id] if state_id in view_labels
+                )
+
+        self._prune_results()
+        self._apply_status_labels(record_type, rules, view_labels, labeled, unchanged)
+
+    def _prefetch_view_labels(self, record_type, states):
+        """
+        Find the views of the states and the labels of the views with two queries.
+
+        :param record_type: one of PropertyState | TaxLotState
+        :param states: list of state ids or queryset of the states
+        :return: dict{int: tuple(int, dict{int: int})}, by state id, the view id and the ids of
+            the label relations of the view by status label id
+        """
+        view_class, label_class, view_field = _view_labels(record_type)
+        view_ids = dict(view_class.objects.filter(state__in=states).values_list('state_id', 'id'))
+
+        labels_by_view = defaultdict(dict)
+        if view_ids:
+            view_labels = label_class.objects.filter(**{f'{view_field}_id__in': list(view_ids.values())})
+            for label_id, view_id, status_label_id in view_labels.values_list('id', f'{view_field}_id', 'statuslabel_id'):
+                labels_by_view[view_id][status_label_id] = label_id
+
+        return {state_id: (view_id, labels_by_view[view_id]) for state_id, view_id in view_ids.items()}
+
+    def _apply_status_labels(self, record_type, rules, view_labels, labeled, unchanged):
+        """
+        Add the status labels of the violations to the views and remove them from the other
+        views, with at most one insert and one delete.
+
+        :param record_type: one of PropertyState | TaxLotState
+        :param rules: list of the checked rules
+        :param view_labels: dict, views and labels by state id from _prefetch_view_labels
+        :param labeled: dict{int: set}, view ids to label by status label id
+        :param unchanged: dict{int: set}, view ids whose label is left as is by status label id
+        :return: None
+        """
+        _, label_class, view_field = _view_labels(record_type)
+
+        new_labels = []
+        removed_label_ids = []
+        status_labels = {rule.status_label_id: rule.status_label for rule in rules if rule.status_label_id}
+        for status_label_id, status_label in status_labels.items():
+            if labeled[status_label_id] and status_label.super_organization_id != self.organization_id:
+                raise IntegrityError(
+                    'Label with super_organization_id={} cannot be applied to a record with parent '
+                    'organization_id={}.'.format(
+                        status_label.super_organization_id,
+                        self.organization_id
+                    )
+                )
+
+            for view_id, labels in view_labels.values():
+                if view_id in labeled[status_label_id]:
+                    if status_label_id not in labels:
+                        new_labels.append(
+                            label_class(**{f'{view_field}_id': view_id, 'statuslabel_id': status_label_id})
+                        )
+                elif status_label_id in labels and view_id not in unchanged[status_label_id]:
+                    removed_label_ids.append(labels[status_label_id])
+
+        if new_labels:
+            label_class.objects.bulk_create(new_labels, ignore_conflicts=True)
+        if removed_label_ids:
+            label_class.objects.filter(id__in=removed_label_ids).delete()
+
+    def _load_columns(self, record_type):
+        """
+        Load the display names of the columns into column_lookup
+
+        :param record_type: one of PropertyState | TaxLotState
+        :return: dict{str: DerivedColumn}, derived columns by name
+        """
         # grab the columns so we can grab the display names, create lookup tuple for display name
         for c in Column.retrieve_all(self.organization, record_type, False):
             self.column_lookup[(c['table_name'], c['column_name'])] = c['display_name']
@@ -644,24 +998,18 @@ class DataQualityCheck(models.Model):
         for derived_column_name in derived_columns_by_name.keys():
             self.column_lookup[(record_type, derived_column_name)] = derived_column_name
 
-        # grab all the rules once, save query time
-        rules = self.rules.filter(enabled=True, table_name=record_type).order_by('field',
-                                                                                 'severity')
+        return derived_columns_by_name
 
-        # Get the list of the field names that will show in every result
-        fields = self.get_fieldnames(record_type)
-        for row in rows:
-            # Initialize the ID if it does not exist yet. Add in the other
-            # fields that are of interest to the GUI
-            if row.id not in self.results:
-                self.results[row.id] = {}
-                for field in fields:
-                    self.results[row.id][field] = getattr(row, field)
-                self.results[row.id]['data_quality_results'] = []
-
-            # Run the checks
-            self._check(rules, row, derived_columns_by_name)
+    def _initialize_result(self, row, fields):
+        # Initialize the ID if it does not exist yet. Add in the other
+        # fields that are of interest to the GUI
+        if row.id not in self.results:
+            self.results[row.id] = {}
+            for field in fields:
+                self.results[row.id][field] = getattr(row, field)
+            self.results[row.id]['data_quality_results'] = []
 
+    def _prune_results(self):
         # Prune the results will remove any entries that have zero data_quality_results
         for k, v in self.results.copy().items():
             if not v['data_quality_results']:
@@ -676,158 +1024,163 @@ class DataQualityCheck(models.Model):
     def reset_results(self):
         self.results = {}
 
-    def _check(self, rules, row, derived_columns_by_name):
+    def _check(self, rules, row, derived_columns_by_name, view_id, labeled, unchanged):
         """
         Check for errors in the min/max of the values.
 
         :param rules: list, rules to run from database objects
         :param row: PropertyState or TaxLotState, row of data to check
         :param derived_columns_by_name: dict{str: DerivedColumn}
+        :param view_id: int, id of the view of the row, None if the row has no view
+        :param labeled: dict{int: set}, view ids to label by status label id, updated in place
+        :param unchanged: dict{int: set}, view ids whose label is left as is by status label id,
+            updated in place
         :return: None
         """
-        # check if the row has any rules applied to it
-        model_labels = {'linked_id': None, 'label_ids': []}
-        if row.__class__.__name__ == 'PropertyState':
-            label = apps.get_model('seed', 'PropertyView_labels')
-            if PropertyView.objects.filter(state=row).exists():
-                model_labels['linked_id'] = PropertyView.objects.get(state=row).id
-                model_labels['label_ids'] = list(
-                    label.objects.filter(propertyview_id=model_labels['linked_id']).values_list(
-                        'statuslabel_id', flat=True)
-                )
-                # _log.debug("Property {} has {} labels".format(model_labels['linked_id'],
-                #                                               len(model_labels['label_ids'])))
-        elif row.__class__.__name__ == 'TaxLotState':
-            label = apps.get_model('seed', 'TaxLotView_labels')
-            if TaxLotView.objects.filter(state=row).exists():
-                model_labels['linked_id'] = TaxLotView.objects.get(state=row).id
-                model_labels['label_ids'] = list(
-                    label.objects.filter(taxlotview_id=model_labels['linked_id']).values_list(
-                        'statuslabel_id', flat=True)
-                )
-                # _log.debug("TaxLot {} has {} labels".format(model_labels['linked_id'],
-                #                                             len(model_labels['label_ids'])))
+        results = self.results[row.id]['data_quality_results']
 
         for rule in rules:
-            value = None
+            label_results = self._check_rule(rule, row, derived_columns_by_name)
+            if rule.status_label_id is None or view_id is None:
+                continue
+
+            if label_results is None:
+                # the value could not be checked, leave the label as is
+                unchanged[rule.status_label_id].add(view_id)
+            elif label_results:
+                labeled[rule.status_label_id].add(view_id)
+                for result_index in label_results:
+                    if result_index is not None:
+                        results[result_index]['label'] = rule.status_label.name
+
+    def _check_rule(self, rule, row, derived_columns_by_name):
+        """
+        Check a row against a rule and add the violations to the results. The status label of
+        the rule is not applied here.
 
-            label_applied = False
-            display_name = rule.field
+        :param rule: Rule
+        :param row: PropertyState or TaxLotState, row of data to check
+        :param derived_columns_by_name: dict{str: DerivedColumn}
+        :return: list, for each time the status label of the rule is to be applied, the index
+            of the result to label or None (valid values). None if the value could not be checked.
+        """
+        results = self.results[row.id]['data_quality_results']
+        label_results = []
 
-            if rule.for_derived_column:
-                derived_column = derived_columns_by_name[rule.field]
-                value = derived_column.evaluate(inventory_state=row)
-            else:
-                if hasattr(row, rule.field):
-                    value = getattr(row, rule.field)
-                    # TODO cleanup after the cleaner is better able to handle fields with units on import
-                    # If the rule doesn't specify units only consider the value for the purposes of numerical comparison
-                    if isinstance(value, ureg.Quantity) and rule.units == '':
-                        value = value.magnitude
-                else:  # rule is for extra_data
-                    value = row.extra_data.get(rule.field, None)
-
-                    if ' (Invalid Footprint)' in rule.field and value is not None:
-                        self.add_invalid_geometry_entry_provided(row.id, rule, display_name, value)
-                        continue
-
-                    try:
-                        value = rule.str_to_data_type(value)
-                    except DataQualityTypeCastError:
-                        self.add_result_type_error(row.id, rule, display_name, value)
-                        continue
-
-            # get the display name of the rule
-            if (rule.table_name, rule.field) in self.column_lookup:
-                display_name = self.column_lookup[(rule.table_name, rule.field)]
-
-            # get the status_labels for the linked properties and tax lots
-            linked_id = model_labels['linked_id']
-
-            if (rule.table_name, rule.field) not in self.column_lookup:
-                # If the rule is not in the column lookup, then it may have been a required
-                # field that wasn't mapped
-                if rule.condition == Rule.RULE_REQUIRED:
-                    self.add_result_missing_req(row.id, rule, display_name, value)
-                    label_applied = self.update_status_label(label, rule, linked_id, row.id)
-            elif value is None or value == '':
-                if rule.condition == Rule.RULE_REQUIRED:
-                    self.add_result_missing_and_none(row.id, rule, display_name, value)
-                    label_applied = self.update_status_label(label, rule, linked_id, row.id)
-                elif rule.condition == Rule.RULE_NOT_NULL:
-                    self.add_result_is_null(row.id, rule, display_name, value)
-                    label_applied = self.update_status_label(label, rule, linked_id, row.id)
-            elif rule.condition == Rule.RULE_INCLUDE or rule.condition == Rule.RULE_EXCLUDE:
-                if not rule.valid_text(value):
-                    self.add_result_string_error(row.id, rule, display_name, value)
-                    label_applied = self.update_status_label(label, rule, linked_id, row.id)
-            elif rule.condition == Rule.RULE_RANGE:
-                try:
-                    if not rule.minimum_valid(value):
-                        if rule.severity == Rule.SEVERITY_ERROR or rule.severity == Rule.SEVERITY_WARNING:
-                            s_min, s_max, s_value = rule.format_strings(value)
-                            self.add_result_min_error(row.id, rule, display_name, s_value, s_min)
-                            label_applied = self.update_status_label(label, rule, linked_id, row.id)
-                except ComparisonError:
-                    s_min, s_max, s_value = rule.format_strings(value)
-                    self.add_result_comparison_error(row.id, rule, display_name, s_value, s_min)
-                    continue
-                except DataQualityTypeCastError:
-                    s_min, s_max, s_value = rule.format_strings(value)
-                    self.add_result_type_error(row.id, rule, display_name, s_value)
-                    continue
-                except UnitMismatchError:
-                    self.add_result_dimension_error(row.id, rule, display_name, value)
-                    continue
+        value = None
+        display_name = rule.field
+
+        if rule.for_derived_column:
+            derived_column = derived_columns_by_name[rule.field]
+            value = derived_column.evaluate(inventory_state=row)
+        else:
+            if hasattr(row, rule.field):
+                value = getattr(row, rule.field)
+                # TODO cleanup after the cleaner is better able to handle fields with units on import
+                # If the rule doesn't specify units only consider the value for the purposes of numerical comparison
+                if isinstance(value, ureg.Quantity) and rule.units == '':
+                    value = value.magnitude
+            else:  # rule is for extra_data
+                value = row.extra_data.get(rule.field, None)
+
+                if ' (Invalid Footprint)' in rule.field and value is not None:
+                    self.add_invalid_geometry_entry_provided(row.id, rule, display_name, value)
+                    return None
 
                 try:
-                    if not rule.maximum_valid(value):
-                        if rule.severity == Rule.SEVERITY_ERROR or rule.severity == Rule.SEVERITY_WARNING:
-                            s_min, s_max, s_value = rule.format_strings(value)
-                            self.add_result_max_error(row.id, rule, display_name, s_value, s_max)
-                            label_applied = self.update_status_label(label, rule, linked_id, row.id)
-                except ComparisonError:
-                    s_min, s_max, s_value = rule.format_strings(value)
-                    self.add_result_comparison_error(row.id, rule, display_name, s_value, s_max)
-                    continue
+                    value = rule.str_to_data_type(value)
                 except DataQualityTypeCastError:
-                    s_min, s_max, s_value = rule.format_strings(value)
-                    self.add_result_type_error(row.id, rule, display_name, s_value)
-                    continue
-                except UnitMismatchError:
-                    self.add_result_dimension_error(row.id, rule, display_name, value)
-                    continue
-
-                # Check min and max values for valid data:
-                if rule.minimum_valid(value) and rule.maximum_valid(value):
-                    if rule.severity == Rule.SEVERITY_VALID:
-                        label_applied = self.update_status_label(label, rule, linked_id, row.id, False)
-
-            if not label_applied and rule.status_label_id in model_labels['label_ids']:
-                self.remove_status_label(label, rule, linked_id)
-
-    def save_to_cache(self, identifier, organization_id):
+                    self.add_result_type_error(row.id, rule, display_name, value)
+                    return None
+
+        # get the display name of the rule
+        if (rule.table_name, rule.field) in self.column_lookup:
+            display_name = self.column_lookup[(rule.table_name, rule.field)]
+
+        if (rule.table_name, rule.field) not in self.column_lookup:
+            # If the rule is not in the column lookup, then it may have been a required
+            # field that wasn't mapped
+            if rule.condition == Rule.RULE_REQUIRED:
+                self.add_result_missing_req(row.id, rule, display_name, value)
+                label_results.append(len(results) - 1)
+        elif value is None or value == '':
+            if rule.condition == Rule.RULE_REQUIRED:
+                self.add_result_missing_and_none(row.id, rule, display_name, value)
+                label_results.append(len(results) - 1)
+            elif rule.condition == Rule.RULE_NOT_NULL:
+                self.add_result_is_null(row.id, rule, display_name, value)
+                label_results.append(len(results) - 1)
+        elif rule.condition == Rule.RULE_INCLUDE or rule.condition == Rule.RULE_EXCLUDE:
+            if not rule.valid_text(value):
+                self.add_result_string_error(row.id, rule, display_name, value)
+                label_results.append(len(results) - 1)
+        elif rule.condition == Rule.RULE_RANGE:
+            try:
+                if not rule.minimum_valid(value):
+                    if rule.severity == Rule.SEVERITY_ERROR or rule.severity == Rule.SEVERITY_WARNING:
+                        s_min, s_max, s_value = rule.format_strings(value)
+                        self.add_result_min_error(row.id, rule, display_name, s_value, s_min)
+                        label_results.append(len(results) - 1)
+            except ComparisonError:
+                s_min, s_max, s_value = rule.format_strings(value)
+                self.add_result_comparison_error(row.id, rule, display_name, s_value, s_min)
+                return None
+            except DataQualityTypeCastError:
+                s_min, s_max, s_value = rule.format_strings(value)
+                self.add_result_type_error(row.id, rule, display_name, s_value)
+                return None
+            except UnitMismatchError:
+                self.add_result_dimension_error(row.id, rule, display_name, value)
+                return None
+
+            try:
+                if not rule.maximum_valid(value):
+                    if rule.severity == Rule.SEVERITY_ERROR or rule.severity == Rule.SEVERITY_WARNING:
+                        s_min, s_max, s_value = rule.format_strings(value)
+                        self.add_result_max_error(row.id, rule, display_name, s_value, s_max)
+                        label_results.append(len(results) - 1)
+            except ComparisonError:
+                s_min, s_max, s_value = rule.format_strings(value)
+                self.add_result_comparison_error(row.id, rule, display_name, s_value, s_max)
+                return None
+            except DataQualityTypeCastError:
+                s_min, s_max, s_value = rule.format_strings(value)
+                self.add_result_type_error(row.id, rule, display_name, s_value)
+                return None
+            except UnitMismatchError:
+                self.add_result_dimension_error(row.id, rule, display_name, value)
+                return None
+
+            # Check min and max values for valid data:
+            if rule.minimum_valid(value) and rule.maximum_valid(value):
+                if rule.severity == Rule.SEVERITY_VALID:
+                    label_results.append(None)
+
+        return label_results
+
+    def save_to_cache(self, identifier, organization_id, chunk=0):
         """
         Save the results to the cache database. The data in the cache are
         stored as a list of dictionaries. The data in this class are stored as
         a dict of dict. This is important to remember because the data from the
         cache cannot be simply loaded into the above structure.
 
+        The results are stored under the key of the chunk, so the results of the
+        other chunks are never read nor rewritten.
+
         :param identifier: Import file primary key
+        :param chunk: int, index of the chunk which was checked
         :return: None
         """
         # change the format of the data in the cache. Make this a list of
         # objects instead of object of objects.
-        existing_results = get_cache_raw(DataQualityCheck.cache_key(identifier, organization_id)) or []
-
-        results = []
-        for key, value in self.results.items():
-            results.append(value)
-
-        existing_results += results
-
-        z = sorted(existing_results, key=lambda k: k['id'])
-        set_cache_raw(DataQualityCheck.cache_key(identifier, organization_id), z, 86400)  # 24 hours
+        results = sorted(self.results.values(), key=lambda k: k['id'])
+        cache_key = DataQualityCheck.cache_key(identifier, organization_id)
+        set_cache_raw(
+            DataQualityCheck.chunk_cache_key(cache_key, chunk),
+            results,
+            DataQualityCheck.CACHE_TIMEOUT
+        )
 
     def initialize_rules(self):
         """
@@ -1038,68 +1391,6 @@ class DataQualityCheck(models.Model):
             'condition': rule.condition,
         })
 
-    def update_status_label(self, label_class, rule, linked_id, row_id, add_to_results=True):
-        """
-
-        :param label_class: statuslabel object, either propertyview label or taxlotview label
-        :param rule: rule object
-        :param linked_id: id of propertyview or taxlotview object
-        :param row_id:
-        :param add_to_results: bool
-        :return: boolean, if labeled was applied
-        """
-        if rule.status_label_id is not None and linked_id is not None:
-            label_org_id = rule.status_label.super_organization_id
-
-            if rule.table_name == 'PropertyState':
-                property_parent_org_id = PropertyView.objects.get(pk=linked_id).property.organization.get_parent().id
-                if property_parent_org_id == label_org_id:
-                    label_class.objects.get_or_create(propertyview_id=linked_id,
-                                                      statuslabel_id=rule.status_label_id)
-                else:
-                    raise IntegrityError(
-                        'Label with super_organization_id={} cannot be applied to a record with parent '
-                        'organization_id={}.'.format(
-                            label_org_id,
-                            property_parent_org_id
-                        )
-                    )
-            else:
-                taxlot_parent_org_id = TaxLotView.objects.get(pk=linked_id).taxlot.organization.get_parent().id
-                if taxlot_parent_org_id == label_org_id:
-                    label_class.objects.get_or_create(taxlotview_id=linked_id,
-                                                      statuslabel_id=rule.status_label_id)
-                else:
-                    raise IntegrityError(
-                        'Label with super_organization_id={} cannot be applied to a record with parent '
-                        'organization_id={}.'.format(
-                            label_org_id,
-                            taxlot_parent_org_id
-                        )
-                    )
-
-            if add_to_results:
-                self.results[row_id]['data_quality_results'][-1]['label'] = rule.status_label.name
-
-            return True
-
-    def remove_status_label(self, label_class, rule, linked_id):
-        """
-        Remove label because it did not match any of the range exceptions
-
-        :param label_class: statuslabel object, either property label or taxlot label
-        :param rule: rule object
-        :param linked_id: id of propertystate or taxlotstate object
-        :return: boolean, if labeled was applied
-        """
-
-        if rule.table_name == 'PropertyState':
-            label_class.objects.filter(propertyview_id=linked_id,
-                                       statuslabel_id=rule.status_label_id).delete()
-        else:
-            label_class.objects.filter(taxlotview_id=linked_id,
-                                       statuslabel_id=rule.status_label_id).delete()
-
     def retrieve_result_by_address(self, address):
         """
         Retrieve the results of the data quality checks for a specific address.
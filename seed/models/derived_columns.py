@@ -7,16 +7,22 @@
 from __future__ import annotations
 
 import copy
-from typing import Any, Union
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Sequence, Union
 
+import numpy as np
 from django.core.exceptions import ValidationError
 from django.db import models
-from lark import Lark, Transformer, v_args
-from lark.exceptions import UnexpectedToken
+from django.db.models import QuerySet
+from django.db.models.fields.json import KeyTransform
+from django.db.models.signals import post_delete, post_save
+from lark import Lark, Transformer, Tree, v_args
+from lark.exceptions import UnexpectedToken, VisitError
 from quantityfield.units import ureg
 
 from seed.landing.models import Organization
-from seed.models.columns import Column
+from seed.models.columns import Column, invalidate_column_cache
 from seed.models.properties import PropertyState
 from seed.models.tax_lots import TaxLotState
 
@@ -43,6 +49,77 @@ def _cast_params_to_floats(params: dict[str, Any]) -> dict[str, float]:
     return tmp_params
 
 
+def _cast_values_to_float_array(values: Sequence[Any]) -> np.ndarray:
+    """Helper to turn a sequence of values into a float array. Values that are
+    not numeric (including booleans and None) become NaN, following the same
+    rules as _cast_params_to_floats.
+
+    :param values: list
+    :return: np.ndarray of float
+    """
+    result = np.full(len(values), np.nan)
+    for index, value in enumerate(values):
+        if value is None or isinstance(value, bool):
+            continue
+
+        if isinstance(value, ureg.Quantity):
+            value = value.magnitude
+
+        try:
+            result[index] = float(value)
+        except Exception:
+            continue
+    return result
+
+
+class ExpressionCache:
+    """Thread safe, least recently used cache of parsed expression trees keyed by
+    the expression string, with hit and miss counters"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._trees: OrderedDict[str, Tree] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, expression: str) -> Optional[Tree]:
+        with self._lock:
+            tree = self._trees.get(expression)
+            if tree is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._trees.move_to_end(expression)
+            return tree
+
+    def set(self, expression: str, tree: Tree) -> None:
+        with self._lock:
+            self._trees[expression] = tree
+            self._trees.move_to_end(expression)
+            while len(self._trees) > self.maxsize:
+                self._trees.popitem(last=False)
+
+    def invalidate(self, expression: str) -> None:
+        with self._lock:
+            self._trees.pop(expression, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._trees.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._trees),
+                'maxsize': self.maxsize,
+            }
+
+
 class ExpressionEvaluator:
     """Wrapper class providing repeated evaluation expressions with different parameters"""
 
@@ -108,18 +185,92 @@ class ExpressionEvaluator:
             """
             self.params = params
 
+    @v_args(inline=True)
+    class EvaluateArrays(EvaluateTree):
+        """Transforms expression tree into an array of results, one per record.
+        Parameters are float arrays of the same length, with NaN for missing values.
+        NaN propagates through every operation, including min and max.
+        """
+        def __init__(self, size=0):
+            super().__init__()
+            self.size = size
+
+        def param(self, name):
+            # a missing parameter makes every result missing
+            return self.params.get(name, np.full(self.size, np.nan))
+
+        def min(self, *args):
+            return np.minimum.reduce(np.broadcast_arrays(*args))
+
+        def max(self, *args):
+            return np.maximum.reduce(np.broadcast_arrays(*args))
+
+    # maximum number of parsed expressions kept by the process wide cache
+    EXPRESSION_CACHE_SIZE = 1000
+
+    _cache = ExpressionCache(EXPRESSION_CACHE_SIZE)
+    _parser = None
+    _parser_lock = threading.Lock()
+
     def __init__(self, expression: str, validate: bool = True):
-        """Construct an expression evaluator.
+        """Construct an expression evaluator. The expression is parsed once and
+        the parse tree is shared by all evaluators of the same expression.
 
         :param expression: str
-        :param validate: bool, optional
+        :param validate: bool, optional, kept for backwards compatibility, the
+            expression is always validated when it is parsed
         """
         self._expression = expression
-        if validate:
-            self.is_valid(expression)
-
+        self._tree = self.parse(expression)
         self._transformer = self.EvaluateTree()
-        self._parser = Lark(self.EXPRESSION_GRAMMAR, parser='lalr', transformer=self._transformer)
+
+    @classmethod
+    def _get_parser(cls) -> Lark:
+        """Return the Lark parser, building it from the grammar on first use"""
+        if cls._parser is None:
+            with cls._parser_lock:
+                if cls._parser is None:
+                    cls._parser = Lark(cls.EXPRESSION_GRAMMAR, parser='lalr')
+        return cls._parser
+
+    @classmethod
+    def parse(cls, expression: str) -> Tree:
+        """Return the parse tree of the expression, from the cache if available.
+        Raises an InvalidExpression exception if invalid
+
+        :param expression: str
+        :return: Tree
+        """
+        tree = cls._cache.get(expression)
+        if tree is None:
+            try:
+                tree = cls._get_parser().parse(expression)
+            except UnexpectedToken as e:
+                raise InvalidExpression(expression, e.pos_in_stream)
+            cls._cache.set(expression, tree)
+
+        return tree
+
+    @classmethod
+    def invalidate(cls, expression: str) -> None:
+        """Remove an expression from the cache of parsed expressions
+
+        :param expression: str
+        """
+        cls._cache.invalidate(expression)
+
+    @classmethod
+    def cache_info(cls) -> dict[str, int]:
+        """Return the hits, misses, size and maxsize of the cache of parsed expressions
+
+        :return: dict
+        """
+        return cls._cache.info()
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        """Empty the cache of parsed expressions and reset its counters"""
+        cls._cache.clear()
 
     @classmethod
     def is_valid(cls, expression: str) -> bool:
@@ -128,11 +279,7 @@ class ExpressionEvaluator:
         :param expression: str
         :return: bool
         """
-        try:
-            Lark(cls.EXPRESSION_GRAMMAR, parser='lalr').parse(expression)
-        except UnexpectedToken as e:
-            raise InvalidExpression(expression, e.pos_in_stream)
-
+        cls.parse(expression)
         return True
 
     def evaluate(self, parameters: Union[None, dict[str, float]] = None) -> float:
@@ -145,7 +292,32 @@ class ExpressionEvaluator:
             parameters = {}
 
         self._transformer.set_params(parameters)
-        return self._parser.parse(self._expression)  # type: ignore[return-value]
+        try:
+            return self._transformer.transform(self._tree)  # type: ignore[return-value]
+        except VisitError as e:
+            # raise the exception of the operation (e.g., KeyError, ZeroDivisionError) instead of lark's wrapper
+            raise e.orig_exc
+
+    def evaluate_arrays(self, parameters: dict[str, np.ndarray], size: int) -> np.ndarray:
+        """Evaluate the expression for many records at once. Each operation is
+        applied to whole arrays.
+
+        Results that can't be computed (missing parameters, division by zero,
+        overflow) are NaN.
+
+        :param parameters: dict, keys are parameter names and values are float arrays of length `size`
+        :param size: int, number of records
+        :return: np.ndarray of float, of length `size`
+        """
+        transformer = self.EvaluateArrays(size)
+        transformer.set_params(parameters)
+        with np.errstate(all='ignore'):
+            try:
+                result = np.array(np.broadcast_to(transformer.transform(self._tree), (size,)), dtype=float)
+            except VisitError as e:
+                raise e.orig_exc
+        result[~np.isfinite(result)] = np.nan
+        return result
 
 
 class InvalidExpression(Exception):
@@ -217,6 +389,13 @@ class DerivedColumn(models.Model):
     def save(self, *args, **kwargs):
         created = not self.pk
         self.full_clean()
+        if not created:
+            previous_expression = DerivedColumn.objects.filter(pk=self.pk).values_list('expression', flat=True).first()
+            if previous_expression is not None and previous_expression != self.expression:
+                # drop the parsed expression which is no longer used, and this instance's evaluator
+                ExpressionEvaluator.invalidate(previous_expression)
+                if hasattr(self, '_cached_evaluator'):
+                    del self._cached_evaluator
         save_response = super().save(*args, **kwargs)
         if self.inventory_type == 0:
             inventory_type = 'PropertyState'
@@ -323,6 +502,98 @@ class DerivedColumn(models.Model):
                             f'    expression: {self.expression}\n'
                             f'    exception: {e}')
 
+    def get_parameter_arrays(self, inventory_states: Union[QuerySet, Sequence[Union[PropertyState, TaxLotState]]]) -> dict[str, np.ndarray]:
+        """Construct a dictionary of float arrays of column values keyed by
+        expression parameter names, one element per inventory state. Values
+        that are missing or not numeric are NaN. Parameters that are derived
+        columns are evaluated with evaluate_many.
+
+        If a QuerySet is provided, only the source columns are fetched from the
+        database (one value per state and column), the states are not loaded.
+
+        WARNING: this method caches the derived column sources, see get_parameter_values.
+
+        :param inventory_states: QuerySet or list of PropertyState | TaxLotState
+        :return: dict, {<parameter name>: np.ndarray, ...}
+        """
+        if not hasattr(self, '_cached_column_parameters'):
+            self._cached_column_parameters = (
+                DerivedColumnParameter.objects
+                .filter(derived_column=self.id)
+                .prefetch_related('source_column')
+            )
+
+        parameters = list(self._cached_column_parameters)
+        params = {}
+        derived_parameters = [p for p in parameters if p.source_column.derived_column_id is not None]
+        for parameter in derived_parameters:
+            params[parameter.parameter_name] = parameter.source_column.derived_column.evaluate_many_array(inventory_states)
+
+        source_parameters = [p for p in parameters if p.source_column.derived_column_id is None]
+        if not source_parameters:
+            return params
+
+        if isinstance(inventory_states, QuerySet):
+            field_names = {f.name for f in inventory_states.model._meta.get_fields()}
+            lookups, annotations = [], {}
+            for index, parameter in enumerate(source_parameters):
+                source_column_name = parameter.source_column.column_name
+                if source_column_name in field_names:
+                    lookups.append(source_column_name)
+                else:
+                    lookups.append(f'_derived_param_{index}')
+                    annotations[f'_derived_param_{index}'] = KeyTransform(source_column_name, 'extra_data')
+
+            rows = list(inventory_states.annotate(**annotations).values_list(*lookups))
+            columns = list(zip(*rows)) if rows else [() for _ in source_parameters]
+        else:
+            columns = []
+            for parameter in source_parameters:
+                source_column_name = parameter.source_column.column_name
+                columns.append([
+                    getattr(state, source_column_name) if hasattr(state, source_column_name)
+                    else state.extra_data.get(source_column_name)
+                    for state in inventory_states
+                ])
+
+        for parameter, values in zip(source_parameters, columns):
+            params[parameter.parameter_name] = _cast_values_to_float_array(values)
+
+        return params
+
+    def evaluate_many_array(self, inventory_states: Union[QuerySet, Sequence[Union[PropertyState, TaxLotState]]]) -> np.ndarray:
+        """Evaluate the expression for many inventory states at once, see evaluate_many.
+
+        :param inventory_states: QuerySet or list of PropertyState | TaxLotState
+        :return: np.ndarray of float, NaN where the expression could not be evaluated
+        """
+        if not hasattr(self, '_cached_evaluator'):
+            self._cached_evaluator = ExpressionEvaluator(self.expression)
+
+        size = inventory_states.count() if isinstance(inventory_states, QuerySet) else len(inventory_states)
+        if size == 0:
+            return np.array([], dtype=float)
+
+        return self._cached_evaluator.evaluate_arrays(self.get_parameter_arrays(inventory_states), size)
+
+    def evaluate_many(self, inventory_states: Union[QuerySet, Sequence[Union[PropertyState, TaxLotState]]]) -> list[Optional[float]]:
+        """Evaluate the expression for many inventory states at once. The expression
+        is parsed once, the source column values are collected into NumPy arrays
+        and the expression is evaluated over the arrays, instead of calling
+        evaluate for every state.
+
+        As with evaluate, states with missing or non-numeric parameters, or for
+        which a ZeroDivisionError would occur, get None.
+
+        WARNING: this method caches parts of the model, see evaluate.
+
+        :param inventory_states: QuerySet or list of PropertyState | TaxLotState. If a
+            QuerySet is provided, it must have a stable ordering.
+        :return: list of float | None, in the order of inventory_states
+        """
+        results = self.evaluate_many_array(inventory_states)
+        return [None if np.isnan(value) else float(value) for value in results]
+
     def check_for_source_columns_derived(self, inventory_state=None, merged_parameters={}):
         dcps = self.derivedcolumnparameter_set.all()
         for dcp in dcps:
@@ -368,3 +639,11 @@ class DerivedColumnParameter(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+
+
+def invalidate_column_cache_of_derived_column(sender, instance, **kwargs):
+    invalidate_column_cache(instance.organization_id)
+
+
+post_save.connect(invalidate_column_cache_of_derived_column, sender=DerivedColumn)
+post_delete.connect(invalidate_column_cache_of_derived_column, sender=DerivedColumn)
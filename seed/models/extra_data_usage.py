@@ -0,0 +1,89 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from seed.models.columns import Column
+from seed.utils.cache import add_to_cache_counter, get_cache_many
+
+
+class ExtraDataUsage(models.Model):
+    """Number of times the inventory was filtered or sorted on an extra data Column.
+    Used to decide which columns deserve an expression index
+    (see seed.utils.extra_data_indexes)."""
+    column = models.OneToOneField(Column, on_delete=models.CASCADE, related_name='usage')
+    filter_count = models.IntegerField(default=0)
+    sort_count = models.IntegerField(default=0)
+    last_used = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return 'ExtraDataUsage - %s: %s filters, %s sorts' % (self.column_id, self.filter_count, self.sort_count)
+
+    @staticmethod
+    def _cache_key(column_id, count_name):
+        return f'extra_data_usage:{column_id}:{count_name}'
+
+    @classmethod
+    def record(cls, filtered_column_ids=(), sorted_column_ids=()):
+        """Increment the usage counts of the columns. The counts are only added up in
+        the cache, they are saved by flush when the usage is read.
+
+        :param filtered_column_ids: ids of the extra data Columns filtered on
+        :param sorted_column_ids: ids of the extra data Columns sorted on
+        """
+        for column_id in set(filtered_column_ids):
+            add_to_cache_counter(cls._cache_key(column_id, 'filter_count'))
+        for column_id in set(sorted_column_ids):
+            add_to_cache_counter(cls._cache_key(column_id, 'sort_count'))
+
+    @classmethod
+    def flush(cls, org_id):
+        """Save the usage counts recorded in the cache for the extra data Columns of
+        the organization. last_used is the time of the flush.
+
+        :param org_id: int
+        """
+        column_ids = list(Column.objects.filter(organization_id=org_id, is_extra_data=True).values_list('id', flat=True))
+        keys = [
+            cls._cache_key(column_id, count_name)
+            for column_id in column_ids
+            for count_name in ['filter_count', 'sort_count']
+        ]
+        cached_counts = {key: count for key, count in get_cache_many(keys).items() if count}
+
+        now = timezone.now()
+        for column_id in column_ids:
+            filter_increment = cached_counts.get(cls._cache_key(column_id, 'filter_count'), 0)
+            sort_increment = cached_counts.get(cls._cache_key(column_id, 'sort_count'), 0)
+            if not filter_increment and not sort_increment:
+                continue
+
+            # subtract what is saved instead of deleting the keys, to keep the uses
+            # recorded in the meantime
+            for count_name, increment in [('filter_count', filter_increment), ('sort_count', sort_increment)]:
+                if increment:
+                    add_to_cache_counter(cls._cache_key(column_id, count_name), -increment)
+
+            updates = {
+                'filter_count': F('filter_count') + filter_increment,
+                'sort_count': F('sort_count') + sort_increment,
+                'last_used': now,
+            }
+            if cls.objects.filter(column_id=column_id).update(**updates):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        column_id=column_id,
+                        filter_count=filter_increment,
+                        sort_count=sort_increment,
+                        last_used=now,
+                    )
+            except IntegrityError:
+                # created concurrently
+                cls.objects.filter(column_id=column_id).update(**updates)
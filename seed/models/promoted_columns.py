@@ -0,0 +1,227 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+import math
+from datetime import date, datetime
+
+from dateutil import parser as date_parser
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from seed.models.columns import (
+    COLUMN_CACHE_TIMEOUT,
+    Column,
+    column_cache_version
+)
+from seed.models.properties import PropertyState
+from seed.models.tax_lots import TaxLotState
+from seed.utils.cache import get_cache_raw, set_cache_raw
+
+BOOLEAN_TRUE_STRINGS = ('true', 't', 'yes', 'y', 'on', '1')
+BOOLEAN_FALSE_STRINGS = ('false', 'f', 'no', 'n', 'off', '0')
+
+
+def _to_number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, datetime):
+        result = value
+    elif isinstance(value, date):
+        result = datetime(value.year, value.month, value.day)
+    else:
+        try:
+            result = date_parser.parse(str(value))
+        except (ValueError, OverflowError):
+            return None
+    if timezone.is_naive(result):
+        result = timezone.make_aware(result, timezone.utc)
+    return result
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    if value in BOOLEAN_TRUE_STRINGS:
+        return True
+    if value in BOOLEAN_FALSE_STRINGS:
+        return False
+    return None
+
+
+class PromotedExtraDataValue(models.Model):
+    """Typed copy of an extra_data value for a Column the organization has promoted.
+
+    Filtering and sorting on extra_data otherwise casts the JSON value of every state
+    at query time, which cannot use an index. Promoted columns keep one row per state
+    with the value in the field matching the column's data type, so filters and sorts
+    can use the (column, value) B-tree indexes instead.
+    """
+    # maps Column.data_type to the field storing the typed value
+    VALUE_FIELDS = {
+        'integer': 'value_number',
+        'number': 'value_number',
+        'float': 'value_number',
+        'area': 'value_number',
+        'eui': 'value_number',
+        'date': 'value_datetime',
+        'datetime': 'value_datetime',
+        'boolean': 'value_boolean',
+    }
+    # maps Column.table_name to the field referencing the state
+    STATE_FIELDS = {
+        'PropertyState': 'property_state',
+        'TaxLotState': 'taxlot_state',
+    }
+    CONVERTERS = {
+        'value_number': _to_number,
+        'value_datetime': _to_datetime,
+        'value_boolean': _to_boolean,
+    }
+
+    column = models.ForeignKey(Column, on_delete=models.CASCADE, related_name='promoted_values')
+    property_state = models.ForeignKey(PropertyState, on_delete=models.CASCADE, null=True, blank=True,
+                                       related_name='promoted_values')
+    taxlot_state = models.ForeignKey(TaxLotState, on_delete=models.CASCADE, null=True, blank=True,
+                                     related_name='promoted_values')
+
+    value_number = models.FloatField(null=True, blank=True)
+    value_datetime = models.DateTimeField(null=True, blank=True)
+    value_boolean = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['column', 'property_state'], name='unique_promoted_property_state'),
+            models.UniqueConstraint(fields=['column', 'taxlot_state'], name='unique_promoted_taxlot_state'),
+        ]
+        indexes = [
+            models.Index(fields=['column', 'value_number'], name='seed_promoted_number_idx'),
+            models.Index(fields=['column', 'value_datetime'], name='seed_promoted_datetime_idx'),
+            models.Index(fields=['column', 'value_boolean'], name='seed_promoted_boolean_idx'),
+        ]
+
+    def __str__(self):
+        return 'PromotedExtraDataValue - %s: %s' % (self.column_id, self.value)
+
+    @property
+    def value(self):
+        return getattr(self, self.VALUE_FIELDS[self.column.data_type])
+
+    @classmethod
+    def value_field(cls, data_type):
+        """Return the name of the field storing values of data_type, or None if
+        columns of that data type cannot be promoted"""
+        return cls.VALUE_FIELDS.get(data_type)
+
+    @classmethod
+    def typed_value(cls, data_type, value):
+        """Convert a raw extra_data value to the type stored for data_type. Values
+        which cannot be converted are returned as None (and are not stored)."""
+        return cls.CONVERTERS[cls.VALUE_FIELDS[data_type]](value)
+
+    @classmethod
+    def promoted_columns(cls, table_name, organization_ids):
+        return Column.objects.filter(
+            organization_id__in=organization_ids,
+            table_name=table_name,
+            is_extra_data=True,
+            is_promoted=True,
+        )
+
+    @classmethod
+    def has_promoted_columns(cls, table_name, organization_id):
+        """Return True if the organization has promoted columns of table_name. The result
+        is cached until the columns of the organization change (see column_cache_version)."""
+        key = f'has_promoted_columns__{organization_id}__{column_cache_version(organization_id)}__{table_name}'
+        result = get_cache_raw(key)
+        if result is None:
+            result = cls.promoted_columns(table_name, [organization_id]).exists()
+            set_cache_raw(key, result, COLUMN_CACHE_TIMEOUT)
+        return result
+
+    @classmethod
+    def refresh_for_states(cls, states, columns=None):
+        """Replace the promoted values of the states with the current content of
+        their extra_data. This must be called by anything writing extra_data without
+        calling save() on the state (e.g., bulk_create or QuerySet.update).
+
+        :param states: iterable of PropertyStates or TaxLotStates (not mixed)
+        :param columns: iterable of promoted Columns to refresh, defaults to all the
+                        promoted columns of the states' organizations
+        """
+        states = [state for state in states if state.pk is not None]
+        if not states:
+            return
+
+        table_name = states[0].__class__.__name__
+        state_field = cls.STATE_FIELDS[table_name]
+        if columns is None:
+            # most organizations have no promoted columns, which is checked without a query
+            organization_ids = {
+                organization_id for organization_id in {state.organization_id for state in states}
+                if cls.has_promoted_columns(table_name, organization_id)
+            }
+            if not organization_ids:
+                return
+            columns = cls.promoted_columns(table_name, organization_ids)
+        columns = [column for column in columns if cls.value_field(column.data_type) is not None]
+        if not columns:
+            return
+
+        new_values = []
+        for column in columns:
+            value_field = cls.value_field(column.data_type)
+            for state in states:
+                if state.organization_id != column.organization_id:
+                    continue
+                value = cls.typed_value(column.data_type, (state.extra_data or {}).get(column.column_name))
+                if value is None:
+                    continue
+                new_values.append(cls(**{'column': column, state_field: state, value_field: value}))
+
+        with transaction.atomic():
+            cls.objects.filter(column__in=columns, **{f'{state_field}__in': states}).delete()
+            cls.objects.bulk_create(new_values, batch_size=1000)
+
+    @classmethod
+    def refresh_for_column(cls, column, state_ids=None, chunk_size=1000):
+        """Rebuild the promoted values of a single column for all the states of its
+        organization (or only state_ids if provided)"""
+        state_class = PropertyState if column.table_name == 'PropertyState' else TaxLotState
+        if state_ids is None:
+            state_ids = list(
+                state_class.objects.filter(organization_id=column.organization_id)
+                .order_by('id').values_list('id', flat=True)
+            )
+        for index in range(0, len(state_ids), chunk_size):
+            states = state_class.objects.filter(id__in=state_ids[index:index + chunk_size]).only(
+                'id', 'organization_id', 'extra_data'
+            )
+            cls.refresh_for_states(states, columns=[column])
+
+
+@receiver(post_save, sender=PropertyState)
+@receiver(post_save, sender=TaxLotState)
+def refresh_promoted_extra_data_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and 'extra_data' not in update_fields:
+        return
+    PromotedExtraDataValue.refresh_for_states([instance])
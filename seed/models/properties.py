@@ -14,6 +14,7 @@ from os import path
 from django.conf import settings
 from django.contrib.gis.db import models as geomodels
 from django.db import IntegrityError, models, transaction
+from django.db.models import Max, Min
 from django.db.models.signals import (
     m2m_changed,
     post_save,
@@ -46,6 +47,7 @@ from seed.utils.generic import (
     obj_to_dict,
     split_model_fields
 )
+from seed.utils.meter_aggregates import refresh_aggregates
 from seed.utils.time import convert_datestr, convert_to_js_timestamp
 
 from .auditlog import AUDIT_IMPORT, DATA_UPDATE_TYPE
@@ -108,7 +110,9 @@ class Property(models.Model):
             # a time, checking to see if self has a similar meter each time.
             # Note that we only copy meters not linked to scenarios because it's assumed
             # the property has already gone through merge_relationships()
-            for source_meter in source_property.meters.filter(scenario_id=None):
+            source_meters = source_property.meters.filter(scenario_id=None)
+            start_times = source_meters.aggregate(Min('meter_readings__start_time'), Max('meter_readings__start_time'))
+            for source_meter in source_meters:
                 with transaction.atomic():
                     target_meter, created = self.meters.get_or_create(
                         is_virtual=source_meter.is_virtual,
@@ -129,6 +133,11 @@ class Property(models.Model):
                         # If self did have a similar meter, copy readings assuming overlaps are possible.
                         target_meter.copy_readings(source_meter, overlaps_possible=True)
 
+            if start_times['meter_readings__start_time__min'] is not None:
+                refresh_aggregates(
+                    start_times['meter_readings__start_time__min'], start_times['meter_readings__start_time__max']
+                )
+
 
 class PropertyState(models.Model):
     """Store a single property. This contains all the state information about the property
@@ -452,6 +461,21 @@ class PropertyState(models.Model):
                 # 'changed_fields': json.loads(log.description) if log.record_type == AUDIT_USER_EDIT else None
             }
 
+        def middle_parent_records(log):
+            # merges of more than two states only reference the parents other than
+            # parent1 and parent2 through parent_states
+            records = []
+            middle_parents = log.parent_states.exclude(
+                pk__in=[log.parent_state1_id, log.parent_state2_id]
+            ).order_by('-id')
+            for parent_state in middle_parents:
+                parent_log = PropertyAuditLog.objects.filter(state=parent_state).order_by('id').first()
+                if parent_log and parent_log.name in ['Import Creation', 'Manual Edit']:
+                    records.append(record_dict(parent_log))
+                else:
+                    records.extend(parent_state.history()[0])
+            return records
+
         log = PropertyAuditLog.objects.select_related('state', 'parent1', 'parent2').filter(
             state_id=self.id
         ).order_by('-id').first()
@@ -487,11 +511,14 @@ class PropertyState(models.Model):
                             # existing records
                             record = record_dict(log.parent2.parent2)
                             history.append(record)
+                            history.extend(middle_parent_records(log.parent2))
                             record = record_dict(log.parent2.parent1)
                             history.append(record)
                         else:
                             tree = log.parent2
 
+                    history.extend(middle_parent_records(log))
+
                     if log.parent1:
                         if log.parent1.name in ['Import Creation', 'Manual Edit']:
                             record = record_dict(log.parent1)
@@ -502,6 +529,7 @@ class PropertyState(models.Model):
                             # existing records
                             record = record_dict(log.parent1.parent2)
                             history.append(record)
+                            history.extend(middle_parent_records(log.parent1))
                             record = record_dict(log.parent1.parent1)
                             history.append(record)
                         else:
@@ -846,6 +874,9 @@ class PropertyAuditLog(models.Model):
                                       related_name='parent_state1')
     parent_state2 = models.ForeignKey(PropertyState, on_delete=models.CASCADE, blank=True, null=True,
                                       related_name='parent_state2')
+    # all the parent states of a merge, as merges of more than two states are logged
+    # once with the parents of least and most priority in parent_state1 and parent_state2
+    parent_states = models.ManyToManyField(PropertyState, blank=True, related_name='propertyauditlog_parent_states')
 
     state = models.ForeignKey('PropertyState', on_delete=models.CASCADE, related_name='propertyauditlog_state')
     view = models.ForeignKey('PropertyView', on_delete=models.CASCADE, related_name='propertyauditlog_view', null=True)
@@ -9,9 +9,11 @@ from __future__ import unicode_literals
 import logging
 
 from django.db import models
+from django.db.models import Max, Min
 
 from seed.models.properties import PropertyView
 from seed.models.property_measures import PropertyMeasure
+from seed.utils.meter_aggregates import refresh_aggregates
 
 _log = logging.getLogger(__name__)
 
@@ -92,7 +94,9 @@ class Scenario(models.Model):
             # e.g., when processing BuildingFiles, it's 'promoted' after this merging
             property_ = None
 
-        for source_meter in source_scenario.meter_set.all():
+        source_meters = source_scenario.meter_set.all()
+        start_times = source_meters.aggregate(Min('meter_readings__start_time'), Max('meter_readings__start_time'))
+        for source_meter in source_meters:
             # create new meter and copy over the readings from the source_meter
             meter = Meter.objects.get(pk=source_meter.id)
             meter.pk = None
@@ -100,3 +104,8 @@ class Scenario(models.Model):
             meter.property = property_
             meter.save()  # save to get new id / association
             meter.copy_readings(source_meter, overlaps_possible=False)
+
+        if start_times['meter_readings__start_time__min'] is not None:
+            refresh_aggregates(
+                start_times['meter_readings__start_time__min'], start_times['meter_readings__start_time__max']
+            )
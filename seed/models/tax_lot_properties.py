@@ -14,6 +14,7 @@ from typing import TYPE_CHECKING, Optional, Sequence, Union
 from django.apps import apps
 from django.contrib.gis.db.models import GeometryField
 from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.postgres.aggregates.general import ArrayAgg
 from django.db import models
 from django.db.models import Count
 from django.utils.timezone import make_naive
@@ -115,6 +116,61 @@ class TaxLotProperty(models.Model):
                 data[f.name] = list(data[f.name])
         return data
 
+    @classmethod
+    def aggregate_labels_and_notes(
+        cls,
+        view_class: type,
+        ids: Sequence[int],
+        include_note_text: bool = True,
+    ) -> dict[int, dict]:
+        """
+        Collect the label names and notes of a batch of PropertyViews or TaxLotViews
+        with one query for the labels and one query for the notes, instead of two
+        queries per view.
+
+        :param view_class: PropertyView or TaxLotView
+        :param ids: list, view ids
+        :param include_note_text: if False, only the notes are counted and the
+                                  created timestamps and text are not retrieved
+        :return: dict keyed by view id, views without labels or notes have
+                 empty values:
+            {
+                <view id>: {
+                    'labels': [<label name>, ...],  # sorted by name
+                    'notes': [(<created>, <text>), ...],  # sorted by created
+                    'notes_count': int,
+                },
+                ...
+            }
+        """
+        result = {view_id: {'labels': [], 'notes': [], 'notes_count': 0} for view_id in ids}
+        if not result:
+            return result
+
+        views = view_class.objects.filter(id__in=ids).order_by()
+
+        label_rows = views.filter(labels__isnull=False).values('id').annotate(
+            label_names=ArrayAgg('labels__name', ordering='labels__name'),
+        ).values_list('id', 'label_names')
+        for view_id, label_names in label_rows:
+            result[view_id]['labels'] = label_names
+
+        notes = views.filter(notes__isnull=False).values('id')
+        if include_note_text:
+            note_rows = notes.annotate(
+                note_created=ArrayAgg('notes__created', ordering='notes__created'),
+                note_text=ArrayAgg('notes__text', ordering='notes__created'),
+            ).values_list('id', 'note_created', 'note_text')
+            for view_id, note_created, note_text in note_rows:
+                result[view_id]['notes'] = list(zip(note_created, note_text))
+                result[view_id]['notes_count'] = len(note_created)
+        else:
+            note_rows = notes.annotate(notes_count=Count('notes')).values_list('id', 'notes_count')
+            for view_id, notes_count in note_rows:
+                result[view_id]['notes_count'] = notes_count
+
+        return result
+
     @classmethod
     def serialize(
         cls,
@@ -122,6 +178,7 @@ class TaxLotProperty(models.Model):
         show_columns: Optional[list[int]],
         columns_from_database: list[dict],
         include_related: bool = True,
+        labels_and_notes: Optional[dict[int, dict]] = None,
     ) -> list[dict]:
         """
         This method takes a list of TaxLotViews or PropertyViews and returns the data along
@@ -140,6 +197,8 @@ class TaxLotProperty(models.Model):
         :param columns_from_database: columns from the database as list of dict
         :param include_related: if False, the related data is NOT included (i.e.,
                                 only the object_list is serialized) - optional (default is True)
+        :param labels_and_notes: result of aggregate_labels_and_notes for the object_list. If
+                                 provided, the note counts are read from it instead of being queried
         """
         if len(object_list) == 0:
             return []
@@ -175,9 +234,12 @@ class TaxLotProperty(models.Model):
         ids = [obj.pk for obj in object_list]
 
         # gather note counts
-        Note = apps.get_model('seed', 'Note')
-        obj_note_counts = {x[0]: x[1] for x in Note.objects.filter(**{lookups['obj_query_in']: ids})
-                           .values_list(lookups['obj_view_id']).order_by().annotate(Count(lookups['obj_view_id']))}
+        if labels_and_notes is not None:
+            obj_note_counts = {view_id: value['notes_count'] for view_id, value in labels_and_notes.items()}
+        else:
+            Note = apps.get_model('seed', 'Note')
+            obj_note_counts = {x[0]: x[1] for x in Note.objects.filter(**{lookups['obj_query_in']: ids})
+                               .values_list(lookups['obj_view_id']).order_by().annotate(Count(lookups['obj_view_id']))}
 
         # determine merge statuses
         states_qs = lookups['view_class'].objects.filter(id__in=ids)
@@ -238,6 +238,21 @@ class TaxLotState(models.Model):
                 # 'changed_fields': json.loads(log.description) if log.record_type == AUDIT_USER_EDIT else None
             }
 
+        def middle_parent_records(log):
+            # merges of more than two states only reference the parents other than
+            # parent1 and parent2 through parent_states
+            records = []
+            middle_parents = log.parent_states.exclude(
+                pk__in=[log.parent_state1_id, log.parent_state2_id]
+            ).order_by('-id')
+            for parent_state in middle_parents:
+                parent_log = TaxLotAuditLog.objects.filter(state=parent_state).order_by('id').first()
+                if parent_log and parent_log.name in ['Import Creation', 'Manual Edit']:
+                    records.append(record_dict(parent_log))
+                else:
+                    records.extend(parent_state.history()[0])
+            return records
+
         log = TaxLotAuditLog.objects.select_related('state', 'parent1', 'parent2').filter(
             state_id=self.id
         ).order_by('-id').first()
@@ -273,11 +288,14 @@ class TaxLotState(models.Model):
                             # existing records
                             record = record_dict(log.parent2.parent2)
                             history.append(record)
+                            history.extend(middle_parent_records(log.parent2))
                             record = record_dict(log.parent2.parent1)
                             history.append(record)
                         else:
                             tree = log.parent2
 
+                    history.extend(middle_parent_records(log))
+
                     if log.parent1:
                         if log.parent1.name in ['Import Creation', 'Manual Edit']:
                             record = record_dict(log.parent1)
@@ -287,6 +305,7 @@ class TaxLotState(models.Model):
                             # existing records
                             record = record_dict(log.parent1.parent2)
                             history.append(record)
+                            history.extend(middle_parent_records(log.parent1))
                             record = record_dict(log.parent1.parent1)
                             history.append(record)
                         else:
@@ -468,6 +487,9 @@ class TaxLotAuditLog(models.Model):
                                       related_name='taxlotauditlog_parent_state1')
     parent_state2 = models.ForeignKey(TaxLotState, on_delete=models.CASCADE, blank=True, null=True,
                                       related_name='taxlotauditlog_parent_state2')
+    # all the parent states of a merge, as merges of more than two states are logged
+    # once with the parents of least and most priority in parent_state1 and parent_state2
+    parent_states = models.ManyToManyField(TaxLotState, blank=True, related_name='taxlotauditlog_parent_states')
 
     state = models.ForeignKey('TaxLotState', on_delete=models.CASCADE,
                               related_name='taxlotauditlog_state')
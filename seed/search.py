@@ -19,15 +19,17 @@ from functools import reduce
 from typing import Any, Callable, Union
 
 from django.db import models
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
 from django.db.models.functions import Cast, NullIf, Replace
 from django.http.request import QueryDict, RawPostDataException
+from django.utils import timezone
 from past.builtins import basestring
 
 from seed.lib.superperms.orgs.models import Organization
 
 from .models import (
     Column,
+    PromotedExtraDataValue,
     Property,
     PropertyState,
     PropertyView,
@@ -366,7 +368,78 @@ class QueryFilter:
 AnnotationDict = dict[str, models.Func]
 
 
-def _build_extra_data_annotations(column_name: str, data_type: str) -> tuple[str, AnnotationDict]:
+def _clean_annotation_name(column_name: str) -> str:
+    # annotations require a few characters to be removed...
+    cleaned_column_name = column_name.replace(' ', '_')
+    cleaned_column_name = cleaned_column_name.replace("'", '-')
+    cleaned_column_name = cleaned_column_name.replace('"', '-')
+    cleaned_column_name = cleaned_column_name.replace('`', '-')
+    cleaned_column_name = cleaned_column_name.replace(';', '-')
+    return cleaned_column_name
+
+
+def _is_promoted(column: dict) -> bool:
+    """Returns True if filters and sorts on the column can use its promoted values
+    (see PromotedExtraDataValue) instead of casting extra_data at query time. Until the
+    values are filled, the column is filtered and sorted like other extra data columns"""
+    return (
+        column.get('is_promoted', False)
+        and column.get('promoted_values_ready', False)
+        and not column.get('related', False)
+        and column.get('table_name') in PromotedExtraDataValue.STATE_FIELDS
+        and PromotedExtraDataValue.value_field(column['data_type']) is not None
+    )
+
+
+def _build_promoted_filter(column: dict, filter: QueryFilter, value: Any) -> Q:
+    """Creates a query object which filters views on the typed values of a promoted
+    extra data column. The values are looked up in a subquery which can use the
+    (column, value) index of PromotedExtraDataValue.
+
+    :param column: dict representation of a promoted Column
+    :param filter: the parsed filter
+    :param value: the parsed filter value
+    :returns: query object usable for `*View.filter(...)`
+    """
+    value_field = PromotedExtraDataValue.value_field(column['data_type'])
+    state_field = PromotedExtraDataValue.STATE_FIELDS[column['table_name']]
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        # promoted values are stored as UTC when extra_data has no timezone
+        value = timezone.make_aware(value, timezone.utc)
+
+    lookup = f'{value_field}__{filter.operator.value}' if filter.operator else value_field
+    state_ids = PromotedExtraDataValue.objects.filter(
+        column_id=column['id'], **{lookup: value}
+    ).values(f'{state_field}_id')
+
+    if filter.is_negated:
+        return ~Q(state_id__in=state_ids)
+    else:
+        return Q(state_id__in=state_ids)
+
+
+def _build_promoted_annotations(column: dict) -> tuple[str, AnnotationDict]:
+    """Creates the annotation of the typed value of a promoted extra data column,
+    for usage like: `*View.annotate(**annotations).order_by(field_name)`
+
+    :param column: dict representation of a promoted Column
+    :returns: the annotated field name along with a dict of annotations
+    """
+    value_field = PromotedExtraDataValue.value_field(column['data_type'])
+    state_field = PromotedExtraDataValue.STATE_FIELDS[column['table_name']]
+    field_name = f'_{_clean_annotation_name(column["column_name"])}_promoted'
+
+    annotations: AnnotationDict = {
+        field_name: Subquery(
+            PromotedExtraDataValue.objects.filter(
+                column_id=column['id'], **{state_field: OuterRef('state_id')}
+            ).values(value_field)[:1]
+        )
+    }
+    return field_name, annotations
+
+
+def _build_extra_data_annotations(column_name: str, data_type: str, field_prefix: str = 'state__') -> tuple[str, AnnotationDict]:
     """Creates a dictionary of annotations which will cast the extra data column_name
     into the provided data_type, for usage like: `*View.annotate(**annotations)`
 
@@ -377,17 +450,14 @@ def _build_extra_data_annotations(column_name: str, data_type: str) -> tuple[str
 
     :param column_name: the Column.column_name for a Column which is extra_data
     :param data_type: the Column.data_type for the column
+    :param field_prefix: path from the annotated model to the state, empty when
+                         annotating a state (e.g., for expression indexes)
     :returns: the annotated field name which contains the casted result, along with
               a dict of annotations
     """
-    full_field_name = f'state__extra_data__{column_name}'
+    full_field_name = f'{field_prefix}extra_data__{column_name}'
 
-    # annotations require a few characters to be removed...
-    cleaned_column_name = column_name.replace(' ', '_')
-    cleaned_column_name = cleaned_column_name.replace("'", '-')
-    cleaned_column_name = cleaned_column_name.replace('"', '-')
-    cleaned_column_name = cleaned_column_name.replace('`', '-')
-    cleaned_column_name = cleaned_column_name.replace(';', '-')
+    cleaned_column_name = _clean_annotation_name(column_name)
     text_field_name = f'_{cleaned_column_name}_to_text'
     stripped_field_name = f'_{cleaned_column_name}_stripped'
     cleaned_field_name = f'_{cleaned_column_name}_cleaned'
@@ -462,10 +532,10 @@ def _parse_view_filter(filter_expression: str, filter_value: str, columns_by_nam
         # campus is the only column found on the canonical property (TaxLots don't have this column)
         # all other columns are found in the state
         updated_filter = QueryFilter(f'property__{filter.field_name}', filter.operator, filter.is_negated)
-    elif column['is_extra_data']:
+    elif column['is_extra_data'] and not _is_promoted(column):
         new_field_name, annotations = _build_extra_data_annotations(column['column_name'], column['data_type'])
         updated_filter = QueryFilter(new_field_name, filter.operator, filter.is_negated)
-    else:
+    elif not column['is_extra_data']:
         updated_filter = QueryFilter(f'state__{filter.field_name}', filter.operator, filter.is_negated)
 
     parser = DATA_TYPE_PARSERS.get(column['data_type'], str)
@@ -474,6 +544,10 @@ def _parse_view_filter(filter_expression: str, filter_value: str, columns_by_nam
     except Exception:
         raise FilterException(f'Invalid data type for "{filter.field_name}". Expected a valid {column["data_type"]} value.')
 
+    if updated_filter is None:
+        # promoted extra data column, filter on the typed values instead
+        return _build_promoted_filter(column, filter, new_filter_value), annotations
+
     return updated_filter.to_q(new_filter_value), annotations
 
 
@@ -495,7 +569,10 @@ def _parse_view_sort(sort_expression: str, columns_by_name: dict[str, dict]) ->
     elif column_name in columns_by_name:
         column = columns_by_name[column_name]
         if column['is_extra_data']:
-            new_field_name, annotations = _build_extra_data_annotations(column_name, column['data_type'])
+            if _is_promoted(column):
+                new_field_name, annotations = _build_promoted_annotations(column)
+            else:
+                new_field_name, annotations = _build_extra_data_annotations(column_name, column['data_type'])
             return f'{direction}{new_field_name}', annotations
         else:
             return f'{direction}state__{column_name}', {}
@@ -533,7 +610,7 @@ def build_view_filters_and_sorts(filters: QueryDict, columns: list[dict]) -> tup
 
     This function basically does the following:
     - Ignore any filter/sort that doesn't have a corresponding column
-    - Handle cases for extra data
+    - Handle cases for extra data (promoted extra data columns use their typed values)
     - Convert filtering values into their proper types (e.g., str -> int)
 
     :param filters: QueryDict from a request
@@ -560,3 +637,33 @@ def build_view_filters_and_sorts(filters: QueryDict, columns: list[dict]) -> tup
             annotations.update(parsed_annotations)
 
     return new_filters, annotations, order_by
+
+
+def get_extra_data_column_ids(filters: QueryDict, columns: list[dict]) -> tuple[set[int], set[int]]:
+    """Get the extra data columns filtered and sorted on by the filters of
+    build_view_filters_and_sorts, e.g., to record their usage (see ExtraDataUsage)
+
+    :param filters: QueryDict from a request
+    :param columns: list of all valid Columns in dict format
+    :return: ids of the filtered columns, ids of the sorted columns
+    """
+    columns_by_name = {
+        c['column_name']: c
+        for c in columns
+    }
+
+    filtered_column_ids = set()
+    for filter_expression in filters.keys():
+        if filter_expression == 'order_by':
+            continue
+        column = columns_by_name.get(QueryFilter.parse(filter_expression).field_name)
+        if column is not None and column['is_extra_data']:
+            filtered_column_ids.add(column['id'])
+
+    sorted_column_ids = set()
+    for sort_expression in filters.getlist('order_by', []):
+        column = columns_by_name.get(sort_expression.lstrip('-'))
+        if column is not None and column['is_extra_data']:
+            sorted_column_ids.add(column['id'])
+
+    return filtered_column_ids, sorted_column_ids
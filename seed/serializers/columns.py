@@ -30,8 +30,10 @@ class ColumnSerializer(serializers.ModelSerializer):
             'id', 'name', 'organization_id', 'table_name', 'merge_protection', 'shared_field_type',
             'column_name', 'is_extra_data', 'unit_name', 'unit_type', 'display_name', 'data_type',
             'is_matching_criteria', 'geocoding_order', 'recognize_empty', 'comstock_mapping',
-            'column_description', 'derived_column',
+            'column_description', 'derived_column', 'is_promoted',
+            'promoted_values_ready',
         )
+        read_only_fields = ('is_promoted', 'promoted_values_ready')
 
     def concat_name(self, obj):
         """
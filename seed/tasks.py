@@ -8,6 +8,7 @@ from __future__ import absolute_import
 
 import math
 import sys
+import traceback
 from datetime import datetime
 
 import pytz
@@ -30,6 +31,7 @@ from seed.models import (
     Column,
     ColumnMapping,
     Cycle,
+    PromotedExtraDataValue,
     Property,
     PropertyState,
     PropertyView,
@@ -37,6 +39,9 @@ from seed.models import (
     TaxLotState,
     TaxLotView
 )
+from seed.models.columns import invalidate_column_cache
+from seed.utils import extra_data_indexes
+from seed.utils.inventory_export import InventoryExporter
 
 logger = get_task_logger(__name__)
 
@@ -444,3 +449,75 @@ def update_inventory_metadata(ids, states, inventory_type, progress_key):
 
     progress_data.finish_with_success()
     return progress_data.result()['progress']
+
+
+@shared_task
+def export_inventory(org_id, inventory_type, profile_id, ids, include_notes, export_type, filename, progress_key):
+    """Write an inventory export to the media directory in the background. The
+    path of the file, relative to MEDIA_ROOT, is stored in the summary of the
+    progress data once the export is complete."""
+    progress_data = ProgressData.from_key(progress_key)
+    try:
+        exporter = InventoryExporter(
+            org_id,
+            inventory_type=inventory_type,
+            profile_id=profile_id,
+            ids=ids,
+            include_notes=include_notes,
+        )
+        path = exporter.write(filename, export_type, progress_data)
+    except Exception as e:
+        progress_data.finish_with_error(f'Failed to export inventory: {e}', traceback.format_exc())
+        return progress_data.result()
+
+    progress_data.update_summary({'file': path, 'export_type': export_type})
+    return progress_data.finish_with_success()
+
+
+@shared_task
+def refresh_promoted_column_values(column_id, progress_key, chunk_size=1000):
+    """Rebuild the typed values of a promoted extra_data column for all the states
+    of its organization"""
+    progress_data = ProgressData.from_key(progress_key)
+    column = Column.objects.get(id=column_id)
+    state_class = PropertyState if column.table_name == 'PropertyState' else TaxLotState
+    state_ids = list(
+        state_class.objects.filter(organization_id=column.organization_id)
+        .order_by('id').values_list('id', flat=True)
+    )
+    progress_data.total = max(math.ceil(len(state_ids) / chunk_size), 1)
+    progress_data.save()
+
+    for chunk_ids in batch(state_ids, chunk_size):
+        PromotedExtraDataValue.refresh_for_column(column, state_ids=chunk_ids, chunk_size=chunk_size)
+        progress_data.step()
+
+    # the values are only used if the column was not unpromoted or changed in the meantime
+    if Column.objects.filter(id=column.id, is_promoted=True, data_type=column.data_type).update(promoted_values_ready=True):
+        invalidate_column_cache(column.organization_id)
+
+    return progress_data.finish_with_success(f'Refreshed promoted values of {column.column_name}')
+
+
+@shared_task
+def create_extra_data_indexes(org_id, column_ids, min_uses, progress_key):
+    """Create the expression indexes of the extra data columns (or of the most
+    filtered and sorted columns if column_ids is empty) of an organization"""
+    progress_data = ProgressData.from_key(progress_key)
+    if column_ids:
+        columns = Column.objects.filter(organization_id=org_id, id__in=column_ids)
+    else:
+        columns = extra_data_indexes.suggested_columns(org_id, min_uses)
+    progress_data.total = max(len(columns), 1)
+    progress_data.save()
+
+    created, errors = [], []
+    for column in columns:
+        try:
+            created.append(extra_data_indexes.create_expression_index(column))
+        except extra_data_indexes.ExtraDataIndexException as e:
+            errors.append(str(e))
+        progress_data.step()
+
+    progress_data.update_summary({'created': created, 'errors': errors})
+    return progress_data.finish_with_success()
@@ -0,0 +1,13 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+
+Benchmarks of the slow paths of SEED, on large synthetic fixtures. They are not named
+test_*.py, so they are not part of the test suite. Run them one module at a time, e.g.:
+
+    ./manage.py test seed.tests.performance.benchmark_calendarization
+
+Each benchmark prints the wall time of the code it measures and checks its results.
+"""
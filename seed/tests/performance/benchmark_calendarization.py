@@ -0,0 +1,70 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase
+
+from seed.analysis_pipelines import calendarization
+from seed.analysis_pipelines.utils import (
+    SimpleMeterReading,
+    calendarize_and_extrapolate_meter_readings,
+    calendarize_meter_readings
+)
+
+# minutes between the readings of the synthetic year of readings
+INTERVAL = 15
+
+
+class BenchmarkCalendarization(TestCase):
+    def setUp(self):
+        step = timedelta(minutes=INTERVAL)
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        count = int(timedelta(days=365) / step)
+        self.meter_readings = [
+            SimpleMeterReading(start + step * i, start + step * (i + 1), 1 + i % 7)
+            for i in range(count)
+        ]
+
+        # none of the readings spans two months, so the reading of a month is the total of
+        # the readings starting in it
+        self.monthly_totals = [0] * 12
+        for meter_reading in self.meter_readings:
+            self.monthly_totals[meter_reading.start_time.month - 1] += meter_reading.reading
+
+    def _time(self, name, function):
+        start = time.perf_counter()
+        result = function(self.meter_readings)
+        print(f'{name} ({len(self.meter_readings)} readings): {time.perf_counter() - start:.3f} s')
+        return result
+
+    def _assert_monthly_readings(self, monthly_readings, expected_readings):
+        self.assertEqual(len(monthly_readings), len(expected_readings))
+        for month, (monthly_reading, expected_reading) in enumerate(zip(monthly_readings, expected_readings), start=1):
+            self.assertEqual(monthly_reading.start_time, datetime(2020, month, 1))
+            self.assertEqual(monthly_reading.end_time, datetime(2020, month, 1) + relativedelta(months=1))
+            self.assertAlmostEqual(monthly_reading.reading, expected_reading)
+
+    def test_calendarize_meter_readings(self):
+        monthly_readings = self._time('calendarize_meter_readings', calendarize_meter_readings)
+        self._assert_monthly_readings(monthly_readings, self.monthly_totals)
+
+    def test_calendarize_and_extrapolate_meter_readings(self):
+        monthly_readings = self._time('calendarize_and_extrapolate_meter_readings', calendarize_and_extrapolate_meter_readings)
+        # 2020 is a leap year, so the readings stop at the start of December 31st and the
+        # reading of December is extrapolated from its first 30 days
+        expected_readings = self.monthly_totals[:-1] + [self.monthly_totals[-1] * 31 / 30]
+        self._assert_monthly_readings(monthly_readings, expected_readings)
+
+    def test_count_days(self):
+        def count_days(meter_readings):
+            start_times, end_times, _ = calendarization.to_arrays(meter_readings)
+            return calendarization.count_days(start_times, end_times)
+
+        # the day the last reading ends on is touched as well
+        self.assertEqual(self._time('count_days', count_days), 366)
@@ -0,0 +1,109 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+import time
+
+from django.test import TestCase
+
+from seed.landing.models import SEEDUser as User
+from seed.models import (
+    Cycle,
+    Note,
+    Property,
+    PropertyState,
+    PropertyView,
+    StatusLabel,
+    TaxLotProperty
+)
+from seed.utils.inventory_export import format_notes
+from seed.utils.organizations import create_organization
+
+# number of property views in the fixture
+COUNT = 50000
+
+# number of views aggregated per query, as when streaming an export
+CHUNK_SIZE = 1000
+
+
+class BenchmarkExportLabelsAndNotes(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='test_user@demo.com', username='test_user@demo.com')
+        self.org, _, _ = create_organization(self.user)
+        cycle = Cycle.objects.filter(organization=self.org).first()
+
+        properties = Property.objects.bulk_create([Property(organization=self.org) for _ in range(COUNT)])
+        states = PropertyState.objects.bulk_create([
+            PropertyState(organization=self.org, address_line_1=f'{i} Benchmark Street') for i in range(COUNT)
+        ])
+        views = PropertyView.objects.bulk_create([
+            PropertyView(property=p, state=s, cycle=cycle) for p, s in zip(properties, states)
+        ])
+        self.view_ids = [view.id for view in views]
+
+        labels = [
+            StatusLabel.objects.create(name=f'Benchmark Label {i}', super_organization=self.org) for i in range(3)
+        ]
+        through = PropertyView.labels.through
+        through.objects.bulk_create([
+            through(propertyview_id=view.id, statuslabel_id=label.id)
+            for index, view in enumerate(views) for label in labels[:index % 4]
+        ])
+        # bulk_create sets the created timestamps of the notes
+        notes = Note.objects.bulk_create([
+            Note(name='Benchmark', text=f'Note {i} for view {view.id}', organization=self.org, property_view=view)
+            for view in views for i in range(2)
+        ])
+
+        # the expected export cells, from the fixture itself
+        notes_by_view = {view.id: [] for view in views}
+        for note in sorted(notes, key=lambda note: note.created):
+            notes_by_view[note.property_view_id].append((note.created, note.text))
+        self.expected = {
+            view.id: (
+                ','.join(label.name for label in labels[:index % 4]),
+                format_notes(notes_by_view[view.id]),
+            )
+            for index, view in enumerate(views)
+        }
+
+    def _per_record_labels_and_notes(self):
+        """The lookups of the labels and notes of each record before aggregate_labels_and_notes"""
+        per_record = {}
+        for view in PropertyView.objects.filter(id__in=self.view_ids).order_by('id'):
+            per_record[view.id] = (
+                ','.join(label.name for label in view.labels.all().order_by('name')),
+                format_notes((note.created, note.text) for note in view.notes.all().order_by('created')),
+            )
+        return per_record
+
+    def _aggregated_labels_and_notes(self):
+        aggregated = {}
+        for index in range(0, COUNT, CHUNK_SIZE):
+            chunk = TaxLotProperty.aggregate_labels_and_notes(
+                PropertyView, self.view_ids[index:index + CHUNK_SIZE]
+            )
+            for view_id, value in chunk.items():
+                aggregated[view_id] = (','.join(value['labels']), format_notes(value['notes']))
+        return aggregated
+
+    def test_aggregate_labels_and_notes(self):
+        # one query for the views, and one for the labels and one for the notes of each view
+        with self.assertNumQueries(1 + 2 * COUNT):
+            start = time.perf_counter()
+            per_record = self._per_record_labels_and_notes()
+            per_record_elapsed = time.perf_counter() - start
+
+        chunk_count = -(-COUNT // CHUNK_SIZE)
+        # one query for the labels and one for the notes of each chunk
+        with self.assertNumQueries(2 * chunk_count):
+            start = time.perf_counter()
+            aggregated = self._aggregated_labels_and_notes()
+            aggregated_elapsed = time.perf_counter() - start
+
+        print(f'per record queries: {1 + 2 * COUNT} queries in {per_record_elapsed:.2f} s')
+        print(f'aggregate_labels_and_notes ({CHUNK_SIZE} views per chunk): {2 * chunk_count} queries in {aggregated_elapsed:.2f} s')
+        self.assertEqual(per_record, self.expected)
+        self.assertEqual(aggregated, self.expected)
@@ -0,0 +1,60 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.utils import timezone as tz
+
+from seed.utils.meters import PropertyMeterReadingsExporter
+
+# minutes between the readings of the synthetic year of readings, they are not saved
+INTERVAL = 15
+
+# reading of the daily readings overlapping the interval readings, which is more than the
+# total of the interval readings of any day
+DAILY_READING = 500
+
+
+class BenchmarkMeterYearlyTotal(TestCase):
+    def setUp(self):
+        # the exporter is only used for its aggregation methods, so it is not initialized
+        self.exporter = PropertyMeterReadingsExporter.__new__(PropertyMeterReadingsExporter)
+
+    def _readings(self, overlapping):
+        step = timedelta(minutes=INTERVAL)
+        start = tz.make_aware(datetime(2020, 1, 1))
+        count = int(timedelta(days=365) / step)
+        readings = [
+            (start + step * i, start + step * (i + 1), 1 + i % 7)
+            for i in range(count)
+        ]
+        if overlapping:
+            # a reading overlapping every day of readings disables the shortcut for
+            # nonintersecting readings
+            readings += [
+                (start + timedelta(days=day), start + timedelta(days=day + 1), DAILY_READING)
+                for day in range(365)
+            ]
+        return sorted(readings, key=lambda reading: reading[1])
+
+    def _max_reading_total(self, readings, name):
+        start = time.perf_counter()
+        total = self.exporter._max_reading_total(readings)
+        print(f'_max_reading_total ({name}, {len(readings)} readings): {time.perf_counter() - start:.3f} s')
+        return total
+
+    def test_max_reading_total(self):
+        readings = self._readings(overlapping=False)
+        total = self._max_reading_total(readings, 'nonintersecting')
+        # none of the readings overlap, so all of them are counted
+        self.assertAlmostEqual(total, sum(reading for _, _, reading in readings))
+
+    def test_max_reading_total_of_overlapping_readings(self):
+        total = self._max_reading_total(self._readings(overlapping=True), 'overlapping')
+        # the daily readings are counted instead of the interval readings they overlap
+        self.assertAlmostEqual(total, 365 * DAILY_READING)
@@ -0,0 +1,110 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+import hashlib
+import time
+from datetime import datetime
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.utils import timezone as tz
+from django.utils.timezone import make_naive
+from past.builtins import basestring
+from unidecode import unidecode
+
+from seed.data_importer.hashing import hash_state, hash_states
+from seed.models import Column, PropertyState
+
+# number of mapped property states in the fixture, they are not saved
+COUNT = 100000
+
+# number of extra data fields of each state
+EXTRA_DATA_COUNT = 20
+
+# md5 of the concatenated hashes of the fixture, which must not change since the hashes
+# are compared with the hashes stored in the database
+EXPECTED_DIGEST = 'e0a1052ae19a242324fd1e9dc5249680'
+
+
+def _previous_hash_state_object(obj, include_extra_data=True):
+    """The implementation of hash_state_object before seed.data_importer.hashing"""
+    def add_dictionary_repr_to_hash(hash_obj, dict_obj):
+        assert isinstance(dict_obj, dict)
+
+        for (key, value) in sorted(dict_obj.items(), key=lambda x_y: x_y[0]):
+            if isinstance(value, dict):
+                add_dictionary_repr_to_hash(hash_obj, value)
+            else:
+                hash_obj.update(str(unidecode(key)).encode('utf-8'))
+                if isinstance(value, basestring):
+                    hash_obj.update(unidecode(value).encode('utf-8'))
+                else:
+                    hash_obj.update(str(value).encode('utf-8'))
+        return hash_obj
+
+    def _get_field_from_obj(field_obj, field):
+        if not hasattr(field_obj, field):
+            return 'FOO'
+        else:
+            return getattr(field_obj, field)
+
+    m = hashlib.md5()
+    for f in Column.retrieve_db_field_name_for_hash_comparison():
+        obj_val = _get_field_from_obj(obj, f)
+        m.update(f.encode('utf-8'))
+        if isinstance(obj_val, datetime):
+            m.update(str(make_naive(obj_val).astimezone(tz.utc).isoformat()).encode('utf-8'))
+        elif isinstance(obj_val, GEOSGeometry):
+            m.update(GEOSGeometry(obj_val, srid=4326).wkt.encode('utf-8'))
+        else:
+            m.update(str(obj_val).encode('utf-8'))
+
+    if include_extra_data:
+        add_dictionary_repr_to_hash(m, obj.extra_data)
+
+    return m.hexdigest()
+
+
+class BenchmarkStateHashing(TestCase):
+    def setUp(self):
+        sale_date = tz.make_aware(datetime(2020, 1, 1))
+        self.states = [
+            PropertyState(
+                address_line_1=f'{i} Benchmark Street',
+                city='Golden',
+                state='CO',
+                postal_code='80401',
+                pm_property_id=str(100000 + i),
+                property_name=f'Benchmark Café {i}',
+                year_built=1900 + i % 120,
+                gross_floor_area=1000 + i,
+                site_eui=50.5 + i % 100,
+                recent_sale_date=sale_date,
+                long_lat=GEOSGeometry(f'POINT ({-105 + i / 1e6} 39.7)', srid=4326),
+                extra_data={
+                    f'Extra Data {j}': f'Value {i} {j}' if j % 2 else i * j
+                    for j in range(EXTRA_DATA_COUNT)
+                },
+            )
+            for i in range(COUNT)
+        ]
+
+    def _hash(self, name, function):
+        start = time.perf_counter()
+        hashes = function(self.states)
+        print(f'{name} ({COUNT} states): {time.perf_counter() - start:.2f} s')
+        return hashlib.md5(''.join(hashes).encode('utf-8')).hexdigest()
+
+    def test_hash_states(self):
+        previous = self._hash(
+            'previous hash_state_object', lambda states: [_previous_hash_state_object(state) for state in states]
+        )
+        single = self._hash('hash_state', lambda states: [hash_state(state) for state in states])
+        batched = self._hash('hash_states', hash_states)
+
+        self.assertEqual(previous, EXPECTED_DIGEST)
+        self.assertEqual(single, EXPECTED_DIGEST)
+        self.assertEqual(batched, EXPECTED_DIGEST)
@@ -22,17 +22,21 @@ from requests import Response
 
 from config.settings.common import BASE_DIR, TIME_ZONE
 from seed.analysis_pipelines.better.buildingsync import _build_better_input
+from seed.analysis_pipelines.better.client import BETTERClient
+from seed.analysis_pipelines.better.pipeline import _wait_for_better_analyses
 from seed.analysis_pipelines.bsyncr import (
     PREMISES_ID_NAME,
     BsyncrPipeline,
     _build_bsyncr_input,
     _parse_analysis_property_view_id
 )
+from seed.analysis_pipelines.co2 import CO2Pipeline
 from seed.analysis_pipelines.eui import (
     ERROR_INVALID_GROSS_FLOOR_AREA,
     ERROR_INVALID_METER_READINGS,
     EUI_ANALYSIS_MESSAGES,
     TIME_PERIOD,
+    EUIPipeline,
     _calculate_eui,
     _get_valid_meters
 )
@@ -45,6 +49,7 @@ from seed.analysis_pipelines.pipeline import (
 from seed.analysis_pipelines.utils import SimpleMeterReading
 from seed.building_sync.building_sync import BuildingSync
 from seed.building_sync.mappings import NAMESPACES
+from seed.data_importer.hashing import hash_state
 from seed.landing.models import SEEDUser as User
 from seed.models import (
     Analysis,
@@ -52,6 +57,7 @@ from seed.models import (
     AnalysisMessage,
     AnalysisOutputFile,
     AnalysisPropertyView,
+    Column,
     Meter,
     MeterReading
 )
@@ -956,6 +962,31 @@ class TestBETTERPipeline(TestCase):
         self.assertTrue("BETTER analysis requires the property's name." in errors)
         self.assertTrue("BETTER analysis requires the property's city." in errors)
 
+    def test_wait_for_better_analyses_checks_again_until_the_analyses_are_done(self):
+        # Setup
+        analysis = self.analysis_property_view.analysis
+        analysis.status = Analysis.RUNNING
+        analysis.save()
+        building_analyses = [{
+            'analysis_property_view_id': self.analysis_property_view.id,
+            'better_building_id': 100,
+            'better_analysis_id': None,
+        }]
+
+        # Act
+        # the first check finds the analysis still running, so the task is enqueued again (and run
+        # immediately b/c tasks are eager in tests)
+        with patch.object(BETTERClient, 'get_building_analysis_status', side_effect=[(None, []), (3, [])]) as mock_status, \
+                patch('seed.analysis_pipelines.better.pipeline._store_better_building_analysis_results') as mock_store, \
+                patch('seed.analysis_pipelines.better.pipeline.chain') as mock_chain:
+            _wait_for_better_analyses.delay(analysis.id, None, None, building_analyses, 0)
+
+        # Assert
+        self.assertEqual(mock_status.call_count, 2)
+        stored_building_analyses = mock_store.call_args[0][0]
+        self.assertEqual([(b.better_building_id, b.better_analysis_id) for b in stored_building_analyses], [(100, 3)])
+        mock_chain.return_value.apply_async.assert_called_once()
+
 
 class TestEuiPipeline(TestCase):
     def setUp(self):
@@ -1028,6 +1059,88 @@ class TestEuiPipeline(TestCase):
         self.assertDictEqual(errors_by_property_view_id, {})
         self.assertNotEqual(meter_readings_by_property_view, {})
 
+    def test_valid_meters_are_read_in_bulk(self):
+        other_property = FakePropertyFactory(organization=self.org).get_property()
+        other_property_view = FakePropertyViewFactory(organization=self.org, user=self.user).get_property_view(
+            prprty=other_property,
+            cycle=self.cycle,
+            state=FakePropertyStateFactory(organization=self.org).get_property_state(gross_floor_area=ureg.Quantity(float(5000), "foot ** 2"))
+        )
+        other_meter = Meter.objects.create(
+            property=other_property,
+            source=Meter.PORTFOLIO_MANAGER,
+            source_id="Other Source ID",
+            type=Meter.ELECTRICITY_GRID
+        )
+        for meter, year in ((self.meter, 2020), (other_meter, 2019), (other_meter, 2021)):
+            for j in range(1, 13):
+                MeterReading.objects.create(
+                    meter=meter,
+                    start_time=make_aware(datetime(year, j, 1, 0, 0, 0), timezone=self.timezone_object),
+                    end_time=make_aware(datetime(year, j, 28, 0, 0, 0), timezone=self.timezone_object),
+                    reading=j,
+                    source_unit='kWh',
+                    conversion_factor=1.00
+                )
+
+        # one query for the property views and one for the readings of all their properties
+        with self.assertNumQueries(2):
+            meter_readings_by_property_view, errors_by_property_view_id = _get_valid_meters([self.property_view.id, other_property_view.id])
+
+        self.assertDictEqual(errors_by_property_view_id, {})
+        for property_view, year in ((self.property_view, 2020), (other_property_view, 2021)):
+            meter_readings = meter_readings_by_property_view[property_view.id]
+            self.assertEqual([reading.reading for reading in meter_readings], list(range(1, 13)))
+            self.assertTrue(all(reading.start_time.year == year for reading in meter_readings))
+
+    @override_settings(ANALYSIS_RUN_BATCH_SIZE=1)
+    def test_run_analysis_in_chunks(self):
+        other_property = FakePropertyFactory(organization=self.org).get_property()
+        other_property_view = FakePropertyViewFactory(organization=self.org, user=self.user).get_property_view(
+            prprty=other_property,
+            cycle=self.cycle,
+            state=FakePropertyStateFactory(organization=self.org).get_property_state(gross_floor_area=ureg.Quantity(float(5000), "foot ** 2"))
+        )
+        other_meter = Meter.objects.create(
+            property=other_property,
+            source=Meter.PORTFOLIO_MANAGER,
+            source_id="Other Source ID",
+            type=Meter.ELECTRICITY_GRID
+        )
+        for meter, reading in ((self.meter, 12345), (other_meter, 1000)):
+            for j in range(1, 13):
+                MeterReading.objects.create(
+                    meter=meter,
+                    start_time=make_aware(datetime(2020, j, 1, 0, 0, 0), timezone=self.timezone_object),
+                    end_time=make_aware(datetime(2020, j, 28, 0, 0, 0), timezone=self.timezone_object),
+                    reading=reading,
+                    source_unit='kWh',
+                    conversion_factor=1.00
+                )
+        analysis = FakeAnalysisFactory(organization=self.org, user=self.user).get_analysis(service=Analysis.EUI)
+        eui_column = Column.objects.create(
+            column_name='analysis_eui',
+            data_type='number',
+            is_extra_data=True,
+            is_promoted=True,
+            table_name='PropertyState',
+            organization=self.org,
+        )
+
+        # the analysis runs immediately, with a task per property view
+        EUIPipeline(analysis.id).prepare_analysis([self.property_view.id, other_property_view.id])
+
+        analysis.refresh_from_db()
+        self.assertEqual(analysis.status, Analysis.COMPLETED)
+        for property_view, eui in ((self.property_view, 14.81), (other_property_view, 2.4)):
+            analysis_property_view = AnalysisPropertyView.objects.get(analysis=analysis, property=property_view.property)
+            self.assertEqual(analysis_property_view.parsed_results['Fractional EUI (kBtu/sqft)'], eui)
+
+            property_view.state.refresh_from_db()
+            self.assertEqual(property_view.state.extra_data['analysis_eui'], eui)
+            self.assertEqual(property_view.state.hash_object, hash_state(property_view.state))
+            self.assertEqual(eui_column.promoted_values.get(property_state=property_view.state).value_number, eui)
+
     def test_calculate_eui(self):
         reading_start_time = datetime(2020, 1, 1)
         reading_end_time = reading_start_time + TIME_PERIOD
@@ -1037,3 +1150,68 @@ class TestEuiPipeline(TestCase):
         self.assertEqual(results['eui'], 0.63)
         self.assertEqual(results['reading'], reading_amount)
         self.assertEqual(results['coverage'], 100)
+
+
+class TestCO2Pipeline(TestCase):
+    def setUp(self):
+        user_details = {
+            'username': 'test_user@demo.com',
+            'password': 'test_pass',
+            'email': 'test_user@demo.com',
+            'first_name': 'Test',
+            'last_name': 'User',
+        }
+        self.user = User.objects.create_user(**user_details)
+        self.org, _, _ = create_organization(self.user)
+        self.cycle = FakeCycleFactory(organization=self.org, user=self.user).get_cycle()
+        self.timezone_object = pytztimezone(TIME_ZONE)
+
+    def _create_property_view_with_readings(self, source_id, gross_floor_area, reading):
+        test_property = FakePropertyFactory(organization=self.org).get_property()
+        property_state = FakePropertyStateFactory(organization=self.org).get_property_state(
+            gross_floor_area=ureg.Quantity(float(gross_floor_area), "foot ** 2"),
+            egrid_subregion_code='CAMX'
+        )
+        property_view = FakePropertyViewFactory(organization=self.org, user=self.user).get_property_view(
+            prprty=test_property, cycle=self.cycle, state=property_state
+        )
+        meter = Meter.objects.create(
+            property=test_property,
+            source=Meter.PORTFOLIO_MANAGER,
+            source_id=source_id,
+            type=Meter.ELECTRICITY_GRID
+        )
+        for j in range(1, 13):
+            MeterReading.objects.create(
+                meter=meter,
+                start_time=make_aware(datetime(2020, j, 1, 0, 0, 0), timezone=self.timezone_object),
+                end_time=make_aware(datetime(2020, j, 28, 0, 0, 0), timezone=self.timezone_object),
+                reading=reading,
+                source_unit='kWh',
+                conversion_factor=1.00
+            )
+        return property_view
+
+    @override_settings(ANALYSIS_RUN_BATCH_SIZE=1)
+    def test_run_analysis_in_chunks(self):
+        property_view = self._create_property_view_with_readings('Source ID', 10000, 12345)
+        other_property_view = self._create_property_view_with_readings('Other Source ID', 5000, 1000)
+        analysis = FakeAnalysisFactory(organization=self.org, user=self.user).get_analysis(
+            service=Analysis.CO2,
+            configuration={'save_co2_results': True}
+        )
+
+        # the analysis runs immediately, with a task per property view
+        CO2Pipeline(analysis.id).prepare_analysis([property_view.id, other_property_view.id])
+
+        analysis.refresh_from_db()
+        self.assertEqual(analysis.status, Analysis.COMPLETED)
+        for view, co2, mwh in ((property_view, 9178, 43.42), (other_property_view, 743, 3.52)):
+            analysis_property_view = AnalysisPropertyView.objects.get(analysis=analysis, property=view.property)
+            self.assertEqual(analysis_property_view.parsed_results['Average Annual CO2 (kgCO2e)'], co2)
+            self.assertEqual(analysis_property_view.parsed_results['Total Annual Meter Reading (MWh)'], mwh)
+            self.assertEqual(analysis_property_view.parsed_results['Annual Coverage %'], 92)
+
+            view.state.refresh_from_db()
+            self.assertAlmostEqual(view.state.total_ghg_emissions.magnitude, co2 / 1000)
+            self.assertEqual(view.state.hash_object, hash_state(view.state))
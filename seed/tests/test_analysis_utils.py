@@ -8,6 +8,7 @@ from datetime import datetime as dt
 
 from django.test import TestCase
 
+from seed.analysis_pipelines import calendarization
 from seed.analysis_pipelines.utils import (
     SimpleMeterReading,
     _split_reading,
@@ -345,6 +346,26 @@ class TestAnalysisUtils(TestCase):
         ]
         self.assertListEqual(expected, result)
 
+    def test_count_days_counts_days_touched_by_overlapping_readings_once(self):
+        # -- Setup
+        original_readings = [
+            # January 30 through February 2 (4 days)
+            SimpleMeterReading(dt(2021, 1, 30, 12), dt(2021, 2, 2, 6), 1),
+            # within the days of the first reading
+            SimpleMeterReading(dt(2021, 1, 31), dt(2021, 2, 1), 1),
+            # February 2 through February 3 (1 more day)
+            SimpleMeterReading(dt(2021, 2, 2, 6), dt(2021, 2, 3, 1), 1),
+            # February 10 (1 more day)
+            SimpleMeterReading(dt(2021, 2, 10, 1), dt(2021, 2, 10, 2), 1),
+        ]
+
+        # -- Act
+        start_times, end_times, _ = calendarization.to_arrays(original_readings)
+        result = calendarization.count_days(start_times, end_times)
+
+        # -- Assert
+        self.assertEqual(6, result)
+
     def test_interpolate_works_when_one_month_missing(self):
         # -- Setup
         readings = [
@@ -0,0 +1,122 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase
+
+from seed.analysis_pipelines.better.client import BETTERClient
+
+
+class StubBETTERHandler(BaseHTTPRequestHandler):
+    """Answers the requests of the BETTERClient like the BETTER API would. The status
+    endpoints return the generation results of server.generation_results one at a time.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.active_requests += 1
+            server.max_active_requests = max(server.max_active_requests, server.active_requests)
+
+        # the body of the BuildingSync files of the tests is the building id
+        content = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        # give the other requests time to start
+        time.sleep(0.05)
+
+        with server.lock:
+            server.active_requests -= 1
+
+        if content == 'invalid':
+            self._respond(400, {'detail': 'Invalid BuildingSync file'})
+        else:
+            self._respond(201, {'id': int(content)})
+
+    def do_GET(self):
+        generation_result = self.server.generation_results.pop(0)
+        if self.path.startswith('/api/v1/portfolios/'):
+            self._respond(200, {'id': 2, 'generation_result': generation_result})
+        else:
+            self._respond(200, [{'id': 3, 'generation_result': generation_result}])
+
+
+class TestBETTERClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBETTERHandler)
+        self.server.lock = threading.Lock()
+        self.server.active_requests = 0
+        self.server.max_active_requests = 0
+        self.server.generation_results = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        host = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.client = BETTERClient('token', host=host, max_concurrent_requests=4)
+
+        self.files_dir = TemporaryDirectory()
+        self.addCleanup(self.files_dir.cleanup)
+
+    def _bsync_xmls(self, contents):
+        paths = []
+        for i, content in enumerate(contents):
+            path = f'{self.files_dir.name}/{i}.xml'
+            with open(path, 'w') as f:
+                f.write(content)
+            paths.append(path)
+        return paths
+
+    def test_create_buildings_makes_concurrent_requests_up_to_the_limit(self):
+        bsync_xmls = self._bsync_xmls([str(building_id) for building_id in range(100, 120)])
+
+        results = self.client.create_buildings(bsync_xmls, better_portfolio_id=1)
+
+        self.assertEqual(results, [(building_id, []) for building_id in range(100, 120)])
+        self.assertGreater(self.server.max_active_requests, 1)
+        self.assertLessEqual(self.server.max_active_requests, 4)
+
+    def test_create_buildings_returns_errors_of_each_building(self):
+        bsync_xmls = self._bsync_xmls(['100', 'invalid', '102'])
+
+        results = self.client.create_buildings(bsync_xmls)
+
+        self.assertEqual(results[0], (100, []))
+        self.assertIsNone(results[1][0])
+        self.assertIn('Received non 2xx status from BETTER: 400', results[1][1][0])
+        self.assertEqual(results[2], (102, []))
+
+    def test_get_portfolio_analysis_status(self):
+        self.server.generation_results = ['PENDING', 'COMPLETE', 'FAILED']
+
+        self.assertEqual(self.client.get_portfolio_analysis_status(1, 2), (False, []))
+        self.assertEqual(self.client.get_portfolio_analysis_status(1, 2), (True, []))
+        is_complete, errors = self.client.get_portfolio_analysis_status(1, 2)
+        self.assertFalse(is_complete)
+        self.assertIn('BETTER failed to generate the portfolio analysis', errors[0])
+
+    def test_get_building_analysis_status(self):
+        self.server.generation_results = ['PENDING', 'COMPLETE', 'FAILED']
+
+        self.assertEqual(self.client.get_building_analysis_status(100), (None, []))
+        self.assertEqual(self.client.get_building_analysis_status(100), (3, []))
+        better_analysis_id, errors = self.client.get_building_analysis_status(100)
+        self.assertIsNone(better_analysis_id)
+        self.assertIn('BETTER failed to generate the building analysis', errors[0])
@@ -142,6 +142,8 @@ class DefaultColumnsViewTests(DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         # randomly check a column
         self.assertIn(expected, data)
@@ -302,3 +304,25 @@ class DefaultColumnsViewTests(DeleteModelsTestCase):
         result = response.json()
         self.assertFalse(result['success'])
         self.assertEqual(result['message'], 'Cannot find column in org=%s with pk=-999' % self.org.id)
+
+    def test_promote_column(self):
+        column = Column.objects.create(column_name='test_number',
+                                       data_type='number',
+                                       table_name='PropertyState',
+                                       organization=self.org,
+                                       is_extra_data=True)
+        state = self.property_state_factory.get_property_state(extra_data={'test_number': '12'})
+        url = reverse('api:v3:columns-promote', args=[column.pk])
+
+        response = self.client.post(url, content_type='application/json', data=json.dumps({'is_promoted': 'false'}))
+        self.assertEqual(response.status_code, 200)
+        column.refresh_from_db()
+        self.assertFalse(column.is_promoted)
+
+        # the task filling the values runs immediately in the tests
+        response = self.client.post(url, content_type='application/json', data=json.dumps({'is_promoted': True}))
+        self.assertEqual(response.status_code, 200)
+        column.refresh_from_db()
+        self.assertTrue(column.is_promoted)
+        self.assertTrue(column.promoted_values_ready)
+        self.assertEqual(list(column.promoted_values.values_list('property_state_id', 'value_number')), [(state.id, 12.0)])
@@ -880,6 +880,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -901,6 +903,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -922,6 +926,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -944,6 +950,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -965,6 +973,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -985,6 +995,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -1016,6 +1028,8 @@ class TestColumnsByInventory(TestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(c, columns)
 
@@ -1037,6 +1051,31 @@ class TestColumnsByInventory(TestCase):
         with self.assertRaisesRegex(Exception, 'Duplicate name'):
             Column.retrieve_all(self.fake_org.pk, 'property', False)
 
+    def test_column_retrieve_all_is_cached_until_the_columns_change(self):
+        columns = Column.retrieve_all(self.fake_org.pk, 'property', False)
+        with self.assertNumQueries(0):
+            self.assertEqual(Column.retrieve_all(self.fake_org.pk, 'property', False), columns)
+
+        # changing the returned columns does not change the cached columns
+        columns[0]['display_name'] = 'Changed'
+        columns.pop()
+        self.assertNotEqual(Column.retrieve_all(self.fake_org.pk, 'property', False), columns)
+
+        column = Column.objects.get(organization=self.fake_org, column_name='Column A')
+        column.display_name = 'Renamed Column A'
+        column.save()
+        columns = Column.retrieve_all(self.fake_org.pk, 'property', False)
+        self.assertIn('Renamed Column A', [c['display_name'] for c in columns])
+
+        used_columns = Column.retrieve_all(self.fake_org.pk, 'property', True)
+        self.assertEqual(len(used_columns), 1)
+        mapping = seed_models.ColumnMapping.objects.create(super_organization=self.fake_org)
+        mapping.column_mapped.add(Column.objects.get(organization=self.fake_org, column_name="Apostrophe's Field"))
+        self.assertEqual(len(Column.retrieve_all(self.fake_org.pk, 'property', True)), 2)
+
+        mapping.delete()
+        self.assertEqual(len(Column.retrieve_all(self.fake_org.pk, 'property', True)), 1)
+
     def test_column_retrieve_schema(self):
         schema = {
             "types": {
@@ -4,10 +4,19 @@
 :copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
 :author
 """
+from django.db import connection
 from django.forms.models import model_to_dict
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from quantityfield.units import ureg
 
-from seed.models import Column, DerivedColumnParameter, PropertyView
+from seed.data_importer.tasks import do_checks
+from seed.models import (
+    Column,
+    DerivedColumnParameter,
+    PropertyState,
+    PropertyView
+)
 from seed.models.data_quality import (
     DataQualityCheck,
     DataQualityTypeCastError,
@@ -24,6 +33,7 @@ from seed.test_helpers.fake import (
     FakeTaxLotStateFactory
 )
 from seed.tests.util import AssertDictSubsetMixin, DataMappingBaseTestCase
+from seed.utils.cache import get_cache_raw
 
 
 class DataQualityCheckTests(AssertDictSubsetMixin, DataMappingBaseTestCase):
@@ -467,3 +477,137 @@ class DataQualityCheckTests(AssertDictSubsetMixin, DataMappingBaseTestCase):
             {'field': derived_column_name, 'message': f'{derived_column_name} out of range'},
             bad_results[0]
         )
+
+    def test_check_data_in_bulk(self):
+        dq = DataQualityCheck.retrieve(self.org.id)
+        dq.add_rule({
+            'field': 'custom_id_1',
+            'table_name': 'PropertyState',
+            'data_type': Rule.TYPE_STRING,
+            'rule_type': Rule.RULE_TYPE_CUSTOM,
+            'condition': Rule.RULE_INCLUDE,
+            'text_match': 'zzz',
+            'severity': Rule.SEVERITY_ERROR,
+        })
+        # extra data rules are checked in Python
+        Column.objects.create(
+            column_name='custom_number',
+            table_name='PropertyState',
+            organization=self.org,
+            is_extra_data=True,
+        )
+        dq.add_rule({
+            'field': 'custom_number',
+            'table_name': 'PropertyState',
+            'data_type': Rule.TYPE_NUMBER,
+            'rule_type': Rule.RULE_TYPE_CUSTOM,
+            'condition': Rule.RULE_RANGE,
+            'max': 10,
+            'severity': Rule.SEVERITY_WARNING,
+        })
+        site_eui_label = StatusLabel.objects.create(name='Check Site EUI', super_organization=self.org)
+        site_eui_rule = dq.rules.get(table_name='PropertyState', field='site_eui', max='1000')
+        site_eui_rule.status_label = site_eui_label
+        site_eui_rule.save()
+
+        ps_bad = self.property_state_factory.get_property_state(
+            None, no_default_data=True, custom_id_1='abcd', pm_property_id='PMID', site_eui=525600, year_built=1699
+        )
+        ps_good = self.property_state_factory.get_property_state(
+            None, no_default_data=True, custom_id_1='zzz', pm_property_id='PMID', address_line_1='1 Main St',
+            site_eui=50, year_built=2000
+        )
+        ps_extra_data = self.property_state_factory.get_property_state(
+            None, no_default_data=True, custom_id_1='zzz', pm_property_id='PMID', address_line_1='2 Main St',
+            extra_data={'custom_number': '20'}
+        )
+        bad_view = PropertyView.objects.create(property=self.property_factory.get_property(), cycle=self.cycle, state=ps_bad)
+        good_view = PropertyView.objects.create(property=self.property_factory.get_property(), cycle=self.cycle, state=ps_good)
+        good_view.labels.add(site_eui_label)
+        states = [ps_bad, ps_good, ps_extra_data]
+
+        expected = DataQualityCheck.retrieve(self.org.id)
+        expected.check_data('PropertyState', states)
+        good_view.labels.add(site_eui_label)
+        bad_view.labels.remove(site_eui_label)
+
+        dq = DataQualityCheck.retrieve(self.org.id)
+        dq.check_data_in_bulk('PropertyState', PropertyState.objects.filter(id__in=[s.id for s in states]))
+
+        self.assertEqual(dq.results, expected.results)
+        self.assertEqual(list(dq.results.keys()), [ps_bad.id, ps_extra_data.id])
+        self.assertEqual(
+            [r['field'] for r in dq.results[ps_extra_data.id]['data_quality_results']],
+            ['custom_number']
+        )
+        self.assertEqual(list(bad_view.labels.all()), [site_eui_label])
+        self.assertEqual(list(good_view.labels.all()), [])
+
+    @override_settings(DATA_QUALITY_BATCH_SIZE=2)
+    def test_results_are_stored_by_chunk(self):
+        states = [
+            self.property_state_factory.get_property_state(
+                None, no_default_data=True, custom_id_1=f'{i}', pm_property_id=f'PM{i}',
+                address_line_1=f'{i} Main St', energy_score=500 if i % 2 else 5
+            )
+            for i in range(5)
+        ]
+
+        # the ids are checked in chunks of 2, out of order
+        ids = [state.id for state in reversed(states)]
+        do_checks(self.org.id, ids, [], 'chunked')
+
+        cache_key = DataQualityCheck.cache_key('chunked', self.org.id)
+        self.assertEqual(get_cache_raw(cache_key), {'chunks': 3})
+        self.assertEqual(len(get_cache_raw(DataQualityCheck.chunk_cache_key(cache_key, 0))), 2)
+
+        results = list(DataQualityCheck.retrieve_results('chunked', self.org.id))
+        self.assertEqual([r['id'] for r in results], sorted(ids))
+
+        errors = list(DataQualityCheck.retrieve_results('chunked', self.org.id, 'error'))
+        self.assertEqual([r['id'] for r in errors], [states[1].id, states[3].id])
+        for result in errors:
+            self.assertEqual(
+                [r['field'] for r in result['data_quality_results']],
+                ['energy_score']
+            )
+
+        # a new run removes the results of the previous run
+        DataQualityCheck.initialize_cache('chunked', self.org.id)
+        self.assertIsNone(get_cache_raw(DataQualityCheck.chunk_cache_key(cache_key, 0)))
+        self.assertEqual(list(DataQualityCheck.retrieve_results('chunked', self.org.id)), [])
+        self.assertIsNone(DataQualityCheck.retrieve_results('missing', self.org.id))
+
+    def test_check_data_queries_do_not_depend_on_the_number_of_rows(self):
+        dq = DataQualityCheck.retrieve(self.org.id)
+        site_eui_label = StatusLabel.objects.create(name='Check Site EUI', super_organization=self.org)
+        site_eui_rule = dq.rules.get(table_name='PropertyState', field='site_eui', max='1000')
+        site_eui_rule.status_label = site_eui_label
+        site_eui_rule.save()
+
+        def check_views(count):
+            # half of the views are to be labeled, the other half have a label to remove
+            views = []
+            for i in range(count):
+                state = self.property_state_factory.get_property_state(
+                    None, no_default_data=True, pm_property_id=f'PM{i}', address_line_1=f'{i} Main St',
+                    site_eui=525600 if i % 2 else 50
+                )
+                view = PropertyView.objects.create(
+                    property=self.property_factory.get_property(), cycle=self.cycle, state=state
+                )
+                if not i % 2:
+                    view.labels.add(site_eui_label)
+                views.append(view)
+
+            dq = DataQualityCheck.retrieve(self.org.id)
+            with CaptureQueriesContext(connection) as queries:
+                dq.check_data('PropertyState', [view.state for view in views])
+
+            for i, view in enumerate(views):
+                self.assertEqual(list(view.labels.all()), [site_eui_label] if i % 2 else [])
+            return len(queries)
+
+        # warm up the caches of the columns
+        check_views(2)
+        self.assertEqual(check_views(2), check_views(20))
@@ -6,6 +6,7 @@
 """
 from string import Template, ascii_letters, digits
 
+import numpy as np
 from django.core.exceptions import ValidationError
 from hypothesis import assume, example, given, settings
 from hypothesis import strategies as st
@@ -19,6 +20,7 @@ from seed.models.derived_columns import (
     ExpressionEvaluator,
     InvalidExpression
 )
+from seed.models.properties import PropertyState
 from seed.test_helpers.fake import (
     FakeColumnFactory,
     FakeDerivedColumnFactory,
@@ -278,6 +280,59 @@ class TestExpressionEvaluator(TestCase):
         actual = ExpressionEvaluator(expression).evaluate(params)
         self.assertEqual(expected, actual)
 
+    def test_evaluator_evaluate_arrays_matches_evaluate(self):
+        # -- Setup
+        expressions = [
+            '$a + $b * 2',
+            '($a / $b) * 100',
+            'max($a, $b, 3) - min($a, $b)',
+            'abs(-$a) % $b',
+            '$a ** 2 + -$b',
+            '$a + $missing',
+            '4 * 2',
+        ]
+        a_values = [1.0, 2.5, -4.0, 0.0, float('nan'), 7.0]
+        b_values = [2.0, 0.0, 3.5, float('nan'), 1.0, -2.0]
+
+        for expression in expressions:
+            evaluator = ExpressionEvaluator(expression)
+
+            # -- Act
+            results = evaluator.evaluate_arrays({'a': np.array(a_values), 'b': np.array(b_values)}, len(a_values))
+
+            # -- Assert
+            for a, b, result in zip(a_values, b_values, results):
+                params = {k: v for k, v in [('a', a), ('b', b)] if not np.isnan(v)}
+                try:
+                    expected = evaluator.evaluate(params)
+                except (KeyError, ZeroDivisionError):
+                    expected = None
+
+                if expected is None:
+                    self.assertTrue(np.isnan(result), f'{expression} with a={a}, b={b}')
+                else:
+                    self.assertAlmostEqual(expected, result, msg=f'{expression} with a={a}, b={b}')
+
+    def test_evaluator_caches_parsed_expressions(self):
+        # -- Setup
+        ExpressionEvaluator.cache_clear()
+
+        # -- Act
+        first = ExpressionEvaluator('$a * 2')
+        second = ExpressionEvaluator('$a * 2')
+        ExpressionEvaluator('$a * 3')
+
+        # -- Assert
+        self.assertEqual(first.evaluate({'a': 2}), 4)
+        self.assertEqual(second.evaluate({'a': 3}), 6)
+        info = ExpressionEvaluator.cache_info()
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['misses'], 2)
+        self.assertEqual(info['size'], 2)
+
+        ExpressionEvaluator.invalidate('$a * 2')
+        self.assertEqual(ExpressionEvaluator.cache_info()['size'], 1)
+
     def test_evaluator_raises_helpful_exception_when_expression_is_invalid(self):
         # -- Setup
         expression = '1 + HELLO'
@@ -670,3 +725,101 @@ class TestDerivedColumns(TestCase):
 
         # Derived Column 2 (defined by a different derived column) can be evaluated
         self.assertEqual(derived_column2.evaluate(property_state), 5)
+
+    def test_derived_column_evaluate_many_matches_evaluate(self):
+        # -- Setup
+        expression = '($a + $b) / $c'
+        extra_data_column = self.col_factory('foo', is_extra_data=True)
+        core_column = self.numeric_core_columns[0]
+        column_parameters = {
+            'a': {'source_column': extra_data_column, 'value': 1},
+            'b': {'source_column': core_column, 'value': 1},
+            'c': {'source_column': self.col_factory('bar', is_extra_data=True), 'value': 2},
+        }
+
+        models = self._derived_column_for_property_factory(expression, column_parameters)
+        derived_column = models['derived_column']
+        property_states = [
+            models['property_state'],
+            # missing extra data
+            self.property_state_factory.get_property_state(**{core_column.column_name: 3, 'extra_data': {'bar': 2}}),
+            # non-numeric extra data
+            self.property_state_factory.get_property_state(**{
+                core_column.column_name: 3, 'extra_data': {'foo': 'HELLO', 'bar': 2}
+            }),
+            # numeric string and division by zero
+            self.property_state_factory.get_property_state(**{
+                core_column.column_name: 3, 'extra_data': {'foo': '5', 'bar': 0}
+            }),
+            self.property_state_factory.get_property_state(**{
+                core_column.column_name: 3, 'extra_data': {'foo': '5', 'bar': 4}
+            }),
+        ]
+        expected = [derived_column.evaluate(property_state) for property_state in property_states]
+        self.assertEqual([1, None, None, None, 2], expected)
+
+        # -- Act
+        list_results = derived_column.evaluate_many(property_states)
+        queryset_results = derived_column.evaluate_many(
+            PropertyState.objects.filter(id__in=[state.id for state in property_states]).order_by('id')
+        )
+
+        # -- Assert
+        self.assertEqual(expected, list_results)
+        self.assertEqual(expected, queryset_results)
+
+    def test_derived_column_evaluate_many_with_derived_column_as_source_column(self):
+        # -- Setup
+        column_parameters = {
+            'a': {
+                'source_column': self.col_factory('foo', is_extra_data=True),
+                'value': 1,
+            },
+        }
+        models = self._derived_column_for_property_factory('$a + 2', column_parameters)
+        derived_column = models['derived_column']
+        derived_column.name = 'dc1'
+        derived_column.save()
+        property_states = [
+            models['property_state'],
+            self.property_state_factory.get_property_state(extra_data={'foo': 10}),
+            self.property_state_factory.get_property_state(extra_data={}),
+        ]
+
+        column_parameters = {
+            'b': {
+                'source_column': Column.objects.get(derived_column=derived_column.id),
+                'value': None
+            },
+        }
+        models = self._derived_column_for_property_factory('$b * 2', column_parameters, create_property_state=False)
+        derived_column2 = models['derived_column']
+
+        # -- Act
+        results = derived_column2.evaluate_many(property_states)
+
+        # -- Assert
+        self.assertEqual([6, 24, None], results)
+        self.assertEqual([derived_column2.evaluate(state) for state in property_states], results)
+
+    def test_derived_column_save_invalidates_cached_expression(self):
+        # -- Setup
+        column_parameters = {
+            'a': {
+                'source_column': self.col_factory('foo', is_extra_data=True),
+                'value': 1,
+            },
+        }
+        models = self._derived_column_for_property_factory('$a + 2', column_parameters)
+        derived_column = models['derived_column']
+        property_state = models['property_state']
+        self.assertEqual(derived_column.evaluate(property_state), 3)
+        self.assertIn('$a + 2', ExpressionEvaluator._cache._trees)
+
+        # -- Act
+        derived_column.expression = '$a + 5'
+        derived_column.save()
+
+        # -- Assert
+        self.assertNotIn('$a + 2', ExpressionEvaluator._cache._trees)
+        self.assertEqual(derived_column.evaluate(property_state), 6)
@@ -0,0 +1,115 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+from django.db import connection
+from django.http.request import QueryDict
+from django.test import TestCase
+
+from seed.landing.models import SEEDUser as User
+from seed.models import Column, ExtraDataUsage, PropertyView
+from seed.search import build_view_filters_and_sorts, get_extra_data_column_ids
+from seed.test_helpers.fake import FakePropertyViewFactory
+from seed.utils import extra_data_indexes
+from seed.utils.organizations import create_organization
+
+
+class TestExtraDataIndexes(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test')
+        self.org, _, _ = create_organization(self.user)
+        self.property_view_factory = FakePropertyViewFactory(organization=self.org)
+        self.column = Column.objects.create(
+            column_name='test_number',
+            data_type='number',
+            is_extra_data=True,
+            table_name='PropertyState',
+            organization=self.org,
+        )
+
+    def _filter(self, query_string):
+        columns = Column.retrieve_all(self.org, 'property', only_used=False, include_related=False)
+        return build_view_filters_and_sorts(QueryDict(query_string), columns)
+
+    def test_extra_data_usage_is_counted_in_the_cache_until_it_is_read(self):
+        columns = Column.retrieve_all(self.org, 'property', only_used=False, include_related=False)
+        for query_string in ['test_number__gte=10', 'test_number=10&order_by=-test_number', 'site_eui__gte=10&order_by=test_number']:
+            # parsing the filters doesn't record anything
+            self._filter(query_string)
+            ExtraDataUsage.record(*get_extra_data_column_ids(QueryDict(query_string), columns))
+        self.assertEqual(ExtraDataUsage.objects.count(), 0)
+
+        # reading the suggestions saves the usage
+        self.assertEqual(extra_data_indexes.suggested_columns(self.org.id, min_uses=4), [self.column])
+        usage = ExtraDataUsage.objects.get(column=self.column)
+        self.assertEqual(usage.filter_count, 2)
+        self.assertEqual(usage.sort_count, 2)
+        self.assertIsNotNone(usage.last_used)
+        # canonical columns are not tracked
+        self.assertEqual(ExtraDataUsage.objects.count(), 1)
+
+        # the saved counts are not added again
+        self.assertEqual(extra_data_indexes.suggested_columns(self.org.id, min_uses=5), [])
+        ExtraDataUsage.record([self.column.id], [])
+        self.assertEqual(extra_data_indexes.suggested_columns(self.org.id, min_uses=5), [self.column])
+
+    def test_expression_index_is_used_by_filters(self):
+        self.property_view_factory.get_property_view(extra_data={'test_number': '9'})
+        self.property_view_factory.get_property_view(extra_data={'test_number': '10'})
+
+        name = extra_data_indexes.create_expression_index(self.column)
+        self.assertEqual(
+            [index['name'] for index in extra_data_indexes.list_indexes(self.org.id)],
+            [name]
+        )
+
+        filters, annotations, _ = self._filter('test_number__gte=10')
+        views = PropertyView.objects.filter(state__organization_id=self.org.id) \
+            .annotate(**annotations).filter(filters)
+        self.assertEqual(views.count(), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn(name, views.explain())
+
+        extra_data_indexes.drop_index(name)
+        self.assertEqual(extra_data_indexes.list_indexes(self.org.id), [])
+
+    def test_expression_index_of_column_name_with_braces(self):
+        column = Column.objects.create(
+            column_name='Area {sq ft}',
+            data_type='number',
+            is_extra_data=True,
+            table_name='PropertyState',
+            organization=self.org,
+        )
+        self.property_view_factory.get_property_view(extra_data={'Area {sq ft}': '10'})
+
+        name = extra_data_indexes.create_expression_index(column)
+
+        self.assertEqual(
+            [index['name'] for index in extra_data_indexes.list_indexes(self.org.id)],
+            [name]
+        )
+
+    def test_index_creation_fails_for_values_which_cannot_be_cast(self):
+        self.property_view_factory.get_property_view(extra_data={'test_number': 'not a number'})
+
+        with self.assertRaises(extra_data_indexes.ExtraDataIndexException):
+            extra_data_indexes.create_expression_index(self.column)
+        self.assertEqual(extra_data_indexes.list_indexes(self.org.id), [])
+
+    def test_unused_indexes_are_dropped(self):
+        name = extra_data_indexes.create_expression_index(self.column)
+        gin_name = extra_data_indexes.create_gin_index(self.org.id, 'PropertyState')
+
+        self.column.data_type = 'string'
+        self.column.save()
+
+        self.assertEqual(extra_data_indexes.drop_unused_indexes(self.org.id), [name])
+        self.assertEqual(
+            [index['name'] for index in extra_data_indexes.list_indexes(self.org.id)],
+            [gin_name]
+        )
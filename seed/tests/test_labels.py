@@ -8,10 +8,10 @@ Unit tests for seed/views/labels.py
 """
 from django.db import IntegrityError, transaction
 
-from seed.models import ASSESSED_RAW, Property, PropertyView
+from seed.models import ASSESSED_RAW, Property, PropertyState, PropertyView
 from seed.models import StatusLabel as Label
-from seed.models import TaxLot, TaxLotView
-from seed.models.data_quality import DataQualityCheck, Rule
+from seed.models import TaxLot, TaxLotState, TaxLotView
+from seed.models.data_quality import DataQualityCheck
 from seed.test_helpers.fake import (
     FakePropertyStateFactory,
     FakeTaxLotStateFactory
@@ -25,10 +25,6 @@ class TestLabelIntegrityChecks(DataMappingBaseTestCase):
     def setUp(self):
         self.api_view = LabelInventoryViewSet()
 
-        # Models can't  be imported directly hence self
-        self.PropertyViewLabels = self.api_view.models['property']
-        self.TaxlotViewLabels = self.api_view.models['taxlot']
-
         self.user_details = {
             'username': 'test_user@demo.com',
             'password': 'test_pass',
@@ -45,7 +41,8 @@ class TestLabelIntegrityChecks(DataMappingBaseTestCase):
     def test_error_occurs_when_trying_to_apply_a_label_to_propertyview_from_a_different_org(self):
         org_1_property = Property.objects.create(organization=self.org)
         property_state_factory = FakePropertyStateFactory(organization=self.org)
-        org_1_propertystate = property_state_factory.get_property_state()
+        # the address_line_1 rule is violated
+        org_1_propertystate = property_state_factory.get_property_state(address_line_1=None)
         org_1_propertyview = PropertyView.objects.create(
             property=org_1_property,
             state=org_1_propertystate,
@@ -69,18 +66,15 @@ class TestLabelIntegrityChecks(DataMappingBaseTestCase):
 
         # Via PropertyState Rule with Label
         org_1_dq = DataQualityCheck.objects.get(organization=self.org)
-        org_1_ps_rule = org_1_dq.rules.filter(table_name='PropertyState').first()
+        org_1_ps_rule = org_1_dq.rules.get(table_name='PropertyState', field='address_line_1')
         # Purposely give an Org 1 Rule an Org 2 Label
         org_1_ps_rule.status_label = self.org_2_status_label
         org_1_ps_rule.save()
 
         with transaction.atomic():
             with self.assertRaises(IntegrityError):
-                org_1_dq.update_status_label(
-                    self.PropertyViewLabels,
-                    Rule.objects.get(pk=org_1_ps_rule.id),
-                    org_1_propertyview.id,
-                    org_1_propertystate.id
+                org_1_dq.check_data_in_bulk(
+                    'PropertyState', PropertyState.objects.filter(pk=org_1_propertystate.id)
                 )
 
         self.assertFalse(PropertyView.objects.get(pk=org_1_propertyview.id).labels.all().exists())
@@ -88,7 +82,8 @@ class TestLabelIntegrityChecks(DataMappingBaseTestCase):
     def test_error_occurs_when_trying_to_apply_a_label_to_taxlotview_from_a_different_org(self):
         org_1_taxlot = TaxLot.objects.create(organization=self.org)
         taxlot_state_factory = FakeTaxLotStateFactory(organization=self.org)
-        org_1_taxlotstate = taxlot_state_factory.get_taxlot_state()
+        # the jurisdiction_tax_lot_id rule is violated
+        org_1_taxlotstate = taxlot_state_factory.get_taxlot_state(jurisdiction_tax_lot_id=None)
         org_1_taxlotview = TaxLotView.objects.create(
             taxlot=org_1_taxlot,
             state=org_1_taxlotstate,
@@ -110,18 +105,15 @@ class TestLabelIntegrityChecks(DataMappingBaseTestCase):
 
         # Via TaxLotState Rule with Label
         org_1_dq = DataQualityCheck.objects.get(organization=self.org)
-        org_1_tls_rule = org_1_dq.rules.filter(table_name='TaxLotState').first()
+        org_1_tls_rule = org_1_dq.rules.get(table_name='TaxLotState', field='jurisdiction_tax_lot_id')
         # Purposely give an Org 1 Rule an Org 2 Label
         org_1_tls_rule.status_label = self.org_2_status_label
         org_1_tls_rule.save()
 
         with transaction.atomic():
             with self.assertRaises(IntegrityError):
-                org_1_dq.update_status_label(
-                    label_class=self.TaxlotViewLabels,
-                    rule=Rule.objects.get(pk=org_1_tls_rule.id),
-                    linked_id=org_1_taxlotview.id,
-                    row_id=org_1_taxlotstate.id
+                org_1_dq.check_data_in_bulk(
+                    'TaxLotState', TaxLotState.objects.filter(pk=org_1_taxlotstate.id)
                 )
 
         self.assertFalse(TaxLotView.objects.get(pk=org_1_taxlotview.id).labels.all().exists())
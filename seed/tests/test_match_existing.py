@@ -41,7 +41,11 @@ from seed.test_helpers.fake import (
     FakeTaxLotStateFactory
 )
 from seed.tests.util import DataMappingBaseTestCase
-from seed.utils.match import match_merge_link, whole_org_match_merge_link
+from seed.utils.match import (
+    MatchingIndex,
+    match_merge_link,
+    whole_org_match_merge_link
+)
 
 
 class TestMatchingPostEdit(DataMappingBaseTestCase):
@@ -2094,3 +2098,36 @@ class TestMatchingExistingViewFullOrgMatchingUnlinking(DataMappingBaseTestCase):
         canonical_ids = [records[0]['id'] for records in summary_2.values() if records]
 
         self.assertNotEqual(canonical_ids[0], canonical_ids[1])
+
+
+class TestMatchingIndex(DataMappingBaseTestCase):
+    def setUp(self):
+        selfvars = self.set_up(ASSESSED_RAW)
+        self.user, self.org, self.import_file, self.import_record, self.cycle = selfvars
+        self.property_state_factory = FakePropertyStateFactory(organization=self.org)
+
+    def test_matching_index_groups_states_in_a_single_query(self):
+        base_details = {
+            'import_file_id': self.import_file.id,
+            'data_state': DATA_STATE_MAPPING,
+            'no_default_data': True,
+        }
+        ps_1 = self.property_state_factory.get_property_state(pm_property_id='1', custom_id_1='A', **base_details)
+        ps_2 = self.property_state_factory.get_property_state(pm_property_id='1', custom_id_1='A', **base_details)
+        ps_3 = self.property_state_factory.get_property_state(pm_property_id='1', custom_id_1=None, **base_details)
+        ps_4 = self.property_state_factory.get_property_state(pm_property_id=None, custom_id_1=None, **base_details)
+
+        states = PropertyState.objects.filter(id__in=[ps_1.id, ps_2.id, ps_3.id, ps_4.id])
+        with self.assertNumQueries(1):
+            index = MatchingIndex.from_queryset(states, ['pm_property_id', 'custom_id_1'])
+
+        groups = sorted(sorted(group) for group in index.groups())
+        self.assertEqual(groups, [sorted([ps_1.id, ps_2.id]), [ps_3.id]])
+        self.assertEqual([sorted(group) for group in index.groups(min_size=2)], [sorted([ps_1.id, ps_2.id])])
+        # -States without any matching criteria values are not eligible for matching
+        self.assertEqual(index.empty_items, [ps_4.id])
+
+        # in-memory -States can be looked up without a query
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(index.get(index.state_key(ps_1))), sorted([ps_1.id, ps_2.id]))
+            self.assertEqual(index.get(index.state_key(ps_4)), [])
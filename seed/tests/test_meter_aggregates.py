@@ -0,0 +1,116 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+from datetime import datetime, timedelta
+
+from django.test import TransactionTestCase, override_settings
+from django.utils.timezone import make_aware
+from pytz import timezone
+
+from config.settings.common import TIME_ZONE
+from seed.landing.models import SEEDUser as User
+from seed.models import Meter, MeterReading
+from seed.test_helpers.fake import FakePropertyFactory
+from seed.utils.meter_aggregates import (
+    aggregate_exists,
+    monthly_totals,
+    readings_time_range,
+    refresh_aggregates
+)
+from seed.utils.meters import PropertyMeterReadingsExporter
+from seed.utils.organizations import create_organization
+
+
+@override_settings(METER_READINGS_CONTINUOUS_AGGREGATES=True)
+class TestMeterAggregates(TransactionTestCase):
+    # the continuous aggregates can only be refreshed outside of a transaction
+
+    def setUp(self):
+        if not aggregate_exists():
+            self.skipTest('The continuous aggregates require TimescaleDB 2.9')
+
+        self.user = User.objects.create_superuser(email='test_user@demo.com', username='test_user@demo.com')
+        self.org, _, _ = create_organization(self.user)
+        self.property_factory = FakePropertyFactory(organization=self.org)
+        self.property = self.property_factory.get_property()
+        self.tz_obj = timezone(TIME_ZONE)
+
+    def _create_meter(self, property_, source_id):
+        return Meter.objects.create(
+            property=property_,
+            source=Meter.PORTFOLIO_MANAGER,
+            source_id=source_id,
+            type=Meter.NATURAL_GAS,
+        )
+
+    def _readings(self, meter, start, count, step, reading):
+        start = make_aware(start, timezone=self.tz_obj)
+        return [
+            MeterReading(
+                meter=meter,
+                start_time=start + step * i,
+                end_time=start + step * (i + 1),
+                reading=reading,
+                source_unit='kBtu (thousand Btu)',
+                conversion_factor=1,
+            )
+            for i in range(count)
+        ]
+
+    def _monthly_usages(self, property_):
+        exporter = PropertyMeterReadingsExporter(property_.id, self.org.id, [])
+        return exporter.readings_and_column_defs('Month')
+
+    def _prorated_monthly_usages(self, property_):
+        with override_settings(METER_READINGS_CONTINUOUS_AGGREGATES=False):
+            return self._monthly_usages(property_)
+
+    def test_monthly_usages_are_read_from_the_aggregate(self):
+        meter = self._create_meter(self.property, '123')
+        # two days of 15 minute interval readings, starting on the last day of January
+        readings = self._readings(meter, datetime(2020, 1, 31), 192, timedelta(minutes=15), 2)
+        MeterReading.objects.bulk_create(readings)
+
+        refresh_aggregates(*readings_time_range(readings))
+
+        self.assertEqual(
+            sorted(monthly_totals([meter.id])),
+            [
+                (meter.id, datetime(2020, 1, 1), 192, False),
+                (meter.id, datetime(2020, 2, 1), 192, False),
+            ]
+        )
+        self.assertEqual(self._monthly_usages(self.property), self._prorated_monthly_usages(self.property))
+
+    def test_readings_straddling_months_are_prorated(self):
+        meter = self._create_meter(self.property, '123')
+        readings = self._readings(meter, datetime(2020, 1, 15), 2, timedelta(days=31), 100)
+        MeterReading.objects.bulk_create(readings)
+
+        refresh_aggregates(*readings_time_range(readings))
+
+        self.assertEqual(
+            sorted(monthly_totals([meter.id])),
+            [
+                (meter.id, datetime(2020, 1, 1), 100, True),
+                (meter.id, datetime(2020, 2, 1), 100, True),
+            ]
+        )
+        result = self._monthly_usages(self.property)
+        self.assertEqual(result, self._prorated_monthly_usages(self.property))
+        self.assertEqual([reading['month'] for reading in result['readings']], ['January 2020', 'February 2020', 'March 2020'])
+
+    def test_copied_readings_are_rolled_up(self):
+        source_property = self.property_factory.get_property()
+        source_meter = self._create_meter(source_property, '123')
+        MeterReading.objects.bulk_create(
+            self._readings(source_meter, datetime(2020, 3, 1), 48, timedelta(hours=1), 1)
+        )
+
+        self.property.copy_meters(source_property.id)
+
+        meter = self.property.meters.get(source_id='123')
+        self.assertEqual(monthly_totals([meter.id]), [(meter.id, datetime(2020, 3, 1), 48, False)])
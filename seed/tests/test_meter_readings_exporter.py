@@ -0,0 +1,138 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+"""
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils.timezone import make_aware
+from pytz import timezone
+
+from config.settings.common import TIME_ZONE
+from seed.landing.models import SEEDUser as User
+from seed.models import Meter, MeterReading
+from seed.test_helpers.fake import FakePropertyFactory
+from seed.utils.meters import PropertyMeterReadingsExporter
+from seed.utils.organizations import create_organization
+
+FIELD_NAME = 'Natural Gas - PM - 123'
+
+
+class TestPropertyMeterReadingsExporter(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='test_user@demo.com', username='test_user@demo.com')
+        self.org, _, _ = create_organization(self.user)
+        self.property = FakePropertyFactory(organization=self.org).get_property()
+        self.meter = Meter.objects.create(
+            property=self.property,
+            source=Meter.PORTFOLIO_MANAGER,
+            source_id='123',
+            type=Meter.NATURAL_GAS,
+        )
+        self.tz_obj = timezone(TIME_ZONE)
+
+    def _create_reading(self, start, end, reading):
+        return MeterReading(
+            meter=self.meter,
+            start_time=make_aware(start, timezone=self.tz_obj),
+            end_time=make_aware(end, timezone=self.tz_obj),
+            reading=reading,
+            source_unit='kBtu (thousand Btu)',
+            conversion_factor=1,
+        )
+
+    def _readings(self, interval):
+        exporter = PropertyMeterReadingsExporter(self.property.id, self.org.id, [])
+        return exporter.readings_and_column_defs(interval)
+
+    def _python_readings(self, interval):
+        with override_settings(METER_READINGS_SQL_AGGREGATION=False):
+            return self._readings(interval)
+
+    def test_monthly_readings_are_aggregated_in_the_database(self):
+        # a day of 15 minute interval readings
+        start = datetime(2020, 1, 15)
+        readings = [
+            self._create_reading(start + timedelta(minutes=15 * i), start + timedelta(minutes=15 * (i + 1)), 1.5)
+            for i in range(96)
+        ]
+        # split 1/2 January and 1/2 February
+        readings.append(self._create_reading(datetime(2020, 1, 31), datetime(2020, 2, 2), 100))
+        # split 1/32 May, 30/32 June and 1/32 July
+        readings.append(self._create_reading(datetime(2020, 5, 31), datetime(2020, 7, 2), 320))
+        MeterReading.objects.bulk_create(readings)
+
+        result = self._readings('Month')
+
+        self.assertEqual(result, self._python_readings('Month'))
+        self.assertEqual(
+            [(reading['month'], reading[FIELD_NAME]) for reading in result['readings']],
+            [
+                ('January 2020', 144 + 50),
+                ('February 2020', 50),
+                ('May 2020', 10),
+                ('June 2020', 300),
+                ('July 2020', 10),
+            ]
+        )
+
+    def test_yearly_readings_are_aggregated_in_the_database(self):
+        readings = [
+            self._create_reading(datetime(2019, month, 1), datetime(2019, month + 1, 1), 10 * month)
+            for month in range(1, 12)
+        ]
+        readings.append(self._create_reading(datetime(2019, 12, 1), datetime(2020, 1, 1), 120))
+        # overlapping readings of 2020 are totaled in Python
+        readings.append(self._create_reading(datetime(2020, 3, 1), datetime(2020, 3, 31), 100))
+        readings.append(self._create_reading(datetime(2020, 3, 15), datetime(2020, 4, 15), 150))
+        readings.append(self._create_reading(datetime(2020, 4, 15), datetime(2020, 5, 1), 20))
+        # spans two years, so it is not part of either year
+        readings.append(self._create_reading(datetime(2020, 12, 15), datetime(2021, 1, 15), 1000))
+        MeterReading.objects.bulk_create(readings)
+
+        result = self._readings('Year')
+
+        self.assertEqual(result, self._python_readings('Year'))
+        self.assertEqual(
+            result['readings'],
+            [
+                {'year': 2019, FIELD_NAME: sum(10 * month for month in range(1, 13))},
+                {'year': 2020, FIELD_NAME: 170},
+            ]
+        )
+
+    def test_max_reading_total_of_nonintersecting_readings(self):
+        exporter = PropertyMeterReadingsExporter(self.property.id, self.org.id, [])
+        start = make_aware(datetime(2020, 1, 1), timezone=self.tz_obj)
+
+        def reading(start_day, end_day, value):
+            return start + timedelta(days=start_day), start + timedelta(days=end_day), value
+
+        # nonintersecting readings, a negative reading is skipped unless it is the first one
+        self.assertEqual(
+            exporter._max_reading_total([reading(0, 1, -1), reading(1, 2, 10), reading(2, 3, -5), reading(3, 4, 20)]),
+            29
+        )
+        # the 10 day reading is worth more than the readings it overlaps
+        self.assertEqual(
+            exporter._max_reading_total([
+                reading(0, 5, 100), reading(5, 10, 100), reading(0, 10, 300), reading(10, 12, 1), reading(11, 13, 2)
+            ]),
+            302
+        )
+
+    def test_max_reading_total_of_zero_length_readings(self):
+        exporter = PropertyMeterReadingsExporter(self.property.id, self.org.id, [])
+        start = make_aware(datetime(2020, 1, 1), timezone=self.tz_obj)
+
+        def reading(start_day, end_day, value):
+            return start + timedelta(days=start_day), start + timedelta(days=end_day), value
+
+        # a zero length reading at the start or end of other readings does not overlap them,
+        # so it is counted with them
+        self.assertEqual(exporter._max_reading_total([reading(0, 1, 10), reading(1, 1, 5), reading(1, 2, 20)]), 35)
+        self.assertEqual(exporter._max_reading_total([reading(0, 1, 10), reading(1, 2, 20), reading(2, 2, 5)]), 35)
+        # a zero length reading within another reading overlaps it
+        self.assertEqual(exporter._max_reading_total([reading(1, 1, 5), reading(0, 2, 10)]), 10)
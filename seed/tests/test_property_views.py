@@ -316,6 +316,44 @@ class PropertyViewTests(DataMappingBaseTestCase):
         self.assertTrue('merged_indicator' in related)
         self.assertFalse(related['merged_indicator'])
 
+    def test_filter_properties_with_cursor_pagination(self):
+        site_euis = [30, None, 10, 30, 20]
+        view_ids = []
+        for site_eui in site_euis:
+            state = self.property_state_factory.get_property_state(site_eui=site_eui)
+            view = PropertyView.objects.create(
+                property=self.property_factory.get_property(), cycle=self.cycle, state=state
+            )
+            view_ids.append(view.id)
+
+        # descending puts the nulls first, ties are sorted by view id
+        expected = [view_ids[1], view_ids[0], view_ids[3], view_ids[4], view_ids[2]]
+
+        url = reverse('api:v3:properties-filter') + '?cycle={}&organization_id={}&per_page=2&order_by=-site_eui'.format(
+            self.cycle.pk, self.org.pk)
+        results = []
+        cursor = ''
+        for page in range(3):
+            response = self.client.post(
+                url + '&cursor={}&count_mode=exact'.format(cursor), content_type='application/json'
+            )
+            data = json.loads(response.content)
+            self.assertEqual(data['pagination']['total'], 5)
+            results += [result['property_view_id'] for result in data['results']]
+            cursor = data['pagination']['next_cursor']
+            self.assertEqual(data['pagination']['has_next'], page < 2)
+
+        self.assertIsNone(cursor)
+        self.assertEqual(results, expected)
+
+        # a cursor cannot be reused with another sort
+        response = self.client.post(
+            reverse('api:v3:properties-filter') + '?cycle={}&organization_id={}&per_page=2&order_by=site_eui&cursor={}'.format(
+                self.cycle.pk, self.org.pk, data['pagination']['cursor']),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_list_properties_with_profile_id(self):
         state = self.property_state_factory.get_property_state(extra_data={"field_1": "value_1"})
         prprty = self.property_factory.get_property()
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Q
 from django.db.models.functions import Cast, NullIf, Replace
@@ -8,7 +9,7 @@ from django.http.request import QueryDict
 from django.test import TestCase
 
 from seed.landing.models import SEEDUser as User
-from seed.models import Column, PropertyView
+from seed.models import Column, PromotedExtraDataValue, PropertyView
 from seed.search import FilterException, build_view_filters_and_sorts
 from seed.test_helpers.fake import FakePropertyViewFactory
 from seed.utils.organizations import create_organization
@@ -357,3 +358,106 @@ class TestInventoryViewSearchParsers(TestCase):
         # -- Assert
         # evaluate the queryset -- no exception should be raised!
         list(cast_property_views)
+
+    def test_filter_and_sorts_use_promoted_extra_data_values(self):
+        # -- Setup
+        column = Column.objects.create(
+            column_name='test_number',
+            data_type='number',
+            is_extra_data=True,
+            table_name='PropertyState',
+            organization=self.fake_org,
+        )
+        column.is_promoted = True
+        # the values are filled by refresh_promoted_column_values when the column is promoted
+        column.promoted_values_ready = True
+        column.save()
+
+        view_9 = self.property_view_factory.get_property_view(extra_data={'test_number': '9'})
+        view_10 = self.property_view_factory.get_property_view(extra_data={'test_number': '10'})
+        view_none = self.property_view_factory.get_property_view(extra_data={'test_number': None})
+
+        # values are kept in sync when the state is saved
+        self.assertEqual(
+            sorted(PromotedExtraDataValue.objects.filter(column=column).values_list('value_number', flat=True)),
+            [9.0, 10.0]
+        )
+
+        # -- Act
+        input = QueryDict('test_number__gte=10&order_by=-test_number')
+        columns = Column.retrieve_all(self.fake_org, 'property', only_used=False, include_related=False)
+        filters, annotations, order_by = build_view_filters_and_sorts(input, columns)
+
+        # -- Assert
+        # the json values are not cast at query time
+        self.assertEqual(list(annotations.keys()), ['_test_number_promoted'])
+        self.assertEqual(order_by, ['-_test_number_promoted'])
+        views = PropertyView.objects.annotate(**annotations).filter(filters).order_by(*order_by)
+        self.assertEqual([v.id for v in views], [view_10.id])
+
+        filters, annotations, order_by = build_view_filters_and_sorts(QueryDict('test_number__ne=10&order_by=test_number'), columns)
+        views = PropertyView.objects.annotate(**annotations).filter(filters).order_by(*order_by)
+        self.assertEqual([v.id for v in views], [view_9.id, view_none.id])
+
+        # updating extra data updates the promoted value
+        view_9.state.extra_data['test_number'] = '11'
+        view_9.state.save()
+        filters, annotations, _ = build_view_filters_and_sorts(QueryDict('test_number__gte=10'), columns)
+        self.assertEqual(PropertyView.objects.annotate(**annotations).filter(filters).count(), 2)
+
+    def test_filter_and_sorts_cast_extra_data_until_promoted_values_are_ready(self):
+        # -- Setup
+        column = Column.objects.create(
+            column_name='test_number',
+            data_type='number',
+            is_extra_data=True,
+            table_name='PropertyState',
+            organization=self.fake_org,
+        )
+        view_9 = self.property_view_factory.get_property_view(extra_data={'test_number': '9'})
+        view_10 = self.property_view_factory.get_property_view(extra_data={'test_number': '10'})
+        column.is_promoted = True
+        column.save()
+
+        # -- Act
+        columns = Column.retrieve_all(self.fake_org, 'property', only_used=False, include_related=False)
+        filters, annotations, order_by = build_view_filters_and_sorts(QueryDict('test_number__gte=9&order_by=-test_number'), columns)
+
+        # -- Assert
+        # the values of the states saved before the column was promoted are not filled yet
+        self.assertFalse(PromotedExtraDataValue.objects.filter(column=column).exists())
+        self.assertIn('_test_number_final', annotations)
+        self.assertEqual(order_by, ['-_test_number_final'])
+        views = PropertyView.objects.annotate(**annotations).filter(filters).order_by(*order_by)
+        self.assertEqual([v.id for v in views], [view_10.id, view_9.id])
+
+    def test_only_states_of_organizations_with_promoted_columns_are_refreshed(self):
+        column = Column.objects.create(
+            column_name='test_number',
+            data_type='number',
+            is_extra_data=True,
+            table_name='PropertyState',
+            organization=self.fake_org,
+        )
+        self.assertFalse(PromotedExtraDataValue.has_promoted_columns('PropertyState', self.fake_org.id))
+
+        # promoting the column clears the cached result
+        column.is_promoted = True
+        column.save()
+        self.assertTrue(PromotedExtraDataValue.has_promoted_columns('PropertyState', self.fake_org.id))
+        self.assertFalse(PromotedExtraDataValue.has_promoted_columns('TaxLotState', self.fake_org.id))
+
+        view = self.property_view_factory.get_property_view(extra_data={'test_number': '9'})
+        self.assertEqual(PromotedExtraDataValue.objects.get(column=column).property_state_id, view.state_id)
+
+    def test_only_extra_data_columns_with_typed_data_can_be_promoted(self):
+        column = Column.objects.create(
+            column_name='test_string',
+            data_type='string',
+            is_extra_data=True,
+            table_name='PropertyState',
+            organization=self.fake_org,
+        )
+        column.is_promoted = True
+        with self.assertRaises(ValidationError):
+            column.save()
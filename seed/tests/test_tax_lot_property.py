@@ -5,9 +5,11 @@
 :author
 """
 import json
+import os
 import time
 from random import randint
 
+from django.conf import settings
 from django.urls import reverse_lazy
 from xlrd import open_workbook
 
@@ -86,6 +88,36 @@ class TestTaxLotProperty(DataMappingBaseTestCase):
         self.assertEqual(len(data), 50)
         self.assertEqual(len(data[0]['related']), 0)
 
+    def test_aggregate_labels_and_notes(self):
+        views = [self.property_view] + [self.property_view_factory.get_property_view() for _ in range(20)]
+        self.properties.extend(view.id for view in views[1:])
+        label_b = self.label_factory.get_statuslabel(name='B Label')
+        label_a = self.label_factory.get_statuslabel(name='A Label')
+        for view in views[:10]:
+            view.labels.add(label_b, label_a)
+        first_note = self.property_view.notes.create(name='Manually Created', note_type=Note.NOTE, text='first')
+        second_note = self.property_view.notes.create(name='Manually Created', note_type=Note.NOTE, text='second')
+
+        # one query for the labels and one for the notes, regardless of the number of views
+        with self.assertNumQueries(2):
+            result = TaxLotProperty.aggregate_labels_and_notes(PropertyView, [view.id for view in views])
+
+        self.assertEqual(len(result), 21)
+        self.assertEqual(result[self.property_view.id]['labels'], ['A Label', 'B Label'])
+        self.assertEqual(
+            result[self.property_view.id]['notes'],
+            [(first_note.created, 'first'), (second_note.created, 'second')]
+        )
+        self.assertEqual(result[self.property_view.id]['notes_count'], 2)
+        self.assertEqual(result[views[-1].id], {'labels': [], 'notes': [], 'notes_count': 0})
+
+        with self.assertNumQueries(2):
+            result = TaxLotProperty.aggregate_labels_and_notes(
+                PropertyView, [view.id for view in views], include_note_text=False
+            )
+        self.assertEqual(result[self.property_view.id]['notes'], [])
+        self.assertEqual(result[self.property_view.id]['notes_count'], 2)
+
     def test_csv_export(self):
         """Test to make sure get_related returns the fields"""
         for i in range(50):
@@ -221,6 +253,90 @@ class TestTaxLotProperty(DataMappingBaseTestCase):
         # ids 52 up to and including 102
         self.assertEqual(len(data['features']), 51)
 
+    def test_csv_export_streaming(self):
+        for i in range(50):
+            p = self.property_view_factory.get_property_view()
+            self.properties.append(p.id)
+        self.property_view.notes.create(name='Manually Created', note_type=Note.NOTE, text='streamed note')
+
+        # call the API
+        url = reverse_lazy('api:v3:tax_lot_properties-export')
+        response = self.client.post(
+            url + '?{}={}&{}={}'.format(
+                'organization_id', self.org.pk,
+                'inventory_type', 'properties'
+            ),
+            data=json.dumps({'export_type': 'csv', 'stream': True}),
+            content_type='application/json'
+        )
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        data = content.split('\r\n')
+
+        self.assertTrue('Property Labels' in data[0].split(','))
+        self.assertTrue('Property Notes' in data[0].split(','))
+        self.assertIn('streamed note', content)
+        # header, 51 properties, and a trailing blank line
+        self.assertEqual(len(data), 53)
+
+    def test_geojson_export_streaming_matches_in_memory(self):
+        for i in range(50):
+            p = self.property_view_factory.get_property_view()
+            self.properties.append(p.id)
+
+        url = reverse_lazy('api:v3:tax_lot_properties-export')
+        query = '?{}={}&{}={}'.format('organization_id', self.org.pk, 'inventory_type', 'properties')
+        response = self.client.post(
+            url + query,
+            data=json.dumps({'export_type': 'geojson', 'stream': True}),
+            content_type='application/json'
+        )
+        streamed = json.loads(b''.join(response.streaming_content))
+
+        response = self.client.post(
+            url + query,
+            data=json.dumps({'export_type': 'geojson'}),
+            content_type='application/json'
+        )
+        in_memory = json.loads(response.content)
+
+        self.assertEqual(streamed['crs'], in_memory['crs'])
+        self.assertEqual(len(streamed['features']), 51)
+        self.assertCountEqual(
+            [f['properties']['property_view_id'] for f in streamed['features']],
+            [f['properties']['property_view_id'] for f in in_memory['features']],
+        )
+
+    def test_csv_export_in_background(self):
+        for i in range(50):
+            p = self.property_view_factory.get_property_view()
+            self.properties.append(p.id)
+
+        url = reverse_lazy('api:v3:tax_lot_properties-export')
+        response = self.client.post(
+            url + '?{}={}&{}={}'.format(
+                'organization_id', self.org.pk,
+                'inventory_type', 'properties'
+            ),
+            data=json.dumps({'export_type': 'csv', 'background': True, 'filename': 'background.csv'}),
+            content_type='application/json'
+        )
+        result = response.json()
+
+        progress_data = ProgressData.from_key(result['progress_key'])
+        self.assertEqual(progress_data.data['status'], 'success')
+        relative_path = progress_data.summary()['file']
+        self.assertTrue(relative_path.startswith(f'exports/{self.org.id}/background_'))
+
+        absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        with open(absolute_path, newline='') as f:
+            data = f.read().split('\r\n')
+        os.remove(absolute_path)
+
+        self.assertTrue('Address Line 1' in data[0].split(','))
+        self.assertEqual(len(data), 53)
+
     def test_refresh_metadata(self):
         for i in range(50):
             p = self.property_view_factory.get_property_view()
@@ -1653,6 +1653,8 @@ class InventoryViewTests(AssertDictSubsetMixin, DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(pm_property_id_col, results)
 
@@ -1673,6 +1675,8 @@ class InventoryViewTests(AssertDictSubsetMixin, DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(expected_property_extra_data_column, results)
 
@@ -1693,6 +1697,8 @@ class InventoryViewTests(AssertDictSubsetMixin, DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(expected_taxlot_extra_data_column, results)
 
@@ -1740,6 +1746,8 @@ class InventoryViewTests(AssertDictSubsetMixin, DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(jurisdiction_tax_lot_id_col, results)
         # breakpoint()
@@ -1761,6 +1769,8 @@ class InventoryViewTests(AssertDictSubsetMixin, DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(expected_property_extra_data_column, results)
 
@@ -1781,5 +1791,7 @@ class InventoryViewTests(AssertDictSubsetMixin, DeleteModelsTestCase):
             'recognize_empty': False,
             'comstock_mapping': None,
             'derived_column': None,
+            'is_promoted': False,
+            'promoted_values_ready': False,
         }
         self.assertIn(expected_taxlot_extra_data_column, results)
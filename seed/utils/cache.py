@@ -20,6 +20,26 @@ def get_cache_raw(key, default=None):
     return django_cache.get(key, default)
 
 
+def get_cache_many(keys):
+    """Return a dict of the values of the keys which exist in the cache"""
+    return django_cache.get_many(keys)
+
+
+def add_to_cache_counter(key, delta=1, timeout=None):
+    """Atomically add delta to the integer stored at key, which is created if it
+    doesn't exist. The key doesn't expire by default.
+
+    :return: int, the new value
+    """
+    django_cache.add(key, 0, timeout)
+    try:
+        return django_cache.incr(key, delta)
+    except ValueError:
+        # the key was evicted between add and incr
+        django_cache.set(key, delta, timeout)
+        return delta
+
+
 def set_cache(progress_key, status, data):
     """
     Sets the cache key to a pickled dictionary containing at least status and progress.
@@ -79,6 +99,11 @@ def delete_cache(progress_key):
     django_cache.delete(progress_key)
 
 
+def delete_cache_many(keys):
+    """Delete the cache associated with each of the keys"""
+    django_cache.delete_many(keys)
+
+
 def lock_cache(progress_key, timeout=60):
     """Set the lock with a default timeout of 1 minute"""
     set_cache_raw(progress_key, 1, timeout)
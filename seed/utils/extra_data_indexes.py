@@ -0,0 +1,238 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+
+Management of PostgreSQL indexes on the extra_data of PropertyState and TaxLotState.
+
+Filters and sorts on extra data columns cast the JSON value at query time (see
+seed.search._build_extra_data_annotations). An expression index on the exact same
+expression, restricted to the states of one organization, lets PostgreSQL use the
+index instead of scanning and casting every state. The index expression is compiled
+from the same annotations used by the inventory filters, so the two always match.
+"""
+import logging
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models.sql import Query
+
+from seed.models import Column, ExtraDataUsage, PropertyState, TaxLotState
+from seed.search import _build_extra_data_annotations
+
+_log = logging.getLogger(__name__)
+
+INDEX_PREFIX = 'seed_ed_'
+
+STATE_CLASSES = {
+    'PropertyState': PropertyState,
+    'TaxLotState': TaxLotState,
+}
+
+TABLE_ABBREVIATIONS = {
+    'PropertyState': 'ps',
+    'TaxLotState': 'ts',
+}
+
+# casting text to a timestamp depends on the session time zone, and non-immutable
+# expressions cannot be indexed
+NON_INDEXABLE_DATA_TYPES = ['date', 'datetime']
+
+
+class ExtraDataIndexException(Exception):
+    pass
+
+
+def is_indexable(column):
+    return (
+        column.is_extra_data
+        and not column.is_promoted
+        and column.derived_column_id is None
+        and column.table_name in STATE_CLASSES
+        and column.data_type not in NON_INDEXABLE_DATA_TYPES
+    )
+
+
+def expression_index_name(column):
+    # the data type is part of the name since the indexed expression depends on it
+    data_type = column.data_type.lower()
+    return f'{INDEX_PREFIX}{TABLE_ABBREVIATIONS[column.table_name]}_{column.organization_id}_{column.id}_{data_type}'
+
+
+def gin_index_name(org_id, table_name):
+    return f'{INDEX_PREFIX}gin_{TABLE_ABBREVIATIONS[table_name]}_{org_id}'
+
+
+def index_expression_sql(column):
+    """Compile the expression used to filter and sort the extra data column into SQL
+    usable in CREATE INDEX
+
+    :param column: Column, extra data column
+    :return: str
+    """
+    state_class = STATE_CLASSES[column.table_name]
+    final_field_name, annotations = _build_extra_data_annotations(
+        column.column_name, column.data_type, field_prefix=''
+    )
+
+    # index expressions cannot reference the table by name
+    query = Query(state_class, alias_cols=False)
+    for name, annotation in annotations.items():
+        query.add_annotation(annotation, name)
+    compiler = query.get_compiler(connection=connection)
+    sql, params = compiler.compile(query.annotations[final_field_name])
+    with connection.cursor() as cursor:
+        return cursor.mogrify(sql, params).decode()
+
+
+def _execute(command, rest):
+    """Execute `<command> [CONCURRENTLY] <rest>`. The statement is concatenated, not
+    formatted, since rest can contain the (quoted) name of an extra data column.
+    """
+    if connection.in_atomic_block:
+        # the savepoint keeps the surrounding transaction usable if the statement fails
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(command + ' ' + rest)
+    else:
+        # build the index without locking writes to the table
+        with connection.cursor() as cursor:
+            cursor.execute(command + ' CONCURRENTLY ' + rest)
+
+
+def create_expression_index(column):
+    """Create an expression index on the extra data column for the states of the
+    column's organization
+
+    :param column: Column, extra data column
+    :return: str, name of the index
+    """
+    if not is_indexable(column):
+        raise ExtraDataIndexException(
+            f'Column {column.id} ({column.column_name}) with data type "{column.data_type}" cannot be indexed'
+        )
+
+    name = expression_index_name(column)
+    table = STATE_CLASSES[column.table_name]._meta.db_table
+    expression = index_expression_sql(column)
+    try:
+        _execute(
+            'CREATE INDEX',
+            f'IF NOT EXISTS "{name}" ON "{table}" (({expression})) '
+            f'WHERE "organization_id" = {int(column.organization_id)}'
+        )
+    except DatabaseError as e:
+        # e.g., a value in extra data cannot be cast into the column's data type. A
+        # failed concurrent build leaves an invalid index behind which must be removed
+        drop_index(name)
+        raise ExtraDataIndexException(f'Unable to create index for column {column.column_name}: {e}')
+    return name
+
+
+def create_gin_index(org_id, table_name):
+    """Create a GIN index on the extra data of the states of the organization, used
+    by key existence and containment lookups (e.g., `extra_data__has_key`)
+
+    :return: str, name of the index
+    """
+    name = gin_index_name(org_id, table_name)
+    table = STATE_CLASSES[table_name]._meta.db_table
+    _execute(
+        'CREATE INDEX',
+        f'IF NOT EXISTS "{name}" ON "{table}" USING gin ("extra_data") '
+        f'WHERE "organization_id" = {int(org_id)}'
+    )
+    return name
+
+
+def drop_index(name):
+    if not name.startswith(INDEX_PREFIX):
+        raise ExtraDataIndexException(f'Index {name} is not an extra data index')
+    _execute('DROP INDEX', f'IF EXISTS "{name}"')
+
+
+def list_indexes(org_id=None):
+    """List the extra data indexes
+
+    :param org_id: int, optional, only list the indexes of the organization
+    :return: list of dict with the name, table and definition of the indexes
+    """
+    patterns = [f'{INDEX_PREFIX}%']
+    if org_id is not None:
+        patterns = [
+            f'{INDEX_PREFIX}{abbreviation}\\_{int(org_id)}\\_%' for abbreviation in TABLE_ABBREVIATIONS.values()
+        ] + [
+            f'{INDEX_PREFIX}gin\\_{abbreviation}\\_{int(org_id)}' for abbreviation in TABLE_ABBREVIATIONS.values()
+        ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, tablename, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND indexname LIKE ANY(%s) ORDER BY indexname',
+            [patterns]
+        )
+        return [
+            {'name': name, 'table': table, 'definition': definition}
+            for name, table, definition in cursor.fetchall()
+        ]
+
+
+def suggested_columns(org_id, min_uses=10):
+    """Extra data columns of the organization which are not indexed yet, ordered by
+    the number of times they were used to filter or sort the inventory
+
+    :param org_id: int
+    :param min_uses: int, minimum number of filters and sorts on the column
+    :return: list of Column
+    """
+    ExtraDataUsage.flush(org_id)
+    existing = {index['name'] for index in list_indexes(org_id)}
+    usages = ExtraDataUsage.objects.filter(
+        column__organization_id=org_id,
+        column__is_extra_data=True,
+    ).select_related('column').order_by('-filter_count', '-sort_count')
+
+    return [
+        usage.column for usage in usages
+        if usage.filter_count + usage.sort_count >= min_uses
+        and is_indexable(usage.column)
+        and expression_index_name(usage.column) not in existing
+    ]
+
+
+def create_suggested_indexes(org_id, min_uses=10, limit=None):
+    """Create the expression indexes of the most used extra data columns
+
+    :return: tuple, (list of created index names, list of error messages)
+    """
+    columns = suggested_columns(org_id, min_uses)
+    if limit is not None:
+        columns = columns[:limit]
+
+    created, errors = [], []
+    for column in columns:
+        try:
+            created.append(create_expression_index(column))
+        except ExtraDataIndexException as e:
+            _log.warning(str(e))
+            errors.append(str(e))
+    return created, errors
+
+
+def drop_unused_indexes(org_id):
+    """Drop the expression indexes of the organization whose column no longer exists
+    or is not indexable anymore (e.g., it was promoted or its data type changed)
+
+    :return: list of dropped index names
+    """
+    expected = {
+        expression_index_name(column)
+        for column in Column.objects.filter(organization_id=org_id, is_extra_data=True)
+        if is_indexable(column)
+    }
+    dropped = []
+    for index in list_indexes(org_id):
+        if f'{INDEX_PREFIX}gin_' in index['name'] or index['name'] in expected:
+            continue
+        drop_index(index['name'])
+        dropped.append(index['name'])
+    return dropped
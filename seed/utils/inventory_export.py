@@ -0,0 +1,398 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California,
+through Lawrence Berkeley National Laboratory (subject to receipt of any
+required approvals from the U.S. Department of Energy) and contributors.
+All rights reserved.
+:author
+"""
+import csv
+import datetime
+import json
+import math
+import os
+from collections import OrderedDict
+
+import xlsxwriter
+from django.conf import settings
+from django.utils.crypto import get_random_string
+from quantityfield.units import ureg
+
+from seed.lib.mcm.utils import batch
+from seed.models import (
+    ColumnListProfile,
+    PropertyView,
+    TaxLotProperty,
+    TaxLotView
+)
+
+INVENTORY_MODELS = {'properties': PropertyView, 'taxlots': TaxLotView}
+
+# number of views read, serialized and written at a time when streaming an export
+EXPORT_CHUNK_SIZE = 1000
+
+# directory, relative to MEDIA_ROOT, where background exports are written
+EXPORT_MEDIA_DIR = 'exports'
+
+POLYGON_FIELDS = ["bounding_box", "centroid", "property_footprint", "taxlot_footprint", "long_lat"]
+
+
+def export_value(value):
+    """Convert a serialized value into something the CSV and XLSX writers understand"""
+    # Convert quantities (this is typically handled in the JSON Encoder, but that isn't here).
+    if isinstance(value, ureg.Quantity):
+        return value.magnitude
+    elif isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def export_row(datum, column_name_mappings):
+    """Return the values of a serialized record in the order of the column name mappings
+
+    :param datum: dict, record from TaxLotProperty.serialize
+    :param column_name_mappings: OrderedDict, {column_name: display_name}
+    :return: list
+    """
+    row = []
+    for column in column_name_mappings:
+        row_result = datum.get(column, None)
+
+        # Try grabbing the value out of the related field if not found yet.
+        if row_result is None and datum.get('related'):
+            row_result = datum['related'][0].get(column, None)
+
+        row.append(export_value(row_result))
+    return row
+
+
+def export_header(column_name_mappings):
+    """Return the header row for an export.
+
+    Excel doesn't like the first item of a CSV to be ID (it can be id, or iD), so it is lowercased.
+    """
+    header = list(column_name_mappings.values())
+    if header and header[0] == 'ID':
+        header[0] = 'id'
+    return header
+
+
+def format_notes(notes):
+    """Join the notes of a record into a single export cell
+
+    :param notes: list of (created, text) tuples, see TaxLotProperty.aggregate_labels_and_notes
+    :return: str
+    """
+    return '\n----------\n'.join(
+        created.astimezone().strftime("%Y-%m-%d %I:%M:%S %p") + "\n" + text
+        for created, text in notes
+    )
+
+
+def _serialized_coordinates(polygon_wkt):
+    string_coord_pairs = polygon_wkt.lstrip('POLYGON (').rstrip(')').split(', ')
+
+    coordinates = []
+    for coord_pair in string_coord_pairs:
+        float_coords = [float(coord) for coord in coord_pair.split(' ')]
+        coordinates.append(float_coords)
+
+    return coordinates
+
+
+def _serialized_point(point_wkt):
+    string_coords = point_wkt.lstrip('POINT (').rstrip(')').split(', ')
+
+    coordinates = []
+    for coord in string_coords[0].split(' '):
+        coordinates.append(float(coord))
+
+    return coordinates
+
+
+def geojson_feature(datum, column_name_mappings):
+    """Build a GeoJSON feature from a serialized record
+
+    :param datum: dict, record from TaxLotProperty.serialize (or one of its related records)
+    :param column_name_mappings: OrderedDict, {column_name: display_name}
+    :return: dict
+    """
+    feature = {
+        "type": "Feature",
+        "properties": {}
+    }
+
+    for key, value in datum.items():
+        if value is None:
+            continue
+
+        value = export_value(value)
+
+        if value and any(k in key for k in POLYGON_FIELDS):
+            """
+            If object is a polygon and is populated, add the 'geometry'
+            key-value-pair in the appropriate GeoJSON format.
+            When the first geometry is added, the correct format is
+            established. When/If a second geometry is added, this is
+            appended alongside the previous geometry.
+            """
+            if key == 'long_lat':
+                # point
+                individual_geometry = {
+                    "coordinates": _serialized_point(value),
+                    "type": "Point"
+                }
+            else:
+                # polygons
+                individual_geometry = {
+                    "coordinates": [_serialized_coordinates(value)],
+                    "type": "Polygon"
+                }
+
+            if feature.get("geometry", None) is None:
+                feature["geometry"] = {
+                    "type": "GeometryCollection",
+                    "geometries": [individual_geometry]
+                }
+            else:
+                feature["geometry"]["geometries"].append(individual_geometry)
+        else:
+            # Non-polygon data
+            display_key = column_name_mappings.get(key, key)
+            feature["properties"][display_key] = value
+
+    # add style information
+    if feature["properties"].get("property_state_id") is not None:
+        feature["properties"]["stroke"] = "#185189"  # buildings color
+    elif feature["properties"].get("taxlot_state_id") is not None:
+        feature["properties"]["stroke"] = "#10A0A0"  # buildings color
+    feature["properties"]["marker-color"] = "#E74C3C"
+    feature["properties"]["fill-opacity"] = 0
+
+    return feature
+
+
+class _Echo(object):
+    """File-like object that returns what is written instead of buffering it, used
+    so that csv.writer can feed a StreamingHttpResponse"""
+
+    def write(self, value):
+        return value
+
+
+class InventoryExporter(object):
+    """
+    Export the properties or tax lots of an organization chunk by chunk.
+
+    The views are read in chunks of `chunk_size` (using a server-side cursor when
+    no ids are given), the labels and notes of each chunk are aggregated in two
+    queries, and each chunk is serialized and written before the next chunk is
+    read. Memory use therefore depends on the chunk size, not on the size of the
+    organization.
+    """
+
+    def __init__(self, org_id, inventory_type='properties', profile_id=None, ids=None,
+                 include_notes=True, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        :param org_id: int, organization id
+        :param inventory_type: str, 'properties' or 'taxlots'
+        :param profile_id: int, optional, Column List Profile used to select the exported columns
+        :param ids: list, optional, view ids to export (in this order). Exports all views when empty
+        :param include_notes: bool, optional, include the text of the notes
+        :param chunk_size: int, optional, number of views to process at a time
+        """
+        self.org_id = org_id
+        self.inventory_type = inventory_type
+        self.view_klass = INVENTORY_MODELS[inventory_type]
+        self.ids = list(ids) if ids else []
+        self.include_notes = include_notes
+        self.chunk_size = chunk_size
+
+        if inventory_type == 'properties':
+            self.inventory_lower = 'property'
+            notes_display_name, labels_display_name = 'Property Notes', 'Property Labels'
+        else:
+            self.inventory_lower = 'taxlot'
+            notes_display_name, labels_display_name = 'Tax Lot Notes', 'Tax Lot Labels'
+
+        column_profile = None
+        if profile_id is not None and str(profile_id) not in ['None', '']:
+            column_profile = ColumnListProfile.objects.get(id=profile_id)
+        else:
+            profile_id = None
+
+        # Set the first column to be the ID
+        self.column_name_mappings = OrderedDict([('id', 'ID')])
+        self.column_ids, add_column_name_mappings, self.columns_from_database = ColumnListProfile.return_columns(
+            org_id,
+            profile_id,
+            inventory_type)
+        self.column_name_mappings.update(add_column_name_mappings)
+
+        # always export the labels and notes
+        self.column_name_mappings[f'{self.inventory_lower}_notes'] = notes_display_name
+        self.column_name_mappings[f'{self.inventory_lower}_labels'] = labels_display_name
+
+        self.derived_columns = list(column_profile.derived_columns.all()) if column_profile is not None else []
+        self.column_name_mappings.update({dc.name: dc.name for dc in self.derived_columns})
+
+    def get_queryset(self, view_ids=None):
+        """Return the views of the organization that are exported, with the related
+        objects needed for serializing them
+
+        :param view_ids: list[int], optional, only return these views (e.g., a chunk
+                         of the export) instead of all of the exported views
+        """
+        if view_ids is None:
+            view_ids = self.ids
+
+        filter_str = {f'{self.inventory_lower}__organization_id': self.org_id}
+        if view_ids:
+            filter_str['id__in'] = view_ids
+
+        return self.view_klass.objects.select_related('state', 'cycle', self.inventory_lower).filter(
+            **filter_str).order_by('id')
+
+    def get_labels_and_notes(self, view_ids):
+        """Aggregate the labels and notes of the views, see TaxLotProperty.aggregate_labels_and_notes"""
+        return TaxLotProperty.aggregate_labels_and_notes(self.view_klass, view_ids, self.include_notes)
+
+    def count(self):
+        return self.get_queryset().count()
+
+    def _iter_id_chunks(self):
+        if self.ids:
+            # keep the requested order
+            return batch(self.ids, self.chunk_size)
+
+        view_ids = self.get_queryset().values_list('id', flat=True).iterator(chunk_size=self.chunk_size)
+        return batch(view_ids, self.chunk_size)
+
+    def annotate(self, views, data, labels_and_notes=None):
+        """Add the labels, notes and derived columns of the views to their serialized records.
+
+        :param views: list of PropertyView or TaxLotView
+        :param data: list of dict, TaxLotProperty.serialize(views, ...)
+        :param labels_and_notes: dict, optional, result of get_labels_and_notes for the views.
+                                 Aggregated here if not provided.
+        """
+        if labels_and_notes is None:
+            labels_and_notes = self.get_labels_and_notes([view.id for view in views])
+
+        labels_key = f'{self.inventory_lower}_labels'
+        notes_key = f'{self.inventory_lower}_notes'
+        states = [view.state for view in views]
+        for derived_column in self.derived_columns:
+            for datum, value in zip(data, derived_column.evaluate_many(states)):
+                datum[derived_column.name] = value
+
+        for datum, view in zip(data, views):
+            view_labels_and_notes = labels_and_notes[view.id]
+            datum[labels_key] = ','.join(view_labels_and_notes['labels'])
+            if self.include_notes:
+                datum[notes_key] = format_notes(view_labels_and_notes['notes'])
+            else:
+                datum[notes_key] = '(excluded during export)'
+
+        return data
+
+    def iter_chunks(self, progress_data=None):
+        """Yield the serialized records of the export, one list per chunk
+
+        :param progress_data: ProgressData, optional, stepped once per chunk. The total is set by this method.
+        """
+        if progress_data is not None:
+            progress_data.total = max(math.ceil(self.count() / self.chunk_size), 1)
+            progress_data.save()
+
+        for chunk_ids in self._iter_id_chunks():
+            views = list(self.get_queryset(chunk_ids))
+            if self.ids:
+                order_dict = {view_id: index for index, view_id in enumerate(chunk_ids)}
+                views.sort(key=lambda view: order_dict[view.id])
+
+            labels_and_notes = self.get_labels_and_notes([view.id for view in views])
+            data = TaxLotProperty.serialize(
+                views, self.column_ids, self.columns_from_database, labels_and_notes=labels_and_notes
+            )
+            yield self.annotate(views, data, labels_and_notes)
+
+            if progress_data is not None:
+                progress_data.step('Exporting Inventory...')
+
+    def iter_csv(self, progress_data=None):
+        """Yield the CSV export, one string per chunk"""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(export_header(self.column_name_mappings))
+
+        for data in self.iter_chunks(progress_data):
+            yield ''.join(writer.writerow(export_row(datum, self.column_name_mappings)) for datum in data)
+
+    def iter_geojson(self, progress_data=None):
+        """Yield the GeoJSON export, one string per chunk. Related records are
+        written once, the first time they are encountered."""
+        yield '{"type": "FeatureCollection", "crs": {"type": "EPSG", "properties": {"code": 4326}}, "features": ['
+
+        related_state_id = 'taxlot_state_id' if self.inventory_type == 'properties' else 'property_state_id'
+        seen_related = set()
+        first = True
+        for data in self.iter_chunks(progress_data):
+            features = []
+            for datum in data:
+                features.append(geojson_feature(datum, self.column_name_mappings))
+                for related in datum.get('related', []):
+                    if related.get(related_state_id) in seen_related:
+                        continue
+                    seen_related.add(related.get(related_state_id))
+                    features.append(geojson_feature(related, self.column_name_mappings))
+
+            if not features:
+                continue
+            chunk = ', '.join(json.dumps(feature) for feature in features)
+            yield chunk if first else ', ' + chunk
+            first = False
+
+        yield ']}'
+
+    def write_xlsx(self, path, progress_data=None):
+        """Write the records to a single worksheet XLSX file. The workbook is written
+        in constant memory mode, so the measure and scenario tabs of the in-memory
+        export are not included."""
+        wb = xlsxwriter.Workbook(path, {'constant_memory': True, 'remove_timezone': True})
+        ws = wb.add_worksheet('Properties' if self.inventory_type == 'properties' else 'Tax Lots')
+        bold = wb.add_format({'bold': True})
+
+        ws.write_row(0, 0, export_header(self.column_name_mappings), bold)
+        row = 0
+        for data in self.iter_chunks(progress_data):
+            for datum in data:
+                row += 1
+                ws.write_row(row, 0, export_row(datum, self.column_name_mappings))
+
+        wb.close()
+
+    def write(self, filename, export_type='csv', progress_data=None):
+        """Write the export to a new file in the exports media directory of the organization
+
+        :param filename: str, name of the file, a random suffix is added to make it unique
+        :param export_type: str, 'csv', 'geojson' or 'xlsx'
+        :param progress_data: ProgressData, optional
+        :return: str, path of the file relative to MEDIA_ROOT
+        """
+        name, ext = os.path.splitext(os.path.basename(filename))
+        relative_path = os.path.join(EXPORT_MEDIA_DIR, str(self.org_id), f'{name}_{get_random_string(7)}{ext}')
+        absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+
+        if export_type == 'xlsx':
+            self.write_xlsx(absolute_path, progress_data)
+        else:
+            chunks = self.iter_geojson(progress_data) if export_type == 'geojson' else self.iter_csv(progress_data)
+            with open(absolute_path, 'w', newline='', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+
+        return relative_path
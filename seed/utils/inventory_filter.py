@@ -3,11 +3,22 @@
 :author
 """
 
-from typing import Literal, Optional
+import base64
+import binascii
+import hashlib
+import json
+import operator
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from typing import Any, Literal, Optional
 
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connection
+from django.db.models import F, Q, QuerySet
 from django.db.utils import DataError
 from django.http import HttpResponse, JsonResponse
+from quantityfield.units import ureg
 from rest_framework import status
 from rest_framework.request import Request
 
@@ -20,12 +31,192 @@ from seed.models import (
     ColumnListProfile,
     ColumnListProfileColumn,
     Cycle,
+    ExtraDataUsage,
     PropertyView,
     TaxLotProperty,
     TaxLotView
 )
-from seed.search import FilterException, build_view_filters_and_sorts
+from seed.search import (
+    FilterException,
+    build_view_filters_and_sorts,
+    get_extra_data_column_ids
+)
 from seed.serializers.pint import apply_display_unit_preferences
+from seed.utils.cache import get_cache_raw, set_cache_raw
+
+# how long the total count of a filtered inventory is cached when paginating by cursor
+CURSOR_COUNT_CACHE_TIMEOUT = 300
+CURSOR_COUNT_MODES = ['cached', 'exact', 'approximate', 'none']
+
+
+class CursorException(Exception):
+    pass
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, ureg.Quantity):
+        return value.magnitude
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'date': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'decimal': str(value)}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise CursorException(f'Cannot paginate by cursor when sorting on values of type {type(value).__name__}')
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if 'datetime' in value:
+            return datetime.fromisoformat(value['datetime'])
+        if 'date' in value:
+            return date.fromisoformat(value['date'])
+        if 'decimal' in value:
+            return Decimal(value['decimal'])
+        raise CursorException('Invalid cursor')
+    return value
+
+
+def encode_cursor(order_by: list[str], values: list[Any]) -> str:
+    """Encode the sort values of the last view of a page into an opaque cursor"""
+    data = {'order_by': order_by, 'values': [_encode_cursor_value(v) for v in values]}
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: list[str]) -> list[Any]:
+    """Decode a cursor into the sort values of the last view of the previous page
+
+    :param cursor: cursor returned as `next_cursor` by the previous page
+    :param order_by: the current sort, which must match the sort of the cursor
+    :return: list of values, one per `order_by` expression
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_order_by, values = data['order_by'], data['values']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise CursorException('Invalid cursor')
+    if cursor_order_by != order_by or len(values) != len(order_by):
+        raise CursorException('The cursor does not match the current sort, restart from the first page')
+    return [_decode_cursor_value(v) for v in values]
+
+
+def _cursor_order_by(order_by: list[str]) -> list[str]:
+    # the view id makes the order, and so the position of a cursor, unique
+    if 'id' in order_by or '-id' in order_by:
+        return order_by
+    return order_by + ['id']
+
+
+def _after_cursor_filter(order_by: list[str], values: list[Any]) -> Optional[Q]:
+    """Build the filter selecting the views sorted after the cursor values, i.e.,
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... while following PostgreSQL's placement
+    of nulls (last in ascending order, first in descending order).
+
+    :return: Q, or None if no view can be after the cursor
+    """
+    after_filters = []
+    equal_filter = Q()
+    for expression, value in zip(order_by, values):
+        field = expression.lstrip('-')
+        if expression.startswith('-'):
+            if value is None:
+                after = Q(**{f'{field}__isnull': False})
+            else:
+                after = Q(**{f'{field}__lt': value})
+        else:
+            if value is None:
+                after = None
+            else:
+                after = Q(**{f'{field}__gt': value}) | Q(**{f'{field}__isnull': True})
+
+        if after is not None:
+            after_filters.append(equal_filter & after)
+        if value is None:
+            equal_filter &= Q(**{f'{field}__isnull': True})
+        else:
+            equal_filter &= Q(**{field: value})
+
+    if not after_filters:
+        return None
+    return reduce(operator.or_, after_filters)
+
+
+def _approximate_count(views_list: QuerySet) -> int:
+    """Number of rows estimated by the query planner, which is much cheaper than
+    counting on large organizations"""
+    sql, params = views_list.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _cursor_count(views_list: QuerySet, count_mode: str, cache_key: str) -> Optional[int]:
+    if count_mode == 'exact':
+        return views_list.count()
+    if count_mode == 'approximate':
+        return _approximate_count(views_list)
+    if count_mode == 'cached':
+        total = get_cache_raw(cache_key)
+        if total is None:
+            total = views_list.count()
+            set_cache_raw(cache_key, total, CURSOR_COUNT_CACHE_TIMEOUT)
+        return total
+    return None
+
+
+def paginate_by_cursor(views_list: QuerySet, order_by: list[str], cursor: str, per_page: int,
+                       count_mode: str = 'cached', count_cache_key: str = '') -> tuple[list, dict]:
+    """Keyset pagination of the filtered views. Instead of skipping the views of the
+    previous pages with an offset, the next page starts after the sort values of the
+    last view of the previous page (encoded in the cursor), so fetching any page costs
+    the same as fetching the first one.
+
+    :param views_list: filtered and annotated views
+    :param order_by: the sort of the views, from build_view_filters_and_sorts
+    :param cursor: `next_cursor` of the previous page, empty for the first page
+    :param per_page: number of views per page
+    :param count_mode: how the total is computed, one of CURSOR_COUNT_MODES
+    :param count_cache_key: cache key of the total when count_mode is "cached"
+    :return: the views of the page and the pagination information
+    """
+    if count_mode not in CURSOR_COUNT_MODES:
+        raise CursorException(f'Invalid count_mode "{count_mode}"; expected one of {CURSOR_COUNT_MODES}')
+
+    order_by = _cursor_order_by(order_by)
+    total = _cursor_count(views_list, count_mode, count_cache_key)
+
+    cursor_fields = {
+        f'_cursor_{index}': F(expression.lstrip('-'))
+        for index, expression in enumerate(order_by)
+    }
+    page_views = views_list.annotate(**cursor_fields).order_by(*order_by)
+    if cursor:
+        after_filter = _after_cursor_filter(order_by, decode_cursor(cursor, order_by))
+        page_views = page_views.filter(after_filter) if after_filter is not None else page_views.none()
+
+    # fetch one extra view to know if there is a next page
+    views = list(page_views[:per_page + 1])
+    has_next = len(views) > per_page
+    views = views[:per_page]
+
+    next_cursor = None
+    if has_next:
+        last_view = views[-1]
+        next_cursor = encode_cursor(order_by, [getattr(last_view, name) for name in cursor_fields])
+
+    return views, {
+        'per_page': per_page,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'has_next': has_next,
+        'total': total,
+        'total_is_approximate': count_mode == 'approximate',
+    }
 
 
 def get_filtered_results(request: Request, inventory_type: Literal['property', 'taxlot'], profile_id: int) -> HttpResponse:
@@ -34,6 +225,8 @@ def get_filtered_results(request: Request, inventory_type: Literal['property', '
     org_id = request.query_params.get('organization_id')
     cycle_id = request.query_params.get('cycle')
     ids_only = request.query_params.get('ids_only', 'false').lower() == 'true'
+    # passing a cursor (empty for the first page) switches to cursor pagination
+    cursor = request.query_params.get('cursor')
     # check if there is a query paramater for the profile_id. If so, then use that one
     profile_id = request.query_params.get('profile_id', profile_id)
 
@@ -60,10 +253,10 @@ def get_filtered_results(request: Request, inventory_type: Literal['property', '
             'results': []
         })
 
-    if ids_only and (per_page or page):
+    if ids_only and (per_page or page or cursor is not None):
         return JsonResponse({
             'success': False,
-            'message': 'Cannot pass query parameter "ids_only" with "per_page" or "page"'
+            'message': 'Cannot pass query parameter "ids_only" with "per_page", "page" or "cursor"'
         }, status=status.HTTP_400_BAD_REQUEST)
 
     page = page or 1
@@ -72,12 +265,12 @@ def get_filtered_results(request: Request, inventory_type: Literal['property', '
     if inventory_type == 'property':
         views_list = (
             PropertyView.objects.select_related('property', 'state', 'cycle')
-            .filter(property__organization_id=org_id, cycle=cycle)
+            .filter(property__organization_id=org_id, state__organization_id=org_id, cycle=cycle)
         )
     elif inventory_type == 'taxlot':
         views_list = (
             TaxLotView.objects.select_related('taxlot', 'state', 'cycle')
-            .filter(taxlot__organization_id=org_id, cycle=cycle)
+            .filter(taxlot__organization_id=org_id, state__organization_id=org_id, cycle=cycle)
         )
 
     include_related = (
@@ -102,6 +295,9 @@ def get_filtered_results(request: Request, inventory_type: Literal['property', '
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    # usage is tracked to decide which extra data columns should be indexed
+    ExtraDataUsage.record(*get_extra_data_column_ids(request.query_params, columns_from_database))
+
     views_list = views_list.annotate(**annotations).filter(filters).order_by(*order_by)
 
     # return property views limited to the 'include_view_ids' list if not empty
@@ -118,17 +314,45 @@ def get_filtered_results(request: Request, inventory_type: Literal['property', '
             'results': id_list
         })
 
-    paginator = Paginator(views_list, per_page)
-
     try:
-        views = paginator.page(page)
-        page = int(page)
-    except PageNotAnInteger:
-        views = paginator.page(1)
-        page = 1
-    except EmptyPage:
-        views = paginator.page(paginator.num_pages)
-        page = paginator.num_pages
+        if cursor is not None:
+            count_cache_key = _count_cache_key(request, inventory_type, org_id, cycle.id)
+            views, pagination = paginate_by_cursor(
+                views_list,
+                order_by,
+                cursor,
+                int(per_page),
+                request.query_params.get('count_mode', 'cached'),
+                count_cache_key,
+            )
+        else:
+            paginator = Paginator(views_list, per_page)
+            try:
+                views = paginator.page(page)
+                page = int(page)
+            except PageNotAnInteger:
+                views = paginator.page(1)
+                page = 1
+            except EmptyPage:
+                views = paginator.page(paginator.num_pages)
+                page = paginator.num_pages
+            pagination = {
+                'page': page,
+                'start': views.start_index(),
+                'end': views.end_index(),
+                'num_pages': paginator.num_pages,
+                'has_next': views.has_next(),
+                'has_previous': views.has_previous(),
+                'total': paginator.count
+            }
+    except CursorException as e:
+        return JsonResponse(
+            {
+                'status': 'error',
+                'message': f'Error paginating: {str(e)}'
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except DataError as e:
         return JsonResponse(
             {
@@ -189,17 +413,21 @@ def get_filtered_results(request: Request, inventory_type: Literal['property', '
     unit_collapsed_results = [apply_display_unit_preferences(org, x) for x in related_results]
 
     response = {
-        'pagination': {
-            'page': page,
-            'start': paginator.page(page).start_index(),
-            'end': paginator.page(page).end_index(),
-            'num_pages': paginator.num_pages,
-            'has_next': paginator.page(page).has_next(),
-            'has_previous': paginator.page(page).has_previous(),
-            'total': paginator.count
-        },
+        'pagination': pagination,
         'cycle_id': cycle.id,
         'results': unit_collapsed_results
     }
 
     return JsonResponse(response)
+
+
+def _count_cache_key(request: Request, inventory_type: str, org_id: int, cycle_id: int) -> str:
+    """Cache key of the total count of views matching the filters of the request"""
+    ignored_params = ['cursor', 'count_mode', 'per_page', 'page', 'order_by']
+    filters = sorted(
+        (key, value) for key, values in request.query_params.lists()
+        for value in values if key not in ignored_params
+    )
+    view_ids = [request.data.get('include_view_ids'), request.data.get('exclude_view_ids')]
+    digest = hashlib.md5(json.dumps([filters, view_ids], default=str).encode()).hexdigest()
+    return f'SEED:inventory_count:{inventory_type}:{org_id}:{cycle_id}:{digest}'
@@ -5,16 +5,20 @@
 :author
 """
 
+from collections import Counter, defaultdict
+
 from celery import shared_task
+from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.postgres.aggregates.general import ArrayAgg
 from django.db import transaction
-from django.db.models import Subquery
 from django.db.models.aggregates import Count
+from quantityfield.units import ureg
 
 from seed.lib.progress_data.progress_data import ProgressData
 from seed.models import (
     Column,
     Cycle,
+    Meter,
     Property,
     PropertyState,
     PropertyView,
@@ -67,6 +71,106 @@ def matching_criteria_column_names(organization_id, table_name):
     }
 
 
+MATCHING_INDEX_CHUNK_SIZE = 2000
+
+
+def _normalize_matching_value(value):
+    """Convert a matching criteria value into a hashable value which is equal for
+    values the database considers equal"""
+    if isinstance(value, ureg.Quantity):
+        return value.magnitude
+    if isinstance(value, GEOSGeometry):
+        return bytes(value.ewkb)
+    return value
+
+
+class MatchingIndex(object):
+    """
+    Hashed blocking index of records by the values of their matching criteria.
+
+    Records are added with the values of their matching criteria (and an optional
+    block, e.g., the Cycle, which must also be equal for records to match) and an
+    item identifying them. Records whose matching criteria values are all None are
+    not eligible for matching and are kept aside in `empty_items`.
+
+    Building the index from a QuerySet streams the rows once, after which all the
+    groups of matching records are known without any further queries.
+    """
+
+    def __init__(self, column_names):
+        self.column_names = sorted(column_names)
+        self.empty_items = []
+        self._blocks = defaultdict(list)
+
+    @classmethod
+    def from_queryset(cls, queryset, column_names, item_fields=('id',), block_field=None, prefix='',
+                      chunk_size=MATCHING_INDEX_CHUNK_SIZE):
+        """
+        Build the index from a QuerySet of -States (or of -Views with prefix='state__').
+
+        :param queryset: QuerySet
+        :param column_names: matching criteria column names
+        :param item_fields: fields identifying a record, the item is the value of the
+            field if there is only one, otherwise a tuple of the values
+        :param block_field: optional field whose value must also be equal for records to match
+        :param prefix: prefix of the matching criteria fields relative to the QuerySet's model
+        :return: MatchingIndex
+        """
+        index = cls(column_names)
+        item_fields = list(item_fields)
+        block_fields = [block_field] if block_field else []
+        fields = item_fields + block_fields + [prefix + column_name for column_name in index.column_names]
+
+        item_count = len(item_fields)
+        values_start = item_count + len(block_fields)
+        rows = queryset.order_by().values_list(*fields).iterator(chunk_size=chunk_size)
+        for row in rows:
+            item = row[0] if item_count == 1 else row[:item_count]
+            block = row[item_count] if block_fields else None
+            index.add(row[values_start:], item, block)
+
+        return index
+
+    def key(self, values, block=None):
+        values = tuple(_normalize_matching_value(value) for value in values)
+        if all(value is None for value in values):
+            return None
+        return (block, values)
+
+    def state_key(self, state, block=None):
+        return self.key([getattr(state, column_name, None) for column_name in self.column_names], block)
+
+    def add(self, values, item, block=None):
+        """Add a record, returns False if it's not eligible for matching"""
+        key = self.key(values, block)
+        if key is None:
+            self.empty_items.append(item)
+            return False
+        self._blocks[key].append(item)
+        return True
+
+    def get(self, key):
+        """Items of the records matching the key (see key() and state_key())"""
+        if key is None:
+            return []
+        return self._blocks.get(key, [])
+
+    def replace(self, key, items):
+        self._blocks[key] = list(items)
+
+    def groups(self, min_size=1):
+        """Lists of items of matching records"""
+        for items in self._blocks.values():
+            if len(items) >= min_size:
+                yield items
+
+    def items(self):
+        """Items of all the records, including the ones not eligible for matching"""
+        for items in self._blocks.values():
+            yield from items
+        yield from self.empty_items
+
+
 def _merge_matches_across_cycles(matching_views, org_id, given_state_id, StateClass):
     """
     This is a helper method for match_merge_link().
@@ -317,105 +421,100 @@ def whole_org_match_merge_link(org_id, state_class_name, proposed_columns=[]):
         column_names = matching_criteria_column_names(org_id, state_class_name)
         preview_run = False
 
-    empty_matching_criteria = empty_criteria_filter(StateClass, column_names)
+    canonical_id_col = 'property_id' if StateClass == PropertyState else 'taxlot_id'
+    canonical_field = canonical_id_col[:-len('_id')]
+    org_views = ViewClass.objects.filter(cycle_id__in=cycle_ids)
 
     with transaction.atomic():
-        # Match merge within each Cycle
-        for cycle_id in cycle_ids:
-            view_in_cycle = ViewClass.objects.filter(cycle_id=cycle_id)
-
-            matched_id_groups = StateClass.objects.\
-                filter(id__in=Subquery(view_in_cycle.values('state_id'))).\
-                exclude(**empty_matching_criteria).\
-                values(*column_names).\
-                annotate(matched_ids=ArrayAgg('id'), matched_count=Count('id')).\
-                values_list('matched_ids', flat=True).\
-                filter(matched_count__gt=1)
-
-            for state_ids in matched_id_groups:
-                ordered_ids = list(
-                    StateClass.objects.
-                    filter(id__in=state_ids).
-                    order_by('updated').
-                    values_list('id', flat=True)
-                )
-
-                merge_states_with_views(ordered_ids, org_id, 'System Match', StateClass)
-
-                summary[StateClass.__name__]['merged_count'] += len(state_ids)
-
-        # Match link across the whole Organization
-        # Append 'state__' to dict keys used for filtering so that filtering can be done across associations
-        state_appended_col_names = {'state__' + col_name for col_name in column_names}
-        state_appended_empty_matching_criteria = {
-            'state__' + col_name: v
-            for col_name, v
-            in empty_matching_criteria.items()
-        }
+        # Match merge within each Cycle. A single pass over the -States of the
+        # organization's -Views, blocked by Cycle, gives all the groups of -States to
+        # merge. -States with empty matching criteria are not eligible.
+        merge_index = MatchingIndex.from_queryset(
+            org_views,
+            column_names,
+            item_fields=['state__updated', 'state_id'],
+            block_field='cycle_id',
+            prefix='state__',
+        )
 
-        canonical_id_col = 'property_id' if StateClass == PropertyState else 'taxlot_id'
+        for group in merge_index.groups(min_size=2):
+            # Merge -States ordered by last update (least to most priority)
+            ordered_ids = [state_id for _updated, state_id in sorted(group)]
 
-        # Looking at all -Views in Org across Cycles
-        org_views = ViewClass.objects.\
-            filter(cycle_id__in=cycle_ids).\
-            select_related('state')
+            merge_states_with_views(ordered_ids, org_id, 'System Match', StateClass)
+
+            summary[StateClass.__name__]['merged_count'] += len(ordered_ids)
+
+        # Match link across the whole Organization, by indexing all -Views (post-merge)
+        # in Org across Cycles by their matching criteria
+        link_index = MatchingIndex.from_queryset(
+            org_views,
+            column_names,
+            item_fields=['id', canonical_id_col],
+            prefix='state__',
+        )
 
         # Identify all canonical_ids that are currently used once and are potentially reusable
-        reusable_canonical_ids = org_views.\
-            values(canonical_id_col).\
-            annotate(use_count=Count(canonical_id_col)).\
-            values_list(canonical_id_col, flat=True).\
-            filter(use_count=1)
-
-        # Ignoring -Views associated to -States with empty matching critieria, group by columns
-        link_groups = org_views.\
-            exclude(**state_appended_empty_matching_criteria).\
-            values(*state_appended_col_names).\
-            annotate(
-                canonical_ids=ArrayAgg(canonical_id_col),
-                view_ids=ArrayAgg('id'),
-                link_count=Count('id')
-            ).\
-            values_list('canonical_ids', 'view_ids', 'link_count')
+        canonical_use_counts = Counter(canonical_id for _view_id, canonical_id in link_index.items())
+        reusable_canonical_ids = {
+            canonical_id for canonical_id, use_count in canonical_use_counts.items() if use_count == 1
+        }
 
-        unused_canonical_ids = []
-        for canonical_ids, view_ids, link_count in link_groups:
+        # Canonical records with meters, only these need their meters copied
+        if CanonicalClass == Property:
+            metered_canonical_ids = set(
+                Meter.objects.filter(property__organization_id=org_id).values_list('property_id', flat=True)
+            )
+        else:
+            metered_canonical_ids = set()
+
+        # Ignoring -Views associated to -States with empty matching critieria, find the link groups
+        groups_to_link = []
+        for group in link_index.groups():
             # If the canonical record was unlinked and is still unlinked, do nothing
-            if link_count == 1 and canonical_ids[0] in reusable_canonical_ids:
+            if len(group) == 1 and group[0][1] in reusable_canonical_ids:
                 continue
+            groups_to_link.append(group)
 
-            # Otherwise, create a new canonical record, copy meters if applicable, and apply the new record to old -Views
-            new_record = CanonicalClass.objects.create(organization_id=org_id)
+        # For records with empty criteria and without reusable canonical IDs, apply a new ID.
+        empty_criteria_items = [
+            (view_id, canonical_id) for view_id, canonical_id in link_index.empty_items
+            if canonical_id not in reusable_canonical_ids
+        ]
 
-            if CanonicalClass == Property:
-                canonical_ids.sort(reverse=True)  # Ensures priority given by most recently created canonical record
-                for canonical_id in canonical_ids:
+        # Create all the new canonical records at once
+        new_records = CanonicalClass.objects.bulk_create([
+            CanonicalClass(organization_id=org_id)
+            for _ in range(len(groups_to_link) + len(empty_criteria_items))
+        ])
+
+        updated_views = []
+        unused_canonical_ids = []
+        for group, new_record in zip(groups_to_link, new_records):
+            view_ids = [view_id for view_id, _canonical_id in group]
+            canonical_ids = [canonical_id for _view_id, canonical_id in group]
+
+            # Copy meters if applicable, priority given by most recently created canonical record
+            for canonical_id in sorted(canonical_ids, reverse=True):
+                if canonical_id in metered_canonical_ids:
                     new_record.copy_meters(canonical_id, source_persists=True)
 
-            ViewClass.objects.filter(id__in=view_ids).update(**{canonical_id_col: new_record.id})
+            updated_views += [ViewClass(id=view_id, **{canonical_id_col: new_record.id}) for view_id in view_ids]
 
             summary[StateClass.__name__]['linked_sets_count'] += 1
 
             unused_canonical_ids += canonical_ids
 
-        # For records with empty criteria and without reusable canonical IDs, apply a new ID.
-        empty_criteria_views = ViewClass.objects.\
-            select_related('state').\
-            filter(cycle_id__in=cycle_ids, **state_appended_empty_matching_criteria).\
-            exclude(**{canonical_id_col + "__in": reusable_canonical_ids})
+        for (view_id, canonical_id), new_record in zip(empty_criteria_items, new_records[len(groups_to_link):]):
+            if canonical_id in metered_canonical_ids:
+                new_record.copy_meters(canonical_id, source_persists=False)
 
-        for view in empty_criteria_views:
-            # Create a new canonical record, copy meters if applicable, and apply the new record to old -Views
-            new_record = CanonicalClass.objects.create(organization_id=org_id)
+            updated_views.append(ViewClass(id=view_id, **{canonical_id_col: new_record.id}))
 
-            if CanonicalClass == Property:
-                new_record.copy_meters(getattr(view, canonical_id_col), source_persists=False)
-
-            setattr(view, canonical_id_col, new_record.id)
-            view.save()
+            # Also delete these unusable canonical records
+            unused_canonical_ids.append(canonical_id)
 
-        # Also delete these unusable canonical records
-        unused_canonical_ids += empty_criteria_views.values_list(canonical_id_col, flat=True)
+        ViewClass.objects.bulk_update(updated_views, [canonical_field], batch_size=1000)
 
         # Delete canonical records that are no longer used.
         CanonicalClass.objects.filter(id__in=unused_canonical_ids).delete()
@@ -13,19 +13,15 @@ from django.db.models import Subquery
 
 from seed.lib.merging import merging
 from seed.models import (
-    AUDIT_IMPORT,
     DATA_STATE_MATCHING,
-    MERGE_STATE_MERGED,
     MERGE_STATE_UNKNOWN,
     Column,
     Note,
     Property,
-    PropertyAuditLog,
     PropertyState,
     PropertyView,
     StatusLabel,
     TaxLot,
-    TaxLotAuditLog,
     TaxLotProperty,
     TaxLotState,
     TaxLotView
@@ -44,153 +40,112 @@ def merge_states_with_views(state_ids, org_id, log_name, StateClass):
 
 
 def merge_properties(state_ids, org_id, log_name, ignore_merge_protection=False):
-    index = 1
-    merged_state = None
-    while index < len(state_ids):
-        # state 1 is the base, state 2 is merged on top of state 1
-        # Use index 0 the first time through, merged_state from then on
-        if index == 1:
-            state_1 = PropertyState.objects.get(id=state_ids[index - 1])
-        else:
-            state_1 = merged_state
-        state_2 = PropertyState.objects.get(id=state_ids[index])
-
-        merged_state = PropertyState.objects.create(organization_id=org_id)
-
-        views = PropertyView.objects.filter(state_id__in=[state_1.id, state_2.id])
-        view_ids = list(views.values_list('id', flat=True))
-        canonical_ids = list(views.values_list('property_id', flat=True))
-
-        # Create new inventory record and associate it to a new view
-        new_property = Property(organization_id=org_id)
-        new_property.save()
-
-        cycle_id = views.first().cycle_id
-        new_view = PropertyView(
-            cycle_id=cycle_id,
-            state_id=merged_state.id,
-            property_id=new_property.id
-        )
-        new_view.save()
-
-        _merge_log_states(merged_state, org_id, state_1, state_2, log_name, ignore_merge_protection)
-
-        _copy_meters_in_order(state_1.id, state_2.id, new_property)
-        _copy_propertyview_relationships(view_ids, new_view)
-
-        # Delete canonical records that are NOT associated to other -Views.
-        other_associated_views = PropertyView.objects.filter(property_id__in=canonical_ids).exclude(pk__in=view_ids)
-        Property.objects \
-            .filter(pk__in=canonical_ids) \
-            .exclude(pk__in=Subquery(other_associated_views.values('property_id'))) \
-            .delete()
-
-        # Delete all -Views
-        PropertyView.objects.filter(pk__in=view_ids).delete()
-
-        index += 1
+    """
+    Merge the given -States, ordered from least to most priority, into a single
+    new -State associated to a new Property and PropertyView.
+    """
+    if len(state_ids) < 2:
+        return None
+
+    views = PropertyView.objects.filter(state_id__in=state_ids)
+    view_ids = list(views.values_list('id', flat=True))
+    canonical_ids = list(views.values_list('property_id', flat=True))
+
+    merged_state = _merge_log_states(org_id, state_ids, log_name, ignore_merge_protection, PropertyState)
+
+    # Create new inventory record and associate it to a new view
+    new_property = Property(organization_id=org_id)
+    new_property.save()
+
+    cycle_id = views.first().cycle_id
+    new_view = PropertyView(
+        cycle_id=cycle_id,
+        state_id=merged_state.id,
+        property_id=new_property.id
+    )
+    new_view.save()
+
+    _copy_meters_in_order(state_ids, new_property)
+    _copy_propertyview_relationships(view_ids, new_view)
+
+    # Delete canonical records that are NOT associated to other -Views.
+    other_associated_views = PropertyView.objects.filter(property_id__in=canonical_ids).exclude(pk__in=view_ids)
+    Property.objects \
+        .filter(pk__in=canonical_ids) \
+        .exclude(pk__in=Subquery(other_associated_views.values('property_id'))) \
+        .delete()
+
+    # Delete all -Views
+    PropertyView.objects.filter(pk__in=view_ids).delete()
 
     return merged_state
 
 
 def merge_taxlots(state_ids, org_id, log_name, ignore_merge_protection=False):
-    index = 1
-    merged_state = None
-    while index < len(state_ids):
-        # state 1 is the base, state 2 is merged on top of state 1
-        # Use index 0 the first time through, merged_state from then on
-        if index == 1:
-            state_1 = TaxLotState.objects.get(id=state_ids[index - 1])
-        else:
-            state_1 = merged_state
-        state_2 = TaxLotState.objects.get(id=state_ids[index])
-
-        merged_state = TaxLotState.objects.create(organization_id=org_id)
-
-        views = TaxLotView.objects.filter(state_id__in=[state_1.id, state_2.id])
-        view_ids = list(views.values_list('id', flat=True))
-        canonical_ids = list(views.values_list('taxlot_id', flat=True))
-
-        # Create new inventory record and associate it to a new view
-        new_taxlot = TaxLot(organization_id=org_id)
-        new_taxlot.save()
-
-        cycle_id = views.first().cycle_id
-        new_view = TaxLotView(
-            cycle_id=cycle_id,
-            state_id=merged_state.id,
-            taxlot_id=new_taxlot.id
-        )
-        new_view.save()
-
-        _merge_log_states(merged_state, org_id, state_1, state_2, log_name, ignore_merge_protection)
-
-        _copy_taxlotview_relationships(view_ids, new_view)
-
-        # Delete canonical records that are NOT associated to other -Views.
-        other_associated_views = TaxLotView.objects.filter(taxlot_id__in=canonical_ids).exclude(pk__in=view_ids)
-        TaxLot.objects \
-            .filter(pk__in=canonical_ids) \
-            .exclude(pk__in=Subquery(other_associated_views.values('taxlot_id'))) \
-            .delete()
-
-        # Delete all -Views
-        TaxLotView.objects.filter(pk__in=view_ids).delete()
-
-        index += 1
+    """
+    Merge the given -States, ordered from least to most priority, into a single
+    new -State associated to a new TaxLot and TaxLotView.
+    """
+    if len(state_ids) < 2:
+        return None
+
+    views = TaxLotView.objects.filter(state_id__in=state_ids)
+    view_ids = list(views.values_list('id', flat=True))
+    canonical_ids = list(views.values_list('taxlot_id', flat=True))
+
+    merged_state = _merge_log_states(org_id, state_ids, log_name, ignore_merge_protection, TaxLotState)
+
+    # Create new inventory record and associate it to a new view
+    new_taxlot = TaxLot(organization_id=org_id)
+    new_taxlot.save()
+
+    cycle_id = views.first().cycle_id
+    new_view = TaxLotView(
+        cycle_id=cycle_id,
+        state_id=merged_state.id,
+        taxlot_id=new_taxlot.id
+    )
+    new_view.save()
+
+    _copy_taxlotview_relationships(view_ids, new_view)
+
+    # Delete canonical records that are NOT associated to other -Views.
+    other_associated_views = TaxLotView.objects.filter(taxlot_id__in=canonical_ids).exclude(pk__in=view_ids)
+    TaxLot.objects \
+        .filter(pk__in=canonical_ids) \
+        .exclude(pk__in=Subquery(other_associated_views.values('taxlot_id'))) \
+        .delete()
+
+    # Delete all -Views
+    TaxLotView.objects.filter(pk__in=view_ids).delete()
 
     return merged_state
 
 
-def _merge_log_states(merged_state, org_id, state_1, state_2, log_name, ignore_merge_protection):
-    if isinstance(state_1, PropertyState):
-        StateClass = PropertyState
-        AuditLogClass = PropertyAuditLog
-    else:
-        StateClass = TaxLotState
-        AuditLogClass = TaxLotAuditLog
+def _merge_log_states(org_id, state_ids, log_name, ignore_merge_protection, StateClass):
+    states_by_id = StateClass.objects.select_related('import_file').in_bulk(state_ids)
+    states = [states_by_id[state_id] for state_id in state_ids]
     priorities = Column.retrieve_priorities(org_id)
 
-    merged_state = merging.merge_state(
-        merged_state, state_1, state_2, priorities[StateClass.__name__], ignore_merge_protection
+    # All the -States are merged at once into a single -State and audit log
+    merged_state = merging.merge_states_bulk(
+        states,
+        priorities[StateClass.__name__],
+        log_name,
+        ignore_merge_protection,
+        data_state=DATA_STATE_MATCHING
     )
 
-    state_1_audit_log = AuditLogClass.objects.filter(state=state_1).first()
-    state_2_audit_log = AuditLogClass.objects.filter(state=state_2).first()
-
-    AuditLogClass.objects.create(
-        organization_id=org_id,
-        parent1=state_1_audit_log,
-        parent2=state_2_audit_log,
-        parent_state1=state_1,
-        parent_state2=state_2,
-        state=merged_state,
-        name=log_name,
-        description='Automatic Merge',
-        import_filename=None,
-        record_type=AUDIT_IMPORT
-    )
+    StateClass.objects.filter(pk__in=state_ids).update(merge_state=MERGE_STATE_UNKNOWN)
 
-    # Set the merged_state to merged
-    merged_state.data_state = DATA_STATE_MATCHING
-    merged_state.merge_state = MERGE_STATE_MERGED
-    merged_state.save()
-    state_1.merge_state = MERGE_STATE_UNKNOWN
-    state_1.save()
-    state_2.merge_state = MERGE_STATE_UNKNOWN
-    state_2.save()
+    return merged_state
 
 
-def _copy_meters_in_order(state_1_id, state_2_id, new_property):
+def _copy_meters_in_order(state_ids, new_property):
     # Add meters in the following order without regard for the source persisting.
-    new_property.copy_meters(
-        PropertyView.objects.get(state_id=state_1_id).property_id,
-        source_persists=False
-    )
-    new_property.copy_meters(
-        PropertyView.objects.get(state_id=state_2_id).property_id,
-        source_persists=False
-    )
+    property_ids = dict(PropertyView.objects.filter(state_id__in=state_ids).values_list('state_id', 'property_id'))
+    for state_id in state_ids:
+        new_property.copy_meters(property_ids[state_id], source_persists=False)
 
 
 def _copy_propertyview_relationships(view_ids, new_view):
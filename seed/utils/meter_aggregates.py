@@ -0,0 +1,140 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2022, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.
+:author
+
+TimescaleDB continuous aggregates of the meter readings.
+
+Migration 0178 creates a hierarchy of continuous aggregates of the readings with a
+reading and a positive duration, bucketed by the start time of the readings in the time
+zone of SEED:
+
+- seed_meterreading_daily: the total kBtu, the number of readings and the latest end
+  time of the readings of each meter and day
+- seed_meterreading_monthly: the same by meter and month, rolled up from the days
+
+They are only created with TimescaleDB 2.9 or later, and filled with the existing readings
+by the migration. They are refreshed for the time range of the readings once a meter import
+is finished or readings are copied to other meters, and can be refreshed entirely with the
+refresh_meter_reading_aggregates management command.
+"""
+import logging
+
+from dateutil.relativedelta import relativedelta
+from django.db import DatabaseError, connection, transaction
+from django.utils.timezone import is_naive, make_aware
+from pytz import timezone
+
+from config.settings.common import TIME_ZONE
+
+_log = logging.getLogger(__name__)
+
+# the aggregates and their bucket widths, each one rolled up from the previous one
+AGGREGATES = [
+    ('seed_meterreading_daily', relativedelta(days=1)),
+    ('seed_meterreading_monthly', relativedelta(months=1)),
+]
+
+# the months are the local months of TIME_ZONE, as in the aggregate
+MONTHLY_TOTALS_SQL = """
+SELECT meter_id, month AT TIME ZONE %(time_zone)s AS month, reading,
+    end_time > ((month AT TIME ZONE %(time_zone)s) + INTERVAL '1 month') AT TIME ZONE %(time_zone)s AS straddling
+FROM seed_meterreading_monthly
+WHERE meter_id IN %(meter_ids)s
+"""
+
+
+def aggregate_exists():
+    """
+    :return: bool, True if the continuous aggregates were created
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [AGGREGATES[-1][0]])
+        return cursor.fetchone()[0]
+
+
+def _floor_bucket(value, width):
+    # the buckets are aligned to the local days and months
+    tz = timezone(TIME_ZONE)
+    if is_naive(value):
+        value = make_aware(value, timezone=tz)
+    local = value.astimezone(tz).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    if width.months:
+        local = local.replace(day=1)
+    return local
+
+
+def _refresh_window(start_time, end_time, width):
+    # only whole buckets are refreshed, so the window is widened to the buckets of the readings
+    tz = timezone(TIME_ZONE)
+    if start_time is not None:
+        start_time = tz.localize(_floor_bucket(start_time, width))
+    if end_time is not None:
+        end_time = tz.localize(_floor_bucket(end_time, width) + width)
+    return start_time, end_time
+
+
+def refresh_aggregates(start_time=None, end_time=None):
+    """
+    Refresh the continuous aggregates for the readings starting between start_time and
+    end_time, or entirely if they are None. A continuous aggregate cannot be refreshed
+    within a transaction, so this is done once the current transaction is committed
+    (immediately if there is none). Errors are logged, the readings are saved either way.
+
+    :param start_time: datetime, earliest start time of the readings
+    :param end_time: datetime, latest start time of the readings
+    :return: None
+    """
+    def _refresh():
+        try:
+            if not aggregate_exists():
+                return
+            with connection.cursor() as cursor:
+                # each aggregate is rolled up from the previous one, so they are refreshed in order
+                for name, width in AGGREGATES:
+                    cursor.execute(
+                        'CALL refresh_continuous_aggregate(%s::regclass, %s, %s)',
+                        [name, *_refresh_window(start_time, end_time, width)]
+                    )
+        except DatabaseError as e:
+            _log.warning(f'Could not refresh the meter reading aggregates from {start_time} to {end_time}: {e}')
+
+    transaction.on_commit(_refresh)
+
+
+def readings_time_range(readings):
+    """
+    :param readings: iterable of dicts or MeterReadings with a start_time
+    :return: tuple, the earliest and latest start times of the readings, or None if there
+        are no readings
+    """
+    start_times = [
+        reading['start_time'] if isinstance(reading, dict) else reading.start_time
+        for reading in readings
+    ]
+    if not start_times:
+        return None
+    return min(start_times), max(start_times)
+
+
+def monthly_totals(meter_ids):
+    """
+    Total kBtu of the meters by month of the start time of the readings, read from the
+    monthly continuous aggregate. The totals of the months with readings ending after the
+    end of the month are the totals of the readings starting in the month, i.e., they are
+    not prorated.
+
+    :param meter_ids: list of int
+    :return: list of tuples, (meter id, start of the month, total kBtu, True if a reading
+        ends after the end of the month)
+    """
+    if not meter_ids:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(MONTHLY_TOTALS_SQL, {
+            'time_zone': TIME_ZONE,
+            'meter_ids': tuple(meter_ids),
+        })
+        return cursor.fetchall()
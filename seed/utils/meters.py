@@ -5,6 +5,9 @@ from calendar import monthrange
 from collections import defaultdict
 from datetime import datetime, time, timedelta
 
+import numpy as np
+from django.conf import settings
+from django.db import connection
 from django.db.models import Q
 from django.utils.timezone import make_aware
 from pytz import timezone
@@ -15,7 +18,63 @@ from seed.data_importer.utils import (
     usage_point_id
 )
 from seed.lib.superperms.orgs.models import Organization
-from seed.models import Meter
+from seed.models import Meter, MeterReading
+from seed.utils.meter_aggregates import aggregate_exists, monthly_totals
+
+# Readings prorated by the number of seconds within each calendar month of the time zone.
+# Readings within a single month (e.g., interval data) are summed directly, and only the
+# readings which straddle the end of a month are split into months.
+MONTHLY_USAGES_SQL = """
+WITH readings AS (
+    SELECT meter_id, start_time, end_time, reading,
+        date_trunc('month', start_time AT TIME ZONE %(time_zone)s) AS month
+    FROM seed_meterreading
+    WHERE meter_id IN %(meter_ids)s AND end_time > start_time AND reading IS NOT NULL
+)
+SELECT meter_id, month, SUM(reading)
+FROM (
+    SELECT meter_id, month, reading
+    FROM readings
+    WHERE end_time <= (month + INTERVAL '1 month') AT TIME ZONE %(time_zone)s
+    UNION ALL
+    SELECT meter_id, month, reading * EXTRACT(EPOCH FROM
+        LEAST(end_time, (month + INTERVAL '1 month') AT TIME ZONE %(time_zone)s)
+        - GREATEST(start_time, month AT TIME ZONE %(time_zone)s)
+    ) / EXTRACT(EPOCH FROM end_time - start_time)
+    FROM (
+        SELECT meter_id, start_time, end_time, reading, months.month
+        FROM readings
+        CROSS JOIN LATERAL generate_series(
+            readings.month, date_trunc('month', end_time AT TIME ZONE %(time_zone)s), INTERVAL '1 month'
+        ) AS months(month)
+        WHERE end_time > (readings.month + INTERVAL '1 month') AT TIME ZONE %(time_zone)s
+    ) AS straddling_readings
+    WHERE end_time > month AT TIME ZONE %(time_zone)s
+) AS month_readings
+GROUP BY meter_id, month
+"""
+
+# Total of the readings within each calendar year of the time zone. The total is only
+# correct when the readings of the year do not overlap and, except for the first one, are
+# not empty (see _usages_by_year_in_database).
+YEARLY_USAGES_SQL = """
+SELECT meter_id, year,
+    BOOL_AND(previous_end_time IS NULL OR (previous_end_time <= start_time AND start_time < end_time)) AS disjoint,
+    SUM(CASE WHEN previous_end_time IS NULL THEN reading ELSE GREATEST(reading, 0) END) AS total
+FROM (
+    SELECT meter_id, start_time, end_time, reading, year,
+        LAG(end_time) OVER (PARTITION BY meter_id, year ORDER BY end_time, start_time) AS previous_end_time
+    FROM (
+        SELECT meter_id, start_time, end_time, reading,
+            date_trunc('year', start_time AT TIME ZONE %(time_zone)s) AS year
+        FROM seed_meterreading
+        WHERE meter_id IN %(meter_ids)s
+    ) AS readings
+    WHERE end_time <= (year + INTERVAL '1 year') AT TIME ZONE %(time_zone)s
+) AS year_readings
+GROUP BY meter_id, year
+ORDER BY meter_id, year
+"""
 
 
 class PropertyMeterReadingsExporter():
@@ -57,10 +116,25 @@ class PropertyMeterReadingsExporter():
         if interval == 'Exact':
             return self._usages_by_exact_times()
         elif interval == 'Month':
+            if self._aggregate_in_database():
+                return self._usages_by_month_in_database()
             return self._usages_by_month()
         elif interval == 'Year':
+            if self._aggregate_in_database():
+                return self._usages_by_year_in_database()
             return self._usages_by_year()
 
+    def _aggregate_in_database(self):
+        return settings.METER_READINGS_SQL_AGGREGATION and connection.vendor == 'postgresql'
+
+    def _aggregate(self, sql, meters):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'time_zone': TIME_ZONE,
+                'meter_ids': tuple(meter.id for meter in meters),
+            })
+            return cursor.fetchall()
+
     def _usages_by_exact_times(self):
         """
         Returns readings and column definitions formatted to display all records and their
@@ -150,6 +224,58 @@ class PropertyMeterReadingsExporter():
             'column_defs': list(column_defs.values())
         }
 
+    def _usages_by_month_in_database(self):
+        """
+        Same as _usages_by_month, but the readings are prorated and summed by month in the
+        database, so only one row per meter and month is returned.
+        """
+        monthly_readings = {}
+
+        column_defs = {
+            '_month': {
+                'field': 'month',
+                '_filter_type': 'datetime',
+            },
+        }
+
+        meters = list(self.meters)
+        fields = {meter.id: self._build_column_def(meter, column_defs) for meter in meters}
+        if meters:
+            for meter_id, month, total in self._monthly_totals(meters):
+                field_name, conversion_factor = fields[meter_id]
+                month_key = month.strftime('%B %Y')
+                monthly_readings.setdefault(month_key, {'month': month_key})
+                monthly_readings[month_key][field_name] = round(total / conversion_factor, 2)
+
+        sorted_readings = sorted(monthly_readings.values(), key=lambda reading: datetime.strptime(reading['month'], '%B %Y'))
+
+        return {
+            'readings': sorted_readings,
+            'column_defs': list(column_defs.values())
+        }
+
+    def _monthly_totals(self, meters):
+        """
+        Returns the prorated total of each meter and month. When the continuous aggregates of
+        the readings exist, the totals are read from the monthly aggregate, except for the
+        meters with readings straddling the end of a month, which are prorated from the readings.
+        """
+        if not (settings.METER_READINGS_CONTINUOUS_AGGREGATES and aggregate_exists()):
+            return self._aggregate(MONTHLY_USAGES_SQL, meters)
+
+        totals = []
+        straddling_meter_ids = set()
+        for meter_id, month, total, straddling in monthly_totals([meter.id for meter in meters]):
+            if straddling:
+                straddling_meter_ids.add(meter_id)
+            totals.append((meter_id, month, total))
+
+        straddling_meters = [meter for meter in meters if meter.id in straddling_meter_ids]
+        if straddling_meters:
+            totals = [total for total in totals if total[0] not in straddling_meter_ids]
+            totals.extend(self._aggregate(MONTHLY_USAGES_SQL, straddling_meters))
+        return totals
+
     def _get_month_ranges(self, st, et):
         """
         Given two dates start time (st) and end date time (et)
@@ -201,7 +327,7 @@ class PropertyMeterReadingsExporter():
                 # Find all meters fully contained within this month (second-level granularity)
                 interval_readings = meter.meter_readings.filter(start_time__range=(current_year_time, end_of_year), end_time__range=(current_year_time, end_of_year))
                 if interval_readings.exists():
-                    readings_list = list(interval_readings.order_by('end_time'))
+                    readings_list = list(interval_readings.order_by('end_time').values_list('start_time', 'end_time', 'reading'))
                     reading_year_total = self._max_reading_total(readings_list)
 
                     if reading_year_total > 0:
@@ -216,6 +342,53 @@ class PropertyMeterReadingsExporter():
             'column_defs': list(column_defs.values())
         }
 
+    def _usages_by_year_in_database(self):
+        """
+        Same as _usages_by_year, but the yearly totals are computed in the database.
+
+        When the readings of a year do not overlap (and only the first one may be empty),
+        the maximum total of nonintersecting readings (_max_reading_total) is the first
+        reading plus the positive readings that follow it, which is computed in SQL. The readings of the years with overlapping
+        readings are loaded to find the maximum total in Python.
+        """
+        yearly_readings = defaultdict(lambda: {})
+
+        column_defs = {
+            '_year': {
+                'field': 'year',
+                '_filter_type': 'datetime',
+            },
+        }
+
+        meters = list(self.meters)
+        fields = {meter.id: self._build_column_def(meter, column_defs) for meter in meters}
+        totals = defaultdict(list)
+        if meters:
+            for meter_id, year, disjoint, total in self._aggregate(YEARLY_USAGES_SQL, meters):
+                if not disjoint:
+                    start_of_year = make_aware(year, timezone=self.tz)
+                    end_of_year = make_aware(year.replace(year=year.year + 1), timezone=self.tz)
+                    readings_list = list(MeterReading.objects.filter(
+                        meter_id=meter_id,
+                        start_time__range=(start_of_year, end_of_year),
+                        end_time__range=(start_of_year, end_of_year)
+                    ).order_by('end_time').values_list('start_time', 'end_time', 'reading'))
+                    total = self._max_reading_total(readings_list)
+                totals[meter_id].append((year.year, total))
+
+        # keep the order of the meters and years of _usages_by_year
+        for meter in meters:
+            field_name, conversion_factor = fields[meter.id]
+            for year, total in totals[meter.id]:
+                if total is not None and total > 0:
+                    yearly_readings[year]['year'] = year
+                    yearly_readings[year][field_name] = total / conversion_factor
+
+        return {
+            'readings': list(yearly_readings.values()),
+            'column_defs': list(column_defs.values())
+        }
+
     def _build_column_def(self, meter, column_defs):
         type_text = meter.get_type_display()
         if meter.source == meter.GREENBUTTON:
@@ -245,33 +418,6 @@ class PropertyMeterReadingsExporter():
 
         return field_name, conversion_factor
 
-    def _latest_nonintersecting_index(self, sorted_readings, start_index):
-        """
-        Using indexes, finds the latest reading before the current reading.
-        Specifically, this latest reading must not end after the current reading
-        starts. The index of the latest reading or -1, if none exists, is returned.
-
-        Note that the readings are expected to be sorted by ascending end_times.
-
-        This binary search is taken from
-        https://www.geeksforgeeks.org/weighted-job-scheduling-log-n-time/
-        """
-        lo = 0
-        hi = start_index - 1
-
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            current_start_time = sorted_readings[start_index].start_time
-
-            if sorted_readings[mid].end_time <= current_start_time:
-                if sorted_readings[mid + 1].end_time <= current_start_time:
-                    lo = mid + 1
-                else:
-                    return mid
-            else:
-                hi = mid - 1
-        return -1
-
     def _max_reading_total(self, sorted_readings):
         """
         Method to find maximum possible total of readings that do not
@@ -282,22 +428,45 @@ class PropertyMeterReadingsExporter():
         https://www.geeksforgeeks.org/weighted-job-scheduling-log-n-time/
 
         At a high level, a running maximum is tracked to ultimately find the max.
+        The latest reading which ends before each reading starts is found for all
+        the readings at once with a binary search over the end times. A reading of
+        zero length only overlaps the readings it is strictly within, so it is
+        counted with the readings ending or starting at the same time.
 
         Note that the readings are expected to be sorted by ascending end_times.
+
+        :param sorted_readings: list of (start_time, end_time, reading) tuples, e.g.,
+            from values_list
+        :return: float
         """
-        # Create list to track running maximum and prefill first entry
         n = len(sorted_readings)
-        running_max = [0 for _ in range(n)]
-        running_max[0] = sorted_readings[0].reading
+        start_times = np.fromiter((reading[0].timestamp() for reading in sorted_readings), dtype=float, count=n)
+        end_times = np.fromiter((reading[1].timestamp() for reading in sorted_readings), dtype=float, count=n)
+        readings = np.fromiter((reading[2] for reading in sorted_readings), dtype=float, count=n)
+
+        # index of the latest reading (before the current one) which does not end after
+        # the current reading starts, or -1 if none exists
+        indexes = np.arange(n)
+        latest_indexes = np.minimum(np.searchsorted(end_times, start_times, side='right'), indexes) - 1
+
+        if np.array_equal(latest_indexes, indexes - 1):
+            # none of the readings overlap, so every reading after the first one adds to
+            # the running maximum unless it is negative
+            return float(readings[0] + np.maximum(readings[1:], 0).sum())
+
+        # Create list to track running maximum and prefill first entry
+        readings = readings.tolist()
+        latest_indexes = latest_indexes.tolist()
+        running_max = [0.0] * n
+        running_max[0] = readings[0]
 
         # Fill the remaining entries in running_max
         for i in range(1, n):
-            curr_max = sorted_readings[i].reading
-
-            latest_index = self._latest_nonintersecting_index(sorted_readings, i)
+            curr_max = readings[i]
 
             # If a latest index was found, add it's running_max value to curr_max
-            if (latest_index != -1):
+            latest_index = latest_indexes[i]
+            if latest_index != -1:
                 curr_max += running_max[latest_index]
 
             # Store maximum of curr_max and the prior running_max entry
@@ -20,7 +20,6 @@ from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.lib.superperms.orgs.models import Organization
 from seed.models.data_quality import DataQualityCheck, Rule
 from seed.utils.api import OrgMixin, api_endpoint_class
-from seed.utils.cache import get_cache_raw
 
 logger = get_task_logger(__name__)
 
@@ -154,7 +153,7 @@ class DataQualityViews(viewsets.ViewSet, OrgMixin):
               required: true
               paramType: path
         """
-        data_quality_results = get_cache_raw(DataQualityCheck.cache_key(pk, self.get_organization(request)))
+        data_quality_results = DataQualityCheck.retrieve_results(pk, self.get_organization(request))
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="Data Quality Check Results.csv"'
 
@@ -458,7 +457,7 @@ class DataQualityViews(viewsets.ViewSet, OrgMixin):
         Organization.objects.get(pk=request.query_params['organization_id'])
 
         data_quality_id = request.query_params['data_quality_id']
-        data_quality_results = get_cache_raw(DataQualityCheck.cache_key(data_quality_id, self.get_organization(request)))
+        data_quality_results = DataQualityCheck.retrieve_results(data_quality_id, self.get_organization(request))
         return JsonResponse({
-            'data': data_quality_results
+            'data': data_quality_results if data_quality_results is None else list(data_quality_results)
         })
@@ -6,6 +6,8 @@
 """
 import json
 
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from drf_yasg.utils import swagger_auto_schema
@@ -16,8 +18,9 @@ from rest_framework.renderers import JSONRenderer
 
 from seed import tasks
 from seed.decorators import ajax_request_class
+from seed.lib.progress_data.progress_data import ProgressData
 from seed.lib.superperms.orgs.decorators import has_perm_class
-from seed.models import Column, Organization
+from seed.models import Column, Organization, PromotedExtraDataValue
 from seed.serializers.columns import ColumnSerializer
 from seed.serializers.pint import add_pint_unit_suffix
 from seed.utils.api import (
@@ -146,11 +149,28 @@ class ColumnViewSet(OrgValidateMixin, SEEDOrgNoPatchOrOrgCreateModelViewSet, Org
         request.data['shared_field_type'] = request.data['sharedFieldType']
         del request.data['sharedFieldType']
 
+        # Promoted values are stored by data type, so they must be rebuilt if it changes
+        column = Column.objects.filter(id=pk, organization_id=organization_id, is_promoted=True).first()
+        data_type_changed = column is not None and request.data.get('data_type', column.data_type) != column.data_type
+        if data_type_changed and PromotedExtraDataValue.value_field(request.data['data_type']) is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Columns with data type \'%s\' cannot be promoted, unpromote the column first' % request.data['data_type']
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         # Ensure ComStock uniqueness across properties and taxlots together
         if request.data['comstock_mapping'] is not None:
             Column.objects.filter(organization_id=organization_id, comstock_mapping=request.data['comstock_mapping']) \
                 .update(comstock_mapping=None)
-        return super(ColumnViewSet, self).update(request, pk)
+        with transaction.atomic():
+            if data_type_changed:
+                # the values of the previous data type are not used until they are rebuilt
+                Column.objects.filter(id=column.id).update(promoted_values_ready=False)
+            response = super(ColumnViewSet, self).update(request, pk)
+        if data_type_changed and response.status_code == status.HTTP_200_OK:
+            progress_data = ProgressData(func_name='refresh_promoted_column_values', unique_id=column.id)
+            tasks.refresh_promoted_column_values.subtask((column.id, progress_data.key)).apply_async()
+        return response
 
     @ajax_request_class
     @has_perm_class('can_modify_data')
@@ -221,6 +241,52 @@ class ColumnViewSet(OrgValidateMixin, SEEDOrgNoPatchOrOrgCreateModelViewSet, Org
                 'message': result[1]
             })
 
+    @swagger_auto_schema(
+        request_body=AutoSchemaHelper.schema_factory({
+            'is_promoted': 'boolean'
+        })
+    )
+    @ajax_request_class
+    @has_perm_class('can_modify_data')
+    @action(detail=True, methods=['POST'])
+    def promote(self, request, pk=None):
+        """
+        Promotes (or unpromotes with `is_promoted` false) an extra data Column. The values
+        of promoted columns are stored typed and indexed, which makes filtering and sorting
+        the inventory on the column much faster. Returns the progress of populating the
+        values when promoting.
+        """
+        org_id = self.get_organization(request)
+        try:
+            column = Column.objects.get(id=pk, organization_id=org_id)
+        except Column.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'message': 'Cannot find column in org=%s with pk=%s' % (org_id, pk)
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        column.is_promoted = str(request.data.get('is_promoted', 'true')).lower() == 'true'
+        # the column is filtered and sorted on extra_data until the task has filled the values
+        column.promoted_values_ready = False
+        try:
+            column.save()
+        except ValidationError as e:
+            return JsonResponse({
+                'success': False,
+                'message': ' '.join(e.messages)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not column.is_promoted:
+            column.promoted_values.all().delete()
+            return JsonResponse({
+                'success': True,
+                'message': 'Column %s is no longer promoted' % column.column_name
+            })
+
+        progress_data = ProgressData(func_name='refresh_promoted_column_values', unique_id=column.id)
+        tasks.refresh_promoted_column_values.subtask((column.id, progress_data.key)).apply_async()
+        return JsonResponse(progress_data.result())
+
     @swagger_auto_schema(
         manual_parameters=[
             AutoSchemaHelper.query_org_id_field(),
@@ -6,6 +6,7 @@
 """
 
 import csv
+from itertools import islice
 
 from celery.utils.log import get_task_logger
 from django.http import HttpResponse, JsonResponse
@@ -21,7 +22,6 @@ from seed.models import PropertyView, TaxLotView
 from seed.models.data_quality import DataQualityCheck
 from seed.utils.api import OrgMixin, api_endpoint_class
 from seed.utils.api_schema import AutoSchemaHelper
-from seed.utils.cache import get_cache_raw
 
 logger = get_task_logger(__name__)
 
@@ -125,7 +125,7 @@ class DataQualityCheckViewSet(viewsets.ViewSet, OrgMixin):
                 'message': 'must include Import file ID or cache key as run_id'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        data_quality_results = get_cache_raw(DataQualityCheck.cache_key(run_id, self.get_organization(request)))
+        data_quality_results = DataQualityCheck.retrieve_results(run_id, self.get_organization(request))
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="Data Quality Check Results.csv"'
 
@@ -161,6 +161,9 @@ class DataQualityCheckViewSet(viewsets.ViewSet, OrgMixin):
         manual_parameters=[
             AutoSchemaHelper.query_org_id_field(),
             AutoSchemaHelper.query_integer_field("run_id", True, "Import file ID or cache key"),
+            AutoSchemaHelper.query_string_field("severity", False, "Only return the results with this severity (error, warning or valid)"),
+            AutoSchemaHelper.query_integer_field("page", False, "Page of the results, all results are returned if not present"),
+            AutoSchemaHelper.query_integer_field("per_page", False, "Number of records per page, defaults to 100"),
         ]
     )
     @api_endpoint_class
@@ -176,7 +179,38 @@ class DataQualityCheckViewSet(viewsets.ViewSet, OrgMixin):
         are stored in redis!
         """
         data_quality_id = request.query_params['run_id']
-        data_quality_results = get_cache_raw(DataQualityCheck.cache_key(data_quality_id, self.get_organization(request)))
+        try:
+            page = request.query_params.get('page')
+            page = int(page) if page is not None else None
+            per_page = int(request.query_params.get('per_page', 100))
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'page and per_page must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if (page is not None and page < 1) or per_page < 1:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'page and per_page must be greater than 0'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data_quality_results = DataQualityCheck.retrieve_results(
+            data_quality_id, self.get_organization(request), request.query_params.get('severity')
+        )
+        if data_quality_results is None or page is None:
+            return JsonResponse({
+                'data': data_quality_results if data_quality_results is None else list(data_quality_results)
+            })
+
+        # the results are merged lazily, so only read one record past the page to know if there is a next page
+        start = (page - 1) * per_page
+        records = list(islice(data_quality_results, start, start + per_page + 1))
         return JsonResponse({
-            'data': data_quality_results
+            'data': records[:per_page],
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'has_next': len(records) > per_page,
+                'has_previous': page > 1,
+            }
         })
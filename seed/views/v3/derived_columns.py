@@ -16,6 +16,7 @@ from rest_framework.decorators import action
 from seed.decorators import ajax_request_class, require_organization_id_class
 from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.models import Column, DerivedColumn, PropertyView, TaxLotView
+from seed.models.columns import invalidate_column_cache
 from seed.serializers.derived_columns import DerivedColumnSerializer
 from seed.utils.api import OrgMixin, api_endpoint_class
 from seed.utils.api_schema import (
@@ -142,6 +143,7 @@ class DerivedColumnViewSet(viewsets.ViewSet, OrgMixin):
         try:
             serializer.save()
             Column.objects.filter(derived_column=pk).update(column_name=data['name'], display_name=data['name'], column_description=data['name'])
+            invalidate_column_cache(org_id)
             return JsonResponse({
                 'status': 'success',
                 'derived_column': serializer.data,
@@ -239,11 +241,12 @@ class DerivedColumnViewSet(viewsets.ViewSet, OrgMixin):
             'cycle_id': cycle_id,
         }).prefetch_related('state', inventory_name)
 
+        values = derived_column.evaluate_many([view.state for view in inventory_views])
         results = []
-        for view in inventory_views:
+        for view, value in zip(inventory_views, values):
             results.append({
                 'id': getattr(view, inventory_name).id,
-                'value': derived_column.evaluate(view.state)
+                'value': value
             })
 
         return JsonResponse({
@@ -70,6 +70,16 @@ def check_file_permission(user, filepath):
         except AnalysisOutputFile.DoesNotExist:
             raise ModelForFileNotFound('AnalysisOutputFile not found')
         organization = analysis_property_view.cycle.organization
+
+    elif base_dir == 'exports':
+        # background inventory exports are written to exports/<organization id>/<filename>
+        try:
+            _, organization_id, _ = filepath_parts
+            organization = Organization.objects.get(id=organization_id)
+        except ValueError:
+            raise ModelForFileNotFound('File path for export was an unexpected structure')
+        except Organization.DoesNotExist:
+            raise ModelForFileNotFound('Organization for export not found')
     else:
         raise ModelForFileNotFound(f'Base directory for media file is not currently handled: "{base_dir}"')
 
@@ -47,6 +47,7 @@ from seed.models import (
     AUDIT_IMPORT,
     Column,
     Cycle,
+    ExtraDataUsage,
     Property,
     PropertyAuditLog,
     PropertyState,
@@ -62,6 +63,7 @@ from seed.serializers.organizations import (
     SharedFieldsReturnSerializer
 )
 from seed.serializers.pint import apply_display_unit_preferences
+from seed.utils import extra_data_indexes
 from seed.utils.api import api_endpoint_class
 from seed.utils.api_schema import AutoSchemaHelper
 from seed.utils.cache import get_cache_raw, set_cache_raw
@@ -267,6 +269,71 @@ class OrganizationViewSet(viewsets.ViewSet):
                 'message': 'organization with with id {} does not exist'.format(pk)
             }, status=status.HTTP_404_NOT_FOUND)
 
+    @swagger_auto_schema(
+        methods=['POST', 'DELETE'],
+        request_body=AutoSchemaHelper.schema_factory({
+            'column_ids': ['integer'],
+            'min_uses': 'integer',
+            'name': 'string',
+        })
+    )
+    @api_endpoint_class
+    @ajax_request_class
+    @has_perm_class('requires_superuser')
+    @action(detail=True, methods=['GET', 'POST', 'DELETE'])
+    def extra_data_indexes(self, request, pk=None):
+        """
+        Manage the expression indexes on the extra data of the organization's states.
+
+        GET lists the indexes along with the filter and sort usage of the extra data columns.
+        POST creates the indexes of `column_ids`, or of the columns used at least `min_uses`
+        times when not provided, and returns the progress of the task.
+        DELETE drops the index `name`, or the indexes of columns which are no longer indexable.
+        """
+        org_id = int(pk)
+        if request.method == 'GET':
+            ExtraDataUsage.flush(org_id)
+            usages = ExtraDataUsage.objects.filter(column__organization_id=org_id) \
+                .select_related('column').order_by('-filter_count', '-sort_count')
+            return JsonResponse({
+                'status': 'success',
+                'indexes': extra_data_indexes.list_indexes(org_id),
+                'usage': [{
+                    'column_id': usage.column_id,
+                    'column_name': usage.column.column_name,
+                    'table_name': usage.column.table_name,
+                    'filter_count': usage.filter_count,
+                    'sort_count': usage.sort_count,
+                    'last_used': usage.last_used,
+                } for usage in usages],
+            })
+
+        if request.method == 'POST':
+            progress_data = ProgressData(func_name='create_extra_data_indexes', unique_id=org_id)
+            tasks.create_extra_data_indexes.subtask((
+                org_id,
+                request.data.get('column_ids', []),
+                int(request.data.get('min_uses', 10)),
+                progress_data.key,
+            )).apply_async()
+            return JsonResponse(progress_data.result())
+
+        name = request.data.get('name')
+        try:
+            if name:
+                if name not in [index['name'] for index in extra_data_indexes.list_indexes(org_id)]:
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': f'Index {name} does not exist in organization {org_id}'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                extra_data_indexes.drop_index(name)
+                dropped = [name]
+            else:
+                dropped = extra_data_indexes.drop_unused_indexes(org_id)
+        except extra_data_indexes.ExtraDataIndexException as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'status': 'success', 'dropped': dropped})
+
     @swagger_auto_schema(
         manual_parameters=[
             AutoSchemaHelper.query_integer_field(
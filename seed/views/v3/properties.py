@@ -399,6 +399,18 @@ class PropertyViewSet(generics.GenericAPIView, viewsets.ViewSet, OrgMixin, Profi
                 required=False,
                 description='Page to fetch'
             ),
+            AutoSchemaHelper.query_string_field(
+                'cursor',
+                required=False,
+                description='Paginate by cursor instead of page: empty for the first page, then the '
+                            '"next_cursor" of the previous page'
+            ),
+            AutoSchemaHelper.query_string_field(
+                'count_mode',
+                required=False,
+                description='Total count when paginating by cursor: "cached" (default), "exact", '
+                            '"approximate" or "none"'
+            ),
             AutoSchemaHelper.query_boolean_field(
                 'include_related',
                 required=False,
@@ -470,6 +482,18 @@ class PropertyViewSet(generics.GenericAPIView, viewsets.ViewSet, OrgMixin, Profi
                 required=False,
                 description='Page to fetch'
             ),
+            AutoSchemaHelper.query_string_field(
+                'cursor',
+                required=False,
+                description='Paginate by cursor instead of page: empty for the first page, then the '
+                            '"next_cursor" of the previous page'
+            ),
+            AutoSchemaHelper.query_string_field(
+                'count_mode',
+                required=False,
+                description='Total count when paginating by cursor: "cached" (default), "exact", '
+                            '"approximate" or "none"'
+            ),
             AutoSchemaHelper.query_boolean_field(
                 'include_related',
                 required=False,
@@ -8,17 +8,14 @@ All rights reserved.
 :author
 """
 import csv
-import datetime
 import io
 import logging
 import math
-from collections import OrderedDict
 from random import randint
 
 import xlsxwriter
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
-from quantityfield.units import ureg
 from rest_framework.decorators import action
 from rest_framework.renderers import JSONRenderer
 from rest_framework.viewsets import GenericViewSet
@@ -26,25 +23,24 @@ from rest_framework.viewsets import GenericViewSet
 from seed.decorators import ajax_request_class
 from seed.lib.progress_data.progress_data import ProgressData
 from seed.lib.superperms.orgs.decorators import has_perm_class
-from seed.models import (
-    ColumnListProfile,
-    PropertyView,
-    TaxLotProperty,
-    TaxLotView
-)
+from seed.models import TaxLotProperty
 from seed.models.meters import Meter, MeterReading
 from seed.models.property_measures import PropertyMeasure
 from seed.models.scenarios import Scenario
 from seed.serializers.tax_lot_properties import TaxLotPropertySerializer
-from seed.tasks import update_inventory_metadata
+from seed.tasks import export_inventory, update_inventory_metadata
 from seed.utils.api import OrgMixin, api_endpoint_class
 from seed.utils.api_schema import AutoSchemaHelper
+from seed.utils.inventory_export import (
+    InventoryExporter,
+    export_header,
+    export_row,
+    geojson_feature
+)
 from seed.utils.match import update_sub_progress_total
 
 _log = logging.getLogger(__name__)
 
-INVENTORY_MODELS = {'properties': PropertyView, 'taxlots': TaxLotView}
-
 
 class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
     """
@@ -70,12 +66,18 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
                 'export_type': 'string',
                 'profile_id': 'integer',
                 'proress_key': 'string',
+                'stream': 'boolean',
+                'background': 'boolean',
             },
             description='- ids: (View) IDs for records to be exported\n'
                         '- filename: desired filename including extension (defaulting to \'ExportedData.{export_type}\')\n'
                         '- export_types: \'csv\', \'geojson\', \'xlsx\' (defaulting to \'csv\')\n'
                         '- profile_id: Column List Profile ID to use for customizing fields included in export'
-                        '- progress_key: (Optional) Used to find and update the ProgressData object. If none is provided, a ProgressData object will be created.'
+                        '- progress_key: (Optional) Used to find and update the ProgressData object. If none is provided, a ProgressData object will be created.\n'
+                        '- stream: (Optional) Stream the CSV or GeoJSON response chunk by chunk instead of building it in memory\n'
+                        '- background: (Optional) Write the export to a file in a background task. The file path '
+                        '(relative to the media endpoint) is in the progress data summary once the export is complete. '
+                        'XLSX files written in the background only contain the inventory tab.'
         ),
     )
     @api_endpoint_class
@@ -96,83 +98,46 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
             progress_key = progress_data.key
         progress_data = update_sub_progress_total(100, progress_key)
 
-        profile_id = None
-        column_profile = None
-        if 'profile_id' in request.data and str(request.data['profile_id']) not in ['None', '']:
-            profile_id = request.data['profile_id']
-            column_profile = ColumnListProfile.objects.get(id=profile_id)
-
-        # get the class to operate on and the relationships
+        profile_id = request.data.get('profile_id')
         view_klass_str = request.query_params.get('inventory_type', 'properties')
-        view_klass = INVENTORY_MODELS[view_klass_str]
+        ids = request.data.get('ids', [])
+        include_notes = request.data.get('include_notes', True)
+        export_type = request.data.get('export_type', 'csv')
+        filename = request.data.get('filename', f"ExportedData.{export_type}")
 
-        # Set the first column to be the ID
-        column_name_mappings = OrderedDict([('id', 'ID')])
-        column_ids, add_column_name_mappings, columns_from_database = ColumnListProfile.return_columns(
+        if request.data.get('background', False):
+            export_inventory.subtask(
+                [org_id, view_klass_str, profile_id, ids, include_notes, export_type, filename, progress_key]
+            ).apply_async()
+            return progress_data.result()
+
+        exporter = InventoryExporter(
             org_id,
-            profile_id,
-            view_klass_str)
-        column_name_mappings.update(add_column_name_mappings)
+            inventory_type=view_klass_str,
+            profile_id=profile_id,
+            ids=ids,
+            include_notes=include_notes,
+        )
+        column_name_mappings = exporter.column_name_mappings
 
-        select_related = ['state', 'cycle']
-        prefetch_related = ['labels']
-        ids = request.data.get('ids', [])
-        filter_str = {}
-        if ids:
-            filter_str['id__in'] = ids
-        if hasattr(view_klass, 'property'):
-            select_related.append('property')
-            filter_str['property__organization_id'] = org_id
-            # always export the labels and notes
-            column_name_mappings['property_notes'] = 'Property Notes'
-            column_name_mappings['property_labels'] = 'Property Labels'
-
-        elif hasattr(view_klass, 'taxlot'):
-            select_related.append('taxlot')
-            filter_str['taxlot__organization_id'] = org_id
-            # always export the labels and notes
-            column_name_mappings['taxlot_notes'] = 'Tax Lot Notes'
-            column_name_mappings['taxlot_labels'] = 'Tax Lot Labels'
-
-        model_views = view_klass.objects.select_related(*select_related).prefetch_related(
-            *prefetch_related).filter(**filter_str).order_by('id')
+        if request.data.get('stream', False) and export_type in ['csv', 'geojson']:
+            return self._streaming_response(filename, exporter, export_type, progress_data)
+
+        model_views = list(exporter.get_queryset())
 
         # get the data in a dict which includes the related data
         progress_data.step('Exporting Inventory...')
-        data = TaxLotProperty.serialize(model_views, column_ids, columns_from_database)
-
-        derived_columns = column_profile.derived_columns.all() if column_profile is not None else []
-        column_name_mappings.update({dc.name: dc.name for dc in derived_columns})
+        labels_and_notes = exporter.get_labels_and_notes([view.id for view in model_views])
+        data = TaxLotProperty.serialize(
+            model_views, exporter.column_ids, exporter.columns_from_database, labels_and_notes=labels_and_notes
+        )
         progress_data.step('Exporting Inventory...')
 
         # add labels, notes, and derived columns
-        include_notes = request.data.get('include_notes', True)
-        batch_size = math.ceil(len(model_views) / 98)
-        for i, record in enumerate(model_views):
-            label_string = []
-            note_string = []
-            for label in list(record.labels.all().order_by('name')):
-                label_string.append(label.name)
-            if include_notes:
-                for note in list(record.notes.all().order_by('created')):
-                    note_string.append(
-                        note.created.astimezone().strftime("%Y-%m-%d %I:%M:%S %p") + "\n" +
-                        note.text
-                    )
-
-            if hasattr(record, 'property'):
-                data[i]['property_labels'] = ','.join(label_string)
-                data[i]['property_notes'] = '\n----------\n'.join(note_string) if include_notes else '(excluded during export)'
-            elif hasattr(record, 'taxlot'):
-                data[i]['taxlot_labels'] = ','.join(label_string)
-                data[i]['taxlot_notes'] = '\n----------\n'.join(note_string) if include_notes else '(excluded during export)'
-
-            # add derived columns
-            for derived_column in derived_columns:
-                data[i][derived_column.name] = derived_column.evaluate(inventory_state=record.state)
-
-            if batch_size > 0 and i % batch_size == 0:
-                progress_data.step('Exporting Inventory...')
+        batch_size = max(math.ceil(len(model_views) / 98), 1)
+        for i in range(0, len(model_views), batch_size):
+            exporter.annotate(model_views[i:i + batch_size], data[i:i + batch_size], labels_and_notes)
+            progress_data.step('Exporting Inventory...')
 
         # force the data into the same order as the IDs
         if ids:
@@ -182,9 +147,7 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
             else:
                 view_id_str = 'taxlot_view_id'
             data.sort(key=lambda inventory_obj: order_dict[inventory_obj[view_id_str]])
-        export_type = request.data.get('export_type', 'csv')
 
-        filename = request.data.get('filename', f"ExportedData.{export_type}")
         progress_data.finish_with_success()
         if export_type == "csv":
             return self._csv_response(filename, data, column_name_mappings)
@@ -213,35 +176,27 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
         response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
 
         writer = csv.writer(response)
-
-        # check the first item in the header and make sure that it isn't ID (it can be id, or iD).
-        # excel doesn't like the first item to be ID in a CSV
-        header = list(column_name_mappings.values())
-        if header[0] == 'ID':
-            header[0] = 'id'
-        writer.writerow(header)
+        writer.writerow(export_header(column_name_mappings))
 
         # iterate over the results to preserve column order and write row.
         for datum in data:
-            row = []
-            for column in column_name_mappings:
-                row_result = datum.get(column, None)
+            writer.writerow(export_row(datum, column_name_mappings))
 
-                # Try grabbing the value out of the related field if not found yet.
-                if row_result is None and datum.get('related'):
-                    row_result = datum['related'][0].get(column, None)
+        return response
 
-                # Convert quantities (this is typically handled in the JSON Encoder, but that isn't here).
-                if isinstance(row_result, ureg.Quantity):
-                    row_result = row_result.magnitude
-                elif isinstance(row_result, datetime.datetime):
-                    row_result = row_result.strftime("%Y-%m-%d %H:%M:%S")
-                elif isinstance(row_result, datetime.date):
-                    row_result = row_result.strftime("%Y-%m-%d")
-                row.append(row_result)
+    def _streaming_response(self, filename, exporter, export_type, progress_data):
+        """Stream the export, serializing one chunk of views at a time"""
+        if export_type == 'geojson':
+            chunks, content_type = exporter.iter_geojson(progress_data), 'application/json'
+        else:
+            chunks, content_type = exporter.iter_csv(progress_data), 'text/csv'
 
-            writer.writerow(row)
+        def _stream():
+            yield from chunks
+            progress_data.finish_with_success()
 
+        response = StreamingHttpResponse(_stream(), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
         return response
 
     def _spreadsheet_response(self, filename, data, column_name_mappings):
@@ -316,23 +271,8 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
         for datum in data:
             row += 1
             id = None
-            for index, column in enumerate(column_name_mappings):
-                if column == 'id':
-                    id = datum.get(column, None)
-
-                row_result = datum.get(column, None)
-
-                # Try grabbing the value out of the related field if not found yet.
-                if row_result is None and datum.get('related'):
-                    row_result = datum['related'][0].get(column, None)
-
-                # Convert quantities (this is typically handled in the JSON Encoder, but that isn't here).
-                if isinstance(row_result, ureg.Quantity):
-                    row_result = row_result.magnitude
-                elif isinstance(row_result, datetime.datetime):
-                    row_result = row_result.strftime("%Y-%m-%d %H:%M:%S")
-                elif isinstance(row_result, datetime.date):
-                    row_result = row_result.strftime("%Y-%m-%d")
+            id = datum.get('id', None)
+            for index, row_result in enumerate(export_row(datum, column_name_mappings)):
                 ws1.write(row, index, row_result)
 
             # measures
@@ -425,7 +365,6 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
         return response
 
     def _json_response(self, filename, data, column_name_mappings):
-        polygon_fields = ["bounding_box", "centroid", "property_footprint", "taxlot_footprint", "long_lat"]
         features = []
 
         # extract related records
@@ -435,84 +374,7 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
         complete_data = data + related_records
 
         for datum in complete_data:
-            feature = {
-                "type": "Feature",
-                "properties": {}
-            }
-
-            for key, value in datum.items():
-                if value is None:
-                    continue
-
-                if isinstance(value, ureg.Quantity):
-                    value = value.magnitude
-                elif isinstance(value, datetime.datetime):
-                    value = value.strftime("%Y-%m-%d %H:%M:%S")
-                elif isinstance(value, datetime.date):
-                    value = value.strftime("%Y-%m-%d")
-
-                if value and any(k in key for k in polygon_fields):
-                    """
-                    If object is a polygon and is populated, add the 'geometry'
-                    key-value-pair in the appropriate GeoJSON format.
-                    When the first geometry is added, the correct format is
-                    established. When/If a second geometry is added, this is
-                    appended alongside the previous geometry.
-                    """
-                    individual_geometry = {}
-
-                    # long_lat
-                    if key == 'long_lat':
-                        coordinates = self._serialized_point(value)
-                        # point
-                        individual_geometry = {
-                            "coordinates": coordinates,
-                            "type": "Point"
-                        }
-                    else:
-                        # polygons
-                        coordinates = self._serialized_coordinates(value)
-                        individual_geometry = {
-                            "coordinates": [coordinates],
-                            "type": "Polygon"
-                        }
-
-                    if feature.get("geometry", None) is None:
-                        feature["geometry"] = {
-                            "type": "GeometryCollection",
-                            "geometries": [individual_geometry]
-                        }
-                    else:
-                        feature["geometry"]["geometries"].append(individual_geometry)
-                else:
-                    """
-                    Non-polygon data
-                    """
-                    display_key = column_name_mappings.get(key, key)
-                    feature["properties"][display_key] = value
-
-                    # # store point geometry in case you need it
-                    # if display_key == "Longitude":
-                    #     point_geometry[0] = value
-                    # if display_key == "Latitude":
-                    #     point_geometry[1] = value
-
-            """
-            Before appending feature, ensure that if there is no geometry recorded.
-            Note that the GeoJson will not render if no lat/lng
-            """
-
-            # add style information
-            if feature["properties"].get("property_state_id") is not None:
-                feature["properties"]["stroke"] = "#185189"  # buildings color
-            elif feature["properties"].get("taxlot_state_id") is not None:
-                feature["properties"]["stroke"] = "#10A0A0"  # buildings color
-            feature["properties"]["marker-color"] = "#E74C3C"
-            # feature["properties"]["stroke-width"] = 3
-            feature["properties"]["fill-opacity"] = 0
-
-            # append feature
-            features.append(feature)
+            features.append(geojson_feature(datum, column_name_mappings))
 
             response_dict = {
                 "type": "FeatureCollection",
@@ -528,25 +390,6 @@ class TaxLotPropertyViewSet(GenericViewSet, OrgMixin):
 
         return response
 
-    def _serialized_coordinates(self, polygon_wkt):
-        string_coord_pairs = polygon_wkt.lstrip('POLYGON (').rstrip(')').split(', ')
-
-        coordinates = []
-        for coord_pair in string_coord_pairs:
-            float_coords = [float(coord) for coord in coord_pair.split(' ')]
-            coordinates.append(float_coords)
-
-        return coordinates
-
-    def _serialized_point(self, point_wkt):
-        string_coords = point_wkt.lstrip('POINT (').rstrip(')').split(', ')
-
-        coordinates = []
-        for coord in string_coords[0].split(' '):
-            coordinates.append(float(coord))
-
-        return coordinates
-
     def _extract_related(self, data):
         # extract all related records into a separate array
         related = []
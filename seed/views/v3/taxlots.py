@@ -101,6 +101,18 @@ class TaxlotViewSet(viewsets.ViewSet, OrgMixin, ProfileIdMixin):
                 required=False,
                 description='The number of items per page to return'
             ),
+            AutoSchemaHelper.query_string_field(
+                'cursor',
+                required=False,
+                description='Paginate by cursor instead of page: empty for the first page, then the '
+                            '"next_cursor" of the previous page'
+            ),
+            AutoSchemaHelper.query_string_field(
+                'count_mode',
+                required=False,
+                description='Total count when paginating by cursor: "cached" (default), "exact", '
+                            '"approximate" or "none"'
+            ),
             AutoSchemaHelper.query_integer_field(
                 'profile_id',
                 required=False,
@@ -178,6 +190,18 @@ class TaxlotViewSet(viewsets.ViewSet, OrgMixin, ProfileIdMixin):
                 required=False,
                 description='The number of items per page to return'
             ),
+            AutoSchemaHelper.query_string_field(
+                'cursor',
+                required=False,
+                description='Paginate by cursor instead of page: empty for the first page, then the '
+                            '"next_cursor" of the previous page'
+            ),
+            AutoSchemaHelper.query_string_field(
+                'count_mode',
+                required=False,
+                description='Total count when paginating by cursor: "cached" (default), "exact", '
+                            '"approximate" or "none"'
+            ),
             AutoSchemaHelper.query_boolean_field(
                 'include_related',
                 required=False,